@@ -77,12 +77,14 @@ class GlobalSettingsDialog(QtWidgets.QDialog):
     ion_division = bnd.bind("ion_division_radios")
     min_concentration = bnd.bind("min_conc_spinbox")
     default_density = bnd.bind("scientific_spinbox")
+    undo_depth = bnd.bind("undo_depth_spinbox")
     
     coinc_count = bnd.bind("line_coinc_count")
     
     cross_section = bnd.bind("cross_section_radios")
  
     save_window_geometries = bnd.bind("window_geom_chkbox")
+    lazy_loading = bnd.bind("lazy_loading_chkbox")
 
     settings_updated = QtCore.pyqtSignal(GlobalSettings)
 
@@ -179,6 +181,7 @@ class GlobalSettingsDialog(QtWidgets.QDialog):
         self.ion_division = self.settings.get_ion_division()
         self.min_conc_spinbox.setMinimum(GlobalSettings.MIN_CONC_LIMIT)
         self.min_concentration = self.settings.get_minimum_concentration()
+        self.undo_depth = self.settings.get_undo_history_depth()
         
         reference_density_value = self.settings.get_default_reference_density()
         self.scientific_spinbox = ScientificSpinBox(
@@ -205,6 +208,7 @@ class GlobalSettingsDialog(QtWidgets.QDialog):
             BaseTab.SAVE_WINDOW_GEOM_KEY, True
         )
         self.color_scheme = self.settings.get_tofe_color()
+        self.lazy_loading = self.settings.get_lazy_loading()
 
     @staticmethod
     def __create_spinbox(default):
@@ -250,6 +254,8 @@ class GlobalSettingsDialog(QtWidgets.QDialog):
         self.settings.set_ion_division(self.ion_division)
         self.settings.set_minimum_concentration(self.min_concentration)
         self.settings.set_default_reference_density(self.default_density)
+        self.settings.set_undo_history_depth(self.undo_depth)
+        self.settings.set_lazy_loading(self.lazy_loading)
 
         gutils.set_potku_setting(
             BaseTab.SAVE_WINDOW_GEOM_KEY, self.save_window_geometries)
@@ -219,7 +219,8 @@ class ElementLossesWidget(QtWidgets.QWidget):
                 self.measurement.get_composition_changes_dir(),
                 self.reference_cut_file,
                 self.checked_cuts,
-                self.partition_count)
+                self.partition_count,
+                cache=self.measurement.get_result_cache())
 
             if progress is not None:
                 sub_progress = progress.get_sub_reporter(
@@ -28,13 +28,14 @@ __author__ = "Timo Konu \n Severi Jääskeläinen \n Samuel Kaiponen \n Heta " \
              "Rekilä \n Sinikka Siironen"
 __version__ = "2.0"
 
-import numpy
-import struct
-
 import dialogs.dialog_functions as df
+import modules.list_mode as list_mode
 import widgets.gui_utils as gutils
 import dialogs.file_dialogs as fdialogs
 
+from pathlib import Path
+from timeit import default_timer as timer
+
 from widgets.gui_utils import StatusBarHandler
 from widgets.icon_manager import IconManager
 
@@ -91,28 +92,6 @@ class ImportDialogBinary(QtWidgets.QDialog):
         root = self.treeWidget.invisibleRootItem()
         self.button_import.setEnabled(root.childCount() > 0)
 
-    @staticmethod
-    def __convert_file(input_file, output_file):
-        """Convert binary file into ascii file.
-        
-        Args:
-            input_file: A string representing input binary file.
-            output_file: A string representing output ascii file.
-        """
-        data = []
-        with open(input_file, "rb") as f:
-            byte = f.read(4)
-            while byte:
-                # Second column is actually unsigned, but Python is broken
-                # in regard to unpacking it properly (treats it as signed 
-                # regardless) therefore we've to manually "make" it unsigned.
-                cols = struct.unpack("<hh", byte)
-                row = [cols[0], cols[1] - 8192]
-                data.append(row)
-                byte = f.read(4)
-        numpy_array = numpy.array(data)
-        numpy.savetxt(output_file, numpy_array, delimiter=" ", fmt="%d %d")  
-
     def __import_files(self):
         """Import binary files.
         """
@@ -122,15 +101,37 @@ class ImportDialogBinary(QtWidgets.QDialog):
         root = self.treeWidget.invisibleRootItem()
         root_child_count = root.childCount()
 
+        conversions = []
+        filename_list = []
         for i in range(root_child_count):
             item = root.child(i)
-            input_file = item.file
+            filename_list.append(item.filename)
 
             output_file = df.import_new_measurement(
                 self.request, self.parent, item)
-            self.__convert_file(input_file, output_file)
-
-            sbh.reporter.report(10 + (i + 1 / root_child_count) * 90)
+            conversions.append((Path(item.file), output_file))
+
+        start_time = timer()
+
+        def report_progress(converted: int, total: int):
+            # Show the throughput next to the percentage in the progress bar
+            elapsed = timer() - start_time
+            if sbh.progress_bar is not None and elapsed > 0:
+                sbh.progress_bar.setFormat(
+                    f"%p% ({converted / elapsed / 1e6:.1f} MB/s)")
+            sbh.reporter.report(10 + 90 * converted / max(total, 1))
+
+        list_mode.convert_binary_files(conversions, progress=report_progress)
+
+        elapsed = timer() - start_time
+        total_size = sum(input_file.stat().st_size
+                         for input_file, _ in conversions)
+        self.request.log(
+            f"Imported binary measurements to request: "
+            f"{', '.join(filename_list)}")
+        self.request.log(
+            f"Importing finished {elapsed} seconds "
+            f"({total_size / max(elapsed, 1e-9) / 1e6:.1f} MB/s)")
 
         sbh.reporter.report(100)
         self.imported = True
@@ -31,6 +31,7 @@ __version__ = "2.0"
 import re
 
 import dialogs.dialog_functions as df
+import modules.coincidence as coincidence
 import modules.general_functions as gf
 import widgets.gui_utils as gutils
 
@@ -81,6 +82,8 @@ class ImportMeasurementsDialog(QtWidgets.QDialog):
         self.imported = False
         
         self.__add_timing_labels()
+        self.check_in_process_coinc.setChecked(
+            self.global_settings.get_import_in_process_coinc())
 
         self.button_import.clicked.connect(self.__import_files) 
         self.button_cancel.clicked.connect(self.__close) 
@@ -168,6 +171,7 @@ class ImportMeasurementsDialog(QtWidgets.QDialog):
                 timing[coinc_timing.adc] = (coinc_timing.low.value(),
                                             coinc_timing.high.value())
         start_time = timer()
+        find_coincidences = self.__get_coinc_function()
 
         sbh.reporter.report(10)
         
@@ -178,15 +182,15 @@ class ImportMeasurementsDialog(QtWidgets.QDialog):
 
             output_file = df.import_new_measurement(
                 self.request, self.parent, item)
-            gf.coinc(Path(item.file),
-                     output_file=output_file,
-                     skip_lines=self.spin_skiplines.value(),
-                     tablesize=10,
-                     trigger=self.spin_adctrigger.value(),
-                     adc_count=self.spin_adccount.value(),
-                     timing=timing,
-                     columns=string_column,
-                     nevents=self.spin_eventcount.value())
+            find_coincidences(Path(item.file),
+                              output_file=output_file,
+                              skip_lines=self.spin_skiplines.value(),
+                              tablesize=10,
+                              trigger=self.spin_adctrigger.value(),
+                              adc_count=self.spin_adccount.value(),
+                              timing=timing,
+                              columns=string_column,
+                              nevents=self.spin_eventcount.value())
 
             sbh.reporter.report(10 + (i + 1) / root_child_count * 90)
 
@@ -337,7 +341,21 @@ class ImportMeasurementsDialog(QtWidgets.QDialog):
             trigger=self.spin_adctrigger.value(),
             adc_count=self.spin_adccount.value(),
             timing=timing,
-            coinc_count=self.global_settings.get_import_coinc_count())
+            coinc_count=self.global_settings.get_import_coinc_count(),
+            coinc_function=self.__get_coinc_function())
+
+    def __get_coinc_function(self):
+        """Returns the function that calculates coincidences, either the
+        in-process implementation or the one that runs the coinc program.
+        The selection is remembered in global settings.
+        """
+        in_process = self.check_in_process_coinc.isChecked()
+        if in_process != self.global_settings.get_import_in_process_coinc():
+            self.global_settings.set_import_in_process_coinc(in_process)
+            self.global_settings.save_config()
+        if in_process:
+            return coincidence.find_coincidences
+        return gf.coinc
 
     def __create_combobox(self, adc):
         """Create combobox for ADC.
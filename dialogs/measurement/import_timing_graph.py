@@ -43,7 +43,7 @@ class ImportTimingGraphDialog(QtWidgets.QDialog):
 
     def __init__(self, parent, input_file, output_file, adc_timing_spin,
                  icon_manager, skip_lines, trigger, adc_count, timing,
-                 coinc_count):
+                 coinc_count, coinc_function=gf.coinc):
         """Inits timing graph dialog for measurement import.
         
         Args:
@@ -58,6 +58,7 @@ class ImportTimingGraphDialog(QtWidgets.QDialog):
             timing: A dictionary of tuples for each ADC.
             coinc_count: An integer representing number of coincidences to be 
                          captured from input_file.
+            coinc_function: Function that calculates the coincidences.
         """
         super().__init__()
         uic.loadUi(gutils.get_ui_dir() / "ui_import_graph_dialog.ui", self)
@@ -68,7 +69,7 @@ class ImportTimingGraphDialog(QtWidgets.QDialog):
         self.timing_high = adc_timing_spin[1]
 
         self.button_close.clicked.connect(self.close)
-        data = gf.coinc(
+        data = coinc_function(
             input_file, skip_lines=skip_lines, tablesize=10, trigger=trigger,
             adc_count=adc_count, timing=timing, nevents=coinc_count,
             columns="$4", timediff=True, output_file=output_file)
@@ -43,6 +43,7 @@ from modules.element_simulation import ElementSimulation
 from modules.enums import OptimizationType, OptimizationMethod
 from modules.linear_optimization import LinearOptimization
 from modules.nsgaii import Nsgaii
+from modules.optimization_checkpoint import get_checkpoint_file
 from modules.simulation import Simulation
 from widgets.binding import PropertySavingWidget
 from widgets.gui_utils import QtABCMeta
@@ -180,6 +181,9 @@ class OptimizationDialog(QtWidgets.QDialog, PropertySavingWidget,
             self._enable_ok_button)
         self.simulationTreeWidget.itemSelectionChanged.connect(
             self._adjust_x)
+        self.simulationTreeWidget.itemSelectionChanged.connect(
+            self._enable_resume)
+        self._enable_resume()
         self.auto_adjust_x_box.clicked.connect(self._adjust_x)
 
         self._fill_measurement_widget()
@@ -257,6 +261,17 @@ class OptimizationDialog(QtWidgets.QDialog, PropertySavingWidget,
             self.selected_cut_file is not None and
             self.selected_element_simulation is not None)
 
+    def _enable_resume(self, *_):
+        """Enables resuming NSGA-II optimizations of the selected
+        ElementSimulation if a previous optimization has left a checkpoint.
+        """
+        elem_sim = self.selected_element_simulation
+        for widget in self.nsgaii_recoil_widget, self.nsgaii_fluence_widget:
+            widget.set_resume_enabled(
+                elem_sim is not None and get_checkpoint_file(
+                    elem_sim.directory, elem_sim.name_prefix,
+                    widget.optimization_type).is_file())
+
     def _adjust_x(self):
         """Adjusts the upper limit value on x axis based on the distribution
         length of the main recoil of currently selected ElementSimulation.
@@ -370,15 +385,18 @@ class OptimizationDialog(QtWidgets.QDialog, PropertySavingWidget,
             if self.current_mode == OptimizationType.RECOIL:
                 params = self.nsgaii_recoil_widget.get_properties()
                 optimize_by_area = self.nsgaii_recoil_widget.optimize_by_area
+                resume = self.nsgaii_recoil_widget.is_resume_checked()
             else:
                 params = self.nsgaii_fluence_widget.get_properties()
                 optimize_by_area = self.nsgaii_fluence_widget.optimize_by_area
+                resume = self.nsgaii_fluence_widget.is_resume_checked()
 
             optimizer = Nsgaii(
                 element_simulation=elem_sim, measurement=measurement,
                 cut_file=cut, ch=self.ch, **params,
                 use_efficiency=self.use_efficiency,
                 optimize_by_area=optimize_by_area, verbose=self.verbose)
+            start_kwargs = {"resume": resume}
         else:
             if self.current_mode == OptimizationType.RECOIL:
                 params = self.linear_recoil_widget.get_properties()
@@ -389,12 +407,13 @@ class OptimizationDialog(QtWidgets.QDialog, PropertySavingWidget,
                 element_simulation=elem_sim, measurement=measurement,
                 cut_file=cut, ch=self.ch, **params,
                 use_efficiency=self.use_efficiency, verbose=self.verbose)
+            start_kwargs = {}
 
         # Optimization running thread
         ct = CancellationToken()
         optimization_thread = threading.Thread(
             target=optimizer.start_optimization,
-            kwargs={"cancellation_token": ct})
+            kwargs={"cancellation_token": ct, **start_kwargs})
 
         # Create necessary results widget
         result_widget = self.tab.add_optimization_results_widget(
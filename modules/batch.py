@@ -0,0 +1,447 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Batch module applies a master measurement's selections, cuts, depth profiles,
+elemental losses and energy spectra to the slave measurements of a request
+without the graphical user interface. Slave measurements are processed in
+parallel and the output files are the same as the ones Potku's master
+commands produce.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import argparse
+import functools
+import os
+import sys
+
+from pathlib import Path
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from . import cut_file
+from . import depth_files
+from . import general_functions as gf
+from .concurrency import EvaluationExecutor
+from .element import Element
+from .energy_spectrum import EnergySpectrum
+from .energy_spectrum import SumEnergySpectrum
+from .enums import DepthProfileUnit
+from .enums import SumSpectrumType
+from .global_settings import GlobalSettings
+from .measurement import Measurement
+from .request import Request
+from .selection import Selector
+
+# Names of the files in which the measurement tab widgets store their state
+DEPTH_PROFILE_SAVE_FILE = "widget_depth_profile.save"
+ELEMENT_LOSSES_SAVE_FILE = "widget_composition_changes.save"
+ENERGY_SPECTRUM_SAVE_FILE = "widget_energy_spectrum.save"
+
+
+class SlaveResult(NamedTuple):
+    """Outcome of applying the master's commands to a slave measurement.
+    """
+    name: str
+    outputs: List[str]
+    errors: List[str]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def load_request(request_file: Path,
+                 settings: Optional[GlobalSettings] = None,
+                 enable_logging: bool = True) -> Request:
+    """Opens a request and loads its samples and measurements the same way
+    Potku does when a request is opened. Measurement data is not loaded.
+
+    Args:
+        request_file: path to a .request file
+        settings: GlobalSettings object. Settings are read from the default
+            configuration directory if None.
+        enable_logging: whether request and measurements log to files
+
+    Return:
+        Request object
+    """
+    if settings is None:
+        settings = GlobalSettings(save_on_creation=False)
+    request = Request.from_file(
+        request_file, settings, enable_logging=enable_logging)
+
+    for sample_path in request.get_samples_files():
+        request.samples.add_sample(sample_path=sample_path)
+
+    tab_id = 0
+    samples = request.samples.get_samples_and_measurements()
+    for sample, measurement_files in samples.items():
+        for measurement_file in measurement_files:
+            request.samples.measurements.add_measurement_file(
+                sample, measurement_file, tab_id, "", False,
+                selector_cls=Selector)
+            tab_id += 1
+    request.index.save()
+    return request
+
+
+def get_slaves(request: Request) -> List[Measurement]:
+    """Returns the measurements that follow the master measurement of the
+    request. Returns an empty list if the request has no master.
+    """
+    master = request.has_master()
+    if master == "":
+        return []
+    nonslaves = request.get_nonslaves()
+    return [
+        measurement
+        for measurement in request.samples.measurements.measurements.values()
+        if measurement is not master and measurement not in nonslaves
+    ]
+
+
+def process_slave(request_file: Path, slave_path: Path,
+                  config_dir: Optional[Path] = None) -> SlaveResult:
+    """Applies the master measurement's commands to a single slave.
+
+    The request is opened separately for each slave so that this function
+    can be run in a worker process. Only the master and the slave are
+    loaded, and the request's directory index is not saved.
+
+    Args:
+        request_file: path to a .request file
+        slave_path: path to the .info file of the slave measurement
+        config_dir: Potku's configuration directory
+
+    Return:
+        SlaveResult
+    """
+    settings = GlobalSettings(config_dir=config_dir, save_on_creation=False)
+    request = Request.from_file(request_file, settings)
+    try:
+        master_path = request.get_master_path()
+        if master_path == "":
+            raise ValueError(f"Request {request.get_name()} has no master "
+                             f"measurement.")
+        slave_path = Path(slave_path)
+        if str(slave_path) == master_path or \
+                str(slave_path) in request.get_nonslave_paths():
+            raise ValueError(f"Measurement {slave_path} is not a slave of "
+                             f"the master measurement.")
+        master = load_measurement(request, Path(master_path), 0)
+        slave = load_measurement(request, slave_path, 1)
+        return apply_master(master, slave)
+    finally:
+        request.close_log_files()
+
+
+def load_measurement(request: Request, measurement_file: Path,
+                     tab_id: int) -> Measurement:
+    """Loads a single measurement and its sample into a request. Measurement
+    data is not loaded.
+
+    Args:
+        request: Request object
+        measurement_file: path to the .info file of the measurement
+        tab_id: identifier for the measurement's tab
+
+    Return:
+        Measurement object
+    """
+    sample_dir = measurement_file.parent.parent
+    sample = next((
+        s for s in request.samples.samples
+        if Path(request.directory, s.directory) == sample_dir), None)
+    if sample is None and sample_dir.parent == request.directory:
+        sample = request.samples.add_sample(sample_path=sample_dir)
+    if sample is None or \
+            measurement_file not in sample.get_measurements_files():
+        raise ValueError(f"Measurement {measurement_file} does not belong "
+                         f"to request {request.get_name()}.")
+    return request.samples.measurements.add_measurement_file(
+        sample, measurement_file, tab_id, "", False, selector_cls=Selector)
+
+
+def apply_master(master: Measurement, slave: Measurement) -> SlaveResult:
+    """Loads slave's data, cuts it with master's selections and recreates
+    the master's depth profile, elemental losses and energy spectrum for the
+    slave.
+
+    Failures are logged to the slave's log and collected to the result
+    instead of raised so that a single broken slave does not stop the batch.
+
+    Args:
+        master: master Measurement
+        slave: slave Measurement
+
+    Return:
+        SlaveResult
+    """
+    outputs = []
+    errors = []
+    steps = [
+        ("cuts", _save_cuts),
+        ("depth profile", _make_depth_profile),
+        ("elemental losses", _make_element_losses),
+        ("energy spectrum", _make_energy_spectrum),
+    ]
+    for name, step in steps:
+        try:
+            if step(master, slave):
+                outputs.append(name)
+        except Exception as e:
+            msg = f"Could not create {name} from master " \
+                  f"{master.name}: {e}"
+            slave.log_error(msg)
+            errors.append(msg)
+            if name == "cuts":
+                # Nothing else can be done without cut files
+                break
+    return SlaveResult(slave.name, outputs, errors)
+
+
+def _save_cuts(master: Measurement, slave: Measurement) -> bool:
+    """Loads master's selections to slave and saves slave's cut files.
+    """
+    slave.load_data()
+    slave.selector.load(
+        Path(master.get_data_dir(), f"{master.name}.selections"))
+    slave.save_cuts()
+    return True
+
+
+def _make_depth_profile(master: Measurement, slave: Measurement) -> bool:
+    """Generates depth files for slave using master's depth profile settings.
+    """
+    lines = _load_save_file(
+        Path(master.get_depth_profile_dir(), DEPTH_PROFILE_SAVE_FILE))
+    if not lines:
+        return False
+    output_dir = _translate_path(lines[0].strip(), master, slave)
+    use_cuts = [
+        _translate_path(cut, master, slave)
+        for cut in lines[2].strip().split("\t")
+    ]
+    elements = [
+        Element.from_string(element)
+        for element in lines[1].strip().split("\t")
+    ]
+    try:
+        x_unit = DepthProfileUnit(lines[3].strip())
+    except ValueError:
+        x_unit = DepthProfileUnit.ATOMS_PER_SQUARE_CM
+    line_zero = False
+    line_scale = False
+    systematic_error = 0.0
+    if len(lines) == 7:
+        line_zero = lines[4].strip() == "True"
+        line_scale = lines[5].strip() == "True"
+        systematic_error = float(lines[6].strip())
+
+    depth_files.generate_depth_files(use_cuts, output_dir, slave)
+
+    # Beam elements of RBS selections are shown as their scatter elements
+    rbs_list = cut_file.get_rbs_selections(use_cuts)
+    for rbs in rbs_list:
+        element = Element.from_string(rbs.split(".")[0])
+        for i, elem in enumerate(elements):
+            if elem == element:
+                elements[i] = rbs_list[rbs]
+
+    file = Path(slave.get_depth_profile_dir(), DEPTH_PROFILE_SAVE_FILE)
+    with file.open("w") as fh:
+        fh.write("{0}\n".format(output_dir.relative_to(slave.directory)))
+        fh.write("{0}\n".format("\t".join(
+            str(element) for element in elements)))
+        fh.write("{0}\n".format("\t".join(str(cut) for cut in use_cuts)))
+        fh.write("{0}\n".format(x_unit))
+        fh.write("{0}\n".format(line_zero))
+        fh.write("{0}\n".format(line_scale))
+        fh.write("{0}".format(systematic_error))
+    return True
+
+
+def _make_element_losses(master: Measurement, slave: Measurement) -> bool:
+    """Stores master's elemental losses settings for slave. Elemental losses
+    are only shown in a graph, so the settings are all there is to save.
+    """
+    lines = _load_save_file(
+        Path(master.get_composition_changes_dir(), ELEMENT_LOSSES_SAVE_FILE))
+    if not lines:
+        return False
+    reference_cut = _translate_path(lines[0].strip(), master, slave)
+    checked_cuts = [
+        _translate_path(cut, master, slave)
+        for cut in lines[1].strip().split("\t")
+    ]
+    partition_count = int(lines[2])
+    y_scale = int(lines[3])
+
+    files = "\t".join(
+        os.path.relpath(cut, slave.directory) for cut in checked_cuts)
+    file = Path(slave.get_composition_changes_dir(), ELEMENT_LOSSES_SAVE_FILE)
+    with open(file, "wt") as fh:
+        fh.write("{0}\n".format(
+            os.path.relpath(reference_cut, slave.directory)))
+        fh.write("{0}\n".format(files))
+        fh.write("{0}\n".format(partition_count))
+        fh.write("{0}".format(y_scale))
+    return True
+
+
+def _make_energy_spectrum(master: Measurement, slave: Measurement) -> bool:
+    """Calculates energy spectra for slave using master's energy spectrum
+    settings.
+    """
+    directory = master.get_energy_spectra_dir()
+    lines = _load_save_file(Path(directory, ENERGY_SPECTRUM_SAVE_FILE))
+    if not lines:
+        return False
+    use_cuts = [
+        _translate_path(cut, master, slave)
+        for cut in lines[0].strip().split("\t")
+    ]
+    bin_width = float(lines[1].strip())
+
+    spectra = EnergySpectrum.calculate_measured_spectra(
+        slave, use_cuts, bin_width)
+    measured_sum_is_selected, _ = gf.check_if_sum_in_directory_name(
+        directory)
+    if measured_sum_is_selected and spectra:
+        SumEnergySpectrum(
+            spectra, slave.get_energy_spectra_dir(), SumSpectrumType.MEASURED)
+
+    files = "\t".join(
+        os.path.relpath(cut, slave.directory) for cut in use_cuts)
+    file = Path(slave.get_energy_spectra_dir(), ENERGY_SPECTRUM_SAVE_FILE)
+    with file.open("w") as fh:
+        fh.write("{0}\n".format(files))
+        fh.write("{0}".format(bin_width))
+    return True
+
+
+def _load_save_file(file: Path) -> List[str]:
+    """Returns the lines of a widget save file or an empty list if the file
+    cannot be read.
+    """
+    try:
+        with file.open("r") as fp:
+            return fp.readlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+
+
+def _translate_path(file_path: str, master: Measurement,
+                    slave: Measurement) -> Path:
+    """Converts a path that points inside master's directory into the
+    corresponding path inside slave's directory.
+    """
+    prefix = Measurement.DIRECTORY_PREFIX
+    file = gf.rreplace(
+        file_path, master.name, slave.name,
+        f"{prefix}{master.serial_number:02d}",
+        f"{prefix}{slave.serial_number:02d}",
+        f"Sample_{master.sample.serial_number:02d}-{master.sample.name}",
+        f"Sample_{slave.sample.serial_number:02d}-{slave.sample.name}")
+    if file.is_file():
+        return file
+    return Path(slave.directory, file)
+
+
+def run(request_file: Path, max_workers: Optional[int] = None,
+        use_processes: bool = True,
+        config_dir: Optional[Path] = None) -> List[SlaveResult]:
+    """Applies the master measurement's commands to all slave measurements
+    of a request.
+
+    Args:
+        request_file: path to a .request file
+        max_workers: maximum number of slaves processed at the same time.
+            Defaults to the number of CPUs.
+        use_processes: whether slaves are processed in worker processes
+            instead of threads
+        config_dir: Potku's configuration directory
+
+    Return:
+        list of SlaveResults in the order of the slaves
+    """
+    request_file = Path(request_file).resolve()
+    settings = GlobalSettings(config_dir=config_dir, save_on_creation=False)
+    request = load_request(request_file, settings, enable_logging=False)
+    if request.has_master() == "":
+        raise ValueError(f"Request {request.get_name()} has no master "
+                         f"measurement.")
+    slave_paths = [slave.path for slave in get_slaves(request)]
+
+    executor = EvaluationExecutor(
+        max_workers=max_workers, use_processes=use_processes)
+    try:
+        return executor.map(
+            functools.partial(
+                process_slave, request_file, config_dir=config_dir),
+            slave_paths)
+    finally:
+        executor.shutdown()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Command line entry point. Returns the exit status.
+    """
+    parser = argparse.ArgumentParser(
+        description="Apply the master measurement's selections, cuts, "
+                    "depth profiles, elemental losses and energy spectra "
+                    "to the slave measurements of a Potku request.")
+    parser.add_argument("request_file", type=Path,
+                        help="path to the .request file")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="number of slaves processed at the same time "
+                             "(default: number of CPUs)")
+    parser.add_argument("--threads", action="store_true",
+                        help="use threads instead of worker processes")
+    parser.add_argument("--config-dir", type=Path, default=None,
+                        help="Potku's configuration directory")
+    args = parser.parse_args(argv)
+
+    try:
+        results = run(
+            args.request_file, max_workers=args.workers,
+            use_processes=not args.threads, config_dir=args.config_dir)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    for result in results:
+        outputs = ", ".join(result.outputs) or "nothing"
+        print(f"{result.name}: {outputs}")
+        for error in result.errors:
+            print(f"    {error}", file=sys.stderr)
+    if not results:
+        print("No slave measurements to process.")
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,566 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Coincidence module finds coincident events from list mode event files
+without running external programs. It reproduces the output of the coinc
+program (external/Potku-coinc) when it is piped into awk, so it can be used
+as a drop-in replacement for general_functions.coinc.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import itertools
+import re
+import sys
+import warnings
+
+from pathlib import Path
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+
+
+# coinc stores at most this many ADCs. The last ADC number marks an empty
+# slot in the coincidence table.
+MAX_ADCS = 128
+BLANK_ADC = MAX_ADCS - 1
+
+_BLANK_CHANNEL = 0xFFFFFFFF
+_CHUNK_SIZE = 1 << 24
+_BLOCK_SIZE = 1 << 18
+
+
+class Events(NamedTuple):
+    """List mode events read from an event file. If the last event of the
+    file was incomplete, partial contains the ADC number and possibly the
+    channel that could be read from it.
+    """
+    adc: np.ndarray
+    channel: np.ndarray
+    timestamp: np.ndarray
+    partial: Tuple[int, ...] = ()
+
+
+class _Coincidences(NamedTuple):
+    """Indices of the events that make up a block of coincidences. Index -1
+    means that the ADC has no event in the coincidence.
+    """
+    trigger: np.ndarray
+    events: np.ndarray
+
+
+def read_events(input_file: Path, skip_lines: int,
+                chunk_size: int = _CHUNK_SIZE) -> Optional[Events]:
+    """Reads 'ADC channel timestamp' events from given file in chunks.
+    Reading stops at the first event that cannot be parsed.
+
+    Args:
+        input_file: path to the event file
+        skip_lines: number of header lines after the first line that are
+            skipped. The first line is always skipped.
+        chunk_size: number of bytes read at a time
+
+    Return:
+        Events or None if the file has fewer lines than are skipped
+    """
+    parts = []
+    with input_file.open("rb") as file:
+        for _ in range(skip_lines + 1):
+            # coinc reads lines into a 100 byte buffer, so long lines
+            # count as multiple lines.
+            if not file.readline(99):
+                return None
+
+        remainder = b""
+        carry = np.empty(0, dtype=np.uint64)
+        while True:
+            data = file.read(chunk_size)
+            buffer = remainder + data
+            remainder = b""
+            if data and buffer and not buffer[-1:].isspace():
+                # Last token may continue in the next chunk
+                split = max(buffer.rfind(ws) for ws in b" \t\n\r\v\f")
+                remainder = buffer[split + 1:]
+                buffer = buffer[:split + 1]
+            values, complete = _parse_values(buffer)
+            values = np.concatenate((carry, values))
+            usable = len(values) - len(values) % 3
+            parts.append(values[:usable].reshape(-1, 3))
+            carry = values[usable:]
+            if not (data and complete):
+                break
+
+    values = np.concatenate(parts) if parts else np.empty((0, 3), np.uint64)
+    return Events(
+        values[:, 0].astype(np.uint32).astype(np.int64),
+        values[:, 1].astype(np.uint32),
+        values[:, 2].copy(),
+        tuple(carry.tolist()))
+
+
+def _parse_values(buffer: bytes) -> Tuple[np.ndarray, bool]:
+    """Converts whitespace separated tokens to unsigned integers. Conversion
+    stops at the first invalid token.
+
+    Return:
+        converted values and whether all tokens were valid
+    """
+    if not buffer.strip():
+        return np.empty(0, dtype=np.uint64), True
+    try:
+        with warnings.catch_warnings():
+            # Older versions of NumPy only warn about invalid data
+            warnings.simplefilter("error", DeprecationWarning)
+            return np.fromstring(buffer, dtype=np.uint64, sep=" "), True
+    except (ValueError, DeprecationWarning):
+        values = []
+        for token in buffer.split():
+            # Like scanf, use the leading digits of an invalid token
+            digits = re.match(rb"\d*", token).group()
+            if digits and int(digits) < 2 ** 64:
+                values.append(int(digits))
+            if digits != token:
+                break
+        return np.array(values, dtype=np.uint64), False
+
+
+def _get_window_limits(timing: Dict[str, Tuple[int, int]]) -> \
+        Tuple[np.ndarray, np.ndarray]:
+    """Returns the low and high timing window limits of each ADC. ADCs
+    without a timing window only accept events with the same timestamp as
+    the trigger.
+    """
+    low = np.zeros(MAX_ADCS, dtype=np.int64)
+    high = np.zeros(MAX_ADCS, dtype=np.int64)
+    for adc, (adc_low, adc_high) in timing.items():
+        low[int(adc)] = adc_low
+        high[int(adc)] = adc_high
+    return low, high
+
+
+def _get_source(events: Events) -> Events:
+    """Returns the events followed by a blank event and a spare event that is
+    used for a partially read event.
+    """
+    return Events(
+        np.append(events.adc, [BLANK_ADC] * 2),
+        np.append(events.channel, np.full(2, _BLANK_CHANNEL, np.uint32)),
+        np.append(events.timestamp, np.zeros(2, np.uint64)),
+        events.partial)
+
+
+def _get_failed_slot(source: Events, old: int, too_high: bool,
+                     partial: Tuple[int, ...], adc_count: int) -> int:
+    """Returns the event that is left in the slot into which coinc failed to
+    read an event.
+
+    Args:
+        source: events followed by a blank and a spare event
+        old: event that was in the slot before
+        too_high: whether the event had too high ADC number
+        partial: values of the event that could be read
+        adc_count: number of ADCs
+
+    Return:
+        index of the event in the slot
+    """
+    blank, spare = len(source.adc) - 2, len(source.adc) - 1
+    if too_high or (partial and partial[0] >= adc_count):
+        # Such events never match, so they are handled as blanks
+        return blank
+    if not partial:
+        return old
+    # Only the values that were read replace the old values
+    source.adc[spare] = partial[0]
+    source.channel[spare] = partial[1] if len(partial) > 1 \
+        else source.channel[old]
+    source.timestamp[spare] = source.timestamp[old]
+    return spare
+
+
+def _time_differences(timestamps: np.ndarray, indices: np.ndarray,
+                      reference: np.ndarray) -> np.ndarray:
+    """Returns timestamp differences as signed 64-bit integers like coinc
+    does.
+    """
+    return (timestamps[indices] - timestamps[reference]).view(np.int64)
+
+
+def _iter_table_coincidences(
+        source: Events, tablesize: int, trigger: int, adc_count: int,
+        low: np.ndarray, high: np.ndarray) -> Iterator[_Coincidences]:
+    """Steps through the coincidence table one event at a time in the same
+    way as coinc does. This is used for files that have fewer events than
+    fit in the table initially, as coinc shrinks the table in that case.
+
+    Reading stops when an event with too high ADC number is read, except
+    while the table is filled initially.
+
+    Args:
+        source: events followed by a blank and a spare event
+        tablesize: size of the coincidence table
+        trigger: trigger ADC
+        adc_count: number of ADCs
+        low: lower timing window limits
+        high: upper timing window limits
+
+    Yield:
+        coincidences one at a time
+    """
+    blank = len(source.adc) - 2
+    adc = source.adc.tolist()
+    timestamp = source.timestamp.tolist()
+    reader = iter(range(blank))
+    partial = source.partial
+    table = [blank] * tablesize
+    size = tablesize
+    for i in range(tablesize // 2, tablesize):
+        index = next(reader, None)
+        if index is None or adc[index] >= adc_count:
+            if index is None:
+                # The partial event was read here
+                partial = ()
+            size = i
+            break
+        table[i] = index
+
+    i = size // 2
+    endgame = 0
+    while size > 1:
+        center = table[i]
+        if adc[center] == trigger:
+            events = [-1] * adc_count
+            for j in range(1, size):
+                k = table[(i + j) % size]
+                k_adc = adc[k]
+                diff = (timestamp[k] - timestamp[center]) % 2 ** 64
+                if diff >= 2 ** 63:
+                    diff -= 2 ** 64
+                if low[k_adc] <= diff <= high[k_adc] and \
+                        k_adc != trigger and k_adc != BLANK_ADC:
+                    events[k_adc] = k
+            if any(event != -1 for event in events):
+                events[trigger] = center
+                yield _Coincidences(
+                    np.array([center]), np.array([events]))
+        if endgame:
+            if endgame == size:
+                break
+            endgame += 1
+            table[(i + size // 2) % size] = blank
+        else:
+            slot = (i + size // 2) % size
+            index = next(reader, None)
+            if index is None or adc[index] >= adc_count:
+                endgame = 1
+                table[slot] = _get_failed_slot(
+                    source, table[slot], index is not None, partial,
+                    adc_count)
+                adc[-1] = int(source.adc[-1])
+                timestamp[-1] = int(source.timestamp[-1])
+            else:
+                table[slot] = index
+        i = (i + 1) % size
+
+
+def _get_table_sequence(event_count: int, tablesize: int, blank: int) -> \
+        Tuple[np.ndarray, int]:
+    """Lays the coincidence table out as a sequence of event indices so that
+    the table at each step of coinc is a sliding window over the sequence.
+
+    When the table size is odd, coinc overwrites one of the initially read
+    events before it becomes the center of the table. That event is put at
+    the start of the sequence. The slot into which the first event after
+    event_count could not be read keeps its old event.
+
+    Args:
+        event_count: number of events that are read into the table
+        tablesize: size of the coincidence table
+        blank: index of a blank event
+
+    Return:
+        event indices and the sequence index of the first center
+    """
+    half = tablesize // 2
+    before = tablesize - half
+    blanks = np.full(half, blank, dtype=np.int64)
+    events = np.arange(event_count, dtype=np.int64)
+    if tablesize % 2:
+        prefix = events[half:half + 1]
+        events = np.delete(events, half)
+    else:
+        prefix = events[:0]
+    sequence = np.concatenate((prefix, blanks, events))
+    stale = sequence[event_count - before]
+    return np.concatenate((
+        sequence, [stale], np.full(tablesize, blank, dtype=np.int64))
+    ), len(prefix) + half
+
+
+def _iter_window_coincidences(
+        source: Events, event_count: int, tablesize: int, trigger: int,
+        adc_count: int, low: np.ndarray, high: np.ndarray,
+        block_size: int = _BLOCK_SIZE) -> Iterator[_Coincidences]:
+    """Finds coincidences with array operations over a sliding window.
+
+    Each event in the window is compared in the same order as coinc compares
+    them so that the last matching event of each ADC is selected, i.e. the
+    closest preceding event, or the furthest following event if there are
+    no preceding ones.
+
+    Args:
+        source: events followed by a blank and a spare event
+        event_count: number of events that coinc reads before it stops.
+            If this is less than the number of events, the next event has
+            too high ADC number.
+        tablesize: size of the coincidence table
+        trigger: trigger ADC
+        adc_count: number of ADCs
+        low: lower timing window limits
+        high: upper timing window limits
+        block_size: number of centers processed at a time
+
+    Yield:
+        coincidences in blocks
+    """
+    blank = len(source.adc) - 2
+    half = tablesize // 2
+    sequence, first_center = _get_table_sequence(
+        event_count, tablesize, blank)
+    failed = event_count + half
+    sequence[failed] = _get_failed_slot(
+        source, sequence[failed], event_count < blank, source.partial,
+        adc_count)
+    adc = source.adc[sequence]
+    timestamp = source.timestamp[sequence]
+    offsets = (*range(1, half), *range(half - tablesize, 0))
+
+    centers = np.arange(first_center, event_count + half + 1)
+    centers = centers[adc[centers] == trigger]
+    for start in range(0, len(centers), block_size):
+        block = centers[start:start + block_size]
+        events = np.full((len(block), adc_count), -1, dtype=np.int64)
+        for offset in offsets:
+            k = block + offset
+            k_adc = adc[k]
+            diff = _time_differences(timestamp, k, block)
+            match = (k_adc != trigger) & (k_adc != BLANK_ADC) & \
+                (low[k_adc] <= diff) & (diff <= high[k_adc])
+            events[np.flatnonzero(match), k_adc[match]] = k[match]
+        found = (events != -1).any(axis=1)
+        block, events = block[found], events[found]
+        if not len(block):
+            continue
+        events[:, trigger] = block
+        yield _Coincidences(
+            sequence[block], np.where(events != -1, sequence[events], -1))
+
+
+def _iter_coincidences(source: Events, tablesize: int, trigger: int,
+                       adc_count: int, timing: Dict[str, Tuple[int, int]],
+                       nevents: int = 0) -> Iterator[_Coincidences]:
+    """Finds coincidences the same way as the coinc program.
+
+    Args:
+        source: events followed by a blank and a spare event
+        tablesize: size of the coincidence table
+        trigger: trigger ADC
+        adc_count: number of ADCs
+        timing: a dict of (min, max) timing windows for ADCs
+        nevents: maximum number of coincidences. 0 means no limit.
+
+    Yield:
+        coincidences in blocks
+    """
+    low, high = _get_window_limits(timing)
+    event_count = len(source.adc) - 2
+    too_high = np.flatnonzero(source.adc[:event_count] >= adc_count)
+    if too_high.size:
+        event_count = too_high[0]
+    if event_count < tablesize - tablesize // 2:
+        blocks = _iter_table_coincidences(
+            source, tablesize, trigger, adc_count, low, high)
+    else:
+        blocks = _iter_window_coincidences(
+            source, event_count, tablesize, trigger, adc_count, low, high)
+
+    remaining = nevents if nevents > 0 else None
+    for block in blocks:
+        if remaining is not None:
+            block = _Coincidences(
+                block.trigger[:remaining], block.events[:remaining])
+            remaining -= len(block.trigger)
+        yield block
+        if remaining == 0:
+            return
+
+
+def _parse_columns(columns: str) -> List[int]:
+    """Parses awk style field references such as '$3,$5'.
+    """
+    fields = []
+    for column in columns.split(","):
+        match = re.fullmatch(r"\s*\$(\d+)\s*", column)
+        if match is None:
+            raise ValueError(f"Unsupported column: '{column}'.")
+        fields.append(int(match.group(1)))
+    return fields
+
+
+def _format_block(source: Events, block: _Coincidences, fields: List[int],
+                  adc_count: int, timediff: bool) -> List[str]:
+    """Formats a block of coincidences as lines that contain the given
+    fields separated by spaces.
+    """
+    def channels(adc):
+        indices = block.events[:, adc]
+        return np.where(indices != -1, source.channel[indices], 0)
+
+    def differences(adc):
+        indices = block.events[:, adc]
+        # coinc casts the difference to a 32-bit integer
+        diff = (source.timestamp[indices] -
+                source.timestamp[block.trigger]).astype(np.uint32)
+        return np.where(indices != -1, diff.view(np.int32), 0)
+
+    values_per_adc = 2 if timediff else 1
+
+    def field_values(field):
+        adc, is_diff = divmod(field - 1, values_per_adc)
+        if is_diff:
+            return differences(adc)
+        return channels(adc)
+
+    field_count = adc_count * values_per_adc
+    columns = []
+    for field in fields:
+        if field == 0:
+            record = zip(*(
+                map(str, field_values(f).tolist())
+                for f in range(1, field_count + 1)))
+            columns.append(["\t".join(values) + "\t" for values in record])
+        elif field > field_count:
+            columns.append(itertools.repeat("", len(block.trigger)))
+        else:
+            columns.append(map(str, field_values(field).tolist()))
+    return [" ".join(values) + "\n" for values in zip(*columns)]
+
+
+def _check_parameters(tablesize: int, trigger: int, adc_count: int) -> \
+        Optional[str]:
+    """Returns the error message that coinc gives for invalid parameters, or
+    None if the parameters are valid.
+    """
+    if not 1 < adc_count < MAX_ADCS - 1:
+        return f"Number of ADCs must be higher than 1 but lower than " \
+               f"{MAX_ADCS - 1}!"
+    if tablesize <= 1:
+        return "Coinc table size must be larger than 1!"
+    if not 0 <= trigger < adc_count:
+        return "Number of ADCS set too low or trigger ADC number is too high!"
+    return None
+
+
+def iter_coinc_lines(input_file: Path, skip_lines: int, tablesize: int,
+                     trigger: int, adc_count: int,
+                     timing: Dict[str, Tuple[int, int]],
+                     columns: str = "$3,$5", nevents: int = 0,
+                     timediff: bool = True, verbose: bool = True) -> \
+        Iterator[str]:
+    """Finds coincidences in an event file and yields the selected columns
+    of each coincidence as a line of text. See find_coincidences for the
+    arguments.
+    """
+    fields = _parse_columns(columns)
+    error = _check_parameters(tablesize, trigger, adc_count)
+    events = None
+    if error is None:
+        try:
+            events = read_events(input_file, skip_lines)
+        except OSError:
+            error = f"Could not open file \"{input_file}\" for input."
+        else:
+            if events is None:
+                error = "Can't skip more lines than there are in the input!"
+    if error is not None:
+        if verbose:
+            print(error, file=sys.stderr)
+        return
+
+    source = _get_source(events)
+    for block in _iter_coincidences(
+            source, tablesize, trigger, adc_count, timing, nevents=nevents):
+        yield from _format_block(source, block, fields, adc_count, timediff)
+
+
+def find_coincidences(input_file: Path, skip_lines: int, tablesize: int,
+                      trigger: int, adc_count: int,
+                      timing: Dict[str, Tuple[int, int]],
+                      output_file: Optional[Path] = None,
+                      columns: str = "$3,$5", nevents: int = 0,
+                      timediff: bool = True, verbose: bool = True) -> \
+        Optional[List[str]]:
+    """Calculate coincidences of file in-process. Takes the same arguments
+    and produces the same output as general_functions.coinc. If an output
+    file is given, coincidences are written to it one at a time instead of
+    collecting them to a list.
+
+    Args:
+        input_file: Path to input file.
+        skip_lines: An integer representing how many lines from the beginning
+                    of the file is skipped.
+        tablesize: An integer representing how large table is used to calculate
+                   coincidences.
+        trigger: An integer representing trigger ADC.
+        adc_count: An integer representing the count of ADCs.
+        timing: A dict consisting of (min, max) representing different ADC
+                timings.
+        output_file: Path to destination file. If None, the results will not
+            be written to file.
+        columns: Columns to parse from output.
+        nevents: An integer representing limit of how many events will the
+                 program look for. 0 means no limit.
+        timediff: A boolean representing whether timediff is output or not.
+        verbose: Whether errors are printed to console or not.
+
+    Return:
+        The selected columns of each coincidence as a list or None if an
+        output file was given
+    """
+    if not (all(columns.split(",")) and timing):
+        return [] if output_file is None else None
+
+    lines = iter_coinc_lines(
+        input_file, skip_lines, tablesize, trigger, adc_count, timing,
+        columns=columns, nevents=nevents, timediff=timediff, verbose=verbose)
+    if output_file is None:
+        return list(lines)
+    with Path(output_file).open("w") as f:
+        f.writelines(lines)
+    return None
+
@@ -27,7 +27,24 @@ multithreaded or multiprocessing operations.
 __author__ = "Juhani Sundell"
 __version__ = "2.0"
 
+import os
+import shutil
 import sys
+import tempfile
+import threading
+from concurrent.futures import Executor
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 
 class CancellationToken:
@@ -69,3 +86,81 @@ class CancellationToken:
         """
         if self.is_cancellation_requested():
             other.request_cancellation()
+
+
+class EvaluationExecutor:
+    """Evaluates items concurrently in a bounded pool of worker threads or
+    processes.
+
+    The pool is created when it is first needed and kept alive until
+    shutdown is called, so that consecutive batches (for example the
+    generations of an optimization) reuse the same workers. Each executor
+    also owns a temporary directory for the files of the evaluated items.
+    The directory is removed on shutdown.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 use_processes: bool = False):
+        """Initializes a new EvaluationExecutor.
+
+        Args:
+            max_workers: maximum number of concurrent workers. Defaults to
+                the number of CPUs.
+            use_processes: whether workers are processes instead of threads.
+                Functions and items must then be picklable.
+        """
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.use_processes = use_processes
+        self.__executor: Optional[Executor] = None
+        self.__temp_dir: Optional[Path] = None
+        self.__lock = threading.Lock()
+
+    def map(self, func: Callable[[T], R], items: Iterable[T]) -> List[R]:
+        """Calls func for each item and returns the results in the order of
+        the items. If any of the calls raises an exception, it is raised
+        here.
+        """
+        items = list(items)
+        if len(items) <= 1 and not self.use_processes:
+            return [func(item) for item in items]
+        return list(self._get_executor().map(func, items))
+
+    def submit(self, func: Callable[..., R], *args, **kwargs) -> Future:
+        """Schedules func to be called with given arguments and returns a
+        Future that holds the result. Useful when results are wanted as
+        they are completed.
+        """
+        return self._get_executor().submit(func, *args, **kwargs)
+
+    def _get_executor(self) -> Executor:
+        """Returns the worker pool, creating it if necessary.
+        """
+        with self.__lock:
+            if self.__executor is None:
+                if self.use_processes:
+                    self.__executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers)
+                else:
+                    self.__executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers)
+            return self.__executor
+
+    def get_temp_dir(self) -> Path:
+        """Returns the temporary directory of the executor.
+        """
+        with self.__lock:
+            if self.__temp_dir is None:
+                self.__temp_dir = Path(tempfile.mkdtemp(prefix="potku-"))
+            return self.__temp_dir
+
+    def shutdown(self):
+        """Waits for the running evaluations to finish, stops the workers
+        and removes the temporary directory.
+        """
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+            temp_dir, self.__temp_dir = self.__temp_dir, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
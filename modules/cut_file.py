@@ -36,8 +36,10 @@ from typing import List
 from typing import Dict
 from typing import Optional
 from typing import Any
+from typing import Union
 
 from .element import Element
+from .event_data import EventData
 from . import file_paths as fp
 
 
@@ -77,12 +79,12 @@ class CutFile:
         if cut_file_path is not None:
             self.load_file(cut_file_path)
     
-    def set_info(self, selection, data: List[Any]):
+    def set_info(self, selection, data: Union[List[Any], EventData]):
         """Set selection information and data into CutFile.
         
         Args:
             selection: Selection class object.
-            data: Lists of data points.
+            data: Lists of data points or EventData.
         """
         self.data = data
         self.element = selection.element
@@ -195,9 +197,12 @@ class CutFile:
                 my_file.write(f"Split count: {self.split_count}\n")
                 my_file.write("\n")
                 my_file.write("ToF, Energy, Event number\n")
-                for p in self.data:  # Write all points
-                    my_file.write(" ".join(map(str, p)))
-                    my_file.write("\n")
+                if isinstance(self.data, EventData):
+                    self.data.write(my_file)
+                else:
+                    for p in self.data:  # Write all points
+                        my_file.write(" ".join(map(str, p)))
+                        my_file.write("\n")
          
     def split(self, reference_cut, splits=10, save=True):
         """Splits cut file into X splits based on reference cut.
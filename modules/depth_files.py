@@ -54,6 +54,10 @@ from .parsing import CSVParser
 from .measurement import Measurement
 from .observing import ProgressReporter
 from .enums import DepthProfileUnit
+from .result_cache import get_fingerprint
+
+# Kind of the depth files in a measurement's ResultCache
+DEPTH_CACHE_KIND = "depth"
 
 
 class DepthFileGenerator:
@@ -93,8 +97,11 @@ class DepthFileGenerator:
                 *(str(f) for f in self._cut_files)), \
                (erd_bin, str(self._output_path), str(self._tof_in_file))
 
-    def run(self):
+    def run(self) -> int:
         """Generate the files necessary for drawing the depth profile.
+
+        Return:
+            return code of the pipeline
         """
         bin_dir = gf.get_bin_dir()
         tof, erd = self.get_command()
@@ -102,17 +109,26 @@ class DepthFileGenerator:
         tof_process = subprocess.Popen(tof, cwd=bin_dir, stdout=subprocess.PIPE)
         ret = subprocess.run(
             erd, cwd=bin_dir, stdin=tof_process.stdout).returncode
+        # Closing the pipe ensures that tof_list does not wait for a reader
+        # if erd_depth exits early
+        tof_process.stdout.close()
+        ret = ret or tof_process.wait()
         if ret != 0:
             print(f"tof_list|erd_depth pipeline returned an error code: {ret}")
+        return ret
 
 
 def generate_depth_files(cut_files: List[Path], output_dir: Path,
                          measurement: Measurement, tof_in_dir: Optional[Path]
-                         = None, progress: Optional[ProgressReporter] = None):
+                         = None, progress: Optional[ProgressReporter] = None,
+                         use_cache: bool = True):
     """Generates depth files from given cut files and writes them to output
     directory.
 
-    Deletes any previous depth files in the given directory
+    Deletes any previous depth files in the given directory. Generated
+    files are stored in the measurement's result cache and copied from
+    there if the cut files, the tof.in file and the efficiency files have
+    not changed.
 
     Args:
         cut_files: list of file paths to .cut files
@@ -120,6 +136,7 @@ def generate_depth_files(cut_files: List[Path], output_dir: Path,
         measurement: Measurement object to generate tof.in
         tof_in_dir: directory in which the tof.in is to be generated.
         progress: a ProgressReporter object
+        use_cache: whether the measurement's result cache is used
     """
     # TODO this could be a method of Measurement
     tof_in_file = measurement.generate_tof_in(directory=tof_in_dir)
@@ -135,8 +152,26 @@ def generate_depth_files(cut_files: List[Path], output_dir: Path,
     if progress is not None:
         progress.report(30)
 
+    if use_cache:
+        detector, *_ = measurement.get_used_settings()
+        cache = measurement.get_result_cache()
+        key = get_fingerprint(
+            tof_in_file, detector.get_used_efficiencies_dir(),
+            [Path(f) for f in cut_files])
+        if cache.load_files(DEPTH_CACHE_KIND, key, output_dir) is not None:
+            if progress is not None:
+                progress.report(100)
+            return
+
     dp = DepthFileGenerator(cut_files, output_dir, tof_in_file=tof_in_file)
-    dp.run()
+    ret = dp.run()
+
+    if use_cache and ret == 0:
+        depth_files = [
+            file for file in output_dir.iterdir()
+            if file.stem == DepthFileGenerator.DEPTH_PREFIX]
+        if depth_files:
+            cache.save_files(DEPTH_CACHE_KIND, key, depth_files)
 
     if progress is not None:
         progress.report(100)
@@ -32,8 +32,15 @@ __version__ = "2.0"
 import os
 
 from pathlib import Path
+from typing import Optional
+
 from .cut_file import CutFile
 from .element import Element
+from .result_cache import ResultCache
+from .result_cache import get_fingerprint
+
+# Kind of the split counts in a measurement's ResultCache
+LOSSES_CACHE_KIND = "losses"
 
 
 class ElementLosses:
@@ -41,10 +48,11 @@ class ElementLosses:
     """
     __slots__ = "directory_cuts", "directory_composition_changes", \
                 "partition_count", "checked_cuts", "reference_cut_file", \
-                "reference_key", "cut_splits"
+                "reference_key", "cut_splits", "cache"
 
     def __init__(self, directory_cuts, directory_composition_changes,
-                 reference_cut_file, checked_cuts, partition_count):
+                 reference_cut_file, checked_cuts, partition_count,
+                 cache: Optional[ResultCache] = None):
         """Inits Element Losses class.
 
         Args:
@@ -54,7 +62,9 @@ class ElementLosses:
             reference_cut_file: String representing reference cut file.
             checked_cuts: String list of cut files to be graphed.
             partition_count: Integer representing split count.
+            cache: optional ResultCache for the split counts
         """
+        self.cache = cache
         self.directory_cuts = directory_cuts
         self.directory_composition_changes = directory_composition_changes
         self.partition_count = partition_count
@@ -85,16 +95,36 @@ class ElementLosses:
         Return:
             Returns dictionary of elements and their counts within splits.
         """
+        if self.cache is not None:
+            key = self.get_fingerprint()
+            if not save_splits:
+                split_counts = self.cache.load_json(LOSSES_CACHE_KIND, key)
+                if split_counts is not None:
+                    return split_counts
+
         self.__load_cut_splits(save=save_splits, progress=progress)
         split_counts = self.__count_element_cuts(progress=progress)
+        if self.cache is not None:
+            self.cache.save_json(LOSSES_CACHE_KIND, key, split_counts)
         return split_counts
 
+    def get_fingerprint(self) -> str:
+        """Returns a fingerprint of the reference cut, the checked cuts and
+        the partition count.
+        """
+        return get_fingerprint(
+            Path(self.reference_cut_file),
+            [Path(file) for file in self.checked_cuts], self.partition_count)
+
     def save_splits(self, progress=None):
         """Save element splits as new cut files.
 
         Args:
             progress: a ProgressReporter that reports the progress of saving
         """
+        if not self.cut_splits.count():
+            # Split counts were loaded from the cache
+            self.__load_cut_splits()
         self.__element_losses_folder_clean_up()
         dirtyinteger = 0
         count = self.cut_splits.count()
@@ -45,6 +45,7 @@ from rx import operators as ops
 
 from . import file_paths as fp
 from . import general_functions as gf
+from . import persistence
 from .base import AdjustableSettings
 from .base import MCERDParameterContainer
 from .base import Serializable
@@ -56,6 +57,7 @@ from .enums import OptimizationType
 from .enums import SimulationMode
 from .enums import SimulationState
 from .enums import SimulationType
+from .get_espe import EspeCache
 from .get_espe import GetEspe
 from .mcerd import MCERD
 from .observing import Observable
@@ -521,8 +523,7 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
             file_path = self.get_default_file_path()
         if save_optim_results:
             self.optimization_results_to_file()
-        with file_path.open("w") as file:
-            json.dump(self.get_json_content(), file, indent=4)
+        persistence.write_json_if_changed(file_path, self.get_json_content())
 
     def profile_to_file(self, file_path: Path):
         """Save profile settings (only channel width) to file.
@@ -547,8 +548,7 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
                 "modification_time_unix": time_stamp}
             obj_profile["energy_spectra"]["channel_width"] = self.channel_width
 
-        with file_path.open("w") as file:
-            json.dump(obj_profile, file, indent=4)
+        persistence.write_json_if_changed(file_path, obj_profile)
 
     def start(self, number_of_processes: int, start_value=None,
               use_old_erd_files=True, optimization_type=None,
@@ -834,7 +834,11 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
             fluence: Optional[float] = None,
             optimization_type: Optional[OptimizationType] = None,
             write_to_file: bool = True,
-            remove_recoil_file: bool = False) -> Tuple[List, Optional[Path]]:
+            remove_recoil_file: bool = False,
+            in_process: bool = False,
+            recoil_file: Optional[Path] = None,
+            cache: Optional[EspeCache] = None) \
+            -> Tuple[List, Optional[Path]]:
         """Calculate the energy spectrum from the MCERD result file.
 
         Args:
@@ -846,10 +850,59 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
             write_to_file: Whether spectrum is written to file
             remove_recoil_file: Whether to remove temporary .recoil file
                 after getting the energy spectrum.
+            in_process: Whether the spectrum is calculated in this process
+                from cached ERD data instead of running get_espe.
+            recoil_file: Path to the temporary .recoil file. By default, the
+                file is written to the simulation directory.
+            cache: Cache for spectra that are not written to file. Used
+                to avoid recalculating identical recoil distributions.
 
         Return:
             tuple consisting of spectrum data and espe file
         """
+        get_espe, output_file = self.get_espe_calculator(
+            recoil_element, ch=ch, fluence=fluence,
+            optimization_type=optimization_type, write_to_file=write_to_file,
+            recoil_file=recoil_file)
+
+        key = None
+        spectrum = None
+        if cache is not None and output_file is None:
+            key = cache.get_key(get_espe, in_process)
+            spectrum = cache.get(key)
+
+        if spectrum is None:
+            if in_process:
+                spectrum = get_espe.run_in_process(output_file=output_file)
+            else:
+                spectrum = get_espe.run(
+                    output_file=output_file, verbose=verbose)
+            if key is not None:
+                cache.put(key, spectrum)
+
+        if remove_recoil_file:
+            get_espe.recoil_file.unlink()
+
+        # TODO returning espe_file is a bit pointless if write_to_file is
+        #   False
+        return spectrum, output_file
+
+    def get_espe_calculator(
+            self,
+            recoil_element: RecoilElement,
+            ch: Optional[float] = None,
+            fluence: Optional[float] = None,
+            optimization_type: Optional[OptimizationType] = None,
+            write_to_file: bool = True,
+            recoil_file: Optional[Path] = None) \
+            -> Tuple[GetEspe, Optional[Path]]:
+        """Writes the recoil distribution to a .recoil file and returns a
+        GetEspe object that calculates its energy spectrum. See
+        calculate_espe for arguments.
+
+        Return:
+            tuple consisting of GetEspe object and espe file
+        """
         suffix = self.simulation_type.get_recoil_suffix()
 
         if optimization_type is OptimizationType.RECOIL:
@@ -859,10 +912,11 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
 
         if optimization_type is OptimizationType.FLUENCE:
             output_file = f"{recoil_element.prefix}-optfl.simu"
-            recoil_file = f"{recoil_element.prefix}-optfl.{suffix}"
+            default_recoil_file = f"{recoil_element.prefix}-optfl.{suffix}"
         else:
             output_file = f"{recoil_element.get_full_name()}.simu"
-            recoil_file = f"{recoil_element.get_full_name()}.{suffix}"
+            default_recoil_file = \
+                f"{recoil_element.get_full_name()}.{suffix}"
 
         erd_file = Path(
             self.directory,
@@ -872,7 +926,8 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
             output_file = Path(self.directory, output_file)
         else:
             output_file = None
-        recoil_file = Path(self.directory, recoil_file)
+        if recoil_file is None:
+            recoil_file = Path(self.directory, default_recoil_file)
 
         with recoil_file.open("w") as rec_file:
             rec_file.write("\n".join(recoil_element.get_mcerd_params()))
@@ -886,7 +941,7 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
         else:
             used_fluence = run.fluence
 
-        spectrum = GetEspe.calculate_simulated_spectrum(
+        get_espe = GetEspe.from_settings(
             beam=run.beam,
             detector=detector,
             target=self.simulation.target,
@@ -894,17 +949,9 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
             reference_density=recoil_element.reference_density,
             fluence=used_fluence,
             erd_file=erd_file,
-            output_file=output_file,
-            recoil_file=recoil_file,
-            verbose=verbose
+            recoil_file=recoil_file
         )
-
-        if remove_recoil_file:
-            recoil_file.unlink()
-
-        # TODO returning espe_file is a bit pointless if write_to_file is
-        #   False
-        return spectrum, output_file
+        return get_espe, output_file
 
     def get_mcerd_params(self) -> Tuple[Dict, Run, Detector]:
         """Returns the parameters for MCERD simulations.
@@ -974,7 +1021,8 @@ class ElementSimulation(Observable, Serializable, AdjustableSettings,
 
         gf.remove_matching_files(
             self.directory,
-            exts={".recoil", ".erd", ".simu", ".scatter", ".rec"},
+            exts={".recoil", ".erd", ".simu", ".scatter", ".rec",
+                  ".checkpoint"},
             filter_func=filter_func)
 
         self.optimization_recoils = []
@@ -1036,6 +1084,7 @@ class ERDFileHandler:
         """
         self.recoil_element = recoil_element
         self.__active_files = {}
+        self.__line_states = {}
 
         self.__old_files = {
             file: seed
@@ -1125,11 +1174,20 @@ class ERDFileHandler:
         """
         return self.get_active_atom_count() + self.get_old_atom_count()
 
-    @staticmethod
-    def __get_atom_count(erd_file: Path):
+    def __get_atom_count(self, erd_file: Path):
         """Returns the number of counted atoms in given ERD file.
+
+        Only the lines appended since the previous count are read. If the
+        file has been truncated or replaced, it is counted from the start.
         """
-        return gf.count_lines_in_file(erd_file, check_file_exists=True)
+        count, state = gf.count_new_lines_in_file(
+            erd_file, self.__line_states.get(erd_file),
+            check_file_exists=True)
+        self.__line_states = {
+            **self.__line_states,
+            erd_file: state
+        }
+        return count
 
     @functools.lru_cache(128)
     def __get_atom_count_cached(self, erd_file: Path):
@@ -1155,6 +1213,7 @@ class ERDFileHandler:
         """
         self.__active_files = {}
         self.__old_files = {}
+        self.__line_states = {}
         self.__get_atom_count_cached.cache_clear()
 
     def results_exist(self) -> bool:
@@ -30,25 +30,47 @@ __author__ = "Jarkko Aalto \n Timo Konu \n Samuli Kärkkäinen " \
              "Juhani Sundell"
 __version__ = "2.0"
 
+import concurrent.futures
+import hashlib
+import os
 import pathlib
 import platform
 import subprocess
 from pathlib import Path
-from typing import Dict, Union, List, Optional, Sequence, Tuple
+from typing import Dict, Iterable, Union, Optional, Sequence, Tuple
 
 import numpy as np
 
 from . import general_functions as gf
 from . import subprocess_utils as sutils
 from .base import Espe
+from .concurrency import EvaluationExecutor
 from .element import Element
 from .enums import SumSpectrumType
 from .measurement import Measurement
 from .observing import ProgressReporter
-from .parsing import ToFListParser
+from .result_cache import ResultCache
+from .result_cache import get_fingerprint
 from .ui_log_handlers import Logger
 
-TofListData = List[Tuple[float, float, float, int, float, str, float, int]]
+# Columns of tof_list output: detector angles, energy (MeV), proton number,
+# mass (u), type of the selection, weight and event number
+TOF_LIST_DTYPE = np.dtype([
+    ("angle1", np.float64),
+    ("angle2", np.float64),
+    ("energy", np.float64),
+    ("z", np.int32),
+    ("mass", np.float64),
+    ("type", "U3"),
+    ("weight", np.float64),
+    ("event", np.int64),
+])
+# tof_list output as a structured numpy array of TOF_LIST_DTYPE. Loaded
+# results may be memory-mapped and read-only.
+TofListData = np.ndarray
+
+# Kind of the measured spectra in a measurement's ResultCache
+ESPE_CACHE_KIND = "espe"
 
 
 # TODO rename and refactor functions
@@ -64,7 +86,8 @@ class EnergySpectrum:
             spectrum_width: float,
             progress: Optional[ProgressReporter] = None,
             no_foil: bool = False,
-            verbose: bool = True):
+            verbose: bool = True,
+            max_workers: Optional[int] = None):
         """Inits energy spectrum
         
         Args:
@@ -75,14 +98,18 @@ class EnergySpectrum:
             progress: ProgressReporter object.
             no_foil: whether foil thickness is set to 0 when running tof_list
             verbose: whether tof_list's stderr is printed to console
+            max_workers: maximum number of tof_list processes that are run
+                at the same time. Defaults to the number of CPUs.
         """
         self._measurement = measurement
         self._global_settings = self._measurement.request.global_settings
         self._cut_files = cut_files
         self._spectrum_width = spectrum_width
         self._directory_es = measurement.get_energy_spectra_dir()
+        self._errors_occurred = False
         self._tof_listed_files = self._load_cuts(
-            no_foil=no_foil, progress=progress, verbose=verbose)
+            no_foil=no_foil, progress=progress, verbose=verbose,
+            max_workers=max_workers)
 
     @staticmethod
     def calculate_measured_spectra(
@@ -92,9 +119,15 @@ class EnergySpectrum:
             progress: Optional[ProgressReporter] = None,
             use_efficiency: bool = False,
             no_foil: bool = False,
-            verbose: bool = True) -> Dict[str, Espe]:
+            verbose: bool = True,
+            max_workers: Optional[int] = None,
+            use_cache: bool = True) -> Dict[str, Espe]:
         """Calculates the measured energy spectra for the given .cut files.
 
+        Calculated spectra are stored in the measurement's result cache.
+        If the cut files, the tof_list settings and the parameters have not
+        changed, the spectra are loaded from the cache instead.
+
         Args:
             measurement: Measurement whose settings will be used when
                 calculating spectra
@@ -105,15 +138,85 @@ class EnergySpectrum:
                 spectra is calculated
             no_foil: whether foil thickness is set to 0 when running tof_list
             verbose: whether tof_list's stderr is printed to console
+            max_workers: maximum number of tof_list processes that are run
+                at the same time. Defaults to the number of CPUs.
+            use_cache: whether the measurement's result cache is used
 
         Returns:
             energy spectra as a dictionary
         """
+        if use_cache:
+            cache = measurement.get_result_cache()
+            key = EnergySpectrum.get_spectra_fingerprint(
+                measurement, cut_files, spectrum_width,
+                use_efficiency=use_efficiency, no_foil=no_foil)
+            espes = EnergySpectrum.load_cached_spectra(
+                cache, key, measurement, cut_files, no_foil=no_foil)
+            if espes is not None:
+                if progress is not None:
+                    progress.report(100)
+                return espes
+
         es = EnergySpectrum(
             measurement, cut_files, spectrum_width, progress=progress,
-            no_foil=no_foil, verbose=verbose)
-        return es.calculate_spectrum(
+            no_foil=no_foil, verbose=verbose, max_workers=max_workers)
+        espes = es.calculate_spectrum(
             use_efficiency=use_efficiency, no_foil=no_foil)
+        if use_cache and not es._errors_occurred:
+            cache.save_json(ESPE_CACHE_KIND, key, espes)
+        return espes
+
+    @staticmethod
+    def get_spectra_fingerprint(
+            measurement: Measurement,
+            cut_files: Sequence[Path],
+            spectrum_width: float,
+            use_efficiency: bool = False,
+            no_foil: bool = False) -> str:
+        """Returns a fingerprint of the inputs of measured spectra: the cut
+        files, the tof.in file, the efficiency files and the parameters.
+        """
+        tof_in = measurement.generate_tof_in(no_foil=no_foil)
+        detector, *_ = measurement.get_used_settings()
+        settings_digest = EnergySpectrum.get_settings_digest(
+            tof_in, detector.get_used_efficiencies_dir())
+        return get_fingerprint(
+            settings_digest, [Path(f) for f in cut_files], spectrum_width,
+            use_efficiency, no_foil)
+
+    @staticmethod
+    def load_cached_spectra(
+            cache: ResultCache,
+            key: str,
+            measurement: Measurement,
+            cut_files: Sequence[Path],
+            no_foil: bool = False) -> Optional[Dict[str, Espe]]:
+        """Returns cached spectra and writes their .hist files. Returns None
+        if the spectra are not cached or if the .tof_list files should be
+        saved but some of them are missing.
+        """
+        directory_es = measurement.get_energy_spectra_dir()
+        if measurement.request.global_settings.is_es_output_saved() and \
+                not all(EnergySpectrum.get_tof_list_file_name(
+                    directory_es, Path(f), no_foil=no_foil).exists()
+                        for f in cut_files):
+            return None
+        cached = cache.load_json(ESPE_CACHE_KIND, key)
+        if cached is None:
+            return None
+
+        directory_es.mkdir(exist_ok=True)
+        espes = {}
+        for spectrum_key, points in cached.items():
+            espe = [tuple(point) for point in points]
+            espes[spectrum_key] = espe
+            if espe:
+                # The .hist file does not contain the padding zeroes
+                EnergySpectrum.write_hist_file(
+                    espe[1:-1], EnergySpectrum.get_hist_file_name(
+                        directory_es, measurement.name, spectrum_key,
+                        no_foil=no_foil))
+        return espes
 
     def calculate_spectrum(
             self,
@@ -138,47 +241,79 @@ class EnergySpectrum:
             self,
             no_foil: bool = False,
             progress: Optional[ProgressReporter] = None,
-            verbose: bool = True) -> Dict[str, TofListData]:
+            verbose: bool = True,
+            max_workers: Optional[int] = None) -> Dict[str, TofListData]:
         """Loads cut files through tof_list into list.
 
+        Cut files are run through tof_list concurrently. A cut file that
+        cannot be processed is logged and does not stop the processing of
+        the other cut files.
+
         Args:
             no_foil: whether foil thickness is set to 0 when running tof_list
             progress: ProgressReporter object
+            verbose: whether tof_list's stderr is printed to console
+            max_workers: maximum number of tof_list processes that are run
+                at the same time
 
         Return:
-            Returns list of cut files' tof_list results.
+            Returns cut files' tof_list results in the order of the cut
+            files.
         """
         tof_in = self._measurement.generate_tof_in(no_foil=no_foil)
+        detector, *_ = self._measurement.get_used_settings()
         cut_dict = {}
         try:
+            settings_digest = EnergySpectrum.get_settings_digest(
+                tof_in, detector.get_used_efficiencies_dir())
             if self._global_settings.is_es_output_saved():
                 directory = self._directory_es
             else:
                 directory = None
 
-            count = len(self._cut_files)
-
             self._directory_es.mkdir(exist_ok=True)
 
-            for i, cut_file in enumerate(self._cut_files):
-                # TODO move cut file handling to cut_file module
-                filename_split = cut_file.name.split('.')
-                element = Element.from_string(filename_split[1])
-
-                if not (5 <= len(filename_split) <= 6):
-                    raise ValueError(
-                        f"Could not parse cut file name: {cut_file}")
-
-                key = ".".join([str(element), *filename_split[2:-1]])
-
-                cut_dict[key] = EnergySpectrum.tof_list(
-                    cut_file, directory, no_foil=no_foil,
-                    logger=self._measurement,
-                    tof_in=tof_in, verbose=verbose)
-
-                if progress is not None:
-                    progress.report(i / count * 90)
+            cut_files = {}
+            for cut_file in self._cut_files:
+                try:
+                    cut_files[EnergySpectrum.get_cut_key(cut_file)] = cut_file
+                except ValueError as e:
+                    self._errors_occurred = True
+                    self._measurement.log_error(
+                        f"Could not calculate Energy Spectrum: {e}.")
+
+            count = len(cut_files)
+            executor = EvaluationExecutor(max_workers=max_workers)
+            try:
+                futures = {
+                    executor.submit(
+                        EnergySpectrum.run_tof_list, cut_file, directory,
+                        no_foil=no_foil, tof_in=tof_in, verbose=verbose,
+                        cache_dir=self._measurement.get_tof_list_dir(),
+                        settings_digest=settings_digest): key
+                    for key, cut_file in cut_files.items()
+                }
+                # Results are handled in this thread as they are completed
+                # so that logging and progress reporting stay in the
+                # calling thread.
+                results = {}
+                for i, future in enumerate(
+                        concurrent.futures.as_completed(futures), start=1):
+                    key = futures[future]
+                    try:
+                        results[key] = future.result()
+                    except Exception as e:
+                        self._errors_occurred = True
+                        self._measurement.log_error(
+                            f"Error in tof_list: {e}")
+                        results[key] = np.empty(0, dtype=TOF_LIST_DTYPE)
+                    if progress is not None:
+                        progress.report(i / count * 90)
+            finally:
+                executor.shutdown()
+            cut_dict = {key: results[key] for key in cut_files}
         except Exception as e:
+            self._errors_occurred = True
             msg = f"Could not calculate Energy Spectrum: {e}."
             self._measurement.log_error(msg)
         finally:
@@ -186,6 +321,19 @@ class EnergySpectrum:
                 progress.report(100)
         return cut_dict
 
+    @staticmethod
+    def get_cut_key(cut_file: Path) -> str:
+        """Returns the key of a cut file's spectrum. The key consists of
+        the element and the remaining parts of the cut file name, for
+        example 'cuts.1H.ERD.0.cut' has key '1H.ERD.0'.
+        """
+        # TODO move cut file handling to cut_file module
+        filename_split = cut_file.name.split('.')
+        if not (5 <= len(filename_split) <= 6):
+            raise ValueError(f"Could not parse cut file name: {cut_file}")
+        element = Element.from_string(filename_split[1])
+        return ".".join([str(element), *filename_split[2:-1]])
+
     @staticmethod
     def tof_list(
             cut_file: Path,
@@ -193,11 +341,17 @@ class EnergySpectrum:
             no_foil: bool = False,
             logger: Optional[Logger] = None,
             tof_in: Path = Path("tof.in"),
-            verbose: bool = True) -> TofListData:
+            verbose: bool = True,
+            cache_dir: Optional[Path] = None,
+            settings_digest: Optional[str] = None) -> TofListData:
         """ToF_list
 
         Arstila's tof_list executables interface for Python.
 
+        If cache_dir is given, results are stored there in binary .npy files
+        and tof_list is not run again while the cut file and the settings
+        stay the same.
+
         Args:
             cut_file: A Path representing cut file to be ran through tof_list.
             directory: A Path representing measurement's energy spectrum
@@ -207,44 +361,158 @@ class EnergySpectrum:
             logger: optional Logger entity used for logging
             tof_in: path to tof_in_file
             verbose: whether tof_list's stderr is printed to console
+            cache_dir: directory for the binary tof_list results
+            settings_digest: digest of the tof_list settings as returned by
+                get_settings_digest. Computed from tof_in if None.
 
         Returns:
-            Returns cut file as list transformed through Arstila's tof_list
-            program.
+            Returns cut file transformed through Arstila's tof_list
+            program as a structured numpy array.
         """
-        if not cut_file:
-            return []
-
-        tof_parser = ToFListParser()
-        cmd = EnergySpectrum.get_command(tof_in, cut_file)
-        stderr = None if verbose else subprocess.DEVNULL
-
         try:
-            with subprocess.Popen(
-                    cmd, cwd=gf.get_bin_dir(), stdout=subprocess.PIPE,
-                    universal_newlines=True, stderr=stderr) as tof_list:
-
-                if directory is not None:
-                    directory.mkdir(exist_ok=True)
-                    tof_list_file = EnergySpectrum.get_tof_list_file_name(
-                        directory, cut_file, no_foil=no_foil)
-                else:
-                    tof_list_file = None
-
-                tof_list_data = sutils.process_output(
-                    tof_list,
-                    tof_parser.parse_str,
-                    file=tof_list_file,
-                    text_func=lambda x: f"{' '.join(str(col) for col in x)}\n"
-                )
-                return tof_list_data
+            return EnergySpectrum.run_tof_list(
+                cut_file, directory, no_foil=no_foil, tof_in=tof_in,
+                verbose=verbose, cache_dir=cache_dir,
+                settings_digest=settings_digest)
         except Exception as e:
             msg = f"Error in tof_list: {e}"
             if logger is not None:
                 logger.log_error(msg)
             else:
                 print(msg)
-            return []
+            return np.empty(0, dtype=TOF_LIST_DTYPE)
+
+    @staticmethod
+    def run_tof_list(
+            cut_file: Path,
+            directory: Optional[Path] = None,
+            no_foil: bool = False,
+            tof_in: Path = Path("tof.in"),
+            verbose: bool = True,
+            cache_dir: Optional[Path] = None,
+            settings_digest: Optional[str] = None) -> TofListData:
+        """Runs a cut file through tof_list like tof_list but raises errors
+        instead of logging them. Safe to call from worker threads.
+        """
+        if not cut_file:
+            return np.empty(0, dtype=TOF_LIST_DTYPE)
+
+        if directory is not None:
+            directory.mkdir(exist_ok=True)
+            tof_list_file = EnergySpectrum.get_tof_list_file_name(
+                directory, cut_file, no_foil=no_foil)
+        else:
+            tof_list_file = None
+
+        cache_file = None
+        if cache_dir is not None:
+            if settings_digest is None:
+                settings_digest = EnergySpectrum.get_settings_digest(tof_in)
+            cache_file = EnergySpectrum.get_tof_list_cache_file_name(
+                cache_dir, cut_file, settings_digest, no_foil=no_foil)
+            tof_list_data = EnergySpectrum.load_tof_list_cache(cache_file)
+            if tof_list_data is not None:
+                if tof_list_file is not None and not tof_list_file.exists():
+                    EnergySpectrum.write_tof_list_file(
+                        tof_list_data, tof_list_file)
+                return tof_list_data
+
+        cmd = EnergySpectrum.get_command(tof_in, cut_file)
+        stderr = None if verbose else subprocess.DEVNULL
+        with subprocess.Popen(
+                cmd, cwd=gf.get_bin_dir(), stdout=subprocess.PIPE,
+                universal_newlines=True, stderr=stderr) as tof_list:
+            tof_list_data = sutils.process_output(
+                tof_list, output_func=EnergySpectrum.parse_tof_list_output)
+
+        if tof_list_file is not None:
+            EnergySpectrum.write_tof_list_file(tof_list_data, tof_list_file)
+        if cache_file is not None:
+            EnergySpectrum.save_tof_list_cache(tof_list_data, cache_file)
+        return tof_list_data
+
+    @staticmethod
+    def parse_tof_list_output(lines: Iterable[str]) -> TofListData:
+        """Parses lines of tof_list output into a structured numpy array.
+        """
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return np.empty(0, dtype=TOF_LIST_DTYPE)
+        return np.loadtxt(lines, dtype=TOF_LIST_DTYPE, ndmin=1)
+
+    @staticmethod
+    def write_tof_list_file(tof_list_data: TofListData, file: Path) -> None:
+        """Writes tof_list results to a text file.
+        """
+        with file.open("w") as f:
+            f.writelines(
+                f"{' '.join(str(col) for col in row)}\n"
+                for row in tof_list_data.tolist())
+
+    @staticmethod
+    def get_settings_digest(
+            tof_in: Path, efficiency_dir: Optional[Path] = None) -> str:
+        """Returns a digest of the tof.in file and the efficiency files that
+        tof_list uses.
+        """
+        digest = hashlib.sha1(Path(tof_in).read_bytes())
+        if efficiency_dir is not None and efficiency_dir.is_dir():
+            for eff_file in sorted(efficiency_dir.glob("*.eff")):
+                digest.update(eff_file.name.encode())
+                digest.update(eff_file.read_bytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_tof_list_cache_file_name(
+            cache_dir: Path, cut_file: Path, settings_digest: str,
+            no_foil: bool = False) -> Path:
+        """Returns the path of the binary tof_list results of a cut file. The
+        name contains a digest of the cut file and the settings, so changing
+        either of them changes the file name.
+        """
+        digest = hashlib.sha1(settings_digest.encode())
+        digest.update(Path(cut_file).read_bytes())
+        foil_txt = ".no_foil" if no_foil else ""
+        return cache_dir / \
+            f"{cut_file.stem}{foil_txt}.{digest.hexdigest()[:16]}.npy"
+
+    @staticmethod
+    def load_tof_list_cache(cache_file: Path) -> Optional[TofListData]:
+        """Returns memory-mapped tof_list results from a cache file or None
+        if the file does not exist or cannot be read.
+        """
+        try:
+            tof_list_data = np.load(cache_file, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if tof_list_data.dtype != TOF_LIST_DTYPE:
+            return None
+        return tof_list_data
+
+    @staticmethod
+    def save_tof_list_cache(
+            tof_list_data: TofListData, cache_file: Path) -> None:
+        """Saves tof_list results to a cache file and removes the outdated
+        cache files of the same cut file.
+        """
+        cache_file.parent.mkdir(exist_ok=True)
+        prefix = cache_file.name.rsplit(".", 2)[0]
+
+        def is_outdated(file_name: str) -> bool:
+            if file_name == cache_file.name or \
+                    not file_name.startswith(f"{prefix}."):
+                return False
+            # Only the digest part may differ
+            return "." not in file_name[len(prefix) + 1:-len(".npy")]
+
+        gf.remove_matching_files(
+            cache_file.parent, exts={".npy"}, filter_func=is_outdated)
+        # Write to a temporary file first so that a partially written file
+        # is never loaded.
+        tmp_file = cache_file.with_name(f"{cache_file.name}.tmp")
+        with tmp_file.open("wb") as f:
+            np.save(f, tof_list_data)
+        os.replace(tmp_file, cache_file)
 
     @staticmethod
     def get_command(tof_in: Path, cut_file: Path) -> Tuple[str, str, str]:
@@ -308,16 +576,16 @@ class EnergySpectrum:
             contents of .hist files as a dict
         """
         espes = {}
-        if use_efficiency:
-            y_col = 6
-        else:
-            y_col = None
-
         keys = []
         for key, tof_list_data in tof_listed_files.items():
-            espe = gf.hist(
-                tof_list_data, col=2, weight_col=y_col,
+            if use_efficiency:
+                weights = tof_list_data["weight"]
+            else:
+                weights = None
+            xs, ys = gf.hist_columns(
+                tof_list_data["energy"], weights=weights,
                 width=spectrum_width)
+            espe = list(zip(xs.tolist(), ys.tolist()))
 
             if not espe:
                 espes[key] = espe
@@ -329,11 +597,16 @@ class EnergySpectrum:
             filename = EnergySpectrum.get_hist_file_name(
                 directory_es, measurement.name, key, no_foil=no_foil)
 
-            numpy_array = np.array(
-                espe, dtype=[("float", float), ("int", int)])
-            np.savetxt(filename, numpy_array, delimiter=" ", fmt="%5.5f %6d")
+            EnergySpectrum.write_hist_file(espe, filename)
         return espes
 
+    @staticmethod
+    def write_hist_file(espe: Espe, file: Path) -> None:
+        """Writes a histogrammed energy spectrum to a .hist file.
+        """
+        numpy_array = np.array(espe, dtype=[("float", float), ("int", int)])
+        np.savetxt(file, numpy_array, delimiter=" ", fmt="%5.5f %6d")
+
 
 class SumEnergySpectrum:
     """Container class for a sum of energy spectra."""
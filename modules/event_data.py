@@ -0,0 +1,296 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Event data module contains a columnar store for ToF-E events and a fast
+reader for .asc measurement files.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+from pathlib import Path
+from typing import List
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+
+import numpy as np
+
+# Bytes that str.split() considers whitespace in ASCII input
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = True
+_SIGN = np.zeros(256, dtype=bool)
+_SIGN[[ord("+"), ord("-")]] = True
+
+_NEWLINE = ord("\n")
+_MAX_DIGITS = 18
+_POWERS_OF_TEN = 10 ** np.arange(_MAX_DIGITS + 1, dtype=np.int64)
+
+# Marker for rows that have no value for the third ADC
+_NO_ADC = np.iinfo(np.int64).min
+# Value of the third ADC for events that were read from two column lines of
+# a file that also has three column lines
+MISSING_ADC = np.iinfo(np.int32).min
+
+CHUNK_SIZE = 2 ** 20
+WRITE_CHUNK_SIZE = 2 ** 16
+
+
+class EventData:
+    """Columnar store for ToF-E events.
+
+    Each event has a time of flight, an energy and an event number that is
+    the (1-based) line number of the event in the original .asc file. If the
+    events were measured with a third ADC, its values are stored in adc.
+    Events that have no value for the third ADC while others do have
+    MISSING_ADC as their value.
+    """
+    __slots__ = "tof", "energy", "event_number", "adc"
+
+    def __init__(self, tof: np.ndarray, energy: np.ndarray,
+                 event_number: np.ndarray, adc: Optional[np.ndarray] = None):
+        """Initializes new EventData.
+
+        Args:
+            tof: time of flight channels
+            energy: energy channels
+            event_number: event numbers
+            adc: values of the optional third ADC
+        """
+        self.tof = np.asarray(tof, dtype=np.int32)
+        self.energy = np.asarray(energy, dtype=np.int32)
+        self.event_number = np.asarray(event_number, dtype=np.int64)
+        if adc is not None:
+            adc = np.asarray(adc, dtype=np.int32)
+        self.adc = adc
+
+        if not len(self.tof) == len(self.energy) == len(self.event_number):
+            raise ValueError("Event columns must have equal lengths.")
+        if self.adc is not None and len(self.adc) != len(self.tof):
+            raise ValueError("Event columns must have equal lengths.")
+
+    @classmethod
+    def empty(cls) -> "EventData":
+        """Returns an EventData that contains no events.
+        """
+        return cls(np.empty(0), np.empty(0), np.empty(0))
+
+    @classmethod
+    def from_file(cls, file: Path, chunk_size: int = CHUNK_SIZE) \
+            -> "EventData":
+        """Reads events from an .asc file.
+
+        Lines that have two columns are read as (ToF, energy) pairs and lines
+        that have three columns as (ToF, energy, ADC) triplets. If a file
+        has both, the ADC value of the pairs is MISSING_ADC. Other lines
+        are skipped but they still increase the event number.
+
+        File is read in chunks so that memory usage stays bounded regardless
+        of the size of the file.
+
+        Args:
+            file: path to an .asc file
+            chunk_size: number of bytes read at a time
+
+        Return:
+            EventData
+        """
+        columns: List[np.ndarray] = []
+        line_count = 0
+        with file.open("rb") as fp:
+            remainder = b""
+            while True:
+                block = fp.read(chunk_size)
+                if not block:
+                    break
+                block = remainder + block
+                end = block.rfind(b"\n") + 1
+                if not end:
+                    remainder = block
+                    continue
+                remainder = block[end:]
+                rows, lines = _parse_rows(block[:end], line_count)
+                columns.append(rows)
+                line_count += lines
+            if remainder:
+                rows, _ = _parse_rows(remainder + b"\n", line_count)
+                columns.append(rows)
+
+        if not columns:
+            return cls.empty()
+
+        data = np.concatenate(columns, axis=1)
+        has_adc = data[2] != _NO_ADC
+        if has_adc.all():
+            adc = data[2]
+        elif has_adc.any():
+            adc = np.where(has_adc, data[2], MISSING_ADC)
+        else:
+            adc = None
+        return cls(data[0], data[1], data[3], adc)
+
+    def __len__(self) -> int:
+        return len(self.tof)
+
+    def __getitem__(self, index) -> "EventData":
+        """Returns the events at given index (a slice, an index array or a
+        boolean mask) as new EventData.
+        """
+        return EventData(
+            self.tof[index], self.energy[index], self.event_number[index],
+            None if self.adc is None else self.adc[index])
+
+    def get_columns(self) -> Tuple[np.ndarray, ...]:
+        """Returns the columns in the order they are written to .cut files.
+        Missing ADC values are included as MISSING_ADC.
+        """
+        if self.adc is None:
+            return self.tof, self.energy, self.event_number
+        return self.tof, self.energy, self.adc, self.event_number
+
+    def write(self, fp: TextIO):
+        """Writes events to a text file, one space separated event per line.
+        Missing ADC values are left out of their lines.
+
+        Args:
+            fp: file opened in text mode
+        """
+        columns = self.get_columns()
+        row_format = " ".join("%d" for _ in columns) + "\n"
+        for start in range(0, len(self), WRITE_CHUNK_SIZE):
+            rows = np.column_stack(
+                [col[start:start + WRITE_CHUNK_SIZE] for col in columns])
+            if self.adc is not None and (rows[:, 2] == MISSING_ADC).any():
+                fp.writelines(
+                    f"{tof} {energy} {n}\n" if adc == MISSING_ADC else
+                    f"{tof} {energy} {adc} {n}\n"
+                    for tof, energy, adc, n in rows.tolist())
+                continue
+            # Formatting a whole block at once is much faster than writing
+            # the rows one by one.
+            fp.write(row_format * len(rows) % tuple(rows.ravel().tolist()))
+
+
+def _parse_rows(block: bytes, first_line: int) -> Tuple[np.ndarray, int]:
+    """Parses two or three column rows of integers from a block of text.
+
+    Args:
+        block: bytes that end with a newline character
+        first_line: number of lines preceding the block in the file
+
+    Return:
+        tuple where first element is a 4xN array of (ToF, energy, ADC, event
+        number) rows and second element is the number of lines in the block.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == _NEWLINE)
+    line_count = len(newlines)
+
+    in_token = ~_WHITESPACE.take(buf)
+    prev_in_token = np.empty_like(in_token)
+    prev_in_token[0] = False
+    prev_in_token[1:] = in_token[:-1]
+    next_in_token = np.empty_like(in_token)
+    next_in_token[-1] = False
+    next_in_token[:-1] = in_token[1:]
+    start_mask = in_token & ~prev_in_token
+    starts = np.flatnonzero(start_mask)
+    ends = np.flatnonzero(in_token & ~next_in_token)
+
+    tokens_before = np.zeros(line_count + 1, dtype=np.int64)
+    tokens_before[1:] = np.searchsorted(starts, newlines)
+    tokens_per_line = np.diff(tokens_before)
+    first_token = tokens_before[:-1]
+    row_lines = np.flatnonzero((tokens_per_line == 2) | (tokens_per_line == 3))
+    rows = np.full((4, len(row_lines)), _NO_ADC, dtype=np.int64)
+    if not len(row_lines):
+        return rows, line_count
+
+    is_digit = (buf - ord("0")) <= 9
+    invalid_bytes = in_token & ~is_digit
+    if invalid_bytes.any():
+        invalid_bytes &= ~(start_mask & _SIGN.take(buf))
+    if invalid_bytes.any() or not is_digit[ends].all() or \
+            (ends - starts).max() >= _MAX_DIGITS:
+        values, valid = _parse_integers(
+            buf, is_digit, invalid_bytes, start_mask, starts, ends)
+    else:
+        # Every token is an integer literal so the C parser can be used.
+        values = np.fromstring(block, dtype=np.int64, sep=" ")
+        valid = np.ones(len(values), dtype=bool)
+
+    row_tokens = first_token[row_lines]
+    triplets = tokens_per_line[row_lines] == 3
+
+    used_tokens = np.concatenate(
+        (row_tokens, row_tokens + 1, row_tokens[triplets] + 2))
+    if not valid[used_tokens].all():
+        bad = used_tokens[~valid[used_tokens]][0]
+        token = block[starts[bad]:ends[bad] + 1].decode(errors="replace")
+        raise ValueError(f"invalid literal for int(): '{token}'")
+
+    rows[0] = values[row_tokens]
+    rows[1] = values[row_tokens + 1]
+    rows[2, triplets] = values[row_tokens[triplets] + 2]
+    rows[3] = row_lines + first_line + 1
+    return rows, line_count
+
+
+def _parse_integers(buf: np.ndarray, is_digit: np.ndarray,
+                    invalid_bytes: np.ndarray, start_mask: np.ndarray,
+                    starts: np.ndarray, ends: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """Converts whitespace separated tokens into integers one byte at a time.
+
+    This is slower than np.fromstring but it tells which tokens could not be
+    converted instead of stopping at the first invalid token.
+
+    Args:
+        buf: text as an array of bytes
+        is_digit: boolean mask of digit bytes
+        invalid_bytes: boolean mask of bytes that cannot appear in an integer
+        start_mask: boolean mask of first bytes of tokens
+        starts: indexes of first bytes of tokens
+        ends: indexes of last bytes of tokens
+
+    Return:
+        tuple of integer values and a boolean mask that tells which tokens
+        were valid integers.
+    """
+    token_of_byte = np.cumsum(start_mask, dtype=np.int64) - 1
+    token_of_byte[token_of_byte < 0] = 0
+
+    exponents = ends[token_of_byte] - np.arange(len(buf))
+    exponents[~is_digit] = 0
+    too_long = exponents >= _MAX_DIGITS
+    exponents[too_long] = 0
+
+    digits = np.where(is_digit, buf - ord("0"), 0).astype(np.int64)
+    values = np.add.reduceat(digits * _POWERS_OF_TEN[exponents], starts)
+
+    invalid = (invalid_bytes | too_long).astype(np.int64)
+    valid = np.add.reduceat(invalid, starts) == 0
+    # A lone sign is not a number either
+    valid &= is_digit[starts] | (ends > starts)
+
+    values[buf[starts] == ord("-")] *= -1
+    return values, valid
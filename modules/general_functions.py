@@ -52,9 +52,12 @@ from typing import Callable
 from typing import Optional
 from typing import Union
 from typing import Iterable
+from typing import NamedTuple
 from typing import Tuple
 from typing import TypeVar
 
+import numpy as np
+
 from . import subprocess_utils as sutils
 
 T = TypeVar("T")
@@ -184,7 +187,8 @@ def find_files_by_extension(directory: Path, *exts) -> Dict[str, List[Path]]:
         for entry in scdir:
             path = Path(entry.path)
             suffix = path.suffix
-            if suffix in search_dict and path.is_file():
+            # DirEntry usually knows its type without a stat call
+            if suffix in search_dict and entry.is_file():
                 search_dict[suffix].append(path)
     return search_dict
 
@@ -196,7 +200,7 @@ def hist(data, col=0, weight_col=None, width=1.0):
     column at certain widths so the graph won't include all information.
 
     Args:
-        data: List representation of data.
+        data: List representation of data or a 2D numpy array.
         col: column that contains the values to be histogrammed
         weight_col: column that contains weights for each row of data
         width: width of histogrammed bins.
@@ -204,27 +208,70 @@ def hist(data, col=0, weight_col=None, width=1.0):
     Return:
         Returns formatted list to use in graphs.
     """
-    if not data:
-        return []
-    data_sliced = tuple(
-        (float(row[col]), float(row[weight_col])
-         if weight_col is not None else 1)
-        for row in data)
-    data_sliced = sorted(data_sliced, key=lambda x: x[0], reverse=False)
-    data_length = len(data_sliced)
-
-    a = int(data_sliced[0][0] / width) * width
-    i = 0
-    hist_list = []
-    while i < data_length:
-        b = 0.0
-        while i < data_length and data_sliced[i][0] < a:
-            b += data_sliced[i][1]
-            i += 1
-        hist_list.append((a - (width / 2.0), b))
-        a += width
-
-    return hist_list
+    if isinstance(data, np.ndarray):
+        values = data[:, col]
+        weights = data[:, weight_col] if weight_col is not None else None
+    else:
+        if not data:
+            return []
+        values = [row[col] for row in data]
+        if weight_col is not None:
+            weights = [row[weight_col] for row in data]
+        else:
+            weights = None
+    xs, ys = hist_columns(values, weights=weights, width=width)
+    return list(zip(xs.tolist(), ys.tolist()))
+
+
+def hist_columns(values, weights=None, width: float = 1.0) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """Histograms values into bins of given width.
+
+    The first bin edge is int(min(values) / width) * width and the first
+    bin contains all values below it. After that, each bin contains the
+    values in [edge - width, edge). Bins are labeled with edge - width / 2
+    and they are added until the largest value has been counted.
+
+    Args:
+        values: 1D array-like of values to histogram
+        weights: 1D array-like of weights for each value or None, if each
+            value is counted once
+        width: width of the bins
+
+    Return:
+        bin labels and the sums of weights in the bins as numpy arrays
+    """
+    if width <= 0:
+        raise ValueError("Bin width must be positive.")
+    values = np.asarray(values, dtype=float)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+    if not values.size:
+        return np.empty(0), np.empty(0)
+
+    # Weights are summed in ascending order of the values like in the
+    # original algorithm so that the sums are rounded the same way.
+    order = np.argsort(values, kind="stable")
+    values = values[order]
+    if weights is not None:
+        weights = weights[order]
+
+    first = int(values[0] / width) * width
+    max_value = values[-1]
+    # Bin edges are accumulated one width at a time (cumsum adds the values
+    # sequentially) so that they have the same rounding errors as
+    # the original algorithm.
+    edges = np.cumsum(np.concatenate((
+        [first], np.full(int((max_value - first) / width) + 2, width))))
+    while edges[-1] <= max_value:
+        # Rounding may leave the estimated edges short of the maximum value
+        edges = np.append(edges, edges[-1] + width)
+    last = np.searchsorted(edges, max_value, side="right")
+    edges = edges[:last + 1]
+
+    indices = np.searchsorted(edges, values, side="right")
+    sums = np.bincount(indices, weights=weights, minlength=len(edges))
+    return edges - width / 2.0, sums.astype(float)
 
 
 def copy_file_to_temp(file: Path) -> Path:
@@ -476,42 +523,6 @@ def find_nearest(x, lst):
         return before
 
 
-def uniform_espe_lists(espe1, espe2, channel_width=0.025):
-    """Modify given energy spectra lists to have the same amount of items.
-
-    Return:
-        Modified lists.
-    """
-    first = espe1
-    second = espe2
-    # check if first x values don't match
-    # add zero values to the one missing the x values
-    if second[0][0] < first[0][0]:
-        x = first[0][0] - channel_width
-        while round(x, 4) >= second[0][0]:
-            first.insert(0, (round(x, 4), 0))
-            x -= channel_width
-    elif first[0][0] < second[0][0]:
-        x = second[0][0] - channel_width
-        while round(x, 4) >= first[0][0]:
-            second.insert(0, (round(x, 4), 0))
-            x -= channel_width
-
-    # do the same for the last values
-    if second[-1][0] < first[-1][0]:
-        x = second[-1][0] + channel_width
-        while round(x, 4) <= first[-1][0]:
-            second.append((round(x, 4), 0))
-            x += channel_width
-    elif first[-1][0] < second[-1][0]:
-        x = first[-1][0] + channel_width
-        while round(x, 4) <= second[-1][0]:
-            first.append((round(x, 4), 0))
-            x += channel_width
-
-    return first, second
-
-
 def format_to_binary(var, length):
     """Format given integer into binary of a certain length.
 
@@ -585,6 +596,124 @@ def count_lines_in_file(file_path: Path, check_file_exists=False):
     return counter + 1
 
 
+# Number of bytes that are compared to detect rewritten files
+_LINE_COUNT_TAIL_SIZE = 64
+
+
+class LineCountState(NamedTuple):
+    """Position of an incremental line count within a file. Returned by
+    count_new_lines_in_file and passed back to it on the next call.
+    """
+    file_id: Tuple[int, int]
+    offset: int
+    newlines: int
+    tail: bytes
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines read so far, including an unterminated last line.
+        """
+        if self.offset and not self.tail.endswith(b"\n"):
+            return self.newlines + 1
+        return self.newlines
+
+
+def count_new_lines_in_file(file_path: Path,
+                            state: Optional[LineCountState] = None,
+                            check_file_exists=False,
+                            chunk_size: int = 2 ** 20) \
+        -> Tuple[int, Optional[LineCountState]]:
+    """Returns the number of lines in given file by reading only the bytes
+    that have been appended to it since the previous call.
+
+    If the file has been replaced, truncated or rewritten after the given
+    state was returned, lines are counted from the beginning of the file.
+
+    Args:
+        file_path: absolute path to a file
+        state: state returned by the previous call for the same file or None
+        check_file_exists: if True, function returns 0 and None if the file
+            does not exist.
+        chunk_size: number of bytes read at a time
+
+    Return:
+        number of lines in the file and the state for the next call
+    """
+    try:
+        with Path(file_path).open("rb") as f:
+            state, _ = _resume_line_count(f, state)
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                state = _advance_line_count(state, chunk)
+    except FileNotFoundError:
+        if not check_file_exists:
+            raise
+        return 0, None
+
+    return state.line_count, state
+
+
+def read_new_lines_in_file(file_path: Path,
+                           state: Optional[LineCountState] = None) \
+        -> Tuple[List[str], LineCountState, bool]:
+    """Returns the lines that have been appended to given file since the
+    previous call. The last line is only returned once it has been
+    terminated with a newline.
+
+    Args:
+        file_path: absolute path to a file
+        state: state returned by the previous call for the same file or None
+
+    Return:
+        new lines, the state for the next call and a boolean that tells
+        whether the file was read from the beginning because it had been
+        replaced, truncated or rewritten after the given state was returned.
+    """
+    with Path(file_path).open("rb") as f:
+        state, restarted = _resume_line_count(f, state)
+        data = f.read()
+
+    data = data[:data.rfind(b"\n") + 1]
+    state = _advance_line_count(state, data)
+    return data.decode().splitlines(keepends=True), state, restarted
+
+
+def _resume_line_count(f, state: Optional[LineCountState]) \
+        -> Tuple[LineCountState, bool]:
+    """Returns the state from which reading of an open file continues and
+    whether the file has to be read from the beginning because it has been
+    replaced, truncated or rewritten after the state was returned. The file
+    is positioned at the offset of the returned state.
+    """
+    stat = os.fstat(f.fileno())
+    file_id = stat.st_dev, stat.st_ino
+    restarted = state is not None and (
+        state.file_id != file_id or
+        stat.st_size < state.offset or
+        not _file_continues(f, state))
+    if state is None or restarted:
+        state = LineCountState(file_id, 0, 0, b"")
+    f.seek(state.offset)
+    return state, restarted
+
+
+def _file_continues(f, state: LineCountState) -> bool:
+    """Checks that the bytes preceding the stored offset are still the ones
+    that were read last.
+    """
+    f.seek(state.offset - len(state.tail))
+    return f.read(len(state.tail)) == state.tail
+
+
+def _advance_line_count(state: LineCountState, data: bytes) \
+        -> LineCountState:
+    """Returns the state after the given bytes have been read.
+    """
+    return LineCountState(
+        state.file_id, state.offset + len(data),
+        state.newlines + data.count(b"\n"),
+        (state.tail + data)[-_LINE_COUNT_TAIL_SIZE:])
+
+
 def combine_files(file_paths: Iterable[Path], destination: Path):
     """Combines an iterable of files into a single file.
     """
@@ -679,3 +808,42 @@ def check_if_sum_in_directory_name(directory):
             if entry.name.startswith("SIMULATED_SUM"):
                 simulated_sum_found = True
     return measured_sum_found, simulated_sum_found
+
+
+def rreplace(s, old, new, old_folder_prefix, new_folder_prefix,
+             old_sample_name, new_sample_name):
+    """Replace from last occurrence.
+
+    http://stackoverflow.com/questions/2556108/how-to-replace-the-last-
+    occurence-of-an-expression-in-a-string
+
+    Args:
+        s: String to modify.
+        old: Old name.
+        new: New name.
+        old_folder_prefix: Folder prefix of the old name.
+        new_folder_prefix: Folder prefix of the new name.
+        old_sample_name: Name of the old sample folder.
+        new_sample_name: Name of the new sample folder.
+    """
+    li = s.rsplit(old, 2)
+    if old_folder_prefix in li[0]:
+        new_f = li[0].replace(old_folder_prefix, new_folder_prefix)
+        li[0] = new_f
+    if old_sample_name in li[0]:
+        new_f = li[0].replace(old_sample_name, new_sample_name)
+        li[0] = new_f
+    # first = s.split(old_folder_prefix, 1)[0]
+    # f_done = first + new_folder_name
+    # second = s.rsplit(old, 1)[1]
+    # s_done = new + second
+    #
+    # result = f_done + s_done
+    result = new.join(li)
+    if "\\" in result and "/" not in result:
+        # This is a patch to make it possible to open .cut files made
+        # on another os.
+        # TODO it would be better to use Path when writing these paths
+        #      to file in the first place
+        result = result.replace("\\", "/")
+    return Path(result)
@@ -24,14 +24,26 @@ __author__ = "Severi Jääskeläinen \n Samuel Kaiponen \n Heta Rekilä \n" \
              "Pitkänen "
 __version__ = "2.0"
 
+import functools
 import glob
+import hashlib
+import math
+import os
 import platform
 import subprocess
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Dict
 from typing import Iterable
+from typing import NamedTuple
 from typing import Optional
 from typing import Tuple
 
+import numpy as np
+from scipy.special import erf
+
 from . import general_functions as gf
 from . import subprocess_utils as sutils
 from .base import Espe
@@ -42,6 +54,256 @@ from .target import Target
 
 from modules.global_settings import GlobalSettings
 
+# Atomic mass unit (MeV/c^2) and speed of light (m/ns)
+_AMU_MEV = 931.49410242
+_C_M_PER_NS = 0.299792458
+
+# Gaussian timing noise is integrated over this many standard deviations
+# on both sides of the measured time-of-flight
+_TIME_SIGMAS = 4.0
+_FWHM_TO_SIGMA = 1 / (2 * math.sqrt(2 * math.log(2)))
+
+# Number of recoil events handled at a time when spreading them over channels
+_EVENT_CHUNK_SIZE = 2 ** 16
+
+ErdFingerprint = Tuple[Tuple[str, int, int], ...]
+
+
+class ErdData(NamedTuple):
+    """Recoil events of ERD files stored as columns.
+    """
+    mass: np.ndarray
+    depth: np.ndarray
+    weight: np.ndarray
+    tof: np.ndarray
+
+    @staticmethod
+    def get_fingerprint(erd_file: Path) -> ErdFingerprint:
+        """Returns the paths, modification times and sizes of the ERD files
+        that match the given glob pattern.
+        """
+        fingerprint = []
+        for file in sorted(glob.glob(str(erd_file))):
+            try:
+                stat = os.stat(file)
+            except OSError:
+                continue
+            fingerprint.append((file, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint)
+
+    @classmethod
+    def from_files(cls, erd_file: Path) -> "ErdData":
+        """Returns the recoil events in ERD files that match the given glob
+        pattern. Files are only parsed again if they have been modified
+        since the previous call.
+        """
+        return _read_erd_data(cls.get_fingerprint(erd_file))
+
+
+def _read_fingerprinted_bytes(file: str, size: int) -> bytes:
+    """Returns the complete lines within the first size bytes of an ERD
+    file. Bytes that were appended after the file was fingerprinted and a
+    last line that had not been fully written yet are left out.
+    """
+    with open(file, "rb") as f:
+        data = f.read(size)
+    return data[:data.rfind(b"\n") + 1]
+
+
+@functools.lru_cache(maxsize=2)
+def _read_erd_data(fingerprint: ErdFingerprint) -> ErdData:
+    """Parses the recoil events of the ERD files listed in the fingerprint.
+    Files are only read up to their fingerprinted sizes, so the events
+    match the fingerprint even if the files are still being written.
+    """
+    arrays = []
+    for file, _, size in fingerprint:
+        try:
+            data = _read_fingerprinted_bytes(file, size)
+        except OSError:
+            continue
+        lines = [
+            line for line in data.decode().splitlines(keepends=True)
+            if line.startswith("R")
+        ]
+        if lines:
+            arrays.append(np.loadtxt(lines, usecols=(5, 6, 7, 8), ndmin=2))
+
+    if arrays:
+        data = np.concatenate(arrays)
+    else:
+        data = np.empty((0, 4))
+    return ErdData(*data.T)
+
+
+def _calculate_spectrum(erd_data: ErdData, recoil_dist: np.ndarray,
+                        ch: float, toflen: float, timeres: float,
+                        scale: float) -> Espe:
+    """Calculates an energy spectrum from recoil events.
+
+    Energies are calculated from the time-of-flight using the average recoil
+    mass. Instead of adding random noise to each time-of-flight, the
+    weight of each event is spread over the channels by the probability
+    given by the Gaussian time resolution, which makes the result
+    deterministic.
+
+    Args:
+        erd_data: recoil events
+        recoil_dist: depth distribution as an array of (depth, concentration)
+            rows
+        ch: channel width (MeV)
+        toflen: time-of-flight length (m)
+        timeres: time resolution (ps, FWHM)
+        scale: multiplier for event weights
+
+    Return:
+        spectrum as a list of (energy, yield) tuples
+    """
+    tof, weights = _get_weighted_events(erd_data, recoil_dist)
+    if not tof.size:
+        return []
+
+    k = _get_energy_factor(erd_data.mass.mean(), toflen)
+    first, counts = _bin_events(tof, weights * scale, k, ch, timeres)
+    return _counts_to_espe(first, counts, ch)
+
+
+def _get_weighted_events(erd_data: ErdData, recoil_dist: np.ndarray) \
+        -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the time-of-flight and the weight of each recoil event whose
+    weight is not zero after weighting it by the recoil distribution.
+    """
+    weights = erd_data.weight * np.interp(
+        erd_data.depth, recoil_dist[:, 0], recoil_dist[:, 1],
+        left=0.0, right=0.0)
+    mask = weights != 0
+    return erd_data.tof[mask], weights[mask]
+
+
+def _get_energy_factor(mass: float, toflen: float) -> float:
+    """Returns k such that energy (MeV) is k / t^2 when time-of-flight t is
+    given in ns.
+    """
+    return 0.5 * mass * _AMU_MEV * (toflen / _C_M_PER_NS) ** 2
+
+
+def _bin_events(tof: np.ndarray, weights: np.ndarray, k: float, ch: float,
+                timeres: float) -> Tuple[int, np.ndarray]:
+    """Spreads the weights of the events over energy channels.
+
+    Return:
+        index of the first channel and the counts in consecutive channels
+        starting from it
+    """
+    if timeres <= 0:
+        channels = np.floor(k / tof ** 2 / ch + 0.5).astype(np.int64)
+        first = channels.min()
+        counts = np.bincount(channels - first, weights=weights)
+    else:
+        sigma = timeres * 1e-3 * _FWHM_TO_SIGMA
+        lowest = np.floor(
+            k / (tof + _TIME_SIGMAS * sigma) ** 2 / ch + 0.5).astype(np.int64)
+        highest = np.floor(
+            k / np.maximum(tof - _TIME_SIGMAS * sigma, tof / 2) ** 2 / ch +
+            0.5).astype(np.int64)
+        first = lowest.min()
+        counts = np.zeros(highest.max() - first + 1)
+        for start in range(0, tof.size, _EVENT_CHUNK_SIZE):
+            end = start + _EVENT_CHUNK_SIZE
+            width = (highest[start:end] - lowest[start:end]).max() + 1
+            channels = lowest[start:end, np.newaxis] + np.arange(width)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                # Times that correspond to the upper and lower energy
+                # boundaries of each channel
+                t_upper = np.sqrt(k / ((channels + 0.5) * ch))
+                t_lower = np.sqrt(k / ((channels - 0.5) * ch))
+            t_lower[channels <= 0] = np.inf
+            t = tof[start:end, np.newaxis]
+            prob = 0.5 * (erf((t_lower - t) / (sigma * math.sqrt(2))) -
+                          erf((t_upper - t) / (sigma * math.sqrt(2))))
+            # Channels are padded to the widest event of the chunk. Padding
+            # is left out so that results do not depend on the chunking.
+            prob[channels > highest[start:end, np.newaxis]] = 0
+            counts += np.bincount(
+                (channels - first).ravel(),
+                weights=(prob * weights[start:end, np.newaxis]).ravel(),
+                minlength=counts.size)
+    return first, counts
+
+
+def _counts_to_espe(first: int, counts: np.ndarray, ch: float) -> Espe:
+    """Converts channel counts into a spectrum of (energy, yield) tuples.
+    Channels with no counts are left out apart from one channel on both
+    sides of the spectrum.
+    """
+    nonzero = np.flatnonzero(counts)
+    if not nonzero.size:
+        return []
+    lo = max(nonzero[0] - 1, -first)
+    counts = np.concatenate((counts, [0.0]))
+    return [
+        (round(float(first + i) * ch, 6), float(counts[i]))
+        for i in range(lo, nonzero[-1] + 2)
+    ]
+
+
+def _write_flat_recoil_file(file: Path, max_depth: float):
+    """Writes a recoil distribution that has a constant concentration of 1
+    from the surface to the given depth.
+    """
+    end = round(max_depth + 1, 2)
+    with file.open("w") as f:
+        f.write(f"0.00 1.0\n{end} 1.0\n"
+                f"{round(end + 0.01, 2)} 0.0\n{round(end + 0.02, 2)} 0.0\n")
+
+
+@functools.lru_cache(maxsize=32)
+def _get_calibration(fingerprint: ErdFingerprint, command_args: Tuple) \
+        -> float:
+    """Runs get_espe for the ERD data and parameters and returns the number
+    of counts it gives per unit of ERD weight and fluence. get_espe is given
+    a copy of the events in the fingerprint, so both calculations use the
+    same events. The recoil distribution, channel width and fluence do not
+    affect the result, so a flat distribution and default values are used.
+
+    Raises SubprocessError if get_espe could not be run or its output
+    could not be compared with the ERD data.
+    """
+    erd_data = _read_erd_data(fingerprint)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        recoil_file = Path(tmp_dir, "calibration.recoil")
+        _write_flat_recoil_file(recoil_file, erd_data.depth.max())
+
+        # get_espe reads a snapshot of the same events as the in-process
+        # calculation, as the ERD files may still be growing
+        erd_file = Path(tmp_dir, "calibration.erd")
+        with erd_file.open("wb") as f:
+            for file, _, size in fingerprint:
+                try:
+                    f.write(_read_fingerprinted_bytes(file, size))
+                except OSError:
+                    continue
+
+        kwargs = dict(command_args, erd_file=erd_file)
+        get_espe = GetEspe(recoil_file=recoil_file, **kwargs)
+        try:
+            external = get_espe.run(verbose=False)
+        except (OSError, subprocess.SubprocessError) as e:
+            raise subprocess.SubprocessError(
+                f"Could not run get_espe to calibrate the energy spectrum: "
+                f"{e}") from e
+        internal = _calculate_spectrum(
+            erd_data, np.loadtxt(recoil_file, ndmin=2), get_espe.channel_width,
+            get_espe.toflen, get_espe.timeres, get_espe.fluence)
+
+    external_sum = sum(y for _, y in external)
+    internal_sum = sum(y for _, y in internal)
+    if external_sum <= 0 or internal_sum <= 0:
+        raise subprocess.SubprocessError(
+            "get_espe returned no counts for the ERD data, so the energy "
+            "spectrum could not be calibrated.")
+    return external_sum / internal_sum
+
 
 class GetEspe:
     """Class for handling calling the external program get_espe to generate
@@ -49,7 +311,11 @@ class GetEspe:
     """
     __slots__ = "recoil_file", "beam_ion", "energy", "theta", \
                 "channel_width", "fluence", "timeres", "density", \
-                "solid", "erd_file", "tangle", "toflen", "_output_parser"
+                "solid", "erd_file", "tangle", "toflen"
+
+    # Shared by all instances so that GetEspe objects can be pickled and
+    # sent to worker processes
+    _output_parser = CSVParser((0, float), (1, float))
 
     def __init__(self, beam_ion: str, energy: float, theta: float,
                  tangle: float, toflen: float, solid: float,
@@ -90,15 +356,14 @@ class GetEspe:
         self.solid = solid
         self.recoil_file = recoil_file
         self.erd_file = erd_file
-        self._output_parser = CSVParser((0, float), (1, float))
 
     @staticmethod
     def calculate_simulated_spectrum(
             beam: Beam, detector: Detector, target: Target,
             output_file: Optional[Path] = None, verbose: bool = None,
-            **kwargs) -> Espe:
+            in_process: bool = False, **kwargs) -> Espe:
         """Calculates simulated spectrum. Calling this is the same as creating
-        a new GetEspe object and calling its run method.
+        a new GetEspe object and calling its run (or run_in_process) method.
         Args:
             beam: provides ion and energy data
             detector: provides tof-length, solid angle, scattering angle
@@ -107,11 +372,32 @@ class GetEspe:
             output_file: path to file where output will be written. If None,
                 output is not written to a file.
             verbose: whether get_espe's stderr is printed to console
+            in_process: whether spectrum is calculated in this process
+                instead of running get_espe
             kwargs: keyword arguments passed down to GetEspe
         Return:
             spectrum data as a list of parsed tuples
         """
-        get_espe = GetEspe(
+        get_espe = GetEspe.from_settings(beam, detector, target, **kwargs)
+        if in_process:
+            return get_espe.run_in_process(output_file=output_file)
+        return get_espe.run(output_file=output_file, verbose=verbose)
+
+    @classmethod
+    def from_settings(cls, beam: Beam, detector: Detector, target: Target,
+                      **kwargs) -> "GetEspe":
+        """Returns a new GetEspe that uses the given beam, detector and
+        target settings.
+        Args:
+            beam: provides ion and energy data
+            detector: provides tof-length, solid angle, scattering angle
+                and time resolution data
+            target: provides target theta data
+            kwargs: keyword arguments passed down to GetEspe
+        Return:
+            GetEspe object
+        """
+        return cls(
             beam_ion=beam.ion.get_prefix(),
             energy=beam.energy,
             theta=detector.detector_theta,
@@ -120,7 +406,6 @@ class GetEspe:
             solid=detector.calculate_solid(),
             tangle=target.target_theta,
             **kwargs)
-        return get_espe.run(output_file=output_file, verbose=verbose)
 
     @staticmethod
     def read_espe_file(espe_file: Path) -> Espe:
@@ -170,6 +455,61 @@ class GetEspe:
 
         return espe
 
+    def run_in_process(self, output_file: Optional[Path] = None) -> Espe:
+        """Calculates the energy spectrum in this process instead of running
+        the get_espe binary. Parsed ERD data is cached so that consecutive
+        calls with different recoil distributions or fluences only read the
+        ERD files again if they have been modified.
+
+        The absolute yield is calibrated by running get_espe once for each
+        set of ERD files and parameters, so the binary must be available.
+        The binary adds random noise to each time-of-flight, whereas this
+        method spreads each event over the channels by the probability of
+        the noise. The total yield therefore agrees with get_espe within
+        0.1 % and the centroid of the spectrum within one channel, but
+        individual channels only agree within the statistical noise of the
+        binary (a few percent of the channel counts when the channels hold
+        more than ~1000 events).
+
+        Args:
+            output_file: if given, spectrum will be written to this file
+
+        Return:
+            spectrum as a list of (energy, yield) tuples
+        """
+        fingerprint = ErdData.get_fingerprint(self.erd_file)
+        erd_data = _read_erd_data(fingerprint)
+
+        espe = []
+        if erd_data.depth.size:
+            scale = self.fluence * _get_calibration(
+                fingerprint, self._get_command_args())
+            espe = _calculate_spectrum(
+                erd_data, np.loadtxt(self.recoil_file, ndmin=2),
+                self.channel_width, self.toflen, self.timeres, scale)
+
+        if output_file is not None:
+            with Path(output_file).open("w") as f:
+                f.writelines(f"{x} {y}\n" for x, y in espe)
+        return espe
+
+    def _get_command_args(self) -> Tuple:
+        """Returns the arguments that affect the calibration of the
+        in-process calculation as a hashable tuple. Recoil distribution,
+        channel width and fluence are left out.
+        """
+        return (
+            ("beam_ion", self.beam_ion),
+            ("energy", self.energy),
+            ("theta", self.theta),
+            ("tangle", self.tangle),
+            ("toflen", self.toflen),
+            ("solid", self.solid),
+            ("erd_file", str(self.erd_file)),
+            ("reference_density", self.density),
+            ("timeres", self.timeres),
+        )
+
     def read_erd_files(self) -> Iterable[str]:
         """Yields lines from ERD files.
         Yield:
@@ -233,4 +573,200 @@ class GetEspe:
             "-density", str(self.density),
             "-ch", str(self.channel_width),
             "-dist", str(self.recoil_file),
-        )
\ No newline at end of file
+        )
+
+
+class SpectrumAccumulator:
+    """Keeps a running energy spectrum of ERD files that are still being
+    written. Each update only parses the events that have been appended to
+    the files since the previous update and adds them to the channel counts,
+    so the cost of an update depends on the number of new events instead of
+    the total number of events.
+
+    Spectra are calculated in the same way as in GetEspe.run_in_process,
+    except that energies are calculated from the average mass of the events
+    read by the first update instead of all events. The absolute yield is
+    calibrated once, when the first events are read.
+    """
+
+    def __init__(self, get_espe: GetEspe):
+        """Initializes a new SpectrumAccumulator. The recoil file of the
+        GetEspe object is read here, so later changes to it are ignored.
+
+        Args:
+            get_espe: GetEspe object that provides the ERD files, the
+                recoil distribution and the other parameters
+        """
+        self._get_espe = get_espe
+        self._recoil_dist = np.loadtxt(get_espe.recoil_file, ndmin=2)
+        self._reset()
+
+    def _reset(self) -> None:
+        """Forgets all events that have been read.
+        """
+        self._file_states: Dict[str, gf.LineCountState] = {}
+        self._scale = None
+        self._k = None
+        self._first = 0
+        self._counts = np.zeros(0)
+
+    def update(self) -> Espe:
+        """Reads the new events from the ERD files.
+
+        Return:
+            spectrum of all events read so far as a list of (energy, yield)
+            tuples
+        """
+        files = sorted(glob.glob(str(self._get_espe.erd_file)))
+        if not self._file_states.keys() <= set(files):
+            # Events of removed files cannot be subtracted from the counts
+            self._reset()
+
+        new_data = []
+        for file in files:
+            try:
+                lines, state, restarted = gf.read_new_lines_in_file(
+                    file, self._file_states.get(file))
+            except OSError:
+                continue
+            if restarted:
+                # Neither can the events of rewritten files
+                self._reset()
+                return self.update()
+            self._file_states[file] = state
+
+            lines = [line for line in lines if line.startswith("R")]
+            if lines:
+                new_data.append(
+                    np.loadtxt(lines, usecols=(5, 6, 7, 8), ndmin=2))
+
+        if new_data:
+            erd_data = ErdData(*np.concatenate(new_data).T)
+            if self._k is None:
+                self._k = _get_energy_factor(
+                    erd_data.mass.mean(), self._get_espe.toflen)
+                self._scale = self._get_espe.fluence * _get_calibration(
+                    ErdData.get_fingerprint(self._get_espe.erd_file),
+                    self._get_espe._get_command_args())
+            tof, weights = _get_weighted_events(erd_data, self._recoil_dist)
+            if tof.size:
+                self._add_counts(*_bin_events(
+                    tof, weights * self._scale, self._k,
+                    self._get_espe.channel_width, self._get_espe.timeres))
+
+        return _counts_to_espe(
+            self._first, self._counts, self._get_espe.channel_width)
+
+    def _add_counts(self, first: int, counts: np.ndarray) -> None:
+        """Adds counts that start from the given channel to the running
+        counts.
+        """
+        first = int(first)
+        if not self._counts.size:
+            self._first, self._counts = first, counts
+            return
+        start = min(self._first, first)
+        end = max(self._first + self._counts.size, first + counts.size)
+        if start != self._first or end - start != self._counts.size:
+            combined = np.zeros(end - start)
+            offset = self._first - start
+            combined[offset:offset + self._counts.size] = self._counts
+            self._first, self._counts = start, combined
+        offset = first - self._first
+        self._counts[offset:offset + counts.size] += counts
+
+
+class EspeCache:
+    """Thread-safe cache for energy spectra with a least recently used
+    eviction policy.
+
+    Spectra are stored by a key that identifies the recoil distribution,
+    the ERD files and all other parameters of a GetEspe object, so that
+    identical recoil distributions are only evaluated once.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """Initializes a new EspeCache.
+
+        Args:
+            maxsize: maximum number of cached spectra
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__espes = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def get_key(get_espe: GetEspe, in_process: bool = False) -> str:
+        """Returns a key that identifies the spectrum calculated by the
+        given GetEspe object. The recoil file must exist.
+
+        Args:
+            get_espe: GetEspe object
+            in_process: whether the spectrum is calculated in process
+                instead of running get_espe
+        """
+        params = (
+            get_espe.beam_ion, get_espe.energy, get_espe.theta,
+            get_espe.tangle, get_espe.toflen, get_espe.solid,
+            get_espe.density, get_espe.timeres, get_espe.channel_width,
+            get_espe.fluence, in_process,
+            ErdData.get_fingerprint(get_espe.erd_file)
+        )
+        key = hashlib.sha1(repr(params).encode())
+        key.update(Path(get_espe.recoil_file).read_bytes())
+        return key.hexdigest()
+
+    def get(self, key: str) -> Optional[Espe]:
+        """Returns the spectrum stored by the key or None if it is not
+        cached.
+        """
+        with self.__lock:
+            try:
+                self.__espes.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(self.__espes[key])
+
+    def put(self, key: str, espe: Espe):
+        """Stores a spectrum. Empty spectra (failed calculations) are not
+        stored.
+        """
+        if not espe:
+            return
+        with self.__lock:
+            self.__espes[key] = list(espe)
+            self.__espes.move_to_end(key)
+            while len(self.__espes) > self.maxsize:
+                self.__espes.popitem(last=False)
+
+    def count_hit(self):
+        """Counts a hit for a spectrum that was obtained without calling
+        get, for example a duplicate within a batch of evaluations.
+        """
+        with self.__lock:
+            self.hits += 1
+
+    def clear(self):
+        """Removes all spectra and resets statistics.
+        """
+        with self.__lock:
+            self.__espes.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self.__espes)
+
+    def get_statistics(self) -> Dict[str, int]:
+        """Returns the number of hits, misses and cached spectra.
+        """
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.__espes)
+            }
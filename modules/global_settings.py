@@ -86,6 +86,9 @@ class GlobalSettings:
     # Hard-coded initial default value for reference density
     DEFAULT_REF_DENSITY = 4.982e22
 
+    # Default number of recoil atom distribution changes that can be undone
+    _DEFAULT_UNDO_DEPTH = 100
+
     def __init__(self, config_dir=None, save_on_creation=True):
         """Inits GlobalSettings class.
         """
@@ -261,6 +264,44 @@ class GlobalSettings:
         """
         self._config[self._DEFAULT]["preview_coincidence_count"] = str(count)
 
+    @handle_exceptions(return_value=False)
+    def get_import_in_process_coinc(self) -> bool:
+        """Get whether coincidences are calculated in-process instead of with
+        the external coinc program when measurements are imported.
+
+        Return:
+            Returns a boolean.
+        """
+        return self._config.getboolean(self._DEFAULT, "in_process_coinc")
+
+    def set_import_in_process_coinc(self, value: bool):
+        """Set whether coincidences are calculated in-process when
+        measurements are imported.
+
+        Args:
+            value: A boolean.
+        """
+        self._config[self._DEFAULT]["in_process_coinc"] = str(value)
+
+    @handle_exceptions(return_value=False)
+    def get_lazy_loading(self) -> bool:
+        """Get whether measurements and simulations of a request are only
+        read from files when they are needed.
+
+        Return:
+            Returns a boolean.
+        """
+        return self._config.getboolean(self._DEFAULT, "lazy_loading")
+
+    def set_lazy_loading(self, value: bool):
+        """Set whether measurements and simulations of a request are only
+        read from files when they are needed.
+
+        Args:
+            value: A boolean.
+        """
+        self._config[self._DEFAULT]["lazy_loading"] = str(value)
+
     @handle_exceptions(return_value=CrossSection.ANDERSEN)
     def get_cross_sections(self) -> CrossSection:
         """Get cross section model to be used in depth profile.
@@ -551,6 +592,19 @@ class GlobalSettings:
         """
         self._config[self._SIMULATION]["default_density"] = str(value)
 
+    @handle_exceptions(return_value=_DEFAULT_UNDO_DEPTH)
+    def get_undo_history_depth(self) -> int:
+        """Returns the maximum number of changes to recoil atom distribution
+        points that can be undone.
+        """
+        return max(self._config.getint(self._SIMULATION, "undo_depth"), 1)
+
+    def set_undo_history_depth(self, value: int):
+        """Sets the maximum number of changes to recoil atom distribution
+        points that can be undone. Must be a positive value.
+        """
+        self._config[self._SIMULATION]["undo_depth"] = str(max(value, 1))
+
     @staticmethod
     def get_default_colors():
         """Returns a dictionary containing default color values for all
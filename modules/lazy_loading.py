@@ -0,0 +1,202 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Lazy loading module lists the measurements and simulations of a request
+without reading their files, so that they can be loaded only when they are
+needed. Settings of items that are likely to be opened next can be read in
+the background.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import concurrent.futures
+import threading
+
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+
+from .concurrency import EvaluationExecutor
+
+MEASUREMENT = "measurement"
+SIMULATION = "simulation"
+
+
+class RequestItem(NamedTuple):
+    """A measurement or simulation of a request that has not been loaded.
+    """
+    item_type: str
+    file: Path
+    sample: "Sample"
+    tab_id: int
+
+    @property
+    def name(self) -> str:
+        """Name of the item. Both .info and .simulation files are named
+        after the measurement or simulation.
+        """
+        return self.file.stem
+
+
+def get_request_items(samples: Iterable["Sample"],
+                      first_tab_id: int = 0) -> List[RequestItem]:
+    """Lists the measurements and simulations of samples in the order they
+    are shown in the tree view. Only directory listings are read.
+
+    Args:
+        samples: samples of the request
+        first_tab_id: tab id of the first item. Following items get
+            consecutive ids.
+
+    Return:
+        list of RequestItems
+    """
+    items = []
+    for item_type, get_files in (
+            (MEASUREMENT, lambda s: s.get_measurements_files()),
+            (SIMULATION, lambda s: s.get_simulation_files())):
+        for sample in samples:
+            for file in get_files(sample):
+                items.append(RequestItem(
+                    item_type, Path(file), sample, first_tab_id + len(items)))
+    return items
+
+
+def read_item_settings(item: RequestItem, log_errors: bool = True) -> Any:
+    """Reads the settings of a measurement or simulation without adding it
+    to the request.
+
+    Args:
+        item: RequestItem
+        log_errors: whether errors are logged to the request's log
+
+    Return:
+        MeasurementSettings or SimulationSettings
+    """
+    request = item.sample.request
+    if item.item_type == MEASUREMENT:
+        return request.samples.measurements.read_settings(
+            item.file.parent, log_errors=log_errors)
+    return request.samples.simulations.read_settings(item.file.parent)
+
+
+def get_neighbours(items: Sequence[Any], item: Any, count: int) -> List[Any]:
+    """Returns items that are close to the given item, closest first. Items
+    after the given item come before items that are equally far before it.
+
+    Args:
+        items: sequence of items
+        item: item whose neighbours are returned
+        count: maximum number of returned items
+
+    Return:
+        list of items
+    """
+    try:
+        index = items.index(item)
+    except ValueError:
+        return []
+    neighbours = []
+    for distance in range(1, len(items)):
+        for i in index + distance, index - distance:
+            if 0 <= i < len(items) and len(neighbours) < count:
+                neighbours.append(items[i])
+    return neighbours
+
+
+class Prefetcher:
+    """Loads items in background threads before they are needed.
+
+    Results are only handed over to the caller, so the loading function
+    must not modify shared state. If loading fails or has not started when
+    the result is asked for, the caller is expected to load the item itself.
+    """
+
+    def __init__(self, load: Callable[[Any], Any], max_workers: int = 2):
+        """Initializes a new Prefetcher.
+
+        Args:
+            load: function that loads an item
+            max_workers: maximum number of items loaded at the same time
+        """
+        self._load = load
+        self._executor = EvaluationExecutor(max_workers=max_workers)
+        self._futures: Dict[Any, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def prefetch(self, items: Iterable[Any]) -> None:
+        """Starts loading items that are not already being loaded.
+        """
+        with self._lock:
+            for item in items:
+                if item not in self._futures:
+                    self._futures[item] = self._executor.submit(
+                        self._load, item)
+
+    def is_prefetched(self, item: Any) -> bool:
+        """Returns whether the item has been submitted for loading.
+        """
+        with self._lock:
+            return item in self._futures
+
+    def get(self, item: Any) -> Optional[Any]:
+        """Returns the loaded item and forgets it. If the item is being
+        loaded, waits until it is done.
+
+        Return:
+            the result of the loading function or None if the item was not
+            prefetched, loading had not started yet or loading failed
+        """
+        with self._lock:
+            future = self._futures.pop(item, None)
+        if future is None or future.cancel():
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def discard(self, item: Any) -> None:
+        """Forgets a prefetched item.
+        """
+        with self._lock:
+            future = self._futures.pop(item, None)
+        if future is not None:
+            future.cancel()
+
+    def shutdown(self) -> None:
+        """Cancels items that are waiting to be loaded and releases the
+        worker threads.
+        """
+        with self._lock:
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+        self._executor.shutdown()
@@ -28,14 +28,11 @@ __version__ = "2.0"
 import copy
 import subprocess
 from collections import namedtuple
-from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List, Optional, Callable, Union
 
 import numpy as np
 from scipy import signal
 
-from . import general_functions as gf
-from . import math_functions as mf
 from . import optimization as opt
 from .base import Espe
 from .element_simulation import ElementSimulation
@@ -66,7 +63,8 @@ class LinearOptimization(opt.BaseOptimizer):
                  check_min=0, skip_simulation=False, use_efficiency=False,
                  optimize_by_area=False, verbose=False,
                  sample_count=12, sample_width=3.0, sample_polynomial_degree=2,
-                 fitting_iteration_count=2, is_skewed=False):
+                 fitting_iteration_count=2, is_skewed=False,
+                 in_process_espe=False, max_workers=None, use_processes=False):
         """Initialize the linear optimizer.
 
         Only LinearOptimization-specific arguments are documented here. See
@@ -101,7 +99,10 @@ class LinearOptimization(opt.BaseOptimizer):
             skip_simulation=skip_simulation,
             use_efficiency=use_efficiency,
             verbose=verbose,
-            optimize_by_area=optimize_by_area  # TODO: remove
+            optimize_by_area=optimize_by_area,  # TODO: remove
+            in_process_espe=in_process_espe,
+            max_workers=max_workers,
+            use_processes=use_processes
         )
         self.element_simulation = element_simulation
 
@@ -489,21 +490,13 @@ class LinearOptimization(opt.BaseOptimizer):
 
         self.optimize_by_area defines which result to get.
         """
-        # Make spectra the same size
-        optim_espe, measured_espe = gf.uniform_espe_lists(
-            optim_espe, self.measured_espe,
-            channel_width=self.element_simulation.channel_width)
+        area, sum_diff = self._get_measured_spectrum().get_differences(
+            optim_espe)
 
-        # Find the area between simulated and measured energy spectra
+        # Area between simulated and measured energy spectra or the mean
+        # squared error of their y values
         if self.optimize_by_area:
-            return mf.calculate_area(optim_espe, measured_espe)
-
-        # Find the mean squared error between simulated and measured
-        # energy spectra y values
-        diff = [(opt_p[1] - mesu_p[1])**2
-                for opt_p, mesu_p in zip(optim_espe, measured_espe)]
-        sum_diff = sum(diff) / len(diff)
-
+            return area
         return sum_diff
 
     def form_recoil(self, current_solution: "BaseSolution", name="") -> RecoilElement:
@@ -621,21 +614,7 @@ class LinearOptimization(opt.BaseOptimizer):
             recoil_elements = [self.form_recoil(sol, f"thread-{i}")
                                for i, sol in enumerate(solutions)]
 
-            # TODO: Splitting the solutions over fewer threads (more than one
-            #  solution per thread) may be slightly faster than this
-            with ThreadPoolExecutor(max_workers=len(solutions)) as executor:
-                futures = [
-                    executor.submit(
-                        self.element_simulation.calculate_espe,
-                        rec,
-                        verbose=self.verbose,
-                        optimization_type=self.optimization_type,
-                        ch=self.channel_width,
-                        write_to_file=False,
-                        remove_recoil_file=True)
-                    for rec in recoil_elements]
-
-                espes = [future.result()[0] for future in futures]
+            espes = self.calculate_espes(recoil_elements)
         elif self.optimization_type is OptimizationType.FLUENCE:
             raise NotImplementedError
         else:
@@ -657,7 +636,9 @@ class LinearOptimization(opt.BaseOptimizer):
                 optimization_type=self.optimization_type,
                 ch=self.channel_width,
                 write_to_file=False,
-                remove_recoil_file=True)
+                remove_recoil_file=True,
+                in_process=self.in_process_espe,
+                cache=self._espe_cache)
         elif self.optimization_type is OptimizationType.FLUENCE:
             raise NotImplementedError
         else:
@@ -0,0 +1,171 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+List mode module converts binary list mode files (Pelletron .lst) into
+the ascii format used by measurements. Files are processed in fixed size
+blocks so that memory use does not depend on the size of the file.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import concurrent.futures
+
+from pathlib import Path
+from typing import Callable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+from .concurrency import EvaluationExecutor
+
+# Each event is stored as two little-endian 16-bit integers
+BINARY_EVENT = np.dtype([("first", "<i2"), ("second", "<i2")])
+
+# The second value is stored with an offset that is removed on conversion
+SECOND_VALUE_OFFSET = 8192
+
+_BLOCK_SIZE = 1 << 20
+
+# Called with the number of bytes processed so far and the total number of
+# bytes to process
+ProgressCallback = Callable[[int, int], None]
+
+
+def iter_binary_events(input_file: Path, block_size: int = _BLOCK_SIZE) -> \
+        Iterator[np.ndarray]:
+    """Reads events from a binary list mode file in blocks. Incomplete
+    bytes at the end of the file are ignored.
+
+    Args:
+        input_file: path to the binary file
+        block_size: maximum number of events in a block
+
+    Yield:
+        structured arrays of BINARY_EVENT
+    """
+    block_bytes = block_size * BINARY_EVENT.itemsize
+    with Path(input_file).open("rb") as file:
+        while True:
+            data = file.read(block_bytes)
+            count = len(data) // BINARY_EVENT.itemsize
+            if count:
+                yield np.frombuffer(data, dtype=BINARY_EVENT, count=count)
+            if len(data) < block_bytes:
+                return
+
+
+def _format_events(events: np.ndarray) -> bytes:
+    """Formats a block of events as lines of two space separated integers.
+    """
+    first = events["first"].tolist()
+    second = (events["second"].astype(np.int32) -
+              SECOND_VALUE_OFFSET).tolist()
+    return "".join(map("%d %d\n".__mod__, zip(first, second))).encode()
+
+
+def convert_binary_file(input_file: Path, output_file: Path,
+                        block_size: int = _BLOCK_SIZE,
+                        progress: Optional[Callable[[int], None]] = None) \
+        -> int:
+    """Converts a binary list mode file into an ascii file.
+
+    Args:
+        input_file: path to the binary file
+        output_file: path to the ascii file
+        block_size: number of events converted at a time
+        progress: optional function that is called with the number of
+            bytes converted after each block
+
+    Return:
+        number of converted events
+    """
+    event_count = 0
+    with Path(output_file).open("wb") as file:
+        for events in iter_binary_events(input_file, block_size=block_size):
+            file.write(_format_events(events))
+            event_count += len(events)
+            if progress is not None:
+                progress(event_count * BINARY_EVENT.itemsize)
+    return event_count
+
+
+def convert_binary_files(conversions: Sequence[Tuple[Path, Path]],
+                         max_workers: Optional[int] = None,
+                         use_processes: bool = True,
+                         progress: Optional[ProgressCallback] = None) -> \
+        List[int]:
+    """Converts several binary list mode files concurrently.
+
+    Args:
+        conversions: pairs of input and output files
+        max_workers: maximum number of files converted at the same time.
+            Defaults to the number of CPUs.
+        use_processes: whether files are converted in worker processes
+            instead of threads
+        progress: optional function that is called with the number of bytes
+            converted so far and the total number of bytes. When a single
+            file is converted, progress is reported after each block.
+            Otherwise it is reported as files are finished.
+
+    Return:
+        number of converted events in each file
+    """
+    sizes = [Path(input_file).stat().st_size for input_file, _ in conversions]
+    total = sum(sizes)
+
+    if len(conversions) == 1 or max_workers == 1:
+        done = 0
+
+        def report_file(converted: int):
+            progress(done + converted, total)
+
+        counts = []
+        for (input_file, output_file), size in zip(conversions, sizes):
+            counts.append(convert_binary_file(
+                input_file, output_file,
+                progress=report_file if progress is not None else None))
+            done += size
+        return counts
+
+    executor = EvaluationExecutor(
+        max_workers=max_workers, use_processes=use_processes)
+    done = 0
+    try:
+        futures = {
+            executor.submit(convert_binary_file, input_file, output_file): i
+            for i, (input_file, output_file) in enumerate(conversions)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            # Raise possible exceptions before the progress is updated
+            future.result()
+            done += sizes[futures[future]]
+            if progress is not None:
+                progress(done, total)
+        return [future.result() for future in
+                sorted(futures, key=futures.get)]
+    finally:
+        executor.shutdown()
@@ -30,7 +30,13 @@ __version__ = "2.0"
 import math
 
 from decimal import Decimal
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Sequence
 from typing import Tuple
+
+import numpy as np
 from shapely.geometry import Polygon
 
 
@@ -331,7 +337,7 @@ def _calculate_bin_count(lst, comp, min_count, max_count, data_sorted):
         raise ValueError("Minimum bin count was bigger than maximum")
     if comp <= 0:
         raise ValueError("Compression must be non-negative.")
-    if not lst:
+    if not len(lst):
         return int(min_count), None
 
     if data_sorted:
@@ -352,6 +358,8 @@ def _calculate_bin_count(lst, comp, min_count, max_count, data_sorted):
 def get_min_and_max(lst):
     """Returns both minimum and maximum values from a list.
     """
+    if isinstance(lst, np.ndarray):
+        return lst.min(), lst.max()
     return min(lst), max(lst)
 
 
@@ -383,6 +391,117 @@ def point_inside_polygon(point, poly):
     return inside
 
 
+def points_inside_polygon(xs: np.ndarray, ys: np.ndarray, poly) \
+        -> np.ndarray:
+    """Vectorized version of point_inside_polygon. Finds out which of the
+    points (xs[i], ys[i]) are inside a polygon "poly".
+
+    The same ray casting rule is applied to every edge of the polygon, so
+    the result is identical to calling point_inside_polygon for each point.
+
+    Args:
+        xs: x coordinates of the points
+        ys: y coordinates of the points
+        poly: polygon as a list of (x, y) pairs
+
+    Return:
+        boolean array where True means that the point is inside the polygon
+    """
+    xs = np.asarray(xs)
+    ys = np.asarray(ys)
+    n = len(poly)
+    inside = np.zeros(len(xs), dtype=bool)
+
+    p1x, p1y = poly[0]
+    for i in range(n + 1):
+        p2x, p2y = poly[i % n]
+        if p1y != p2y:
+            crosses = (ys > min(p1y, p2y)) & (ys <= max(p1y, p2y)) & \
+                      (xs <= max(p1x, p2x))
+            if p1x != p2x:
+                dy = ys[crosses].astype(np.float64) - p1y
+                xinters = dy * (p2x - p1x) / (p2y - p1y) + p1x
+                crosses[crosses] = xs[crosses] <= xinters
+            inside ^= crosses
+        p1x, p1y = p2x, p2y
+    return inside
+
+
+def points_inside_polygons(
+        xs: np.ndarray, ys: np.ndarray, polygons: Sequence,
+        bounds: Optional[List[Optional[Tuple[float, float, float, float]]]]
+        = None, chunk_size: int = 2 ** 20,
+        progress_callback: Optional[Callable[[float], None]] = None) \
+        -> np.ndarray:
+    """Classifies points against several polygons at once.
+
+    Points are processed in chunks to keep the size of temporary arrays
+    bounded. Within each chunk, points are first filtered with the combined
+    bounding box of all polygons and then with the bounding box of each
+    polygon before the ray casting test of points_inside_polygon is applied
+    to the remaining candidates.
+
+    Args:
+        xs: x coordinates of the points
+        ys: y coordinates of the points
+        polygons: collection of polygons, each a list of (x, y) pairs
+        bounds: (x_min, x_max, y_min, y_max) limits for each polygon. Points
+            outside the limits are never inside the polygon. If the limits of
+            a polygon are None, no point is inside it. By default, bounding
+            boxes of the polygons are used.
+        chunk_size: number of points processed at a time
+        progress_callback: function that is called with the percentage of
+            processed points after each chunk
+
+    Return:
+        boolean array of shape (len(polygons), len(xs)) where True means that
+        the point is inside the polygon
+    """
+    xs = np.asarray(xs)
+    ys = np.asarray(ys)
+    if bounds is None:
+        bounds = [_get_bounding_box(poly) for poly in polygons]
+    inside = np.zeros((len(polygons), len(xs)), dtype=bool)
+
+    used_bounds = [b for b in bounds if b is not None]
+    if not used_bounds or not len(xs):
+        if progress_callback is not None:
+            progress_callback(100)
+        return inside
+    x_min = min(b[0] for b in used_bounds)
+    x_max = max(b[1] for b in used_bounds)
+    y_min = min(b[2] for b in used_bounds)
+    y_max = max(b[3] for b in used_bounds)
+
+    for start in range(0, len(xs), chunk_size):
+        x, y = xs[start:start + chunk_size], ys[start:start + chunk_size]
+        candidates = np.flatnonzero(
+            (x >= x_min) & (x <= x_max) & (y >= y_min) & (y <= y_max))
+        cx, cy = x[candidates], y[candidates]
+        for i, (poly, bound) in enumerate(zip(polygons, bounds)):
+            if bound is None:
+                continue
+            in_box = np.flatnonzero(
+                (cx >= bound[0]) & (cx <= bound[1]) &
+                (cy >= bound[2]) & (cy <= bound[3]))
+            inside[i, start + candidates[in_box]] = points_inside_polygon(
+                cx[in_box], cy[in_box], poly)
+        if progress_callback is not None:
+            progress_callback(min(start + chunk_size, len(xs)) / len(xs) * 100)
+
+    return inside
+
+
+def _get_bounding_box(poly) -> Optional[Tuple[float, float, float, float]]:
+    """Returns the (x_min, x_max, y_min, y_max) bounding box of a polygon or
+    None if the polygon has no points.
+    """
+    if not len(poly):
+        return None
+    xs, ys = zip(*poly)
+    return min(xs), max(xs), min(ys), max(ys)
+
+
 def distance(p0, p1):
     """Distance between points
 
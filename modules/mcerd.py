@@ -31,12 +31,11 @@ __version__ = "2.0"
 import platform
 import subprocess
 import re
-import multiprocessing
 import rx
 
 from . import general_functions as gf
-from . import subprocess_utils as sutils
 from . import observing
+from . import process_manager as pm
 
 from typing import Optional
 from typing import Dict
@@ -45,11 +44,12 @@ from typing import Mapping
 from typing import Any
 from pathlib import Path
 from rx import operators as ops
-from rx.scheduler import ThreadPoolScheduler
 
 from .layer import Layer
 from .concurrency import CancellationToken
 from .base import StrTuple
+from .process_manager import ProcessManager
+from .process_manager import get_process_manager
 
 
 class MCERD:
@@ -136,8 +136,10 @@ class MCERD:
 
     def run(self, print_output=True, ct: Optional[CancellationToken] = None,
             poll_interval=10, first_check=0.2, max_time=None,
-            ct_check=0.2) -> rx.Observable:
-        """Starts the MCERD process.
+            manager: Optional[ProcessManager] = None) -> rx.Observable:
+        """Queues the MCERD process into the application-wide process
+        manager. The process is started when it fits under the manager's
+        limit of concurrent processes.
 
         Args:
             print_output: whether MCERD output is also printed to console
@@ -145,50 +147,57 @@ class MCERD:
                 the simulation should be stopped.
             poll_interval: seconds between each check to see if the simulation
                 process is still running.
-            first_check: seconds until the first time mcerd is polled.
+            first_check: seconds from the start of the process until the
+                first time mcerd is polled.
             max_time: maximum running time in seconds.
-            ct_check: how often cancellation is checked in seconds.
+            manager: ProcessManager that runs the process. Defaults to the
+                application-wide manager.
 
         Return:
             observable stream where each item is a dictionary. All dictionaries
             contain the same keys.
         """
-        # Create files necessary to run MCERD
-        self.create_mcerd_files()
-        cmd = self.get_command()
-        ct = ct or CancellationToken()
-
-        process = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            cwd=gf.get_bin_dir(), universal_newlines=True)
-
-        errs = rx.from_iterable(iter(process.stderr.readline, ""))
-        outs = rx.from_iterable(iter(process.stdout.readline, ""))
-
-        is_running = MCERD.running_check(process, first_check, poll_interval)
-        ct_check = MCERD.cancellation_check(process, ct_check, ct)
-
-        if max_time is not None:
-            timeout = MCERD.timeout_check(process, max_time, ct)
-        else:
-            timeout = rx.empty()
-
-        thread_count = multiprocessing.cpu_count()
-        pool_scheduler = ThreadPoolScheduler(thread_count)
-
-        merged = rx.merge(errs, outs).pipe(
-            ops.subscribe_on(pool_scheduler),
-            MCERD.get_pipeline(
-                self._seed, self._rec_filename, print_output=print_output),
-            ops.combine_latest(rx.merge(
-                is_running, ct_check, timeout
-            )),
-            ops.starmap(lambda x, y: {
-                **x, **y,
-                MCERD.IS_RUNNING: x[MCERD.IS_RUNNING] and y[MCERD.IS_RUNNING]
-            }),
-            ops.take_while(lambda x: x[MCERD.IS_RUNNING], inclusive=True),
-        )
+        manager = manager or get_process_manager()
+
+        # Files are created right before the process starts. Processes
+        # of the same recoil share the files, so they are started one at a
+        # time once the previous one has read its input files.
+        events = manager.observe(
+            self.get_command(), cwd=gf.get_bin_dir(),
+            prepare=self.create_mcerd_files, ct=ct, first_check=first_check,
+            poll_interval=poll_interval, max_time=max_time,
+            startup_key=self.command_file,
+            startup_done=lambda line: line.strip() == MCERD._INIT_ENDS)
+
+        def merge_output(shared: rx.Observable) -> rx.Observable:
+            outs = shared.pipe(
+                ops.filter(lambda e: e.kind == pm.LINE),
+                ops.map(lambda e: e.value),
+                MCERD.get_pipeline(
+                    self._seed, self._rec_filename,
+                    print_output=print_output))
+            status = shared.pipe(
+                ops.filter(lambda e: e.kind != pm.LINE),
+                ops.map(MCERD._get_status))
+            # Processes cancelled in the queue produce no output
+            not_started = shared.pipe(
+                ops.filter(lambda e: e.kind == pm.STOPPED and e.value is None),
+                ops.map(lambda _: self._get_stopped_output()))
+
+            return rx.merge(
+                outs.pipe(
+                    ops.combine_latest(status),
+                    ops.starmap(lambda x, y: {
+                        **x, **y,
+                        MCERD.IS_RUNNING:
+                            x[MCERD.IS_RUNNING] and y[MCERD.IS_RUNNING]
+                    })),
+                not_started
+            ).pipe(
+                ops.take_while(lambda x: x[MCERD.IS_RUNNING], inclusive=True)
+            )
+
+        merged = events.pipe(ops.publish(merge_output))
 
         # on_completed does not get called if the take_while condition is
         # inclusive so this is a quick fix to get the files deleted.
@@ -205,17 +214,39 @@ class MCERD:
         )
 
     @staticmethod
-    def _stop_if_cancelled(
-            process: subprocess.Popen,
-            ct: CancellationToken) -> bool:
-        """Stops the process if cancellation has been requested. Returns
-        True if cancellation has not been requested and simulation is still
-        running, False otherwise.
+    def _get_status(event: pm.ProcessEvent) -> Dict[str, Any]:
+        """Converts a status event from the process manager into a
+        dictionary. Raises SubprocessError if the process has returned an
+        error code.
         """
-        if ct.is_cancellation_requested():
-            sutils.kill_process(process)
-            return False
-        return True
+        if event.kind == pm.STATUS:
+            return {
+                MCERD.IS_RUNNING: MCERD.is_running(event.value)
+            }
+        if event.kind == pm.TIMEOUT:
+            return {
+                MCERD.IS_RUNNING: False,
+                MCERD.MSG: MCERD.SIM_TIMEOUT
+            }
+        return {
+            MCERD.IS_RUNNING: False,
+            MCERD.MSG: MCERD.SIM_STOPPED
+        }
+
+    def _get_stopped_output(self) -> Dict[str, Any]:
+        """Returns the output of a process that was stopped before it was
+        started.
+        """
+        return {
+            MCERD.PRESIM: True,
+            MCERD.CALCULATED: 0,
+            MCERD.TOTAL: 0,
+            MCERD.PERCENTAGE: 0,
+            MCERD.SEED: self._seed,
+            MCERD.NAME: self._rec_filename,
+            MCERD.MSG: MCERD.SIM_STOPPED,
+            MCERD.IS_RUNNING: False
+        }
 
     @staticmethod
     def is_running(process: subprocess.Popen) -> bool:
@@ -290,94 +321,6 @@ class MCERD:
             pass
         return ops.do_action(passer)
 
-    @staticmethod
-    def running_check(
-            process: subprocess.Popen,
-            first_check: float,
-            interval: float) -> rx.Observable:
-        """Periodically checks if the given process is running.
-
-        Args:
-            process: process to be monitored
-            first_check: seconds until the first check
-            interval: interval between each check
-
-        Return:
-            rx.Observable that fires dictionaries after each check
-        """
-        return rx.timer(first_check, interval).pipe(
-            # TODO change this to run at an increasing interval, i.e:
-            #       - first check after 0.0 seconds,
-            #       - second check after 0.2 seconds,
-            #       - third after 1.0, ... etc.
-            #   MCERD is likely to crash early (?) so it makes sense to
-            #   run the check more frequently at the beginning.
-            ops.map(lambda _: {
-                MCERD.IS_RUNNING: MCERD.is_running(process)
-            }),
-            ops.take_while(lambda x: x[MCERD.IS_RUNNING], inclusive=True)
-        )
-
-    @staticmethod
-    def cancellation_check(
-            process: subprocess.Popen,
-            interval: float,
-            ct: CancellationToken) -> rx.Observable:
-        """Kills the given process if cancellation is requested from the
-        CancellationToken.
-
-        Args:
-            process: process that will killed if cancellation is requested
-            interval: cancellation check interval in seconds
-            ct: CancellationToken that is being checked
-
-        Return:
-            rx.Observable that fires a single dictionary after cancellation is
-            requested
-        """
-        return rx.timer(0, interval).pipe(
-            ops.map(
-                lambda _: MCERD._stop_if_cancelled(process, ct)),
-            ops.first(lambda x: not x),
-            ops.map(lambda _: {
-                MCERD.IS_RUNNING: False,
-                MCERD.MSG: MCERD.SIM_STOPPED
-            }),
-        )
-
-    @staticmethod
-    def timeout_check(
-            process: subprocess.Popen,
-            timeout: float,
-            ct: CancellationToken) -> rx.Observable:
-        """Kills the given process after timeout has passed.
-
-        Args:
-            process: process to be killed
-            timeout: termination time in seconds
-            ct: CancellationToken
-
-        Return:
-            rx.Observable that fires only a single dictionary after the timeout
-            has passed.
-        """
-        return rx.timer(timeout).pipe(
-            ops.do_action(
-                # Request cancellation so all simulation processes that
-                # share the same cancellation_token are also stopped.
-                # TODO not working as intended if simulation is short enough
-                #   to stop before max_time has elapsed. Maybe let caller
-                #   implement its own timeout check when multiple processes
-                #   are being run.
-                on_next=lambda _: ct.request_cancellation()),
-            ops.map(lambda _: {
-                # sutils.kill_process returns None, which can be casted to bool
-                MCERD.IS_RUNNING: bool(sutils.kill_process(process)),
-                MCERD.MSG: MCERD.SIM_TIMEOUT
-            }),
-            ops.first()
-        )
-
     def create_mcerd_files(self):
         """Creates the temporary files needed for running MCERD.
         """
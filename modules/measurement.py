@@ -42,19 +42,34 @@ from pathlib import Path
 from collections import namedtuple
 from typing import Optional
 from typing import List
+from typing import NamedTuple
 from typing import Tuple
 
 from . import general_functions as gf
 from . import file_paths as fpaths
 from .cut_file import CutFile
 from .detector import Detector
+from .event_data import EventData
 from .profile import Profile
 from .run import Run
+from .request_index import RequestIndex
+from .result_cache import ResultCache
 from .target import Target
 from .ui_log_handlers import MeasurementLogger
 from .base import Serializable
 
 
+class MeasurementSettings(NamedTuple):
+    """Settings of a measurement that are read from the files in its
+    directory.
+    """
+    measurement_file: Optional[Path]
+    target: Optional[Target]
+    detector: Optional[Detector]
+    run: Optional[Run]
+    profile: Optional[Profile]
+
+
 class Measurements:
     """ Measurements class handles multiple measurements.
     """
@@ -93,8 +108,53 @@ class Measurements:
             return None
         return self.measurements[key]
 
+    def read_settings(self, directory: Path,
+                      log_errors: bool = True) -> MeasurementSettings:
+        """Reads the settings files in a measurement directory. Settings
+        that have no file are None.
+
+        Reading does not modify the request, so settings can be read in
+        another thread before the measurement is added.
+
+        Args:
+            directory: directory of the measurement
+            log_errors: whether errors are logged to the request's log
+
+        Return:
+            MeasurementSettings
+        """
+        profile_file, mesu_file, tgt_file, det_file = \
+            Measurement.find_measurement_files(
+                directory, index=self.request.index)
+
+        if tgt_file is not None:
+            target = Target.from_file(tgt_file, self.request)
+        else:
+            target = None
+
+        if det_file is not None:
+            detector = Detector.from_file(
+                det_file, self.request, save_on_creation=False)
+            detector.update_directories(det_file.parent)
+        else:
+            detector = None
+
+        if mesu_file is not None:
+            run = Run.from_file(mesu_file)
+        else:
+            run = None
+
+        if profile_file is not None:
+            profile = Profile.from_file(
+                profile_file, logger=self.request if log_errors else None)
+        else:
+            profile = None
+
+        return MeasurementSettings(mesu_file, target, detector, run, profile)
+
     def add_measurement_file(self, sample: "Sample", file_path: Path, tab_id,
-                             name, import_evnt_or_binary, selector_cls=None):
+                             name, import_evnt_or_binary, selector_cls=None,
+                             settings: Optional[MeasurementSettings] = None):
         """Add a new file to measurements. If selector_cls is given,
         selector will be initialized as an object of that class.
 
@@ -107,6 +167,8 @@ class Measurements:
             import_evnt_or_binary: Whether evnt or lst data is being imported
                 or not.
             selector_cls: class of the selector.
+            settings: settings of the measurement if they have already been
+                read with read_settings.
 
         Return:
             Returns new measurement or None if it wasn't added
@@ -122,6 +184,7 @@ class Measurements:
                      directory_prefix + "%02d" % next_serial + "-" + name)
             sample.increase_running_int_measurement_by_1()
             measurement_directory.mkdir(exist_ok=True)
+            self.request.index.invalidate(measurement_directory.parent)
             mesu_file = measurement_directory / f"{name}.info"
             measurement = Measurement(
                 self.request, mesu_file, tab_id, name, sample=sample)
@@ -137,36 +200,16 @@ class Measurements:
             file_name = file_path.name
             file_directory = file_path.parent
 
-            profile_file, mesu_file, tgt_file, det_file = \
-                Measurement.find_measurement_files(file_directory)
-
-            if tgt_file is not None:
-                target = Target.from_file(tgt_file, self.request)
-            else:
-                target = None
-
-            if det_file is not None:
-                detector = Detector.from_file(
-                    det_file, self.request, save_on_creation=False)
-                detector.update_directories(det_file.parent)
-            else:
-                detector = None
-
-            if mesu_file is not None:
-                run = Run.from_file(mesu_file)
-            else:
-                run = None
-
-            if profile_file is not None:
-                profile = Profile.from_file(profile_file, logger=self.request)
-            else:
-                profile = None
+            if settings is None:
+                settings = self.read_settings(file_directory)
 
             # Create Measurement from file
             if file_path.exists() and file_path.suffix == ".info":
                 measurement = Measurement.from_file(
-                    file_path, mesu_file, self.request, sample=sample,
-                    target=target, detector=detector, run=run, profile=profile)
+                    file_path, settings.measurement_file, self.request,
+                    sample=sample, target=settings.target,
+                    detector=settings.detector, run=settings.run,
+                    profile=settings.profile)
 
                 measurement_folder_name = file_directory.name
                 serial_number = int(measurement_folder_name[
@@ -197,6 +240,8 @@ class Measurements:
                     mesu_file = measurement_directory / f"{name}.info"
                     sample.increase_running_int_measurement_by_1()
                     measurement_directory.mkdir(exist_ok=True)
+                    self.request.index.invalidate(
+                        measurement_directory.parent)
                     measurement = Measurement(
                         self.request, mesu_file, tab_id, name, sample=sample)
 
@@ -304,7 +349,7 @@ class Measurement(MeasurementLogger, Serializable):
         self.measurement_setting_modification_time = \
             measurement_setting_modification_time
 
-        self.data = []
+        self.data = EventData.empty()
 
         self.serial_number = 0
         self.directory = self.path.parent
@@ -394,12 +439,18 @@ class Measurement(MeasurementLogger, Serializable):
         self.set_up_log_files(self.directory)
 
     @staticmethod
-    def find_measurement_files(directory: Path):
-        res = gf.find_files_by_extension(
-            directory, ".profile", ".measurement", ".target")
+    def find_measurement_files(directory: Path,
+                               index: Optional[RequestIndex] = None):
+        """Returns a tuple of the settings files of a measurement. If an
+        index is given, directories are listed with it.
+        """
+        if index is not None:
+            find_files = index.find_files_by_extension
+        else:
+            find_files = gf.find_files_by_extension
+        res = find_files(directory, ".profile", ".measurement", ".target")
         try:
-            det_res = gf.find_files_by_extension(
-                directory / "Detector", ".detector")
+            det_res = find_files(directory / "Detector", ".detector")
         except OSError:
             det_res = {".detector": []}
 
@@ -501,6 +552,22 @@ class Measurement(MeasurementLogger, Serializable):
         """
         return self.directory / "Energy_spectra"
 
+    def get_tof_list_dir(self) -> Path:
+        """Returns the path to the directory of binary tof_list results.
+        """
+        return self.directory / "Tof_list"
+
+    def get_result_cache_dir(self) -> Path:
+        """Returns the path to the directory of cached results.
+        """
+        return self.directory / "Result_cache"
+
+    def get_result_cache(self) -> ResultCache:
+        """Returns a ResultCache for energy spectra, depth files and
+        elemental losses of this measurement.
+        """
+        return ResultCache(self.get_result_cache_dir())
+
     def get_depth_profile_dir(self) -> Path:
         """Returns the path to depth profile directory.
         """
@@ -665,23 +732,13 @@ class Measurement(MeasurementLogger, Serializable):
     def load_data(self):
         """Loads measurement data from filepath
         """
-        n = 0
         try:
             filename = Path(self.measurement_file)
 
             measurement_name, extension = filename.stem, filename.suffix.lower()
             if extension == ".asc":
                 file_to_open = self.get_data_dir() / f"{measurement_name}.asc"
-                with file_to_open.open("r") as fp:
-                    for line in fp:
-                        n += 1  # Event number
-                        split = line.split()
-                        split_len = len(split)
-                        if split_len == 2:  # At least two columns
-                            self.data.append([int(split[0]), int(split[1]), n])
-                        if split_len == 3:
-                            self.data.append([int(split[0]), int(split[1]),
-                                              int(split[2]), n])
+                self.data = EventData.from_file(file_to_open)
             self.selector.measurement = self
         except IOError as e:
             error_log = "Error while loading the measurement date for the " \
@@ -707,7 +764,12 @@ class Measurement(MeasurementLogger, Serializable):
         files.
         """
         # TODO should this also rename spectra files?
-        gf.rename_entity(self, new_name)
+        old_directory = self.directory
+        try:
+            gf.rename_entity(self, new_name)
+        finally:
+            self.request.index.remove(old_directory)
+            self.request.index.invalidate(old_directory.parent)
         try:
             self.rename_info_file()
         except OSError as e:
@@ -879,24 +941,19 @@ class Measurement(MeasurementLogger, Serializable):
 
         self.__remove_old_cut_files()
 
-        # Initializes the list size to match the number of selections.
-        points_in_selection = [[] for _ in range(self.selector.count())]
-
-        # Go through all points in measurement data
-        data_count = len(self.data)
-        for n in range(data_count):  # while n < data_count: 
-            if n % 5000 == 0:
-                # Do not always update UI to make it faster.
-                if progress is not None:
-                    progress.report(n / data_count * 80)
-            point = self.data[n]
-            # Check if point is within selectors' limits for faster processing.
-            if not self.selector.axes_limits.is_inside(point):
-                continue
-
-            for i, selection in enumerate(self.selector.selections):
-                if selection.point_inside(point):
-                    points_in_selection[i].append(point)
+        # Check which points are within selectors' limits for faster
+        # processing.
+        data = self.data[self.selector.axes_limits.are_inside(
+            self.data.tof, self.data.energy)]
+
+        # Classify all points against all selections at once.
+        if progress is not None:
+            sub_progress = progress.get_sub_reporter(lambda x: 0.8 * x)
+        else:
+            sub_progress = None
+        inside = self.selector.events_inside(
+            data.tof, data.energy, progress=sub_progress)
+        points_in_selection = [data[mask] for mask in inside]
 
         self.selector.update_selection_beams()
         self.selector.auto_save()
@@ -22,22 +22,26 @@ __author__ = "Heta Rekilä \n Juhani Sundell \n Tuomas Pitkänen"
 __version__ = "2.0"
 
 import collections
+import concurrent.futures
 import os
 import subprocess
 from pathlib import Path
 from timeit import default_timer as timer
-from typing import Tuple, List, Union
+from typing import Tuple, List, Optional, Union
 
 import numpy as np
 
+from . import file_paths as fp
 from . import general_functions as gf
-from . import math_functions as mf
 from . import optimization as opt
+from . import optimization_checkpoint as ckpt
 from .concurrency import CancellationToken
 from .element_simulation import ElementSimulation
 from .enums import IonDivision
 from .enums import OptimizationState
 from .enums import OptimizationType
+from .get_espe import ErdData
+from .get_espe import ErdFingerprint
 from .point import Point
 from .recoil_element import RecoilElement
 
@@ -49,6 +53,9 @@ SolutionNp = np.ndarray  # Single solution
 PopulationNp = np.ndarray  # List of solutions
 ObjectiveValues = Tuple[float, float]
 
+_NO_SIMULATED_DATA = "Ensure that there is simulated data for this recoil " \
+                     "element before starting optimization."
+
 
 class Nsgaii(opt.BaseOptimizer):
     """
@@ -67,7 +74,9 @@ class Nsgaii(opt.BaseOptimizer):
                  stop_percent=0.3, check_time=20, ch=0.025,
                  measurement=None, cut_file=None, dis_c=20,
                  dis_m=20, check_max=900, check_min=0, skip_simulation=False,
-                 use_efficiency=False, optimize_by_area=False, verbose=False):
+                 use_efficiency=False, optimize_by_area=False, verbose=False,
+                 in_process_espe=False, max_workers=None, use_processes=False,
+                 steady_state=False):
 
         """
         Initialize the NSGA-II optimizer.
@@ -84,6 +93,10 @@ class Nsgaii(opt.BaseOptimizer):
             dis_c: Distribution index for crossover. When this is big,
                 a new solution is close to its parents.
             dis_m: Distribution for mutation.
+            steady_state: whether offspring are evaluated asynchronously
+                one at a time instead of a generation at a time. A new
+                offspring is created as soon as an evaluation finishes, so
+                that max_workers evaluations are running all the time.
         """
         # TODO separate the two optimization types into two classes
         # Observable.__init__(self)
@@ -105,12 +118,16 @@ class Nsgaii(opt.BaseOptimizer):
             skip_simulation=skip_simulation,
             use_efficiency=use_efficiency,
             verbose=verbose,
-            optimize_by_area=optimize_by_area
+            optimize_by_area=optimize_by_area,
+            in_process_espe=in_process_espe,
+            max_workers=max_workers,
+            use_processes=use_processes
         )
 
         self.evaluations = gen * pop_size
         self.pop_size = pop_size
         self.sol_size = sol_size  # TODO: Move to BaseOptimizer?
+        self.steady_state = steady_state
 
         # Crossover and mutation parameters
         self.cross_p = cross_p
@@ -122,10 +139,19 @@ class Nsgaii(opt.BaseOptimizer):
         self.bit_length_y = 0
 
         self.population = None
+        self._evaluations_left = self.evaluations
+        self._erd_fingerprint = ()
+
+        # Fluence optimization scales a single spectrum instead of running
+        # get_espe for each solution
+        self._base_espe = None
+        self._base_fluence = None
+        self.saved_espe_runs = 0
 
     def _prepare_optimization(
             self, initial_pop=None, cancellation_token=None,
-            ion_division: IonDivision = IonDivision.BOTH) -> None:
+            ion_division: IonDivision = IonDivision.BOTH,
+            resume: bool = False) -> None:
         """Performs internal preparation before optimization begins.
         """
         self.element_simulation.optimization_recoils = []
@@ -135,16 +161,25 @@ class Nsgaii(opt.BaseOptimizer):
                 "Optimization could not be prepared, no measurement defined.")
 
         self.element_simulation.optimized_fluence = None
+        self._base_espe = None
+        self._base_fluence = None
+        self.saved_espe_runs = 0
+        self._evaluations_left = self.evaluations
 
         self.prepare_measured_spectra()
 
-        self.combine_previous_erd_files()
+        if not resume:
+            self.combine_previous_erd_files()
 
         # Modify measurement file to match the simulation file in regards to
         # the x coordinates -> they have matching values for ease of distance
         # counting
         self.modify_measurement()
 
+        if resume:
+            self._restore_checkpoint()
+            return
+
         if initial_pop is None:
             initial_pop = self.initialize_population()
 
@@ -161,8 +196,88 @@ class Nsgaii(opt.BaseOptimizer):
 
         if not self._skip_simulation:
             self.run_initial_simulation(cancellation_token, ion_division)
+        self._erd_fingerprint = self._get_erd_fingerprint()
 
         self.population = self.evaluate_solutions(initial_pop)
+        self._save_checkpoint(self.evaluations)
+
+    def get_checkpoint_file(self) -> Path:
+        """Returns the path of the file where the state of the optimization
+        is saved after each generation.
+        """
+        return ckpt.get_checkpoint_file(
+            self.element_simulation.directory,
+            self.element_simulation.name_prefix, self.optimization_type)
+
+    def has_checkpoint(self) -> bool:
+        """Returns whether there is a checkpoint that the optimization can
+        be resumed from.
+        """
+        return self.get_checkpoint_file().is_file()
+
+    def _get_erd_fingerprint(self) -> ErdFingerprint:
+        """Returns the fingerprint of the ERD files that solutions are
+        evaluated against.
+        """
+        erd_file = Path(
+            self.element_simulation.directory,
+            fp.get_erd_file_name(
+                self.element_simulation.get_main_recoil(), "*",
+                optim_mode=self.optimization_type))
+        return ErdData.get_fingerprint(erd_file)
+
+    def _save_checkpoint(self, evaluations_left: int) -> None:
+        """Saves the current population, random number generator state and
+        number of evaluations left.
+        """
+        checkpoint = ckpt.Checkpoint(
+            solutions=np.array(self.population[0], dtype=float),
+            objective_values=np.array(self.population[1], dtype=float),
+            evaluations_left=evaluations_left,
+            rng_state=np.random.get_state(),
+            erd_fingerprint=self._erd_fingerprint,
+            const_var_i=self._const_var_i)
+        try:
+            ckpt.save_checkpoint(self.get_checkpoint_file(), checkpoint)
+        except OSError:
+            # Optimization can go on without checkpoints
+            pass
+
+    def _restore_checkpoint(self) -> None:
+        """Continues from the state saved in the checkpoint file instead of
+        running the initial simulation and evaluating a new population.
+        """
+        checkpoint = ckpt.load_checkpoint(self.get_checkpoint_file())
+        if checkpoint.solutions.shape != (self.pop_size, self.sol_size):
+            raise ValueError(
+                "checkpoint does not match the population and solution "
+                "sizes")
+        if checkpoint.erd_fingerprint != self._get_erd_fingerprint():
+            raise ValueError(
+                "simulation results have changed since the checkpoint was "
+                "saved")
+
+        self._erd_fingerprint = checkpoint.erd_fingerprint
+        self._const_var_i = checkpoint.const_var_i
+        self._evaluations_left = checkpoint.evaluations_left
+        np.random.set_state(checkpoint.rng_state)
+
+        if self.optimization_type is OptimizationType.RECOIL:
+            self.find_bit_variable_lengths()
+            self.element_simulation.optimization_recoils = [
+                self.form_recoil(checkpoint.solutions[0])
+            ]
+        self.population = [
+            checkpoint.solutions, checkpoint.objective_values
+        ]
+
+    def _remove_checkpoint(self) -> None:
+        """Removes the checkpoint file.
+        """
+        try:
+            self.get_checkpoint_file().unlink()
+        except OSError:
+            pass
 
     @staticmethod
     def crowding_distance(
@@ -180,40 +295,36 @@ class Nsgaii(opt.BaseOptimizer):
         """
         pop_obj = np.array(objective_values)
         n, m = np.shape(pop_obj)
+        front_no = np.asarray(front_no)
         crowd_dis = np.zeros(n)
         # Get all front numbers.
         front_unique = np.unique(front_no)
         fronts = front_unique[front_unique != np.inf]
-        for f in range(len(fronts)):
+        for f in fronts:
             # All the indices corresponding to solutions belonging to front f
-            front = np.array(
-                [k for k in range(len(front_no)) if front_no[k] == fronts[f]])
+            front = np.flatnonzero(front_no == f)
             # Find min and max values for objective functions
             f_max = pop_obj[front, :].max(0)
             f_min = pop_obj[front, :].min(0)
             for i in range(m):
+                values = pop_obj[front, i]
                 # Sort the front's solutions according to its ith objective.
                 # rank[i] tells the index in front -> front[rank[i]] tells the
                 # index in pop_obj
-                rank = np.argsort(pop_obj[front, i])
+                rank = np.argsort(values)
                 # Current front's first and last get infinitive crowding
                 # distance values
                 crowd_dis[front[rank[0]]] = np.inf
                 crowd_dis[front[rank[-1]]] = np.inf
-                for j in range(1, len(front) - 1):
-                    ind_pop = front[rank[j]]
-                    ind_front_next = front[rank[j + 1]]
-                    ind_front_prev = front[rank[j - 1]]
-                    # Normalize the objective function values
-                    dist = pop_obj[(ind_front_next, i)] - \
-                           pop_obj[(ind_front_prev, i)]
-                    if dist == 0:
-                        current_distance = 0
-                    else:
-                        # TODO raises RuntimeWarning here if simulation time
-                        #  outs before presim ends
-                        current_distance = dist / (f_max[i] - f_min[i])
-                    crowd_dis[ind_pop] = crowd_dis[ind_pop] + current_distance
+                # Distance between the next and previous solutions of each
+                # solution in the middle, normalized by the objective's range
+                dist = values[rank[2:]] - values[rank[:-2]]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    # TODO raises RuntimeWarning here if simulation time
+                    #  outs before presim ends
+                    current_distance = np.where(
+                        dist == 0, 0, dist / (f_max[i] - f_min[i]))
+                crowd_dis[front[rank[1:-1]]] += current_distance
         return crowd_dis
 
     def evaluate_solutions(self, sols: List[Solution]) \
@@ -233,47 +344,49 @@ class Nsgaii(opt.BaseOptimizer):
                 self.form_recoil(solution) for solution in sols
             ]
 
-            for recoil in self.element_simulation.optimization_recoils:
-                # Run get_espe
-                espe, _ = self.element_simulation.calculate_espe(
-                    recoil, verbose=self.verbose,
-                    optimization_type=self.optimization_type,
-                    ch=self.channel_width, write_to_file=False)
-                objective_values.append(self.get_objective_values(espe))
+            espes = self.calculate_espes(
+                self.element_simulation.optimization_recoils)
+            objective_values = [
+                self.get_objective_values(espe) for espe in espes
+            ]
 
         else:  # Evaluate fluence
-            recoil = self.element_simulation.get_main_recoil()
             for solution in sols:
                 # Round solution appropriately
                 sol_fluence = gf.round_value_by_four_biggest(solution[0])
-                # Run get_espe
-                espe, _ = self.element_simulation.calculate_espe(
-                    recoil, optimization_type=self.optimization_type,
-                    ch=self.channel_width, fluence=sol_fluence,
-                    write_to_file=False)
+                espe = self._get_fluence_espe(sol_fluence)
                 objective_values.append(self.get_objective_values(espe))
 
         pop = collections.namedtuple("Population",
                                      ("solutions", "objective_values"))
         return pop(sols, objective_values)
 
-    def _get_spectra_differences(self, optim_espe: Espe) -> Tuple[float, float]:
-        # Make spectra the same size
-        optim_espe, measured_espe = gf.uniform_espe_lists(
-            optim_espe, self.measured_espe,
-            channel_width=self.element_simulation.channel_width)
-
-        # Find the area between simulated and measured energy
-        # spectra
-        area = mf.calculate_area(optim_espe, measured_espe)
+    def _get_fluence_espe(self, fluence: float) -> Espe:
+        """Returns the energy spectrum for given fluence.
 
-        # Find the mean squared error between simulated and measured
-        # energy spectra y values
-        diff = [(opt_p[1] - mesu_p[1])**2
-                for opt_p, mesu_p in zip(optim_espe, measured_espe)]
-        sum_diff = sum(diff) / len(diff)
+        Simulated spectra scale linearly with fluence, so get_espe is only
+        run for the first fluence of the optimization. Spectra for other
+        fluences are formed by scaling it.
+        """
+        if not self._base_espe:
+            recoil = self.element_simulation.get_main_recoil()
+            self._base_espe, _ = self.element_simulation.calculate_espe(
+                recoil, optimization_type=self.optimization_type,
+                ch=self.channel_width, fluence=fluence,
+                write_to_file=False, in_process=self.in_process_espe)
+            self._base_fluence = fluence
+            return self._base_espe
+
+        self.saved_espe_runs += 1
+        if fluence == self._base_fluence:
+            return self._base_espe
+        multiplier = fluence / self._base_fluence
+        return [(x, y * multiplier) for x, y in self._base_espe]
 
-        return area, sum_diff
+    def _get_spectra_differences(self, optim_espe: Espe) -> Tuple[float, float]:
+        # Area between simulated and measured energy spectra and the mean
+        # squared error of their y values
+        return self._get_measured_spectrum().get_differences(optim_espe)
 
     def get_objective_values(self, optim_espe: Espe) -> Tuple[float, float]:
         """Calculates the objective values and returns them as a np.array.
@@ -698,62 +811,7 @@ class Nsgaii(opt.BaseOptimizer):
             List with front numbers, corresponding to pop_obj indices, number of
             last front found.
         """
-        if r_n == np.inf:
-            r_n = n
-        # Coded according to algorithm given by Deb(2002)
-        # Go through all solutions
-        front_no = np.inf * np.ones(n)
-        fronts = 0
-        front_1 = []  # Holds pop_obj and index in one element
-        added_solutions = 0
-        s_i = [i for i in range(n)]  # s_p holds pop_obj and its index in one
-        # element
-        n_i = np.zeros(n)
-        # front_no, pop_obj and s_i plus n_i -> all have corresponding indices
-        for i in range(len(pop_obj)):
-            p = pop_obj[i]
-            s_p = []
-            n_p = 0
-            for h in range(len(pop_obj)):
-                q = pop_obj[h]
-                if np.array_equal(p, q):
-                    continue
-                if opt.dominates(p, q):
-                    s_p.append((q, h))
-                elif opt.dominates(q, p):
-                    n_p += 1
-            if n_p == 0:
-                front_no[i] = 1
-                front_1.append((p, i))
-                added_solutions += 1
-            s_i[i] = s_p
-            n_i[i] = n_p
-        fronts += 1
-
-        current_front = front_1
-        f_n = 1
-        while current_front:
-            if added_solutions >= r_n:
-                break
-            new_front = []
-            for j in range(len(current_front)):
-                p = current_front[j]
-                p_i = p[1]
-                s_p = s_i[p_i]
-                for k in range(len(s_p)):
-                    q = s_p[k][0]
-                    index = s_p[k][1]
-                    n_q = n_i[index]
-                    n_q -= 1
-                    n_i[index] = n_q
-                    if n_q == 0:
-                        front_no[index] = f_n + 1
-                        new_front.append((q, index))
-                        added_solutions += 1
-            f_n += 1
-            current_front = new_front
-            fronts += 1
-        return front_no, fronts
+        return peel_fronts(opt.domination_matrix(pop_obj), r_n)
 
     @staticmethod
     def new_population_selection(population: List[PopulationNp], pop_size: int)\
@@ -772,28 +830,9 @@ class Nsgaii(opt.BaseOptimizer):
         pop_n, t = np.shape(population[0])
         # Sort intermediate population based on non-domination
         front_no, last_front_no = Nsgaii.nd_sort(population[1], pop_n, pop_size)
-        include_in_next = [False for _ in range(front_no.size)]
-        # Find all individuals that belong to better fronts, except the last one
-        # that doesn't fit
-        for i in range(front_no.size):
-            if front_no[i] < last_front_no:
-                include_in_next[i] = True
         # Calculate crowding distance for all individuals
         crowd_dis = Nsgaii.crowding_distance(front_no, population[1])
-
-        # Find last front that maybe doesn't fit properly
-        last = [i for i in range(len(front_no)) if front_no[i] == last_front_no]
-        # Rank holds the indices corresponding to last that have crowding
-        # distance from biggest to smallest
-        rank = np.argsort(-crowd_dis[last])
-        delta_n = rank[: (pop_size - int(np.sum(include_in_next)))]
-        # Get indices corresponding to population for individuals to be included
-        #  in the next generation.
-        rest = [last[i] for i in delta_n]
-        for i in rest:
-            include_in_next[i] = True
-        index = np.array(
-            [i for i in range(len(include_in_next)) if include_in_next[i]])
+        index = select_survivors(front_no, last_front_no, crowd_dis, pop_size)
         next_pop = [population[0][index, :], population[1][index, :]]
 
         return next_pop, front_no[index], crowd_dis[index]
@@ -801,25 +840,34 @@ class Nsgaii(opt.BaseOptimizer):
     def start_optimization(
             self, starting_solutions: List[Solution] = None,
             cancellation_token: CancellationToken = None,
-            ion_division: IonDivision = IonDivision.BOTH) -> None:
+            ion_division: IonDivision = IonDivision.BOTH,
+            resume: bool = False) -> None:
         """
         Start the optimization. This includes sorting based on
         non-domination and crowding distance, creating offspring population
         by crossover and mutation, and selecting individuals to the new
         population.
 
+        The state of the optimization is saved into a checkpoint file after
+        each generation. The checkpoint is removed when all evaluations
+        have been done.
+
         Args:
             starting_solutions: First solutions used in optimization. If
                 None, initialize new solutions.
             cancellation_token: CancellationToken that is used to stop the
                 optimization before all evaluations have been evaluated.
             ion_division: ion division mode used when simulating
+            resume: whether to continue from the checkpoint of a previous
+                optimization instead of running the initial simulation.
+                starting_solutions are ignored when resuming.
         """
         self.on_next(self._get_message(
             OptimizationState.PREPARING, evaluations_left=self.evaluations))
         try:
             self._prepare_optimization(
-                starting_solutions, cancellation_token, ion_division)
+                starting_solutions, cancellation_token, ion_division,
+                resume=resume)
         except (OSError, ValueError, subprocess.SubprocessError) as e:
             self.on_error(self._get_message(
                 OptimizationState.FINISHED,
@@ -830,8 +878,73 @@ class Nsgaii(opt.BaseOptimizer):
         start_time = timer()
 
         self.on_next(self._get_message(
-            OptimizationState.RUNNING, evaluations_left=self.evaluations))
+            OptimizationState.RUNNING,
+            evaluations_left=self._evaluations_left))
+
+        if self.steady_state:
+            evaluations = self._run_steady_state(
+                cancellation_token, start_time)
+        else:
+            evaluations = self._run_generations(
+                cancellation_token, start_time)
+        if evaluations is None:
+            return
+        if evaluations > 0:
+            self._save_checkpoint(evaluations)
+        else:
+            self._remove_checkpoint()
+
+        # Finally, sort by non-domination
+        front_no, last_front_no = self.nd_sort(self.population[1],
+                                               self.pop_size)
+        # Find first front
+        try:
+            pareto_optimal_sols = self.population[0][front_no == 1, :]
+            pareto_optimal_objs = self.population[1][front_no == 1, :]
+        except TypeError:
+            self.on_error(self._get_message(
+                OptimizationState.FINISHED,
+                error="Could not form the Pareto front. Optimization may have "
+                      "been stopped before any solutions were evaluated."))
+            self.clean_up(cancellation_token)
+            return
+
+        if self.optimization_type is OptimizationType.RECOIL:
+            first_sol, med_sol, last_sol = pick_final_solutions(
+                pareto_optimal_objs, pareto_optimal_sols, count=3)
+
+            # Save the three pareto solutions as recoils
+            self.element_simulation.optimization_recoils = []
+            first_recoil = self.form_recoil(first_sol, "optfirst")
+            self.element_simulation.optimization_recoils.append(first_recoil)
+            med_recoil = self.form_recoil(med_sol, "optmed")
+            self.element_simulation.optimization_recoils.append(med_recoil)
+            last_recoil = self.form_recoil(last_sol, "optlast")
+            self.element_simulation.optimization_recoils.append(last_recoil)
+        else:
+            # Calculate average of found fluences
+            f_sum = 0
+            for sol in pareto_optimal_sols:
+                f_sum += sol[0]
+            avg = f_sum / len(pareto_optimal_sols)
+            self.element_simulation.optimized_fluence = avg
+
+        self.clean_up(cancellation_token)
+        self.element_simulation.optimization_results_to_file(self.cut_file)
+
+        self.on_completed(self._get_message(
+            OptimizationState.FINISHED,
+            evaluations_done=self.evaluations - evaluations,
+            saved_espe_runs=self.saved_espe_runs))
+
+    def _run_generations(self, cancellation_token: CancellationToken,
+                         start_time: float) -> Optional[int]:
+        """Runs the generational NSGA-II where a whole offspring population
+        is evaluated before the next population is selected.
 
+        Return:
+            number of evaluations left or None if the optimization failed
+        """
         # Sort the initial population according to non-domination
         front_no, last_front_no = self.nd_sort(self.population[1],
                                                self.pop_size)
@@ -840,7 +953,7 @@ class Nsgaii(opt.BaseOptimizer):
         # is joined with the offspring population.
         crowd_dis = self.crowding_distance(front_no, self.population[1])
         # In a loop until number of evaluations is reached:
-        evaluations = self.evaluations
+        evaluations = self._evaluations_left
         while evaluations > 0:
             if cancellation_token is not None:
                 if cancellation_token.is_cancellation_requested():
@@ -854,12 +967,8 @@ class Nsgaii(opt.BaseOptimizer):
             try:
                 pool_ind = opt.tournament_allow_doubles(2, pool_size, fit)
             except IndexError:
-                self.on_error(self._get_message(
-                    OptimizationState.FINISHED,
-                    error="Ensure that there is simulated data for this recoil "
-                          "element before starting optimization."))
-                self.clean_up(cancellation_token)
-                return
+                self._fail(cancellation_token, _NO_SIMULATED_DATA)
+                return None
             pop_sol, pop_obj = np.array(self.population[0]), \
                                np.array(self.population[1])
             pool = [pop_sol[pool_ind, :], pop_obj[pool_ind, :]]
@@ -869,11 +978,9 @@ class Nsgaii(opt.BaseOptimizer):
                 #  cause an IndexError here. Find out why and handle it properly
                 offspring = self.variation(pool[0])
             except IndexError as e:
-                self.on_error(self._get_message(
-                    OptimizationState.FINISHED,
-                    error=f"Failed to process offspring: {e}."))
-                self.clean_up(cancellation_token)
-                return
+                self._fail(
+                    cancellation_token, f"Failed to process offspring: {e}.")
+                return None
             # Evaluate offspring solutions to get offspring population
             offspring_pop = self.evaluate_solutions(offspring)
             # Join parent population and offspring population
@@ -890,6 +997,7 @@ class Nsgaii(opt.BaseOptimizer):
 
             # Update the amount of evaluation left
             evaluations -= self.pop_size
+            self._save_checkpoint(evaluations)
 
             elapsed_time = timer() - start_time
             self.on_next(self._get_message(
@@ -906,49 +1014,115 @@ class Nsgaii(opt.BaseOptimizer):
                         elapsed_time - start_time, percent, self.evaluations -
                         evaluations))
 
-        # Finally, sort by non-domination
-        front_no, last_front_no = self.nd_sort(self.population[1],
-                                               self.pop_size)
-        # Find first front
-        try:
-            pareto_optimal_sols = self.population[0][front_no == 1, :]
-            pareto_optimal_objs = self.population[1][front_no == 1, :]
-        except TypeError:
-            self.on_error(self._get_message(
-                OptimizationState.FINISHED,
-                error="Could not form the Pareto front. Optimization may have "
-                      "been stopped before any solutions were evaluated."))
-            self.clean_up(cancellation_token)
-            return
+        return evaluations
 
-        if self.optimization_type is OptimizationType.RECOIL:
-            first_sol, med_sol, last_sol = pick_final_solutions(
-                pareto_optimal_objs, pareto_optimal_sols, count=3)
+    def _run_steady_state(self, cancellation_token: CancellationToken,
+                          start_time: float) -> Optional[int]:
+        """Runs the asynchronous steady-state NSGA-II. A fixed number of
+        offspring are evaluated at the same time. Each finished offspring is
+        inserted into the population and a new offspring is created right
+        away.
 
-            # Save the three pareto solutions as recoils
-            self.element_simulation.optimization_recoils = []
-            first_recoil = self.form_recoil(first_sol, "optfirst")
-            self.element_simulation.optimization_recoils.append(first_recoil)
-            med_recoil = self.form_recoil(med_sol, "optmed")
-            self.element_simulation.optimization_recoils.append(med_recoil)
-            last_recoil = self.form_recoil(last_sol, "optlast")
-            self.element_simulation.optimization_recoils.append(last_recoil)
-        else:
-            # Calculate average of found fluences
-            f_sum = 0
-            for sol in pareto_optimal_sols:
-                f_sum += sol[0]
-            avg = f_sum / len(pareto_optimal_sols)
-            self.element_simulation.optimized_fluence = avg
+        Progress is reported each time a population's worth of
+        evaluations has finished.
 
-        self.clean_up(cancellation_token)
-        self.element_simulation.optimization_results_to_file(self.cut_file)
+        Return:
+            number of evaluations left or None if the optimization failed
+        """
+        archive = Archive(self.population[0], self.population[1],
+                          self.pop_size)
+        max_in_flight = self._executor.max_workers
+        # Each evaluation in flight writes its recoil into its own file
+        free_slots = list(range(max_in_flight))
+        in_flight = {}
+        evaluations = self._evaluations_left
+        unsubmitted = self._evaluations_left
+        try:
+            while True:
+                cancelled = cancellation_token is not None and \
+                    cancellation_token.is_cancellation_requested()
+                while not cancelled and unsubmitted > 0 and \
+                        len(in_flight) < max_in_flight:
+                    fit = np.vstack((archive.front_no, archive.crowd_dis)).T
+                    try:
+                        pool_ind = opt.tournament_allow_doubles(
+                            2, round(self.pop_size / 2), fit)
+                    except IndexError:
+                        self._fail(cancellation_token, _NO_SIMULATED_DATA)
+                        return None
+                    try:
+                        offspring = self.variation(
+                            archive.solutions[pool_ind, :], count=1)[0]
+                    except IndexError as e:
+                        self._fail(
+                            cancellation_token,
+                            f"Failed to process offspring: {e}.")
+                        return None
+                    slot = free_slots.pop()
+                    future = self._submit_evaluation(offspring, slot)
+                    in_flight[future] = offspring, slot
+                    unsubmitted -= 1
+
+                if cancelled or not in_flight:
+                    break
+                done, _ = concurrent.futures.wait(
+                    in_flight, timeout=0.2,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    offspring, slot = in_flight.pop(future)
+                    free_slots.append(slot)
+                    archive.insert(
+                        offspring, self.get_objective_values(future.result()))
+                    evaluations -= 1
+                    if evaluations % self.pop_size == 0:
+                        self.population = [
+                            archive.solutions, archive.objective_values]
+                        self._save_checkpoint(evaluations)
+                        self.on_next(self._get_message(
+                            OptimizationState.RUNNING,
+                            evaluations_left=evaluations,
+                            pareto_front=archive.get_pareto_front(),
+                            elapsed=timer() - start_time))
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+        self.population = [archive.solutions, archive.objective_values]
+        return evaluations
+
+    def _submit_evaluation(self, solution: SolutionNp, slot: int) -> \
+            concurrent.futures.Future:
+        """Starts calculating the energy spectrum of a single solution.
 
-        self.on_completed(self._get_message(
-            OptimizationState.FINISHED,
-            evaluations_done=self.evaluations - evaluations))
+        Args:
+            solution: solution to evaluate
+            slot: index of the recoil file used for the evaluation
+
+        Return:
+            Future that holds the energy spectrum
+        """
+        if self.optimization_type is OptimizationType.RECOIL:
+            recoil_file = Path(
+                self._executor.get_temp_dir(), f"offspring-{slot}.recoil")
+            return self.submit_espe(self.form_recoil(solution), recoil_file)
+
+        # Fluence spectra are scaled from a spectrum that has already
+        # been calculated so there is nothing to wait for
+        future = concurrent.futures.Future()
+        future.set_result(self._get_fluence_espe(
+            gf.round_value_by_four_biggest(solution[0])))
+        return future
+
+    def _fail(self, cancellation_token: CancellationToken, error: str) \
+            -> None:
+        """Reports an error that stops the optimization and cleans up.
+        """
+        self.on_error(self._get_message(
+            OptimizationState.FINISHED, error=error))
+        self.clean_up(cancellation_token)
 
-    def variation(self, pop_sols: List[Solution]) -> PopulationNp:
+    def variation(self, pop_sols: List[Solution],
+                  count: Optional[int] = None) -> PopulationNp:
         """
         Generate offspring population using SBX and polynomial mutation for
         fluence, and simple binary crossover and binary
@@ -956,16 +1130,19 @@ class Nsgaii(opt.BaseOptimizer):
 
         Args:
             pop_sols: Solutions that are used to create offspring population.
+            count: Number of offspring. Defaults to self.pop_size.
 
         Return:
-            Offspring size self.pop_size.
+            Offspring of the given size.
         """
+        if count is None:
+            count = self.pop_size
         offspring = []
         pop_dec_n, t = np.shape(pop_sols)
         p = 0  # How many solutions have been added to offspring
 
         # Crossover
-        while p in range(self.pop_size):
+        while p in range(count):
             # Find two random unique indices for two parents.
             p_1 = np.random.randint(pop_dec_n)
             p_2 = np.random.randint(pop_dec_n)
@@ -1007,7 +1184,7 @@ class Nsgaii(opt.BaseOptimizer):
 
             offspring.append(child_1)
             p += 1
-            if p >= self.pop_size:
+            if p >= count:
                 break
             else:
                 offspring.append(child_2)
@@ -1021,7 +1198,7 @@ class Nsgaii(opt.BaseOptimizer):
                 sol_length += len(var)
 
             # Do mutation for offspring population
-            do_mutation = np.ones((self.pop_size, sol_length),
+            do_mutation = np.ones((count, sol_length),
                                   dtype=bool)
             # Avoid mutating constants
             bit_index = 0
@@ -1037,11 +1214,11 @@ class Nsgaii(opt.BaseOptimizer):
             # Indicate mutation for all variables that have a random number
             # over mut_p / sol_length
             do_mutation_prob = np.random.random_sample(
-                (self.pop_size, sol_length)) < self.mut_p / sol_length
+                (count, sol_length)) < self.mut_p / sol_length
             total_mutation_bool = np.logical_and(do_mutation, do_mutation_prob)
 
             # Change offspring array that holds each binary string in an array
-            for i in range(self.pop_size):
+            for i in range(count):
                 for j in range(self.sol_size):
                     r = offspring[i][j]
                     int_list = [int(x) for x in list(r)]
@@ -1055,7 +1232,7 @@ class Nsgaii(opt.BaseOptimizer):
 
             # Change variables back to decimal
             dec_offspring = []
-            for k in range(self.pop_size):
+            for k in range(count):
                 sol = []
                 b_i = 0
                 for h in range(self.sol_size):
@@ -1096,7 +1273,7 @@ class Nsgaii(opt.BaseOptimizer):
             # Indicate mutation for all variables that have a random number
             # over mut_p / self.sol_size
             do_mutation_prob = np.random.random_sample(
-                (self.pop_size, self.sol_size)) < self.mut_p / self.sol_size
+                (count, self.sol_size)) < self.mut_p / self.sol_size
 
             # Polynomial mutation.
             # r = np.random.uniform()
@@ -1107,15 +1284,15 @@ class Nsgaii(opt.BaseOptimizer):
             # c = parent[i] + delta*(self.upper_limits[i] -
             #                        self.lower_limits[i])
 
-            r = np.random.random_sample((self.pop_size, self.sol_size))
+            r = np.random.random_sample((count, self.sol_size))
             # Define which solution use which delta value
             use_r_smaller = do_mutation_prob & (r < 0.5)
 
-            upper = np.tile(self.upper_limits[0], (self.pop_size, 1))
-            lower = np.tile(self.lower_limits[0], (self.pop_size, 1))
+            upper = np.tile(self.upper_limits[0], (count, 1))
+            lower = np.tile(self.lower_limits[0], (count, 1))
 
             # Change offspring to numpy array
-            off = [np.array([item]) for item in offspring]
+            off = [np.atleast_1d(item) for item in offspring]
             offspring = np.array(off)
 
             # delta = np.power(2*r[use_r_smaller], (1 / (self.dis_m + 1))) - 1
@@ -1155,6 +1332,138 @@ class Nsgaii(opt.BaseOptimizer):
         return np.array(offspring)
 
 
+def peel_fronts(domination: np.ndarray, r_n: float = np.inf) \
+        -> Tuple[np.ndarray, int]:
+    """
+    Sort solutions into fronts by non-domination.
+
+    Args:
+        domination: Matrix where element [i, j] tells whether solution i
+            dominates solution j.
+        r_n: How many elements fit inside the resulting population. Sorting
+            stops when the fronts found so far have at least this many
+            solutions.
+
+    Return:
+        Front numbers of the solutions (inf for solutions that were not
+        sorted) and number of last front found.
+    """
+    n = len(domination)
+    if r_n == np.inf:
+        r_n = n
+    # Coded according to algorithm given by Deb(2002). Domination
+    # counts are kept for all solutions and each front is removed from
+    # the counts of the solutions it dominates.
+    n_i = domination.sum(axis=0)
+    front_no = np.inf * np.ones(n)
+    current_front = n_i == 0
+    front_no[current_front] = 1
+    added_solutions = np.count_nonzero(current_front)
+    fronts = 1
+    while current_front.any():
+        if added_solutions >= r_n:
+            break
+        n_i = n_i - domination[current_front].sum(axis=0)
+        new_front = (n_i == 0) & (front_no == np.inf)
+        fronts += 1
+        front_no[new_front] = fronts
+        added_solutions += np.count_nonzero(new_front)
+        current_front = new_front
+    return front_no, fronts
+
+
+def select_survivors(front_no: np.ndarray, last_front_no: int,
+                     crowd_dis: np.ndarray, pop_size: int) -> np.ndarray:
+    """
+    Select individuals to the next population based on crowded comparison
+    operator.
+
+    Args:
+        front_no: Front numbers of the individuals.
+        last_front_no: Number of the last front that is (partly) included.
+        crowd_dis: Crowding distances of the individuals.
+        pop_size: Size of the next population.
+
+    Return:
+        Indices of the selected individuals in ascending order.
+    """
+    # Find all individuals that belong to better fronts, except the last one
+    # that doesn't fit
+    include_in_next = front_no < last_front_no
+
+    # Find last front that maybe doesn't fit properly
+    last = np.flatnonzero(front_no == last_front_no)
+    # Rank holds the indices corresponding to last that have crowding
+    # distance from biggest to smallest
+    rank = np.argsort(-crowd_dis[last])
+    delta_n = rank[: (pop_size - int(np.sum(include_in_next)))]
+    # Get indices corresponding to population for individuals to be included
+    #  in the next generation.
+    include_in_next[last[delta_n]] = True
+    return np.flatnonzero(include_in_next)
+
+
+class Archive:
+    """
+    Population of the steady-state NSGA-II.
+
+    Domination between the members is stored in a matrix, so inserting a
+    solution only compares it with the current members. The population is
+    then selected the same way as in the generational NSGA-II.
+    """
+
+    def __init__(self, solutions: PopulationNp,
+                 objective_values: List[ObjectiveValues], size: int):
+        """Initializes a new Archive.
+
+        Args:
+            solutions: Initial solutions.
+            objective_values: Objective values of the initial solutions.
+            size: Size of the population.
+        """
+        self.size = size
+        self.solutions = np.array(solutions)
+        self.objective_values = np.array(objective_values, dtype=float)
+        self._domination = opt.domination_matrix(self.objective_values)
+        self.front_no, _ = peel_fronts(self._domination, size)
+        self.crowd_dis = Nsgaii.crowding_distance(
+            self.front_no, self.objective_values)
+
+    def insert(self, solution: SolutionNp,
+               objective_values: ObjectiveValues) -> bool:
+        """Adds a solution and removes the worst member so that the size of
+        the population stays the same.
+
+        Return:
+            whether the added solution was kept in the population
+        """
+        new_obj = np.array([objective_values], dtype=float)
+        objs = np.vstack((self.objective_values, new_obj))
+        n = len(objs)
+        domination = np.zeros((n, n), dtype=bool)
+        domination[:-1, :-1] = self._domination
+        domination[-1, :-1] = opt.domination_matrix(
+            new_obj, self.objective_values)[0]
+        domination[:-1, -1] = opt.domination_matrix(
+            self.objective_values, new_obj)[:, 0]
+
+        front_no, last_front_no = peel_fronts(domination, self.size)
+        crowd_dis = Nsgaii.crowding_distance(front_no, objs)
+        index = select_survivors(front_no, last_front_no, crowd_dis, self.size)
+
+        self.solutions = np.vstack((self.solutions, solution))[index]
+        self.objective_values = objs[index]
+        self._domination = domination[np.ix_(index, index)]
+        self.front_no = front_no[index]
+        self.crowd_dis = crowd_dis[index]
+        return index[-1] == n - 1
+
+    def get_pareto_front(self) -> np.ndarray:
+        """Returns the objective values of the first front.
+        """
+        return self.objective_values[self.front_no == 1, :]
+
+
 def solution_to_binary(
         solution: Solution, bit_length_x: int, bit_length_y: int) -> List[str]:
     """Returns a binary representation of a solution.
@@ -30,9 +30,13 @@ __version__ = "2.0"
 
 import os
 import abc
+import functools
 import math
+import subprocess
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any
+from typing import List
 
 import numpy as np
 import rx
@@ -40,15 +44,22 @@ from rx import operators as ops
 
 from . import file_paths as fp
 from . import general_functions as gf
+from . import spectrum_alignment as sa
+from .base import Espe
 from .concurrency import CancellationToken
+from .concurrency import EvaluationExecutor
 from .element_simulation import ElementSimulation
 from .energy_spectrum import EnergySpectrum
+from .get_espe import EspeCache
+from .get_espe import GetEspe
+from .get_espe import SpectrumAccumulator
 from .enums import IonDivision
 from .enums import OptimizationState
 from .enums import OptimizationType
 from .mcerd import MCERD
 from .observing import Observable
 from .parsing import CSVParser
+from .recoil_element import RecoilElement
 
 
 class BaseOptimizer(abc.ABC, Observable):
@@ -62,7 +73,9 @@ class BaseOptimizer(abc.ABC, Observable):
                  number_of_processes=1, stop_percent=0.3, check_time=20,
                  ch=0.025, measurement=None, cut_file=None, check_max=900,
                  check_min=0, skip_simulation=False, use_efficiency=False,
-                 verbose=False, optimize_by_area=False) -> None:
+                 verbose=False, optimize_by_area=False,
+                 in_process_espe=False, max_workers=None,
+                 use_processes=False, espe_cache_size=1024) -> None:
         """Initialize a BaseOptimizer.
 
         Args:
@@ -86,6 +99,15 @@ class BaseOptimizer(abc.ABC, Observable):
             skip_simulation: whether simulation is skipped altogether
             use_efficiency: whether to use efficiency for pre-calculated
                 spectrum.
+            in_process_espe: whether energy spectra of solutions are
+                calculated in process instead of running get_espe.
+            max_workers: maximum number of solutions that are evaluated
+                concurrently. Defaults to the number of CPUs.
+            use_processes: whether solutions are evaluated in worker
+                processes instead of threads. Only used with
+                in_process_espe.
+            espe_cache_size: maximum number of energy spectra that are
+                cached so that identical solutions are only evaluated once.
         """
         Observable.__init__(self)
 
@@ -112,6 +134,10 @@ class BaseOptimizer(abc.ABC, Observable):
         self.check_min = check_min
 
         self.channel_width = ch
+        self.in_process_espe = in_process_espe
+        self._executor = EvaluationExecutor(
+            max_workers, use_processes=use_processes and in_process_espe)
+        self._espe_cache = EspeCache(espe_cache_size)
 
         self.measurement = measurement
         self.cut_file = Path(cut_file)
@@ -121,13 +147,33 @@ class BaseOptimizer(abc.ABC, Observable):
         self.verbose = verbose
         self.optimize_by_area = optimize_by_area
 
-    @staticmethod
-    def _get_message(state: OptimizationState, **kwargs) -> dict:
-        """Returns a dictionary with the state of the optimization and
-        other information.
+    @property
+    def measured_espe(self) -> Espe:
+        """Measured energy spectrum that simulated spectra are compared to.
+        """
+        return self._measured_espe
+
+    @measured_espe.setter
+    def measured_espe(self, value: Espe) -> None:
+        self._measured_espe = value
+        self._measured_spectrum = None
+
+    def _get_measured_spectrum(self) -> sa.ReferenceSpectrum:
+        """Returns the measured spectrum placed on a grid of channels. The
+        grid is calculated once per measured spectrum.
+        """
+        if self._measured_spectrum is None:
+            self._measured_spectrum = sa.ReferenceSpectrum(
+                self.measured_espe, self.channel_width)
+        return self._measured_spectrum
+
+    def _get_message(self, state: OptimizationState, **kwargs) -> dict:
+        """Returns a dictionary with the state of the optimization, energy
+        spectrum cache statistics and other information.
         """
         return {
             "state": state,
+            "espe_cache": self._espe_cache.get_statistics(),
             **kwargs
         }
 
@@ -186,13 +232,27 @@ class BaseOptimizer(abc.ABC, Observable):
                     cancellation_token, ct)),
                 ops.filter(lambda _: False),
             )
+            # Each check only reads the ERD events written since the
+            # previous check
+            accumulator = get_optim_spectrum_accumulator(
+                self.element_simulation, self.optimization_type)
+
+            def get_check_espe(_) -> Espe:
+                try:
+                    return accumulator.update()
+                except subprocess.SubprocessError as e:
+                    # Simulation cannot be stopped by the check anymore
+                    ct.request_cancellation()
+                    raise subprocess.SubprocessError(
+                        f"Could not check whether the initial simulation "
+                        f"has converged: {e}") from e
+
             # FIXME spectra_chk should only be performed when pre-simulation
             #   has finished, otherwise there will be no new observed atoms
             #   and the difference between the two spectra is 0
             spectra_chk = rx.timer(self.check_min, self.check_time).pipe(
                 ops.merge(ct_check),
-                ops.map(lambda _: get_optim_espe(
-                    self.element_simulation, self.optimization_type)),
+                ops.map(get_check_espe),
                 ops.scan(
                     lambda prev_espe, next_espe: (prev_espe[1], next_espe),
                     seed=[None, None]),
@@ -214,9 +274,11 @@ class BaseOptimizer(abc.ABC, Observable):
             # Simulation needs to finish before optimization can start
             # so we run this synchronously.
             # TODO use callback instead of running sync
-            merged.run()
-            # TODO should not have to call this manually
-            self.element_simulation._clean_up(ct)
+            try:
+                merged.run()
+            finally:
+                # TODO should not have to call this manually
+                self.element_simulation._clean_up(ct)
 
         else:
             raise ValueError(
@@ -228,27 +290,9 @@ class BaseOptimizer(abc.ABC, Observable):
         Modify measured energy spectrum to match the simulated in regards to
         the x coordinates.
         """
-        new = []
-        i = 0
-        # Add zero points to start and end to get correct mean values
-        first_x = self.measured_espe[0][0]
-        last_x = self.measured_espe[-1][0]
-
-        # TODO could use deque for quicker inserts
-        self.measured_espe.insert(
-            0, (round(first_x - self.element_simulation.channel_width, 4), 0.0))
-        self.measured_espe.append(
-            (round(last_x + self.element_simulation.channel_width, 4), 0.0))
-
-        while i < len(self.measured_espe) - 1:  # Do nothing to the last point
-            current_point = self.measured_espe[i]
-            next_point = self.measured_espe[i + 1]
-
-            new_x = round((next_point[0] + current_point[0]) / 2, 4)
-            new_y = round((next_point[1] + current_point[1]) / 2, 5)
-            new.append((new_x, new_y))
-            i += 1
-        self.measured_espe = new
+        # Zero points are added to start and end to get correct mean values
+        self.measured_espe = sa.average_adjacent_channels(
+            self.measured_espe, self.channel_width)
 
     # TODO: Should starting_solutions be typed list or np.ndarray?
     @abc.abstractmethod
@@ -266,9 +310,93 @@ class BaseOptimizer(abc.ABC, Observable):
         """
         pass
 
+    def calculate_espes(self, recoils: List[RecoilElement]) -> List[Espe]:
+        """Calculates energy spectra for recoils concurrently. Spectra of
+        recoil distributions that have already been evaluated are taken from
+        the cache and duplicates are only evaluated once.
+
+        Return:
+            energy spectra in the same order as the recoils
+        """
+        # Recoil files are written here, each solution to its own file
+        temp_dir = self._executor.get_temp_dir()
+        get_espes = [
+            self.element_simulation.get_espe_calculator(
+                recoil, ch=self.channel_width,
+                optimization_type=self.optimization_type,
+                write_to_file=False,
+                recoil_file=Path(temp_dir, f"solution-{i}.recoil"))[0]
+            for i, recoil in enumerate(recoils)
+        ]
+        keys = [
+            EspeCache.get_key(get_espe, self.in_process_espe)
+            for get_espe in get_espes
+        ]
+
+        espes = {}
+        missing = {}
+        for key, get_espe in zip(keys, get_espes):
+            if key in espes or key in missing:
+                self._espe_cache.count_hit()
+                continue
+            espe = self._espe_cache.get(key)
+            if espe is None:
+                missing[key] = get_espe
+            else:
+                espes[key] = espe
+
+        for key, espe in zip(missing, self._executor.map(
+                self._get_espe_function(), missing.values())):
+            self._espe_cache.put(key, espe)
+            espes[key] = espe
+
+        return [espes[key] for key in keys]
+
+    def submit_espe(self, recoil: RecoilElement, recoil_file: Path) -> \
+            Future:
+        """Starts calculating the energy spectrum of a single recoil in the
+        background. Spectra are taken from and stored in the same cache as
+        in calculate_espes.
+
+        Args:
+            recoil: recoil element whose spectrum is calculated
+            recoil_file: file where the recoil distribution is written. The
+                file must not be reused before the calculation is done.
+
+        Return:
+            Future that holds the energy spectrum
+        """
+        get_espe, _ = self.element_simulation.get_espe_calculator(
+            recoil, ch=self.channel_width,
+            optimization_type=self.optimization_type, write_to_file=False,
+            recoil_file=recoil_file)
+        key = EspeCache.get_key(get_espe, self.in_process_espe)
+        espe = self._espe_cache.get(key)
+        if espe is not None:
+            future = Future()
+            future.set_result(espe)
+            return future
+
+        def cache_espe(done: Future):
+            if not done.cancelled() and done.exception() is None:
+                self._espe_cache.put(key, done.result())
+
+        future = self._executor.submit(self._get_espe_function(), get_espe)
+        future.add_done_callback(cache_espe)
+        return future
+
+    def _get_espe_function(self):
+        """Returns the function that calculates the spectrum of a GetEspe
+        object.
+        """
+        if self.in_process_espe:
+            return GetEspe.run_in_process
+        return functools.partial(GetEspe.run, verbose=self.verbose)
+
     def clean_up(self, cancellation_token: CancellationToken) -> None:
         if cancellation_token is not None:
             cancellation_token.request_cancellation()
+        self._executor.shutdown()
         self._delete_temp_files()
 
     def _delete_temp_files(self) -> None:
@@ -282,37 +410,35 @@ class BaseOptimizer(abc.ABC, Observable):
                     pass
 
 
-def get_optim_espe(elem_sim: ElementSimulation,
-                   optimization_type: OptimizationType):
+def get_optim_spectrum_accumulator(elem_sim: ElementSimulation,
+                                   optimization_type: OptimizationType) \
+        -> SpectrumAccumulator:
+    """Returns a SpectrumAccumulator for the ERD files of the initial
+    simulation. Its spectra are calculated in process and calibrated with
+    one get_espe run, regardless of whether solutions are evaluated in
+    process.
+    """
     if optimization_type is OptimizationType.RECOIL:
         recoil = elem_sim.optimization_recoils[0]
     else:
         recoil = elem_sim.get_main_recoil()
 
-    espe, _ = elem_sim.calculate_espe(
+    get_espe, _ = elem_sim.get_espe_calculator(
         recoil, optimization_type=optimization_type, write_to_file=False)
-    return espe
+    return SpectrumAccumulator(get_espe)
 
 
 def calculate_change(espe1, espe2, channel_width):
     if not espe1 or not espe2:
         return math.inf
-    uniespe1, uniespe2 = gf.uniform_espe_lists(
-        espe1, espe2, channel_width=channel_width)
-
-    # Calculate distance between energy spectra
-    # TODO move this to math_functions
-    sum_diff = 0
-    amount = 0
-    for point1, point2 in zip(uniespe1, uniespe2):
-        if point1[1] != 0 or point2[1] != 0:
-            amount += 1
-            sum_diff += abs(point1[1] - point2[1])
-    # Take average of sum_diff (non-zero diffs)
-    if amount:
-        return sum_diff / amount
-    else:
-        return math.inf
+    _, y1, y2 = sa.align_spectra(espe1, espe2, channel_width)
+
+    # Calculate distance between energy spectra as the average of the
+    # non-zero differences
+    nonzero = (y1 != 0) | (y2 != 0)
+    if nonzero.any():
+        return float(np.abs(y1[nonzero] - y2[nonzero]).mean())
+    return math.inf
 
 
 def dominates(a, b):
@@ -336,11 +462,41 @@ def dominates(a, b):
     return is_better
 
 
+def domination_matrix(objective_values, others=None) -> np.ndarray:
+    """
+    Compare solutions with each other. Same as calling dominates for each
+    pair of solutions.
+
+    Args:
+        objective_values: Solutions (objective values), one per row.
+        others: Solutions that the first ones are compared with. Defaults to
+            objective_values.
+
+    Return:
+        Boolean matrix where element [i, j] tells whether solution i
+        dominates solution j of the other solutions.
+    """
+    obj = np.asarray(objective_values, dtype=float)
+    others = obj if others is None else np.asarray(others, dtype=float)
+    not_worse = np.ones((len(obj), len(others)), dtype=bool)
+    is_better = np.zeros((len(obj), len(others)), dtype=bool)
+    # Compared one objective at a time so that NaN values neither make a
+    # solution worse nor better, just like in dominates
+    for i in range(obj.shape[1] if obj.ndim == 2 else 0):
+        column, other_column = obj[:, i], others[:, i]
+        not_worse &= ~(column[:, None] > other_column[None, :])
+        is_better |= column[:, None] < other_column[None, :]
+    return not_worse & is_better
+
+
 def tournament_allow_doubles(t, p, fit):
     """
     Tournament selection that allows one individual to be in the mating pool
     several times.
 
+    Random numbers are consumed in the same order as when candidates are
+    drawn one at a time, so the same random state produces the same pool.
+
     Args:
         t: Number of solutions to be compared, size of tournament.
         p: Number of solutions to be selected as parents in the mating pool.
@@ -349,29 +505,61 @@ def tournament_allow_doubles(t, p, fit):
     Return:
         Index of selected solutions.
     """
-    n = len(fit)
-    pool = []
-    for i in range(p):
-        candidates = []
-        # Find k different candidates for tournament
-        j = 0
-        while j in range(t):
-            candidate = np.random.randint(n)
-            if candidate not in candidates:
-                candidates.append(candidate)
-                j += 1
-        min_front = min([fit[i, 0] for i in candidates])
-        min_candidates = [i for i in candidates if fit[i, 0] == min_front]
-        number_of_mins = len(min_candidates)
-        if number_of_mins > 1:  # If multiple candidates from the same front
-            # Find the candidate with smallest crowding distance
-            max_dist = max([fit[i, 1] for i in min_candidates])
-            max_cands = [i for i in min_candidates if fit[i, 1] == max_dist]
-            pool.append(max_cands[0])
-        else:
-            pool.append(min_candidates[0])
-
-    return np.array(pool)
+    fit = np.asarray(fit)
+    candidates = _draw_tournament_candidates(t, p, len(fit))
+    if not p:
+        return candidates.reshape(0)
+    fronts = fit[candidates, 0]
+    distances = fit[candidates, 1]
+    is_min = fronts == fronts.min(axis=1, keepdims=True)
+
+    # Find the largest crowding distance among the candidates from the best
+    # front. Candidates are compared in order like max does, so NaN distances
+    # give the same result.
+    max_dist = np.full(p, np.nan)
+    found = np.zeros(p, dtype=bool)
+    for j in range(t):
+        take = is_min[:, j] & (~found | (distances[:, j] > max_dist))
+        max_dist[take] = distances[take, j]
+        found |= is_min[:, j]
+
+    winners = is_min & (distances == max_dist[:, None])
+    # If only one candidate is from the best front, it wins regardless of
+    # its crowding distance
+    single = is_min.sum(axis=1) == 1
+    winners[single] = is_min[single]
+    if not winners.any(axis=1).all():
+        raise IndexError("Tournament could not be decided.")
+    return candidates[np.arange(p), winners.argmax(axis=1)]
+
+
+def _draw_tournament_candidates(t, p, n) -> np.ndarray:
+    """Draws t different candidates for each of the p tournaments. Numbers
+    are drawn in blocks, but exactly as many are drawn as when drawing one
+    candidate at a time and redrawing duplicates.
+    """
+    rows = []
+    partial = []
+    while len(rows) < p:
+        draws = np.random.randint(n, size=(p - len(rows)) * t - len(partial))
+        start = 0
+        if not partial:
+            block = draws.reshape(-1, t)
+            # Rows are accepted until the first one with duplicates
+            ordered = np.sort(block, axis=1)
+            has_doubles = (ordered[:, 1:] == ordered[:, :-1]).any(axis=1)
+            first_bad = int(np.argmax(has_doubles)) if has_doubles.any() \
+                else len(block)
+            rows.extend(block[:first_bad])
+            start = first_bad * t
+        # The rest is handled one candidate at a time
+        for candidate in draws[start:]:
+            if candidate not in partial:
+                partial.append(candidate)
+            if len(partial) == t:
+                rows.append(np.array(partial))
+                partial = []
+    return np.array(rows, dtype=int).reshape(p, t)
 
 
 def single_point_crossover(parent1, parent2):
@@ -0,0 +1,157 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Optimization checkpoint module saves the state of a running NSGA-II
+optimization into a file in the element simulation directory, so that an
+optimization that was interrupted can be continued without running the
+initial simulation again.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import json
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from pathlib import Path
+from typing import List
+from typing import NamedTuple
+from typing import Tuple
+
+from .enums import OptimizationType
+from .get_espe import ErdFingerprint
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_EXT = ".checkpoint"
+
+RngState = Tuple[str, np.ndarray, int, int, float]
+
+
+class Checkpoint(NamedTuple):
+    """State of an optimization between two generations.
+
+    The ERD fingerprint identifies the simulation results the objective
+    values were calculated from. A checkpoint can only be used as long as
+    the ERD files have not changed.
+    """
+    solutions: np.ndarray
+    objective_values: np.ndarray
+    evaluations_left: int
+    rng_state: RngState
+    erd_fingerprint: ErdFingerprint
+    const_var_i: List[int]
+
+
+def get_checkpoint_file(directory: Path, prefix: str,
+                        optim_mode: OptimizationType) -> Path:
+    """Returns the path of the checkpoint file of an optimization. The name
+    matches the other result files of the same optimization mode so that
+    the checkpoint is removed with them.
+
+    Args:
+        directory: directory of the element simulation
+        prefix: name prefix of the element simulation
+        optim_mode: optimization mode
+
+    Return:
+        path to the checkpoint file
+    """
+    if optim_mode is OptimizationType.FLUENCE:
+        return Path(directory, f"{prefix}-optfl{CHECKPOINT_EXT}")
+    if optim_mode is OptimizationType.RECOIL:
+        return Path(directory, f"{prefix}-opt{CHECKPOINT_EXT}")
+
+    raise ValueError(f"Unknown optimization mode '{optim_mode}'")
+
+
+def save_checkpoint(file: Path, checkpoint: Checkpoint) -> None:
+    """Writes a checkpoint into a compressed file. The file is replaced
+    atomically so that an interruption while saving leaves the previous
+    checkpoint intact.
+
+    Args:
+        file: path to the checkpoint file
+        checkpoint: Checkpoint to save
+    """
+    _, keys, pos, has_gauss, cached_gaussian = checkpoint.rng_state
+    fd, tmp_file = tempfile.mkstemp(
+        dir=file.parent, prefix=f"{file.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(
+                f,
+                version=CHECKPOINT_VERSION,
+                solutions=checkpoint.solutions,
+                objective_values=checkpoint.objective_values,
+                evaluations_left=checkpoint.evaluations_left,
+                rng_keys=keys,
+                rng_pos=pos,
+                rng_has_gauss=has_gauss,
+                rng_cached_gaussian=cached_gaussian,
+                erd_fingerprint=json.dumps(checkpoint.erd_fingerprint),
+                const_var_i=np.array(checkpoint.const_var_i, dtype=int))
+        os.replace(tmp_file, file)
+    except BaseException:
+        Path(tmp_file).unlink()
+        raise
+
+
+def load_checkpoint(file: Path) -> Checkpoint:
+    """Reads a checkpoint from a file.
+
+    Args:
+        file: path to the checkpoint file
+
+    Return:
+        Checkpoint
+
+    Raises:
+        OSError if the file cannot be read and ValueError if it is not a
+        valid checkpoint.
+    """
+    try:
+        with np.load(file, allow_pickle=False) as data:
+            if int(data["version"]) != CHECKPOINT_VERSION:
+                raise ValueError("Checkpoint was saved by another version.")
+            rng_state = (
+                "MT19937",
+                data["rng_keys"],
+                int(data["rng_pos"]),
+                int(data["rng_has_gauss"]),
+                float(data["rng_cached_gaussian"])
+            )
+            fingerprint = tuple(
+                (name, mtime, size) for name, mtime, size
+                in json.loads(str(data["erd_fingerprint"])))
+            return Checkpoint(
+                solutions=data["solutions"],
+                objective_values=data["objective_values"],
+                evaluations_left=int(data["evaluations_left"]),
+                rng_state=rng_state,
+                erd_fingerprint=fingerprint,
+                const_var_i=[int(i) for i in data["const_var_i"]])
+    except (KeyError, TypeError, EOFError, zipfile.BadZipFile) as e:
+        raise ValueError(f"Invalid checkpoint file: {e}") from e
@@ -0,0 +1,190 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Persistence module contains helpers for writing save files only when their
+contents change and for coalescing frequent edits into delayed writes that
+are performed in a background thread.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import json
+import threading
+import time
+
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import FrozenSet
+from typing import Optional
+
+# Keys that only record when a file was written. They are not compared when
+# deciding whether a file needs to be rewritten.
+TIMESTAMP_KEYS = frozenset({"modification_time", "modification_time_unix"})
+
+
+def _without_keys(obj: Dict, ignored_keys: FrozenSet[str]) -> Dict:
+    """Returns a copy of a json object without the given top level keys.
+    """
+    return {
+        key: value for key, value in obj.items() if key not in ignored_keys
+    }
+
+
+def write_json_if_changed(file_path: Path, obj: Dict,
+                          ignored_keys: FrozenSet[str] = TIMESTAMP_KEYS,
+                          indent: int = 4) -> bool:
+    """Writes the object to given file in json format unless the file
+    already contains the same values.
+
+    Args:
+        file_path: path to the json file
+        obj: json serializable dictionary
+        ignored_keys: top level keys whose values are not compared
+        indent: indentation used when writing the file
+
+    Return:
+        True if the file was written, False otherwise.
+    """
+    # Round trip the object so that tuples and lists compare equal
+    new_obj = _without_keys(json.loads(json.dumps(obj)), ignored_keys)
+    try:
+        with file_path.open("r") as file:
+            old_obj = json.load(file)
+        if isinstance(old_obj, dict) and \
+                _without_keys(old_obj, ignored_keys) == new_obj:
+            return False
+    except (OSError, json.JSONDecodeError):
+        pass
+
+    with file_path.open("w") as file:
+        json.dump(obj, file, indent=indent)
+    return True
+
+
+class DebouncedWriter:
+    """Calls a save function in a background thread once no new changes
+    have been marked for a given quiet period.
+    """
+
+    def __init__(self, save_func: Callable[[], None], delay: float = 1.0):
+        """Initializes a new DebouncedWriter.
+
+        Args:
+            save_func: function that writes the changes to disk
+            delay: length of the quiet period in seconds
+        """
+        self._save_func = save_func
+        self._delay = delay
+        self._condition = threading.Condition()
+        # Saving is serialized separately so that flush can be called from
+        # any thread while the background thread is writing.
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._closed = False
+        self._deadline = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def dirty(self) -> bool:
+        """Whether there are changes that have not been saved yet.
+        """
+        with self._condition:
+            return self._dirty
+
+    def mark_dirty(self) -> None:
+        """Marks that there are unsaved changes. Changes are saved after
+        no new changes have been marked for the duration of the delay.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._dirty = True
+            self._deadline = time.monotonic() + self._delay
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self) -> bool:
+        """Saves unsaved changes immediately in the calling thread.
+
+        Return:
+            True if the save function was called, False otherwise.
+        """
+        with self._save_lock:
+            with self._condition:
+                if not self._dirty:
+                    return False
+                self._dirty = False
+            try:
+                self._save_func()
+            except Exception:
+                with self._condition:
+                    self._dirty = True
+                raise
+            return True
+
+    def close(self, flush: bool = True) -> None:
+        """Stops the background thread. Changes marked after closing are
+        ignored.
+
+        Args:
+            flush: whether unsaved changes are saved or discarded
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if flush:
+            self.flush()
+        else:
+            with self._condition:
+                self._dirty = False
+
+    def _run(self) -> None:
+        """Waits for quiet periods and saves the changes.
+        """
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._dirty:
+                        remaining = self._deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    self._thread = None
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Changes remain dirty and saving is retried after another
+                # quiet period.
+                with self._condition:
+                    self._deadline = time.monotonic() + self._delay
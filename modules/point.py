@@ -27,11 +27,27 @@ __author__ = "Severi Jääskeläinen \n Samuel Kaiponen \n Heta Rekilä \n " \
              "Sinikka Siironen \n Juhani Sundell"
 __version__ = "2.0"
 
+import bisect
+
+import numpy as np
+
+from array import array
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
 from . import math_functions as mf
 
 
 class Point:
-    """A 2D point with x and y coordinates."""
+    """A 2D point with x and y coordinates.
+
+    A point can belong to one or more PointStores. The stores are notified
+    when the coordinates of the point change.
+    """
+    __slots__ = "_x", "_y", "_stores"
+
     def __init__(self, *xy):
         """Inits point.
 
@@ -44,6 +60,7 @@ class Point:
             xy = xy[0]
         self._x = xy[0]
         self._y = xy[1]
+        self._stores = ()
 
     def __lt__(self, other):
         """
@@ -67,7 +84,28 @@ class Point:
         if not isinstance(other, Point):
             return NotImplemented
 
-        return vars(self) == vars(other)
+        return self.get_coordinates() == other.get_coordinates()
+
+    def __copy__(self):
+        """Returns a copy of the point that does not belong to any store.
+        """
+        return Point(self._x, self._y)
+
+    def __deepcopy__(self, memo):
+        """Returns a copy of the point that does not belong to any store.
+        """
+        return Point(self._x, self._y)
+
+    def __getstate__(self):
+        """Returns the coordinates of the point for pickling.
+        """
+        return self._x, self._y
+
+    def __setstate__(self, state):
+        """Sets the coordinates of an unpickled point.
+        """
+        self._x, self._y = state
+        self._stores = ()
 
     def __repr__(self):
         """Returns a string representation of the Point object.
@@ -135,7 +173,9 @@ class Point:
         Args:
              x: X coordinate.
         """
+        old_x = self._x
         self._x = x
+        self._notify_stores(old_x)
 
     def set_y(self, y):
         """
@@ -145,6 +185,7 @@ class Point:
              y: Y coordinate.
         """
         self._y = y
+        self._notify_stores(self._x)
 
     def set_coordinates(self, xy):
         """
@@ -153,8 +194,19 @@ class Point:
         Args:
             xy: Point's x and y coordinates.
         """
+        old_x = self._x
         self._x = xy[0]
         self._y = xy[1]
+        self._notify_stores(old_x)
+
+    def _notify_stores(self, old_x):
+        """Tells the stores of the point that its coordinates have changed.
+
+        Args:
+            old_x: x coordinate of the point before the change
+        """
+        for store in self._stores:
+            store.point_changed(self, old_x)
 
     def calculate_new_point(self, other, x):
         """Returns a new point at position x on a line that goes trough
@@ -177,3 +229,234 @@ class Point:
         simulation.
         """
         return f"{round(self.get_x(), 2)} {round(self.get_y(), 4)}"
+
+
+class PointStore:
+    """Points sorted in ascending order by their x coordinate.
+
+    The coordinates of the points are mirrored in two arrays so that they
+    can be read without going through the Point objects, and points are
+    looked up and inserted with a binary search over the x coordinates.
+    Points notify the store when their coordinates are changed.
+
+    Moving a point past its neighbour leaves the points unsorted, as the
+    order of the points is only changed when points are added or removed.
+    Lookups fall back to a linear search while the points are unsorted.
+    """
+    __slots__ = "_points", "_xs", "_ys", "_inversions"
+
+    def __init__(self, points: Iterable[Point] = ()):
+        """Initializes a new PointStore.
+
+        Args:
+            points: points to add to the store
+        """
+        self._points = []
+        self._xs = array("d")
+        self._ys = array("d")
+        self._inversions = 0
+        self._set_points(sorted(points))
+
+    def __len__(self):
+        return len(self._points)
+
+    def __iter__(self):
+        return iter(self._points)
+
+    def __getitem__(self, item):
+        return self._points[item]
+
+    def __eq__(self, other):
+        """Stores are equal if their points are equal.
+        """
+        if not isinstance(other, PointStore):
+            return NotImplemented
+
+        return self._points == other._points
+
+    def __deepcopy__(self, memo):
+        """Returns a store that contains copies of the points.
+        """
+        return PointStore(Point(p.get_coordinates()) for p in self._points)
+
+    def get_points(self) -> List[Point]:
+        """Returns the list of points in the store. The list must not be
+        modified directly.
+        """
+        return self._points
+
+    def get_xs(self) -> List[float]:
+        """Returns a list of the x coordinates of the points.
+        """
+        return self._xs.tolist()
+
+    def get_ys(self) -> List[float]:
+        """Returns a list of the y coordinates of the points.
+        """
+        return self._ys.tolist()
+
+    def get_coordinates(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns copies of the x and y coordinates of the points as
+        arrays.
+        """
+        return np.array(self._xs, dtype=float), np.array(self._ys, dtype=float)
+
+    def is_sorted(self) -> bool:
+        """Returns True if the points are in ascending order by their x
+        coordinate.
+        """
+        return not self._inversions
+
+    def index(self, point: Point) -> int:
+        """Returns the index of the first point that is equal to the given
+        point.
+
+        Raises ValueError if there is no such point.
+        """
+        if self._inversions:
+            return self._points.index(point)
+        x = point.get_x()
+        i = bisect.bisect_left(self._xs, x)
+        while i < len(self._xs) and self._xs[i] == x:
+            if self._points[i] == point:
+                return i
+            i += 1
+        raise ValueError(f"{point!r} is not in the store")
+
+    def add(self, point: Point) -> int:
+        """Adds a point after the points that have the same x coordinate.
+
+        Args:
+            point: Point to add
+
+        Return:
+            index of the added point
+        """
+        if self._inversions:
+            # Restore the order of the points first
+            self._set_points(sorted([*self._points, point]))
+            return self.index(point)
+        i = bisect.bisect_right(self._xs, point.get_x())
+        self._insert(i, point)
+        return i
+
+    def remove(self, point: Point) -> None:
+        """Removes the first point that is equal to the given point.
+
+        Raises ValueError if there is no such point.
+        """
+        self.pop(self.index(point))
+
+    def pop(self, i: int) -> Point:
+        """Removes and returns the i:th point.
+        """
+        n = len(self._points)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("point index out of range")
+        self._inversions -= self._count_inversions(i - 1, i + 2)
+        point = self._points.pop(i)
+        del self._xs[i]
+        del self._ys[i]
+        self._inversions += self._count_inversions(i - 1, i + 1)
+        self._detach(point)
+        return point
+
+    def get_neighbors(self, point: Point) \
+            -> Tuple[Optional[Point], Optional[Point]]:
+        """Returns the points before and after the given point.
+
+        Raises ValueError if the point is not in the store.
+        """
+        i = self.index(point)
+        ln = self._points[i - 1] if i > 0 else None
+        rn = self._points[i + 1] if i < len(self._points) - 1 else None
+        return ln, rn
+
+    def replace(self, start: int, stop: int, xs: Iterable[float],
+                ys: Iterable[float]) -> None:
+        """Replaces the points between start and stop with new points.
+
+        Args:
+            start: index of the first replaced point
+            stop: index after the last replaced point
+            xs: x coordinates of the new points
+            ys: y coordinates of the new points
+        """
+        new_points = [Point(x, y) for x, y in zip(xs, ys)]
+        for point in self._points[start:stop]:
+            self._detach(point)
+        for point in new_points:
+            self._attach(point)
+        self._points[start:stop] = new_points
+        self._xs[start:stop] = array("d", (p.get_x() for p in new_points))
+        self._ys[start:stop] = array("d", (p.get_y() for p in new_points))
+        self._inversions = int(np.count_nonzero(
+            np.diff(np.array(self._xs, dtype=float)) < 0))
+
+    def point_changed(self, point: Point, old_x: float) -> None:
+        """Updates the coordinates of a point that has been changed.
+
+        Args:
+            point: Point whose coordinates were changed
+            old_x: x coordinate of the point before the change
+        """
+        i = self._find_identical(point, old_x)
+        self._inversions -= self._count_inversions(i - 1, i + 2)
+        self._xs[i] = point.get_x()
+        self._ys[i] = point.get_y()
+        self._inversions += self._count_inversions(i - 1, i + 2)
+
+    def _find_identical(self, point: Point, x: float) -> int:
+        """Returns the index of the given point object when its x coordinate
+        in the store is x.
+        """
+        if not self._inversions:
+            i = bisect.bisect_left(self._xs, x)
+            while i < len(self._xs) and self._xs[i] == x:
+                if self._points[i] is point:
+                    return i
+                i += 1
+        for i, p in enumerate(self._points):
+            if p is point:
+                return i
+        raise ValueError(f"{point!r} is not in the store")
+
+    def _insert(self, i: int, point: Point) -> None:
+        """Inserts a point at the given index.
+        """
+        self._inversions -= self._count_inversions(i - 1, i + 1)
+        self._points.insert(i, point)
+        self._xs.insert(i, point.get_x())
+        self._ys.insert(i, point.get_y())
+        self._inversions += self._count_inversions(i - 1, i + 2)
+        self._attach(point)
+
+    def _set_points(self, points: List[Point]) -> None:
+        """Replaces all points with the given sorted points.
+        """
+        for point in self._points:
+            self._detach(point)
+        self._points = points
+        self._xs = array("d", (p.get_x() for p in points))
+        self._ys = array("d", (p.get_y() for p in points))
+        self._inversions = 0
+        for point in points:
+            self._attach(point)
+
+    def _count_inversions(self, start: int, stop: int) -> int:
+        """Returns the number of adjacent points between start and stop
+        that are in descending order.
+        """
+        xs = self._xs
+        start = max(start, 0)
+        stop = min(stop, len(xs))
+        return sum(xs[i] > xs[i + 1] for i in range(start, stop - 1))
+
+    def _attach(self, point: Point) -> None:
+        if not any(store is self for store in point._stores):
+            point._stores = (*point._stores, self)
+
+    def _detach(self, point: Point) -> None:
+        point._stores = tuple(s for s in point._stores if s is not self)
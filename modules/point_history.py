@@ -0,0 +1,298 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Point history module keeps the undo and redo history of the points of a
+recoil atom distribution. Only the newest state of each direction is kept
+in full; older states are stored as the points that differ from the next
+state.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import collections
+
+import numpy as np
+
+from typing import Deque
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from .point import Point
+from .point import PointStore
+
+DEFAULT_DEPTH = 100
+
+
+class Snapshot(NamedTuple):
+    """Coordinates of the points of a distribution. full_edit tells whether
+    the state was saved while full edit was on.
+    """
+    xs: np.ndarray
+    ys: np.ndarray
+    full_edit: bool
+
+
+class Patch(NamedTuple):
+    """Difference between two states. Replacing the points between start
+    and stop of the newer state with the points of the patch gives the
+    older state.
+    """
+    start: int
+    stop: int
+    xs: np.ndarray
+    ys: np.ndarray
+    full_edit: bool
+
+
+def get_changed_range(xs1: np.ndarray, ys1: np.ndarray, xs2: np.ndarray,
+                      ys2: np.ndarray) -> Tuple[int, int, int]:
+    """Returns the range of points that differ between two states. Points
+    before and after the range are the same in both states.
+
+    Args:
+        xs1: x coordinates of the first state
+        ys1: y coordinates of the first state
+        xs2: x coordinates of the second state
+        ys2: y coordinates of the second state
+
+    Return:
+        start of the range and the ends of the range in the first and the
+        second state
+    """
+    n1, n2 = len(xs1), len(xs2)
+    n = min(n1, n2)
+    changed = (xs1[:n] != xs2[:n]) | (ys1[:n] != ys2[:n])
+    start = int(np.argmax(changed)) if changed.any() else n
+
+    # Points after the range must not overlap with the points before it
+    m = n - start
+    changed = (xs1[n1 - m:] != xs2[n2 - m:]) | (ys1[n1 - m:] != ys2[n2 - m:])
+    same = int(np.argmax(changed[::-1])) if changed.any() else m
+    return start, n1 - same, n2 - same
+
+
+def get_patch(newer: Snapshot, older: Snapshot) -> Patch:
+    """Returns a patch that turns the newer state into the older state.
+    """
+    start, stop, older_stop = get_changed_range(
+        newer.xs, newer.ys, older.xs, older.ys)
+    return Patch(
+        start, stop, older.xs[start:older_stop].copy(),
+        older.ys[start:older_stop].copy(), older.full_edit)
+
+
+def apply_patch(snapshot: Snapshot, patch: Patch) -> Snapshot:
+    """Returns the state that the patch turns the snapshot into.
+    """
+    xs = np.concatenate((
+        snapshot.xs[:patch.start], patch.xs, snapshot.xs[patch.stop:]))
+    ys = np.concatenate((
+        snapshot.ys[:patch.start], patch.ys, snapshot.ys[patch.stop:]))
+    return Snapshot(xs, ys, patch.full_edit)
+
+
+def get_snapshot(store: PointStore, full_edit: bool,
+                 exclude: Optional[Point] = None) -> Snapshot:
+    """Returns the current state of the points in a store.
+
+    Args:
+        store: PointStore
+        full_edit: whether full edit is on
+        exclude: point that is left out of the snapshot
+
+    Return:
+        Snapshot
+    """
+    xs, ys = store.get_coordinates()
+    if exclude is not None:
+        i = next(
+            (i for i, p in enumerate(store.get_points()) if p is exclude),
+            None)
+        if i is not None:
+            xs, ys = np.delete(xs, i), np.delete(ys, i)
+    return Snapshot(xs, ys, full_edit)
+
+
+def restore_snapshot(store: PointStore, snapshot: Snapshot) -> None:
+    """Changes the points of a store to match the snapshot. Points that are
+    the same in both are kept.
+    """
+    xs, ys = store.get_coordinates()
+    start, stop, snapshot_stop = get_changed_range(
+        xs, ys, snapshot.xs, snapshot.ys)
+    store.replace(start, stop, snapshot.xs[start:snapshot_stop],
+                  snapshot.ys[start:snapshot_stop])
+
+
+def is_same_state(snapshot1: Snapshot, snapshot2: Snapshot) -> bool:
+    """Returns True if the points of the snapshots are the same.
+    """
+    return np.array_equal(snapshot1.xs, snapshot2.xs) and \
+        np.array_equal(snapshot1.ys, snapshot2.ys)
+
+
+class _Stack:
+    """Stack of states where the top state is kept in full and the rest as
+    patches. The oldest states are dropped when the stack is full.
+    """
+    __slots__ = "top", "_patches"
+
+    def __init__(self, depth: int):
+        self.top: Optional[Snapshot] = None
+        self._patches: Deque[Patch] = collections.deque(maxlen=depth - 1)
+
+    def __len__(self):
+        if self.top is None:
+            return 0
+        return len(self._patches) + 1
+
+    def set_depth(self, depth: int) -> None:
+        self._patches = collections.deque(self._patches, maxlen=depth - 1)
+
+    def push(self, snapshot: Snapshot) -> None:
+        if self.top is not None and self._patches.maxlen:
+            self._patches.append(get_patch(snapshot, self.top))
+        self.top = snapshot
+
+    def pop(self) -> Snapshot:
+        snapshot = self.top
+        if self._patches:
+            self.top = apply_patch(snapshot, self._patches.pop())
+        else:
+            self.top = None
+        return snapshot
+
+    def clear(self) -> None:
+        self.top = None
+        self._patches.clear()
+
+
+class PointHistory:
+    """Undo and redo history of the points in a PointStore.
+
+    States are saved before the points are edited. Undoing restores the
+    latest saved state and redoing returns to the state that was undone.
+    The number of states kept in each direction is limited by the depth of
+    the history.
+    """
+    __slots__ = "_depth", "_undo", "_redo", "_full_edit"
+
+    def __init__(self, depth: int = DEFAULT_DEPTH):
+        """Initializes a new PointHistory.
+
+        Args:
+            depth: maximum number of states that can be undone
+        """
+        self._check_depth(depth)
+        self._depth = depth
+        self._undo = _Stack(depth)
+        self._redo = _Stack(depth)
+        # Tells whether the current state was saved in full edit
+        self._full_edit = False
+
+    @property
+    def depth(self) -> int:
+        """Maximum number of states that can be undone.
+        """
+        return self._depth
+
+    @depth.setter
+    def depth(self, value: int) -> None:
+        self._check_depth(value)
+        self._depth = value
+        self._undo.set_depth(value)
+        self._redo.set_depth(value)
+
+    @staticmethod
+    def _check_depth(depth: int) -> None:
+        if depth < 1:
+            raise ValueError("History depth must be positive.")
+
+    def get_undo_count(self) -> int:
+        """Returns the number of states that can be undone.
+        """
+        return len(self._undo)
+
+    def get_redo_count(self) -> int:
+        """Returns the number of states that can be redone.
+        """
+        return len(self._redo)
+
+    def is_previous_full_edit(self) -> Optional[bool]:
+        """Returns whether the state that undo restores was saved in full
+        edit or None if there is nothing to undo.
+        """
+        if self._undo.top is None:
+            return None
+        return self._undo.top.full_edit
+
+    def save(self, store: PointStore, full_edit: bool,
+             exclude: Optional[Point] = None) -> None:
+        """Saves the current state of the points. Nothing is saved if the
+        points are the same as in the previously saved state. Saving clears
+        the redo history.
+
+        Args:
+            store: PointStore
+            full_edit: whether full edit is on
+            exclude: point that is left out of the saved state, for example
+                a point that was just added
+        """
+        snapshot = get_snapshot(store, full_edit, exclude)
+        if self._undo.top is not None and \
+                is_same_state(snapshot, self._undo.top):
+            return
+        self._undo.push(snapshot)
+        self._redo.clear()
+        self._full_edit = full_edit
+
+    def undo(self, store: PointStore) -> bool:
+        """Restores the latest saved state. Returns False if there was
+        nothing to undo.
+        """
+        if self._undo.top is None:
+            return False
+        self._redo.push(get_snapshot(store, self._full_edit))
+        self._restore(store, self._undo.pop())
+        return True
+
+    def redo(self, store: PointStore) -> bool:
+        """Returns to the state that was last undone. Returns False if there
+        was nothing to redo.
+        """
+        if self._redo.top is None:
+            return False
+        self._undo.push(get_snapshot(store, self._full_edit))
+        self._restore(store, self._redo.pop())
+        return True
+
+    def clear(self) -> None:
+        """Removes all states from the history.
+        """
+        self._undo.clear()
+        self._redo.clear()
+
+    def _restore(self, store: PointStore, snapshot: Snapshot) -> None:
+        restore_snapshot(store, snapshot)
+        self._full_edit = snapshot.full_edit
@@ -0,0 +1,444 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Process manager module runs external processes (MCERD simulations) on
+behalf of the whole application. A single manager thread starts the
+processes, reads their output and checks their status, and the number of
+processes running at the same time is limited. Processes that do not fit
+under the limit are queued.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import collections
+import multiprocessing
+import os
+import platform
+import queue
+import selectors
+import subprocess
+import threading
+import time
+
+import rx
+
+from pathlib import Path
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from rx import operators as ops
+from rx.disposable import Disposable
+from rx.scheduler import ThreadPoolScheduler
+
+from . import subprocess_utils as sutils
+from .concurrency import CancellationToken
+
+# Kinds of events emitted by the manager
+LINE = "line"
+STATUS = "status"
+STOPPED = "stopped"
+TIMEOUT = "timeout"
+
+# Seconds between the checks of the manager thread
+_TICK = 0.1
+
+# Seconds a process may take to report that it has started before the
+# next process with the same startup key is started anyway
+_STARTUP_TIMEOUT = 5
+
+# Number of threads that deliver events to observers
+_SCHEDULER_WORKERS = 4
+
+_READ_SIZE = 64 * 1024
+
+
+class ProcessEvent(NamedTuple):
+    """An event of a managed process.
+
+    LINE events carry a line of output without the line terminator. STATUS
+    events carry the subprocess.Popen object; they are emitted periodically
+    while the process is running and once after it has exited and its
+    output has been read. STOPPED events are emitted when the process is
+    cancelled and carry the Popen object or None if the process was
+    cancelled before it was started. TIMEOUT events carry the Popen object
+    of a process that ran out of time.
+    """
+    kind: str
+    value: Any
+
+
+class _Job:
+    """A queued or running process.
+    """
+    __slots__ = "cmd", "cwd", "prepare", "observer", "ct", "first_check", \
+                "poll_interval", "max_time", "startup_key", "startup_done", \
+                "process", "buffers", "open_streams", "started_at", \
+                "next_check", "starting", "stopped", "detached"
+
+    def __init__(self, cmd: Sequence[str], cwd: Optional[Path],
+                 prepare: Optional[Callable[[], None]], observer,
+                 ct: CancellationToken, first_check: float,
+                 poll_interval: float, max_time: Optional[float],
+                 startup_key: Optional[Any],
+                 startup_done: Optional[Callable[[str], bool]]):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.prepare = prepare
+        self.observer = observer
+        self.ct = ct
+        self.first_check = first_check
+        self.poll_interval = poll_interval
+        self.max_time = max_time
+        self.startup_key = startup_key
+        self.startup_done = startup_done
+        self.process: Optional[subprocess.Popen] = None
+        self.buffers = {}
+        self.open_streams = 0
+        self.started_at = 0.0
+        self.next_check = 0.0
+        self.starting = False
+        self.stopped = False
+        self.detached = False
+
+    def emit(self, kind: str, value: Any) -> None:
+        if not self.detached:
+            self.observer.on_next(ProcessEvent(kind, value))
+
+    def error(self, err: Exception) -> None:
+        if not self.detached:
+            self.observer.on_error(err)
+
+    def complete(self) -> None:
+        if not self.detached:
+            self.observer.on_completed()
+
+
+class ProcessManager:
+    """Runs processes in a single manager thread.
+
+    Output of all processes is read with a selector (or with reader threads
+    on Windows where pipes cannot be selected) and the running, cancellation
+    and timeout checks of all processes are done on the same thread. At
+    most max_processes processes run at the same time; the rest wait in a
+    queue in the order they were submitted.
+
+    Processes that share a startup key are started one at a time: the next
+    one is started only after the previous one has reported that it has
+    read its input files. This allows processes to reuse the same input
+    files.
+
+    The manager thread is started when a process is submitted and it stops
+    when there is nothing left to do. Events are delivered to observers on
+    a shared, bounded scheduler.
+    """
+
+    def __init__(self, max_processes: Optional[int] = None):
+        """Initializes a new ProcessManager.
+
+        Args:
+            max_processes: maximum number of processes running at the same
+                time. Defaults to the number of CPUs.
+        """
+        self._max_processes = max_processes or multiprocessing.cpu_count()
+        self.scheduler = ThreadPoolScheduler(_SCHEDULER_WORKERS)
+        self._queue: Deque[_Job] = collections.deque()
+        self._running: List[_Job] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        if platform.system() == "Windows":
+            self._selector = None
+            self._inbox = queue.Queue()
+        else:
+            self._selector = selectors.DefaultSelector()
+
+    @property
+    def max_processes(self) -> int:
+        """Maximum number of processes running at the same time.
+        """
+        return self._max_processes
+
+    @max_processes.setter
+    def max_processes(self, value: int) -> None:
+        if value < 1:
+            raise ValueError("Maximum number of processes must be positive.")
+        self._max_processes = value
+
+    def get_queued_count(self) -> int:
+        """Returns the number of processes waiting to be started.
+        """
+        with self._lock:
+            return len(self._queue)
+
+    def get_running_count(self) -> int:
+        """Returns the number of processes that have been started but whose
+        output has not been fully read yet.
+        """
+        with self._lock:
+            return len(self._running)
+
+    def observe(self, cmd: Sequence[str], cwd: Optional[Path] = None,
+                prepare: Optional[Callable[[], None]] = None,
+                ct: Optional[CancellationToken] = None,
+                first_check: float = 0.2, poll_interval: float = 10,
+                max_time: Optional[float] = None,
+                startup_key: Optional[Any] = None,
+                startup_done: Optional[Callable[[str], bool]] = None) -> \
+            rx.Observable:
+        """Returns an observable that queues the process when it is
+        subscribed to.
+
+        Disposing the subscription removes a queued process from the queue.
+        A process that has already been started is left running but its
+        events are no longer delivered.
+
+        Args:
+            cmd: command that starts the process
+            cwd: working directory of the process
+            prepare: function that is called right before the process is
+                started, for example to write the input files
+            ct: token that is checked to see if the process should be
+                killed
+            first_check: seconds from the start until the first STATUS
+                event
+            poll_interval: seconds between STATUS events
+            max_time: maximum running time in seconds. When it is exceeded,
+                cancellation is requested from the token and the process
+                is killed.
+            startup_key: processes with the same key are started one at a
+                time
+            startup_done: function that tells from a line of output that
+                the process has started. Required if startup_key is given.
+
+        Return:
+            observable stream of ProcessEvents
+        """
+        def subscribe(observer, _=None):
+            job = _Job(
+                cmd, cwd, prepare, observer, ct or CancellationToken(),
+                first_check, poll_interval, max_time, startup_key,
+                startup_done)
+            self._submit(job)
+
+            def detach():
+                job.detached = True
+            return Disposable(detach)
+
+        return rx.create(subscribe).pipe(ops.observe_on(self.scheduler))
+
+    def _submit(self, job: _Job) -> None:
+        """Adds a job to the queue and starts the manager thread if it is
+        not running.
+        """
+        with self._lock:
+            self._queue.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="process-manager", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Main loop of the manager thread.
+        """
+        while True:
+            cancelled, startable = self._take_queued()
+            for job in cancelled:
+                job.emit(STOPPED, None)
+                job.complete()
+            for job in startable:
+                self._start(job, time.monotonic())
+            with self._lock:
+                if not self._queue and not self._running:
+                    self._thread = None
+                    return
+            self._read_output(_TICK)
+            self._check_running()
+
+    def _take_queued(self) -> Tuple[List[_Job], List[_Job]]:
+        """Removes the jobs that have been cancelled and the jobs that fit
+        under the limit from the queue. Jobs that have been detached are
+        dropped.
+
+        Return:
+            cancelled jobs and the jobs that can be started
+        """
+        now = time.monotonic()
+        cancelled, startable = [], []
+        with self._lock:
+            starting = {
+                job.startup_key for job in self._running
+                if job.starting and now - job.started_at < _STARTUP_TIMEOUT
+            }
+            free = self._max_processes - len(self._running)
+            for job in list(self._queue):
+                if job.detached:
+                    self._queue.remove(job)
+                elif job.ct.is_cancellation_requested():
+                    self._queue.remove(job)
+                    cancelled.append(job)
+                elif len(startable) < free and \
+                        job.startup_key not in starting:
+                    self._queue.remove(job)
+                    startable.append(job)
+                    if job.startup_key is not None:
+                        starting.add(job.startup_key)
+        return cancelled, startable
+
+    def _start(self, job: _Job, now: float) -> bool:
+        """Starts the process of a job. Returns True if the process was
+        started. Called without holding the lock, as preparing and starting
+        the process may take a while.
+        """
+        try:
+            if job.prepare is not None:
+                job.prepare()
+            job.process = subprocess.Popen(
+                job.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=job.cwd)
+        except Exception as e:
+            job.error(e)
+            return False
+
+        job.started_at = now
+        job.next_check = now + job.first_check
+        job.starting = job.startup_key is not None
+        for stream in job.process.stdout, job.process.stderr:
+            job.buffers[stream] = b""
+            job.open_streams += 1
+            if self._selector is not None:
+                self._selector.register(
+                    stream, selectors.EVENT_READ, (job, stream))
+            else:
+                # At most two readers per running process
+                threading.Thread(
+                    target=self._read_stream, args=(job, stream),
+                    daemon=True).start()
+        with self._lock:
+            self._running.append(job)
+        return True
+
+    def _read_stream(self, job: _Job, stream) -> None:
+        """Reads a stream until it ends. Used instead of the selector on
+        Windows.
+        """
+        while True:
+            data = os.read(stream.fileno(), _READ_SIZE)
+            self._inbox.put((job, stream, data))
+            if not data:
+                return
+
+    def _read_output(self, timeout: float) -> None:
+        """Waits for output from the running processes and handles it.
+        """
+        if self._selector is not None:
+            if not self._selector.get_map():
+                time.sleep(timeout)
+                return
+            for key, _ in self._selector.select(timeout):
+                job, stream = key.data
+                data = os.read(key.fd, _READ_SIZE)
+                if not data:
+                    self._selector.unregister(stream)
+                self._handle_output(job, stream, data)
+            return
+
+        try:
+            item = self._inbox.get(timeout=timeout)
+            while True:
+                self._handle_output(*item)
+                item = self._inbox.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _handle_output(self, job: _Job, stream, data: bytes) -> None:
+        """Splits the output of a process into lines and emits them. Empty
+        data means that the stream has ended.
+        """
+        buffer = job.buffers[stream] + data
+        if data:
+            *lines, job.buffers[stream] = buffer.split(b"\n")
+        else:
+            # Last line may not have a line terminator
+            lines = [buffer] if buffer else []
+            job.buffers[stream] = b""
+            job.open_streams -= 1
+            stream.close()
+            if not job.open_streams:
+                job.starting = False
+        for line in lines:
+            text = line.rstrip(b"\r").decode(errors="replace")
+            if job.starting and job.startup_done(text):
+                job.starting = False
+            job.emit(LINE, text)
+
+    def _check_running(self) -> None:
+        """Finishes jobs whose processes have exited and checks the
+        cancellation, timeout and running status of the others.
+        """
+        now = time.monotonic()
+        for job in list(self._running):
+            process = job.process
+            if job.open_streams == 0 and process.poll() is not None:
+                with self._lock:
+                    self._running.remove(job)
+                if not job.stopped:
+                    job.emit(STATUS, process)
+                job.complete()
+            elif job.stopped:
+                continue
+            elif job.ct.is_cancellation_requested():
+                job.stopped = True
+                sutils.kill_process(process)
+                job.emit(STOPPED, process)
+            elif job.max_time is not None and \
+                    now - job.started_at >= job.max_time:
+                job.stopped = True
+                # Other processes that share the token are stopped too
+                job.ct.request_cancellation()
+                sutils.kill_process(process)
+                job.emit(TIMEOUT, process)
+            elif now >= job.next_check:
+                job.next_check = now + job.poll_interval
+                if process.poll() is None:
+                    job.emit(STATUS, process)
+            if job.starting and now - job.started_at >= _STARTUP_TIMEOUT:
+                job.starting = False
+
+
+_manager: Optional[ProcessManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_process_manager() -> ProcessManager:
+    """Returns the application-wide ProcessManager.
+    """
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ProcessManager()
+        return _manager
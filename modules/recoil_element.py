@@ -28,7 +28,6 @@ __author__ = "Severi Jääskeläinen \n Samuel Kaiponen \n Heta Rekilä \n " \
              "Sinikka Siironen \n Juhani Sundell"
 __version__ = "2.0"
 
-import copy
 import json
 import itertools
 import time
@@ -40,11 +39,15 @@ from typing import Tuple
 
 from . import file_paths as fp
 from . import math_functions as mf
+from . import persistence
 
 from .base import Serializable
 from .base import MCERDParameterContainer
 from .element import Element
 from .point import Point
+from .point import PointStore
+from .point_history import DEFAULT_DEPTH
+from .point_history import PointHistory
 from .parsing import CSVParser
 
 from modules.global_settings import GlobalSettings
@@ -59,7 +62,7 @@ class RecoilElement(MCERDParameterContainer, Serializable):
                  name="Default", rec_type="rec",
                  description="These are default recoil settings.",
                  reference_density=REFERENCE_DENSITY, modification_time=None,
-                 channel_width=None):
+                 channel_width=None, history_depth=DEFAULT_DEPTH):
         """Inits recoil element.
 
         Args:
@@ -68,6 +71,8 @@ class RecoilElement(MCERDParameterContainer, Serializable):
             color: string representation of a color
             name: Name of the RecoilElement object anf file.
             rec_type: Type recoil element (rec or sct).
+            history_depth: Maximum number of point changes that can be
+                undone.
         """
         self.element = element
         if not name:
@@ -85,17 +90,8 @@ class RecoilElement(MCERDParameterContainer, Serializable):
             
         self.channel_width = channel_width
 
-        # TODO might want to use some sort of sorted collection instead of a
-        #  list, although this depends on the number of elements in the list.
-        #  A linked list would make finding neighbors faster.
-        self._points = sorted(points)
-        self.points_backlog = []
-        # This is out of bounds if no undo is done, telss the index of the
-        # next points to be added
-        self.points_backlog_i_add = 0
-        # List corresponding to poins backlog entry, tells if entry was done
-        # in full edit or not
-        self.entry_in_full_edit = []
+        self._points = PointStore(points)
+        self._history = PointHistory(history_depth)
 
         # Contains ElementWidget and SimulationControlsWidget.
         self.widgets = []
@@ -142,121 +138,58 @@ class RecoilElement(MCERDParameterContainer, Serializable):
         """
         self._edit_lock_on = False
 
-    def previous_points_in_full_edit(self):
-        """Check if previous points
+    def previous_points_in_full_edit(self) -> Optional[bool]:
+        """Check if the points that undo restores were saved in full edit.
+        Returns None if there is nothing to undo.
         """
-        prev_i = self.points_backlog_i_add - 1
-        if prev_i >= 0:
-            full_edit_used = self.entry_in_full_edit[prev_i]
-            return full_edit_used
+        return self._history.is_previous_full_edit()
 
-    def save_current_points(self, full_edit_used, exclude=None,
-                            save_before_undo=False):
-        """Save current points for undoing or redoing.
+    def save_current_points(self, full_edit_used: bool,
+                            exclude: Optional[Point] = None):
+        """Save current points for undoing. Only the points that differ
+        from the previously saved points are stored.
 
         Args:
-            full_edit_used: TODO
+            full_edit_used: whether full edit is on
             exclude: A point that needs to be excluded from backlog entry.
-            save_before_undo: TODO
         """
-        points = []
-        if exclude:
-            for p in self._points:
-                if p is exclude:
-                    continue
-                else:
-                    points.append(p)
-        else:
-            points = self._points
-
-        copy_points = copy.deepcopy(points)
-
-        # Check that copied points differ form the last added one
-        are_same = False
-        if self.points_backlog_i_add - 1 >= 0:
-            previous = self.points_backlog[self.points_backlog_i_add - 1]
-            if len(copy_points) == len(previous):
-                for j in range(len(copy_points)):
-                    c_p = copy_points[j]
-                    p_p = previous[j]
-                    if not c_p.get_x() == p_p.get_x() or not c_p.get_y() == \
-                            p_p.get_y():
-                        are_same = False
-                        break
-                    else:
-                        are_same = True
-        if are_same:
-            return
-
-        if save_before_undo:
-            try:
-                self.points_backlog[self.points_backlog_i_add]
-            except IndexError:
-                self.points_backlog.append(copy_points)
-            return
-
-        # Remove obsolete entries
-        removed_points = []
-        i = len(self.points_backlog) - 1
-        while i >= 0:
-            collection = self.points_backlog[i]
-            if i == self.points_backlog_i_add - 1:
-                break
-            else:
-                removed_points.append(collection)
-            i -= 1
-
-        self.entry_in_full_edit = \
-            self.entry_in_full_edit[:self.points_backlog_i_add]
-
-        for r in removed_points:
-            self.points_backlog.remove(r)
-
-        self.points_backlog.append(copy_points)
-        self.entry_in_full_edit.append(full_edit_used)
-        self.points_backlog_i_add += 1
+        self._history.save(self._points, full_edit_used, exclude)
 
-    def next_backlog_entry_done(self):
+    def can_undo_points(self) -> bool:
+        """Returns True if there are saved points to return to.
         """
-        Check if next backlog entry has been done.
+        return self._history.get_undo_count() > 0
 
-        Return:
-             True or False.
+    def can_redo_points(self) -> bool:
+        """Returns True if there are undone points to return to.
         """
-        try:
-            self.points_backlog[self.points_backlog_i_add + 1]
-        except IndexError:
-            return False
-        return True
+        return self._history.get_redo_count() > 0
 
-    def change_points_to_previous(self):
-        """
-        Change the points list reference to another list.
+    def undo_points(self) -> bool:
+        """Change the points to the previously saved points. Returns False
+        if there was nothing to undo.
         """
-        self._points = self.points_backlog[self.points_backlog_i_add - 1]
-        self.points_backlog_i_add -= 1
+        return self._history.undo(self._points)
 
-    def change_points_to_next(self):
+    def redo_points(self) -> bool:
+        """Change the points to the points that were last undone. Returns
+        False if there was nothing to redo.
         """
-        Change the points list reference to another list.
-        """
-        self._points = self.points_backlog[self.points_backlog_i_add + 1]
-        self.points_backlog_i_add += 1
+        return self._history.redo(self._points)
 
     def delete_backlog(self):
         """
         Delete backlog.
         """
-        self.points_backlog = []
-        self.points_backlog_i_add = 0
-        self.entry_in_full_edit = []
+        self._history.clear()
 
-    def get_previous_backlog_index(self):
-        """
-        Return:
-             Index where previous points are in the backlog list.
+    def set_history_depth(self, depth: int):
+        """Sets the maximum number of point changes that can be undone.
+
+        Args:
+            depth: a positive integer
         """
-        return self.points_backlog_i_add - 1
+        self._history.depth = depth
 
     def update_zero_values(self):
         """
@@ -301,24 +234,19 @@ class RecoilElement(MCERDParameterContainer, Serializable):
         """
         return self._edit_lock_on
 
-    def _sort_points(self):
-        """Sorts the points in ascending order by their x coordinate."""
-        self._points.sort()
-
     def get_xs(self) -> List[float]:
         """Returns a list of the x coordinates of the points."""
-        return [point.get_x() for point in self._points]
+        return self._points.get_xs()
 
     def get_ys(self) -> List[float]:
         """Returns a list of the y coordinates of the points."""
-        return [point.get_y() for point in self._points]
+        return self._points.get_ys()
 
     def get_xs_and_ys(self) -> Tuple[List[float], List[float]]:
         """Returns a tuple where first one contains the values on the
         x axis and second one contains the values on the y axis.
         """
-        xs, ys = zip(*(p.get_coordinates() for p in self._points))
-        return xs, ys
+        return self._points.get_xs(), self._points.get_ys()
 
     def get_point(self, i: int) -> Point:
         """Returns the i:th point.
@@ -326,13 +254,12 @@ class RecoilElement(MCERDParameterContainer, Serializable):
         return self._points[i]
 
     def get_points(self) -> List[Point]:
-        """Get points.
+        """Get points. The returned list must not be modified directly.
 
         Return:
              Points list.
         """
-        # TODO maybe return shallow copy
-        return self._points
+        return self._points.get_points()
 
     def get_first_point(self) -> Point:
         """Returns the first point in the distribution.
@@ -357,8 +284,7 @@ class RecoilElement(MCERDParameterContainer, Serializable):
 
     def add_point(self, point: Point):
         """Adds a point and maintains sort order."""
-        self._points.append(point)
-        self._sort_points()
+        self._points.add(point)
 
     def remove_point(self, point: Point):
         """Removes the given point.
@@ -369,21 +295,13 @@ class RecoilElement(MCERDParameterContainer, Serializable):
         """Returns the point whose x coordinate is closest to but
         less than the given point's.
         """
-        ind = self._points.index(point)
-        if ind == 0:
-            return None
-        else:
-            return self._points[ind - 1]
+        return self._points.get_neighbors(point)[0]
 
     def get_right_neighbor(self, point: Point) -> Optional[Point]:
         """Returns the point whose x coordinate is closest to but
         greater than the given point's.
         """
-        ind = self._points.index(point)
-        if ind == len(self._points) - 1:
-            return None
-        else:
-            return self._points[ind + 1]
+        return self._points.get_neighbors(point)[1]
 
     def get_neighbors(self, point: Point) \
             -> Tuple[Optional[Point], Optional[Point]]:
@@ -395,19 +313,7 @@ class RecoilElement(MCERDParameterContainer, Serializable):
         Return:
             left and right neighbour as a tuple
         """
-        ind = self._points.index(point)
-
-        if ind == 0:
-            ln = None
-        else:
-            ln = self._points[ind - 1]
-
-        if ind == len(self._points) - 1:
-            rn = None
-        else:
-            rn = self._points[ind + 1]
-
-        return ln, rn
+        return self._points.get_neighbors(point)
 
     def between_zeros(self, point: Point) -> bool:
         """Checks whether point is between two zero Points.
@@ -488,8 +394,7 @@ class RecoilElement(MCERDParameterContainer, Serializable):
             "color": self.color
         }
 
-        with recoil_file_path.open("w") as file:
-            json.dump(obj, file, indent=4)
+        persistence.write_json_if_changed(recoil_file_path, obj)
 
     @classmethod
     def from_file(cls, file_path: Path, channel_width=None, rec_type="rec") \
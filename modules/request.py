@@ -50,6 +50,7 @@ from .sample import Samples
 from .simulation import Simulation
 from .target import Target
 from .recoil_element import RecoilElement
+from .request_index import RequestIndex
 from .global_settings import GlobalSettings
 from .observing import ProgressReporter
 
@@ -76,6 +77,7 @@ class Request(ElementSimulationContainer, RequestLogger):
 
         self.request_name = name
         self.global_settings = global_settings
+        self.index = RequestIndex(self.directory, self.get_index_file())
         self.samples = Samples(self)
 
         self.__tabs = tabs
@@ -143,6 +145,12 @@ class Request(ElementSimulationContainer, RequestLogger):
         elif save_on_creation:
             self._save()
 
+    def get_index_file(self) -> Path:
+        """Returns the path of the file that indexes the directories of
+        the request.
+        """
+        return self.directory / "Index" / "request_index.json"
+
     def create_folder_structure(self) -> None:
         self.directory.mkdir(exist_ok=True)
         self.default_folder.mkdir(exist_ok=True)
@@ -382,9 +390,7 @@ class Request(ElementSimulationContainer, RequestLogger):
         if measurement in self.__non_slaves:
             return
         self.__non_slaves.append(measurement)
-        paths = [m.path for m in self.__non_slaves]
-        self.__request_information["meta"]["nonslave"] = "|".join(
-            paths)
+        self._update_nonslave_paths()
         self._save()
 
     def include_slave(self, measurement: Measurement) -> None:
@@ -397,11 +403,21 @@ class Request(ElementSimulationContainer, RequestLogger):
         if measurement not in self.__non_slaves:
             return
         self.__non_slaves.remove(measurement)
-        paths = [m.path for m in self.__non_slaves]
-        self.__request_information["meta"]["nonslave"] = "|".join(
-            paths)
+        self._update_nonslave_paths()
         self._save()
 
+    def _update_nonslave_paths(self) -> None:
+        """Stores the paths of non-slave measurements in the request
+        information. Paths of measurements that have not been loaded are
+        kept as they are.
+        """
+        loaded = {str(m.path) for m in self._get_measurements()}
+        paths = [
+            path for path in self.get_nonslave_paths() if path not in loaded
+        ]
+        paths.extend(str(m.path) for m in self.__non_slaves)
+        self.__request_information["meta"]["nonslave"] = "|".join(paths)
+
     def get_name(self) -> str:
         """ Get the request's name.
         
@@ -423,9 +439,8 @@ class Request(ElementSimulationContainer, RequestLogger):
             Returns all the paths for these samples.
         """
         samples = []
-        for item in os.listdir(self.directory):
-            if os.path.isdir(Path(self.directory, item)) and \
-                    item.startswith("Sample_"):
+        for item in self.index.list_dir(self.directory).dirs:
+            if item.startswith("Sample_"):
                 samples.append(Path(self.directory, item))
                 # It is presumed that the sample numbers are of format
                 # '01', '02',...,'10', '11',...
@@ -475,12 +490,28 @@ class Request(ElementSimulationContainer, RequestLogger):
         paths = self.__request_information["meta"]["nonslave"].split("|")
         for measurement in self._get_measurements():
             for path in paths:
-                if path == measurement.path:
+                if path == str(measurement.path):
                     if measurement in self.__non_slaves:
                         continue
                     self.__non_slaves.append(measurement)
         return self.__non_slaves
 
+    def get_nonslave_paths(self) -> List[str]:
+        """Returns the paths of the .info files of measurements that are
+        excluded from slave category, including measurements that have not
+        been loaded.
+        """
+        return [
+            path for path in
+            self.__request_information["meta"]["nonslave"].split("|") if path
+        ]
+
+    def get_master_path(self) -> str:
+        """Returns the path of the .info file of the master measurement or
+        an empty string if the request has no master measurement.
+        """
+        return self.__request_information["meta"]["master"]
+
     def has_master(self) -> Union[str, Measurement]:
         """ Does request have master measurement? Check from config file as
         it is not loaded yet.
@@ -495,7 +526,7 @@ class Request(ElementSimulationContainer, RequestLogger):
         """
         path = self.__request_information["meta"]["master"]
         for measurement in self._get_measurements():
-            if measurement.path == path:
+            if str(measurement.path) == path:
                 return measurement
         return ""
 
@@ -507,7 +538,7 @@ class Request(ElementSimulationContainer, RequestLogger):
             .split("|")
         for measurement in self._get_measurements():
             for path in paths:
-                if path == measurement.path:
+                if path == str(measurement.path):
                     self.__non_slaves.append(measurement)
 
     def _save(self) -> None:
@@ -595,7 +626,7 @@ class Request(ElementSimulationContainer, RequestLogger):
             self.__request_information["meta"]["master"] = ""
         else:
             # name = measurement.name
-            path = measurement.path
+            path = str(measurement.path)
             self.__request_information["meta"]["master"] = path
         self._save()
 
@@ -0,0 +1,280 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Request index module stores the contents of the directories of a request
+(samples, measurements, simulations and their settings files) in a single
+JSON file, so that the directory tree does not have to be walked every time
+the request is opened.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from pathlib import Path
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+INDEX_VERSION = 1
+
+# Directories that have been modified this recently when they are listed
+# are listed again next time, as file systems with a coarse timestamp
+# resolution could hide later modifications.
+_RACY_INTERVAL_NS = 2 * 10 ** 9
+
+
+class DirectoryListing(NamedTuple):
+    """Names of the files and subdirectories in a directory, sorted.
+    """
+    files: List[str]
+    dirs: List[str]
+
+
+def list_directory(directory: Path) -> DirectoryListing:
+    """Lists a directory. Types of the entries are read from the directory
+    itself so the entries are not stat'ed on most file systems.
+
+    Args:
+        directory: directory to list
+
+    Return:
+        DirectoryListing
+    """
+    files, dirs = [], []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                files.append(entry.name)
+            elif entry.is_dir():
+                dirs.append(entry.name)
+    return DirectoryListing(sorted(files), sorted(dirs))
+
+
+class RequestIndex:
+    """Index of the directories of a request.
+
+    Each listed directory is stored with its modification time. An entry
+    is valid as long as the modification time of the directory is the same,
+    so validating it only takes a single stat call. Invalid entries and
+    directories that have not been listed before are listed again.
+
+    The index file is replaced atomically when it is saved. If it is
+    missing, unreadable or of another version, the index is rebuilt as
+    directories are listed.
+    """
+
+    def __init__(self, directory: Path, index_file: Path):
+        """Initializes a new RequestIndex. The index file is read when the
+        first directory is listed.
+
+        Args:
+            directory: root directory of the request. Directories outside
+                of it are listed without the index.
+            index_file: path to the index file
+        """
+        self.directory = Path(directory)
+        self.index_file = Path(index_file)
+        self._entries: Optional[Dict[str, dict]] = None
+        self._modified = False
+        self._lock = threading.RLock()
+
+    def list_dir(self, directory: Path) -> DirectoryListing:
+        """Returns the files and subdirectories of a directory.
+
+        Args:
+            directory: directory to list
+
+        Return:
+            DirectoryListing
+        """
+        key = self._get_key(directory)
+        if key is None:
+            return list_directory(directory)
+
+        mtime = os.stat(directory).st_mtime_ns
+        with self._lock:
+            entry = self._get_entries().get(key)
+        if entry is not None and entry["mtime"] == mtime:
+            return DirectoryListing(entry["files"], entry["dirs"])
+
+        listing = list_directory(directory)
+        if abs(time.time_ns() - mtime) < _RACY_INTERVAL_NS:
+            mtime = None
+        with self._lock:
+            self._get_entries()[key] = {
+                "mtime": mtime,
+                "files": listing.files,
+                "dirs": listing.dirs,
+            }
+            self._modified = True
+        return listing
+
+    def find_files_by_extension(self, directory: Path, *exts) -> \
+            Dict[str, List[Path]]:
+        """Returns the files in a directory that have the given extensions.
+        Same as general_functions.find_files_by_extension but uses the
+        index.
+
+        Args:
+            directory: directory to search
+            exts: file extensions to look for
+
+        Return:
+            dictionary where keys are file extensions and values are lists
+            of paths.
+        """
+        search_dict = {
+            ext: [] for ext in exts
+        }
+        for file in self.list_dir(directory).files:
+            path = Path(directory, file)
+            if path.suffix in search_dict:
+                search_dict[path.suffix].append(path)
+        return search_dict
+
+    def invalidate(self, *directories: Path) -> None:
+        """Forgets the listings of the given directories and saves the
+        index. Should be called when files are created, renamed or deleted
+        in the directories.
+
+        Args:
+            directories: directories whose contents have changed
+        """
+        self._forget(directories, recursive=False)
+
+    def remove(self, *directories: Path) -> None:
+        """Forgets the listings of the given directories and all of their
+        subdirectories and saves the index. Should be called when the
+        directories are deleted or renamed.
+
+        Args:
+            directories: directories that no longer exist
+        """
+        self._forget(directories, recursive=True)
+
+    def _forget(self, directories, recursive: bool) -> None:
+        """Removes directories from the index and saves it if anything was
+        removed.
+        """
+        keys = [self._get_key(directory) for directory in directories]
+        keys = [key for key in keys if key is not None]
+        with self._lock:
+            entries = self._get_entries()
+            for key in keys:
+                if recursive:
+                    removed = [
+                        other for other in entries if key == "." or
+                        other == key or other.startswith(f"{key}/")
+                    ]
+                else:
+                    removed = [key] if key in entries else []
+                for other in removed:
+                    del entries[other]
+                    self._modified = True
+            self.save()
+
+    def save(self) -> None:
+        """Writes the index into the index file if it has been modified.
+        Errors are ignored as the index can always be rebuilt.
+        """
+        with self._lock:
+            if not self._modified:
+                return
+            self._prune()
+            data = {
+                "version": INDEX_VERSION,
+                "directories": self._entries,
+            }
+            try:
+                self.index_file.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_file = tempfile.mkstemp(
+                    dir=self.index_file.parent,
+                    prefix=f"{self.index_file.name}.", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(data, f, separators=(",", ":"))
+                    os.replace(tmp_file, self.index_file)
+                except BaseException:
+                    Path(tmp_file).unlink()
+                    raise
+            except OSError:
+                return
+            self._modified = False
+
+    def _prune(self) -> None:
+        """Removes entries of directories that are no longer listed in their
+        parent directory and entries of their subdirectories.
+        """
+        entries = self._entries
+        pruned = set()
+        for key in sorted(entries, key=lambda k: k.count("/")):
+            if key == ".":
+                continue
+            parent, _, name = key.rpartition("/")
+            parent = parent or "."
+            if parent in pruned or (
+                    parent in entries and
+                    name not in entries[parent]["dirs"]):
+                del entries[key]
+                pruned.add(key)
+
+    def _get_entries(self) -> Dict[str, dict]:
+        """Returns the entries of the index, reading them from the index
+        file if necessary.
+        """
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> Dict[str, dict]:
+        """Reads the index file. An empty index is returned if the file
+        cannot be used.
+        """
+        try:
+            with self.index_file.open("r") as f:
+                data = json.load(f)
+            if data["version"] != INDEX_VERSION:
+                return {}
+            entries = data["directories"]
+            for entry in entries.values():
+                if not isinstance(entry["files"], list) or \
+                        not isinstance(entry["dirs"], list):
+                    return {}
+            return entries
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def _get_key(self, directory: Path) -> Optional[str]:
+        """Returns the key of a directory in the index or None if the
+        directory is not inside the request.
+        """
+        try:
+            return Path(directory).relative_to(self.directory).as_posix()
+        except ValueError:
+            return None
@@ -0,0 +1,341 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Result cache module stores results derived from measurement data (energy
+spectra, depth files, elemental losses) by a fingerprint of their inputs,
+so that unchanged results do not have to be calculated again.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Any
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+
+# Total size of the entries in a cache directory is kept below this
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+_JSON_SUFFIX = ".json"
+_TMP_SUFFIX = ".tmp"
+
+
+class CacheEntry(NamedTuple):
+    """Information of a single cached result.
+    """
+    kind: str
+    key: str
+    path: Path
+    size: int
+    last_used: float
+
+
+def get_fingerprint(*inputs: Any) -> str:
+    """Returns a digest of the given inputs.
+
+    Paths are hashed by their names and contents, so moving a measurement
+    does not change the digest but editing a file does. Directories are
+    hashed by the files they contain and paths that do not exist by their
+    names only. Lists, tuples and mappings are hashed item by item and
+    other values by their repr.
+
+    Args:
+        inputs: values the result depends on
+
+    Return:
+        hex digest
+    """
+    digest = hashlib.sha1()
+    for value in inputs:
+        _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+def _update_digest(digest, value: Any) -> None:
+    """Adds a value to the digest. Each value is prefixed by its type and
+    length so that different sequences of values cannot produce the same
+    data.
+    """
+    def add(tag: str, data: bytes):
+        digest.update(f"{tag}{len(data)}:".encode())
+        digest.update(data)
+
+    if isinstance(value, Path):
+        add("name", value.name.encode())
+        if value.is_dir():
+            files = sorted(f for f in value.iterdir() if f.is_file())
+            add("dir", str(len(files)).encode())
+            for file in files:
+                _update_digest(digest, file)
+        elif value.is_file():
+            add("file", value.read_bytes())
+        else:
+            add("missing", b"")
+    elif isinstance(value, (list, tuple)):
+        add("seq", str(len(value)).encode())
+        for item in value:
+            _update_digest(digest, item)
+    elif isinstance(value, Mapping):
+        add("map", str(len(value)).encode())
+        for k, v in sorted(value.items(), key=lambda item: repr(item[0])):
+            _update_digest(digest, k)
+            _update_digest(digest, v)
+    else:
+        add("val", repr(value).encode())
+
+
+class ResultCache:
+    """Content-addressed cache of results in a directory.
+
+    Each result is stored by its kind (for example 'espe') and a key that
+    is a fingerprint of the inputs of the result. A result is either a JSON
+    document or a set of files. Loading a result marks it as used, and the
+    least recently used results are removed when the cache grows larger
+    than its maximum size.
+
+    Results are written to temporary files first so that a partially
+    written result is never loaded.
+    """
+
+    def __init__(self, directory: Path,
+                 max_size: Optional[int] = DEFAULT_MAX_SIZE):
+        """Initializes a new ResultCache. The directory is created when
+        the first result is saved.
+
+        Args:
+            directory: directory of the cached results
+            max_size: maximum total size of the results in bytes or None
+                if the size is not limited
+        """
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def load_json(self, kind: str, key: str) -> Optional[Any]:
+        """Returns a cached JSON result or None if it is not cached.
+        """
+        file = self._get_path(kind, key, _JSON_SUFFIX)
+        try:
+            with file.open("r") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._touch(file)
+        return value
+
+    def save_json(self, kind: str, key: str, value: Any) -> None:
+        """Stores a result as a JSON document.
+        """
+        file = self._get_path(kind, key, _JSON_SUFFIX)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(
+            dir=self.directory, prefix=f"{file.name}.", suffix=_TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_file, file)
+        except BaseException:
+            Path(tmp_file).unlink()
+            raise
+        self._trim(keep=file)
+
+    def load_files(self, kind: str, key: str, directory: Path) -> \
+            Optional[List[Path]]:
+        """Copies cached result files to a directory.
+
+        Args:
+            kind: kind of the result
+            key: fingerprint of the inputs of the result
+            directory: directory where the files are copied
+
+        Return:
+            paths of the copied files or None if the result is not cached
+        """
+        entry_dir = self._get_path(kind, key)
+        if not entry_dir.is_dir():
+            return None
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            files = [
+                Path(shutil.copy2(file, directory / file.name))
+                for file in sorted(entry_dir.iterdir())
+            ]
+        except OSError:
+            return None
+        self._touch(entry_dir)
+        return files
+
+    def save_files(self, kind: str, key: str, files: Iterable[Path]) -> None:
+        """Stores copies of the given files as a result.
+        """
+        entry_dir = self._get_path(kind, key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(
+            dir=self.directory, prefix=f"{entry_dir.name}.",
+            suffix=_TMP_SUFFIX))
+        try:
+            for file in files:
+                shutil.copy2(file, tmp_dir / Path(file).name)
+            if entry_dir.exists():
+                # Same key means same contents so the old files are fine
+                shutil.rmtree(tmp_dir)
+            else:
+                os.replace(tmp_dir, entry_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        self._touch(entry_dir)
+        self._trim(keep=entry_dir)
+
+    def get_entries(self, kind: Optional[str] = None) -> List[CacheEntry]:
+        """Returns the cached results, least recently used first.
+
+        Args:
+            kind: if given, only results of this kind are returned
+        """
+        if not self.directory.is_dir():
+            return []
+        entries = []
+        for path in self.directory.iterdir():
+            entry = self._get_entry(path)
+            if entry is not None and (kind is None or entry.kind == kind):
+                entries.append(entry)
+        return sorted(entries, key=lambda e: (e.last_used, e.path.name))
+
+    def get_size(self, kind: Optional[str] = None) -> int:
+        """Returns the total size of the cached results in bytes.
+
+        Args:
+            kind: if given, only results of this kind are counted
+        """
+        return sum(entry.size for entry in self.get_entries(kind))
+
+    def evict(self, kind: Optional[str] = None,
+              max_size: Optional[int] = None) -> List[CacheEntry]:
+        """Removes cached results.
+
+        Args:
+            kind: if given, only results of this kind are removed
+            max_size: if given, least recently used results are removed
+                until the total size of the remaining results is at most
+                max_size. Otherwise all results are removed.
+
+        Return:
+            removed results
+        """
+        entries = self.get_entries(kind)
+        if max_size is None:
+            removed = entries
+        else:
+            size = sum(entry.size for entry in entries)
+            removed = []
+            for entry in entries:
+                if size <= max_size:
+                    break
+                removed.append(entry)
+                size -= entry.size
+        for entry in removed:
+            self._remove(entry.path)
+        return removed
+
+    def clear(self) -> None:
+        """Removes all cached results and left over temporary files.
+        """
+        if not self.directory.is_dir():
+            return
+        for path in self.directory.iterdir():
+            if self._get_entry(path) is not None or \
+                    path.name.endswith(_TMP_SUFFIX):
+                self._remove(path)
+
+    def _get_path(self, kind: str, key: str, suffix: str = "") -> Path:
+        """Returns the path of a cached result.
+        """
+        if "." in kind or not key.isalnum():
+            raise ValueError(f"Invalid cache kind or key: {kind}, {key}")
+        return self.directory / f"{kind}.{key}{suffix}"
+
+    def _get_entry(self, path: Path) -> Optional[CacheEntry]:
+        """Returns a CacheEntry of the path or None if the path is not a
+        cached result.
+        """
+        parts = path.name.split(".")
+        if len(parts) == 3 and f".{parts[2]}" == _JSON_SUFFIX:
+            files = [path]
+        elif len(parts) == 2 and path.is_dir():
+            files = [f for f in path.iterdir() if f.is_file()]
+        else:
+            return None
+        try:
+            size = sum(f.stat().st_size for f in files)
+            last_used = path.stat().st_mtime
+        except OSError:
+            # Removed by someone else
+            return None
+        return CacheEntry(parts[0], parts[1], path, size, last_used)
+
+    def _trim(self, keep: Path) -> None:
+        """Removes least recently used results until the cache fits into
+        its maximum size. The given result is always kept.
+        """
+        if self.max_size is None:
+            return
+        entries = self.get_entries()
+        size = sum(entry.size for entry in entries)
+        for entry in entries:
+            if size <= self.max_size:
+                break
+            if entry.path != keep:
+                self._remove(entry.path)
+                size -= entry.size
+
+    @staticmethod
+    def _touch(path: Path) -> None:
+        """Marks a result as used.
+        """
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _remove(path: Path) -> None:
+        """Removes a result file or directory.
+        """
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                path.unlink()
+            except OSError:
+                pass
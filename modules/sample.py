@@ -27,7 +27,6 @@ __author__ = "Severi Jääskeläinen \n Samuel Kaiponen \n Heta Rekilä " \
              "\n Sinikka Siironen"
 __version__ = "2.0"
 
-import os
 
 from pathlib import Path
 from typing import Optional
@@ -89,6 +88,7 @@ class Samples:
             sample = Sample(next_serial, self.request, sample_dir, name)
             self.request.increase_running_int_by_1()
             new_path.mkdir(exist_ok=True)
+            self.request.index.invalidate(self.request.directory)
         self.samples.append(sample)
         return sample
 
@@ -179,8 +179,9 @@ class Sample:
         """
         all_measurements = []   # TODO refactor
         name_prefix = Measurement.DIRECTORY_PREFIX
-        all_dirs = os.listdir(Path(self.request.directory, self.directory))
-        all_dirs.sort()
+        index = self.request.index
+        all_dirs = index.list_dir(
+            Path(self.request.directory, self.directory)).dirs
 
         for directory in all_dirs:
             # Only handle directories that start with name_prefix
@@ -189,8 +190,9 @@ class Sample:
                     # Read measurment number from directory name
                     self._running_int_measurement = int(
                         directory[len(name_prefix):len(name_prefix) + 2])
-                    for file in os.listdir(Path(
-                            self.request.directory, self.directory, directory)):
+                    for file in index.list_dir(Path(
+                            self.request.directory, self.directory,
+                            directory)).files:
                         if file.endswith(".info"):  # TODO break?
                             all_measurements.append(Path(
                                 self.request.directory, self.directory,
@@ -213,8 +215,9 @@ class Sample:
         """
         all_simulations = []    # TODO refactor
         name_prefix = Simulation.DIRECTORY_PREFIX
-        all_dirs = os.listdir(Path(self.request.directory, self.directory))
-        all_dirs.sort()     # TODO why sort here?
+        index = self.request.index
+        all_dirs = index.list_dir(
+            Path(self.request.directory, self.directory)).dirs
 
         for directory in all_dirs:
             # Only handle directories that start with name_prefix
@@ -223,8 +226,9 @@ class Sample:
                     # Read simulation number from directory name
                     self._running_int_simulation = int(
                         directory[len(name_prefix):len(name_prefix) + 2])
-                    for file in os.listdir(Path(
-                            self.request.directory, self.directory, directory)):
+                    for file in index.list_dir(Path(
+                            self.request.directory, self.directory,
+                            directory)).files:
                         if file.endswith(".simulation"):
                             all_simulations.append(Path(
                                 self.request.directory, self.directory,
@@ -36,14 +36,17 @@ __version__ = "2.0"
 import os
 import itertools
 
+import numpy as np
+
 from . import math_functions as mf
 from . import general_functions as gf
 
 import matplotlib as mpl
-
-from dialogs.measurement.selection import SelectionSettingsDialog
+import matplotlib.lines
 
 from pathlib import Path
+from typing import Optional
+from typing import Tuple
 
 from .element import Element
 
@@ -100,6 +103,29 @@ class AxesLimits:
             return False
         return True
 
+    def are_inside(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Vectorized version of is_inside.
+
+        Args:
+            xs: x coordinates of the points
+            ys: y coordinates of the points
+
+        Return:
+            boolean array where True means that the point is within limits.
+        """
+        if not self.__used:
+            return np.zeros(len(xs), dtype=bool)
+        return (xs >= self.__x_min) & (xs <= self.__x_max) & \
+            (ys >= self.__y_min) & (ys <= self.__y_max)
+
+    def get_limits(self) -> Optional[Tuple[int, int, int, int]]:
+        """Returns the limits as a (x_min, x_max, y_min, y_max) tuple or None
+        if the limits have not been set.
+        """
+        if not self.__used:
+            return None
+        return self.__x_min, self.__x_max, self.__y_min, self.__y_max
+
 
 class Selector:
     """Selector objects handles all selections within measurement.
@@ -522,10 +548,45 @@ class Selector:
         if not selection.is_closed:
             selection.events_counted = True
             return
-        for n in range(len(data)):
-            selection.point_inside(data[n])
+        selection.points_inside(data.tof, data.energy)
         selection.events_counted = True
 
+    def events_inside(self, xs: np.ndarray, ys: np.ndarray,
+                      progress=None) -> np.ndarray:
+        """Classifies events against all closed selections at once.
+
+        Event counts of closed selections whose events have not been counted
+        yet are increased by the number of events inside them. Selections
+        that are not closed contain no events.
+
+        Args:
+            xs: x coordinates of the events
+            ys: y coordinates of the events
+            progress: ProgressReporter object
+
+        Return:
+            boolean array of shape (self.count(), len(xs)) where True means
+            that the event is inside the selection.
+        """
+        if progress is not None:
+            progress_callback = progress.report
+        else:
+            progress_callback = None
+        rows = [i for i, sel in enumerate(self.selections) if sel.is_closed]
+        inside = np.zeros((len(self.selections), len(xs)), dtype=bool)
+        if not rows:
+            return inside
+
+        closed = [self.selections[i] for i in rows]
+        inside[rows] = mf.points_inside_polygons(
+            xs, ys, [sel.get_points() for sel in closed],
+            [sel.axes_limits.get_limits() for sel in closed],
+            progress_callback=progress_callback)
+        for selection, mask in zip(closed, inside[rows]):
+            if not selection.events_counted:
+                selection.event_count += int(np.count_nonzero(mask))
+        return inside
+
     def update_selection_points(self, progress=None):
         """Update all selections event counts.
 
@@ -537,12 +598,7 @@ class Selector:
             selection.events_counted = False
             selection.event_count = 0
 
-        for i, point in enumerate(data):
-            for selection in self.selections:
-                if selection.is_closed:
-                    selection.point_inside(point)
-            if progress is not None and i % 10_000 == 0:
-                progress.report(i / len(data) * 100)
+        self.events_inside(data.tof, data.energy, progress=progress)
 
         for selection in self.selections:
             selection.events_counted = True
@@ -656,7 +712,8 @@ class Selection:
                 x.append(point[0])
                 y.append(point[1])
                 self.points.set_data(x, y)
-            self.axes.add_line(self.points)
+            if self.axes is not None:
+                self.axes.add_line(self.points)
             return 0
 
     def undo_last(self):
@@ -756,6 +813,9 @@ class Selection:
 
         selection_completed = True
         if canvas is not None:
+            # Imported here so that selections can be loaded and cut without
+            # Qt, e.g. in batch processing.
+            from dialogs.measurement.selection import SelectionSettingsDialog
             canvas.draw_idle()
             selection_settings_dialog = SelectionSettingsDialog(self)
             # True = ok, False = cancel -> delete selection
@@ -774,7 +834,8 @@ class Selection:
     def draw(self):
         """Draw selection points into graph (matplotlib) axes
         """
-        self.axes.add_line(self.points)
+        if self.axes is not None:
+            self.axes.add_line(self.points)
 
     def set_color(self, color):
         """Set selection color
@@ -891,3 +952,20 @@ class Selection:
         if inside and not self.events_counted:
             self.event_count += 1
         return inside
+
+    def points_inside(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """Vectorized version of point_inside.
+
+        Args:
+            xs: x coordinates of the points
+            ys: y coordinates of the points
+
+        Return:
+            boolean array where True means that the point is within selection.
+        """
+        inside, = mf.points_inside_polygons(
+            xs, ys, [self.get_points()], [self.axes_limits.get_limits()])
+        # While at it, increase event point counts if not counted already.
+        if not self.events_counted:
+            self.event_count += int(np.count_nonzero(inside))
+        return inside
@@ -37,6 +37,7 @@ from collections import namedtuple
 from pathlib import Path
 from typing import Optional
 from typing import List
+from typing import NamedTuple
 
 from . import general_functions as gf
 
@@ -47,11 +48,20 @@ from .base import Serializable
 from .enums import SimulationType
 from .detector import Detector
 from .element_simulation import ElementSimulation
+from .request_index import RequestIndex
 from .run import Run
 from .target import Target
 from .ui_log_handlers import SimulationLogger
 
 
+class SimulationSettings(NamedTuple):
+    """Files of a simulation and the settings that are read from them.
+    """
+    files: tuple
+    target: Optional[Target]
+    detector: Optional[Detector]
+
+
 class Simulations:
     """Simulations class handles multiple simulations.
     """
@@ -85,14 +95,48 @@ class Simulations:
             return None
         return self.simulations[key]
 
-    def add_simulation_file(self, sample: "Sample", simulation_file: Path,
-                            tab_id: int) -> Optional["Simulation"]:
+    def read_settings(self, directory: Path) -> SimulationSettings:
+        """Finds the files in a simulation directory and reads the target
+        and detector settings from them.
+
+        Reading does not modify the request, so settings can be read in
+        another thread before the simulation is added.
+
+        Args:
+            directory: directory of the simulation
+
+        Return:
+            SimulationSettings
+        """
+        files = Simulation.find_simulation_files(
+            directory, index=self.request.index)
+
+        if files.target is not None:
+            target = Target.from_file(files.target, self.request)
+        else:
+            target = None
+
+        if files.detector is not None:
+            detector = Detector.from_file(
+                files.detector, self.request, save_on_creation=False)
+            detector.update_directories(files.detector.parent)
+        else:
+            detector = None
+
+        return SimulationSettings(files, target, detector)
+
+    def add_simulation_file(
+            self, sample: "Sample", simulation_file: Path, tab_id: int,
+            settings: Optional[SimulationSettings] = None) -> \
+            Optional["Simulation"]:
         """Add a new file to simulations.
 
         Args:
             sample: The sample under which the simulation is put.
             simulation_file: Path of the .simulation file.
             tab_id: Integer representing identifier for simulation's tab.
+            settings: settings of the simulation if they have already been
+                read with read_settings.
 
         Return:
             Returns new simulation or None if it wasn't added
@@ -104,23 +148,13 @@ class Simulations:
 
         # Create simulation from file
         if simulation_file.exists():
+            if settings is None:
+                settings = self.read_settings(simulation_folder)
             (target_file, mesu_file,
              elem_sim_files, profile_files,
-             detector_file) = Simulation.find_simulation_files(
-                simulation_folder)
-
-            if target_file is not None:
-                target = Target.from_file(
-                    target_file, sample.request)
-            else:
-                target = None
-
-            if detector_file is not None:
-                detector = Detector.from_file(
-                    detector_file, sample.request, save_on_creation=False)
-                detector.update_directories(detector_file.parent)
-            else:
-                detector = None
+             detector_file) = settings.files
+            target = settings.target
+            detector = settings.detector
 
             simulation = Simulation.from_file(
                 sample.request, simulation_file, measurement_file=mesu_file,
@@ -164,6 +198,7 @@ class Simulations:
                 simulation = Simulation(
                     simulation_file, self.request, name=simulation_name,
                     tab_id=tab_id, sample=sample)
+                self.request.index.invalidate(simulation_folder.parent)
                 serial_number = int(simulation_folder.name[len(
                     directory_prefix):len(directory_prefix) + 2])
                 simulation.serial_number = serial_number
@@ -315,7 +350,12 @@ class Simulation(SimulationLogger, ElementSimulationContainer, Serializable):
         """
         # TODO should .measurement file also be renamed?
         old_file_name = self.simulation_file
-        gf.rename_entity(self, new_name)
+        old_directory = self.directory
+        try:
+            gf.rename_entity(self, new_name)
+        finally:
+            self.request.index.remove(old_directory)
+            self.request.index.invalidate(old_directory.parent)
         # self.name is updated during gf.rename_entity, so no need to
         # update simulation file here
         # TODO add function get_simulation_file to dynamically
@@ -339,14 +379,20 @@ class Simulation(SimulationLogger, ElementSimulationContainer, Serializable):
             break
 
     @staticmethod
-    def find_simulation_files(simulation_dir: Path) -> namedtuple:
-        """Returns a tuple of all simulation files.
+    def find_simulation_files(simulation_dir: Path,
+                              index: Optional[RequestIndex] = None) -> \
+            namedtuple:
+        """Returns a tuple of all simulation files. If an index is given,
+        directories are listed with it.
         """
-        res = gf.find_files_by_extension(
+        if index is not None:
+            find_files = index.find_files_by_extension
+        else:
+            find_files = gf.find_files_by_extension
+        res = find_files(
             simulation_dir, ".mcsimu", ".target", ".measurement", ".profile")
         try:
-            det_res = gf.find_files_by_extension(
-                simulation_dir / "Detector", ".detector")
+            det_res = find_files(simulation_dir / "Detector", ".detector")
         except OSError:
             det_res = {".detector": []}
 
@@ -0,0 +1,192 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+Spectrum alignment module places energy spectra on a common grid of
+channels and compares them with array operations. Optimizers use it to
+calculate the differences between simulated and measured spectra.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import numpy as np
+
+from typing import NamedTuple
+from typing import Tuple
+
+from .base import Espe
+
+
+class AlignedSpectra(NamedTuple):
+    """Two spectra on the same grid of channels. Channels that are missing
+    from either spectrum have zero yield in it.
+    """
+    x: np.ndarray
+    y1: np.ndarray
+    y2: np.ndarray
+
+
+def to_arrays(espe: Espe) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the energies and yields of a spectrum as arrays.
+    """
+    data = np.asarray(espe, dtype=float).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def get_channels(x: np.ndarray, origin: float, channel_width: float) \
+        -> np.ndarray:
+    """Returns the channel index of each energy counted from the origin.
+
+    Args:
+        x: energies
+        origin: energy of channel 0
+        channel_width: width of a channel
+
+    Return:
+        integer array
+    """
+    return np.rint((x - origin) / channel_width).astype(np.int64)
+
+
+def average_adjacent_channels(espe: Espe, channel_width: float) -> Espe:
+    """Returns a spectrum where each point is the average of two adjacent
+    points of the given spectrum. A zero point is added to both ends first,
+    so the result has one point more than the given spectrum.
+
+    This moves the points of a measured spectrum to the same energies as
+    the points of a simulated spectrum.
+
+    Args:
+        espe: spectrum as a list of (energy, yield) tuples
+        channel_width: channel width used for the added zero points
+
+    Return:
+        spectrum as a list of (energy, yield) tuples
+    """
+    x, y = to_arrays(espe)
+    x = np.concatenate((
+        [round(x[0] - channel_width, 4)], x, [round(x[-1] + channel_width, 4)]
+    ))
+    y = np.concatenate(([0.0], y, [0.0]))
+    new_x = np.round((x[1:] + x[:-1]) / 2, 4)
+    new_y = np.round((y[1:] + y[:-1]) / 2, 5)
+    return list(zip(new_x.tolist(), new_y.tolist()))
+
+
+def align_spectra(espe1: Espe, espe2: Espe, channel_width: float) \
+        -> AlignedSpectra:
+    """Places two spectra on the same grid of channels. Both spectra are
+    expected to have their points at the same channel energies.
+
+    Args:
+        espe1: spectrum as a list of (energy, yield) tuples
+        espe2: spectrum as a list of (energy, yield) tuples
+        channel_width: width of a channel
+
+    Return:
+        AlignedSpectra that covers the energies of both spectra
+    """
+    x1, y1 = to_arrays(espe1)
+    return ReferenceSpectrum(espe2, channel_width).align(x1, y1)
+
+
+def get_area_between(y1: np.ndarray, y2: np.ndarray, channel_width: float) \
+        -> float:
+    """Returns the area between two aligned spectra.
+
+    The area is calculated like the area of the polygon formed by the
+    spectra, so areas where the first spectrum is above the second one and
+    areas where it is below cancel each other out.
+    """
+    if y1.size < 2:
+        return 0.0
+    diff = y1 - y2
+    return abs(channel_width * (diff.sum() - (diff[0] + diff[-1]) / 2))
+
+
+def get_mean_squared_error(y1: np.ndarray, y2: np.ndarray) -> float:
+    """Returns the mean squared error of two aligned spectra.
+    """
+    return float(np.mean((y1 - y2) ** 2))
+
+
+class ReferenceSpectrum:
+    """Spectrum that other spectra are compared to, for example the measured
+    spectrum of an optimization. Channels of the spectrum are calculated
+    once, so comparing a spectrum to it only needs to place the other
+    spectrum on the grid.
+    """
+    __slots__ = "channel_width", "origin", "_channels", "_first", "_last", \
+                "_y"
+
+    def __init__(self, espe: Espe, channel_width: float):
+        """Initializes a new ReferenceSpectrum.
+
+        Args:
+            espe: spectrum as a list of (energy, yield) tuples
+            channel_width: width of a channel
+        """
+        x, y = to_arrays(espe)
+        self.channel_width = channel_width
+        self.origin = x[0] if x.size else 0.0
+        self._channels = get_channels(x, self.origin, channel_width)
+        self._first = self._channels.min(initial=0)
+        self._last = self._channels.max(initial=0)
+        self._y = y
+
+    def align(self, x: np.ndarray, y: np.ndarray) -> AlignedSpectra:
+        """Places a spectrum and the reference spectrum on the same grid.
+
+        Args:
+            x: energies of the spectrum
+            y: yields of the spectrum
+
+        Return:
+            AlignedSpectra where y1 is the given spectrum and y2 is the
+            reference spectrum
+        """
+        channels = get_channels(x, self.origin, self.channel_width)
+        first = min(self._first, channels.min(initial=self._first))
+        last = max(self._last, channels.max(initial=self._last))
+
+        y1 = np.zeros(last - first + 1)
+        y1[channels - first] = y
+        y2 = np.zeros(last - first + 1)
+        y2[self._channels - first] = self._y
+        grid = self.origin + np.arange(first, last + 1) * self.channel_width
+        return AlignedSpectra(grid, y1, y2)
+
+    def get_differences(self, espe: Espe) -> Tuple[float, float]:
+        """Returns the area between the spectrum and the reference spectrum
+        and their mean squared error.
+
+        Args:
+            espe: spectrum as a list of (energy, yield) tuples
+
+        Return:
+            area and mean squared error
+        """
+        aligned = self.align(*to_arrays(espe))
+        return (
+            get_area_between(aligned.y1, aligned.y2, self.channel_width),
+            get_mean_squared_error(aligned.y1, aligned.y2)
+        )
@@ -35,6 +35,7 @@ from pathlib import Path
 from typing import Optional, Set
 from typing import List
 
+from . import persistence
 from .base import Serializable, AdjustableSettings
 from .element import Element
 from .layer import Layer
@@ -152,8 +153,7 @@ class Target(Serializable, AdjustableSettings):
             }
             obj["layers"].append(layer_obj)
 
-        with target_file.open("w") as file:
-            json.dump(obj, file, indent=4)
+        persistence.write_json_if_changed(target_file, obj)
 
     def _get_attrs(self) -> Set[str]:
         """Returns a set of attribute names. These Target attribute values
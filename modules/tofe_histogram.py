@@ -0,0 +1,111 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+
+ToF-E histogram module bins measured events into a two dimensional grid of
+event counts. The grid is cached so that it only has to be recomputed when
+the binning changes.
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+import numpy as np
+
+AxesRange = Sequence[Sequence[float]]
+
+
+class HistogramGrid(NamedTuple):
+    """Event counts binned on two axes. counts[i, j] is the number of events
+    in the bin between x_edges[i:i + 2] and y_edges[j:j + 2].
+    """
+    counts: np.ndarray
+    x_edges: np.ndarray
+    y_edges: np.ndarray
+
+    @property
+    def extent(self) -> Tuple[float, float, float, float]:
+        """Returns the left, right, bottom and top edges of the grid.
+        """
+        return (self.x_edges[0], self.x_edges[-1],
+                self.y_edges[0], self.y_edges[-1])
+
+    def transpose(self) -> "HistogramGrid":
+        """Returns a grid with x and y axes swapped.
+        """
+        return HistogramGrid(self.counts.T, self.y_edges, self.x_edges)
+
+
+class ToFEHistogram:
+    """Bins ToF-E events into a HistogramGrid. The latest grid is cached and
+    reused as long as the bin counts and the binning range stay the same.
+    """
+    __slots__ = "_tof", "_energy", "_key", "_grid"
+
+    def __init__(self, tof: np.ndarray, energy: np.ndarray):
+        """Initializes a new ToFEHistogram.
+
+        Args:
+            tof: time of flight values of the events
+            energy: energy values of the events
+        """
+        self._tof = tof
+        self._energy = energy
+        self._key = None
+        self._grid: Optional[HistogramGrid] = None
+
+    def get_grid(self, bins: Tuple[int, int],
+                 axes_range: Optional[AxesRange] = None,
+                 transposed: bool = False) -> HistogramGrid:
+        """Returns the binned event counts.
+
+        Args:
+            bins: number of bins on the x and y axes
+            axes_range: lower and upper limits of the bins on the x and y
+                axes. If None, the limits of the data are used.
+            transposed: if True, energy is on the x axis and time of flight
+                on the y axis. Otherwise the other way around.
+
+        Return:
+            HistogramGrid
+        """
+        bins = tuple(bins)
+        if axes_range is not None:
+            axes_range = tuple(tuple(limits) for limits in axes_range)
+        if transposed:
+            bins = bins[::-1]
+            if axes_range is not None:
+                axes_range = axes_range[::-1]
+
+        key = bins, axes_range
+        if key != self._key:
+            self._grid = HistogramGrid(*np.histogram2d(
+                self._tof, self._energy, bins=bins, range=axes_range))
+            self._key = key
+
+        if transposed:
+            return self._grid.transpose()
+        return self._grid
@@ -51,6 +51,7 @@ from PyQt5.QtWidgets import QMenu
 from PyQt5.QtWidgets import QTreeWidgetItem
 
 import dialogs.dialog_functions as df
+import modules.lazy_loading as lazy_loading
 import widgets.gui_utils as gutils
 import widgets.input_validation as iv
 from dialogs.about import AboutDialog
@@ -63,6 +64,8 @@ from dialogs.new_request import RequestNewDialog
 from dialogs.request_settings import RequestSettingsDialog
 from dialogs.simulation.new_simulation import SimulationNewDialog
 from modules.global_settings import GlobalSettings
+from modules.lazy_loading import Prefetcher
+from modules.lazy_loading import RequestItem
 from modules.measurement import Measurement
 from modules.request import Request
 from modules.selection import Selector
@@ -109,12 +112,19 @@ class Potku(QtWidgets.QMainWindow):
         self.tab_widgets = {}
         self.tab_id = 0  # identification for each tab
 
+        # Measurements and simulations that are shown in the tree but have
+        # not been loaded yet when lazy loading is used
+        self.lazy_items = {}
+        self.request_items = []
+        self.prefetcher = None
+
         # Set up connections within UI
         self.actionNew_Measurement.triggered.connect(self.open_new_measurement)
         self.requestSettingsButton.clicked.connect(self.open_request_settings)
         self.globalSettingsButton.clicked.connect(self.open_global_settings)
         self.tabs.tabCloseRequested.connect(self.remove_tab)
         self.treeWidget.itemDoubleClicked.connect(self.focus_selected_tab)
+        self.treeWidget.currentItemChanged.connect(self.__prefetch_tree_item)
 
         self.requestNewButton.clicked.connect(self.make_new_request)
         self.requestOpenButton.clicked.connect(self.open_request)
@@ -216,7 +226,7 @@ class Potku(QtWidgets.QMainWindow):
             menu.addAction("Remove", self.__remove_tree_item)
 
         current_item = self.treeWidget.currentItem()
-        if current_item and isinstance(current_item.obj, Measurement):
+        if current_item and self.__is_measurement_item(current_item):
             menu.addAction("Make master", self.__make_master_measurement)
             menu.addAction("Remove master", self.__remove_master_measurement)
             menu.addAction(
@@ -241,6 +251,7 @@ class Potku(QtWidgets.QMainWindow):
 
         if not clicked_item:
             return
+        self.__load_tree_item(clicked_item)
         # TODO do all name validation in the backend modules
         regex = "^[A-Za-z0-9-ÖöÄäÅå]+"
         valid_text = iv.validate_text_input(clicked_item.text(0), regex)
@@ -313,6 +324,7 @@ class Potku(QtWidgets.QMainWindow):
         clicked_item = self.treeWidget.currentItem()
 
         if clicked_item:
+            self.__load_tree_item(clicked_item)
             if type(clicked_item.obj) is Measurement:
                 obj_type = "measurement"
             elif type(clicked_item.obj) is Simulation:
@@ -334,8 +346,17 @@ class Potku(QtWidgets.QMainWindow):
             clicked_item.parent().obj.remove_obj(clicked_item.obj)
             clicked_item.obj.close_log_files()
 
+            # Pending edits must not be written into the removed directory
+            tab = self.tab_widgets.get(clicked_item.obj.tab_id)
+            if isinstance(tab, SimulationTabWidget) and \
+                    tab.simulation_target is not None:
+                tab.simulation_target.stop_automatic_saving(
+                    save_changes=False)
+
             # Remove object directory
             shutil.rmtree(clicked_item.obj.directory)
+            self.request.index.remove(clicked_item.obj.directory)
+            self.request.index.invalidate(clicked_item.obj.directory.parent)
 
             # Remove object from tree
             clicked_item.parent().removeChild(clicked_item)
@@ -351,7 +372,13 @@ class Potku(QtWidgets.QMainWindow):
         """
         Save recoil elements and simulation targets and close the program.
         """
+        for tab in self.tab_widgets.values():
+            if isinstance(tab, SimulationTabWidget) and \
+                    tab.simulation_target is not None:
+                tab.simulation_target.flush_saves()
+
         if self.request is not None:
+            self.request.index.save()
             for sample in self.request.samples.samples:
                 for simulation in sample.simulations.simulations.values():
                     for elem_sim in simulation.element_simulations:
@@ -370,6 +397,9 @@ class Potku(QtWidgets.QMainWindow):
         if isinstance(widget, BaseTab):
             widget.save_geometries()
 
+        if self.prefetcher is not None:
+            self.prefetcher.shutdown()
+
         super().closeEvent(event)
 
     def are_simulations_stopped(self):
@@ -483,7 +513,7 @@ class Potku(QtWidgets.QMainWindow):
         """Deletes the selected tree widget items.
         """
         # TODO: Memory isn't released correctly. Maybe because of matplotlib.
-        selected_tabs = [self.tab_widgets[item.tab_id] for
+        selected_tabs = [self.__get_tab(item.tab_id) for
                          item in self.treeWidget.selectedItems()]
         if selected_tabs:  # Ask user a confirmation.
             reply = QtWidgets.QMessageBox.question(
@@ -506,6 +536,8 @@ class Potku(QtWidgets.QMainWindow):
 
                 # Remove measurement's directory tree
                 shutil.rmtree(measurement.directory)
+                self.request.index.remove(measurement.directory)
+                self.request.index.invalidate(measurement.directory.parent)
                 Path(self.request.directory /
                      measurement.measurement_file).unlink()
             except:
@@ -551,7 +583,7 @@ class Potku(QtWidgets.QMainWindow):
         sbh = StatusBarHandler(self.statusbar)
         try:
             tab_id = clicked_item.tab_id
-            tab = self.tab_widgets[tab_id]
+            tab = self.__get_tab(tab_id)
 
             if type(tab) is SimulationTabWidget:
                 kwargs = {
@@ -935,12 +967,24 @@ class Potku(QtWidgets.QMainWindow):
         self.load_request_samples(progress=sbh.reporter.get_sub_reporter(
             lambda x: 20 + 0.2 * x
         ))
-        self.load_request_measurements(progress=sbh.reporter.get_sub_reporter(
-            lambda x: 40 + 0.2 * x
-        ))
-        self.load_request_simulations(progress=sbh.reporter.get_sub_reporter(
-            lambda x: 80 + 0.2 * x
-        ))
+        if self.settings.get_lazy_loading():
+            self.load_request_items(progress=sbh.reporter.get_sub_reporter(
+                lambda x: 40 + 0.6 * x
+            ))
+            # Master has to be loaded so that it can be set for the request
+            master_path = self.request.get_master_path()
+            for item in list(self.lazy_items.values()):
+                if str(item.file) == master_path:
+                    self.__get_tab(item.tab_id)
+        else:
+            self.load_request_measurements(
+                progress=sbh.reporter.get_sub_reporter(
+                    lambda x: 40 + 0.2 * x
+                ))
+            self.load_request_simulations(
+                progress=sbh.reporter.get_sub_reporter(
+                    lambda x: 80 + 0.2 * x
+                ))
 
         self.__remove_introduction_tab()
         self.__set_request_buttons_enabled(True)
@@ -962,16 +1006,15 @@ class Potku(QtWidgets.QMainWindow):
                     0)[0]
                 for i in range(sample_item.childCount()):
                     item = sample_item.child(i)
-                    tab_widget = self.tab_widgets[item.tab_id]
-                    tab_name = tab_widget.obj.name
+                    tab_name = item.obj.name
                     if master_measurement_name and \
                             item.tab_id == master_measurement.tab_id:
                         item.setText(0,
                                      "{0} (master)".format(
                                          master_measurement_name))
-                    elif tab_widget.obj in nonslaves or \
-                            not master_measurement_name or type(
-                        tab_widget.obj) == Simulation:
+                    elif self.__is_nonslave(item.obj, nonslaves) or \
+                            not master_measurement_name or \
+                            not self.__is_measurement_item(item):
                         item.setText(0, tab_name)
                     else:
                         item.setText(0, "{0} (slave)".format(tab_name))
@@ -985,6 +1028,8 @@ class Potku(QtWidgets.QMainWindow):
                 # TODO Sample was not found in tree.
                 pass
 
+        # Directories listed while opening are found from the index next time
+        self.request.index.save()
         sbh.reporter.report(100)
 
     def open_request_settings(self):
@@ -1081,20 +1126,11 @@ class Potku(QtWidgets.QMainWindow):
             progress.report(cur_progress)
 
         if tab_type == "measurement":
-            measurement = \
-                self.request.samples.measurements.add_measurement_file(
-                    sample, filepath, self.tab_id, object_name,
-                    import_evnt_or_binary=import_evnt_or_binary,
-                    selector_cls=Selector)
+            measurement, tab = self.__create_tab(
+                tab_type, filepath, sample, self.tab_id,
+                object_name=object_name,
+                import_evnt_or_binary=import_evnt_or_binary)
             if measurement is not None:
-                tab = MeasurementTabWidget(self.tab_id, measurement,
-                                           self.icon_manager,
-                                           statusbar=self.statusbar)
-                tab.issueMaster.connect(self.__master_issue_commands)
-
-                tab.setAttribute(QtCore.Qt.WA_DeleteOnClose)
-                self.tab_widgets[self.tab_id] = tab
-                tab.add_log()
                 tab.data_loaded = load_data
                 if load_data:
                     measurement.load_data()
@@ -1119,17 +1155,10 @@ class Potku(QtWidgets.QMainWindow):
             return measurement
 
         if tab_type == "simulation":
-            simulation = self.request.samples.simulations.add_simulation_file(
-                sample, filepath, self.tab_id)
+            simulation, tab = self.__create_tab(
+                tab_type, filepath, sample, self.tab_id)
 
             if simulation is not None:
-                tab = SimulationTabWidget(self.request, self.tab_id, simulation,
-                                          self.icon_manager,
-                                          statusbar=self.statusbar)
-
-                tab.setAttribute(QtCore.Qt.WA_DeleteOnClose)
-                tab.add_log()
-                self.tab_widgets[self.tab_id] = tab
                 tab.data_loaded = load_data
                 if load_data:
                     tab.add_simulation_target_and_recoil(
@@ -1149,6 +1178,182 @@ class Potku(QtWidgets.QMainWindow):
                 self.__add_item_to_tree(sample_item, simulation, load_data)
                 self.tab_id += 1
 
+    def __create_tab(self, tab_type, filepath: Path, sample, tab_id,
+                     object_name="", import_evnt_or_binary=False,
+                     settings=None):
+        """Makes a new measurement or simulation and a tab for it. Data is
+        not loaded and the tab is not added into TabWidget.
+
+        Args:
+            tab_type: Either "measurement" or "simulation".
+            filepath: A Path representing measurement or simulation file
+                path, or data path when creating a new measurement.
+            sample: The sample under which the measurement or simulation is put.
+            tab_id: identifier of the tab.
+            object_name: When creating a new Measurement, this is the name
+                for it.
+            import_evnt_or_binary: Whether evnt or lst data is being imported
+                or not.
+            settings: settings of the measurement or simulation if they have
+                already been read.
+
+        Return:
+            the new measurement or simulation and its tab, or None and None
+            if it could not be made
+        """
+        if tab_type == "measurement":
+            measurement = \
+                self.request.samples.measurements.add_measurement_file(
+                    sample, filepath, tab_id, object_name,
+                    import_evnt_or_binary=import_evnt_or_binary,
+                    selector_cls=Selector, settings=settings)
+            if measurement is None:
+                return None, None
+            tab = MeasurementTabWidget(tab_id, measurement,
+                                       self.icon_manager,
+                                       statusbar=self.statusbar)
+            tab.issueMaster.connect(self.__master_issue_commands)
+
+            tab.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+            self.tab_widgets[tab_id] = tab
+            tab.add_log()
+            tab.data_loaded = False
+            return measurement, tab
+
+        simulation = self.request.samples.simulations.add_simulation_file(
+            sample, filepath, tab_id, settings=settings)
+        if simulation is None:
+            return None, None
+        tab = SimulationTabWidget(self.request, tab_id, simulation,
+                                  self.icon_manager,
+                                  statusbar=self.statusbar)
+
+        tab.setAttribute(QtCore.Qt.WA_DeleteOnClose)
+        tab.add_log()
+        self.tab_widgets[tab_id] = tab
+        tab.data_loaded = False
+        return simulation, tab
+
+    def load_request_items(self, progress=None):
+        """Adds the measurements and simulations of the request into the
+        tree without loading them. They are loaded when they are opened or
+        otherwise needed.
+
+        Args:
+            progress: a ProgressReporter object
+        """
+        self.request_items = lazy_loading.get_request_items(
+            self.request.samples.samples, first_tab_id=self.tab_id)
+        if self.prefetcher is None:
+            self.prefetcher = Prefetcher(self.__read_item_settings)
+
+        count = len(self.request_items)
+        for i, item in enumerate(self.request_items):
+            sample_item = self.treeWidget.findItems(
+                "%02d" % item.sample.serial_number + " " + item.sample.name,
+                Qt.MatchEndsWith, 0)[0]
+            self.__add_item_to_tree(sample_item, item, False)
+            self.lazy_items[item.tab_id] = item
+            self.tab_id += 1
+
+            if progress is not None:
+                progress.report(i / count * 100)
+
+        if progress is not None:
+            progress.report(100)
+
+    @staticmethod
+    def __read_item_settings(item: RequestItem):
+        """Reads the settings of an item in a background thread. Errors are
+        not logged there as the log is shown in the GUI. If reading fails,
+        the settings are read again when the item is loaded.
+        """
+        return lazy_loading.read_item_settings(item, log_errors=False)
+
+    def __get_tab(self, tab_id):
+        """Returns the tab with the given id. If the measurement or
+        simulation of the tab has not been loaded yet, it is loaded first.
+
+        Args:
+            tab_id: identifier of the tab
+
+        Return:
+            MeasurementTabWidget, SimulationTabWidget or None if the item
+            could not be loaded
+        """
+        item = self.lazy_items.pop(tab_id, None)
+        if item is None:
+            return self.tab_widgets.get(tab_id)
+
+        settings = self.prefetcher.get(item)
+        obj, tab = self.__create_tab(
+            item.item_type, item.file, item.sample, item.tab_id,
+            settings=settings)
+
+        tree_item = self.__find_tree_item(tab_id)
+        if tree_item is not None and obj is not None:
+            tree_item.obj = obj
+        self.prefetcher.prefetch(lazy_loading.get_neighbours(
+            self.__get_unloaded_items(item), item, 2))
+        return tab
+
+    def __load_tree_item(self, tree_item):
+        """Loads the measurement or simulation of a tree item if it has not
+        been loaded yet.
+        """
+        if isinstance(tree_item.obj, RequestItem):
+            self.__get_tab(tree_item.tab_id)
+
+    def __get_unloaded_items(self, item: RequestItem):
+        """Returns the items that have not been loaded yet and the given
+        item in the order they are in the tree.
+        """
+        return [
+            other for other in self.request_items
+            if other.tab_id in self.lazy_items or other is item
+        ]
+
+    def __prefetch_tree_item(self, current, *_):
+        """Starts reading the settings of the current tree item and its
+        neighbours in the background if they have not been loaded yet.
+        """
+        if current is None or self.prefetcher is None:
+            return
+        item = self.lazy_items.get(getattr(current, "tab_id", None))
+        if item is None:
+            return
+        self.prefetcher.prefetch([item, *lazy_loading.get_neighbours(
+            self.__get_unloaded_items(item), item, 2)])
+
+    def __find_tree_item(self, tab_id):
+        """Returns the tree item of the tab with the given id or None.
+        """
+        tree_root = self.treeWidget.invisibleRootItem()
+        for i in range(tree_root.childCount()):
+            sample_item = tree_root.child(i)
+            for j in range(sample_item.childCount()):
+                tree_item = sample_item.child(j)
+                if tree_item.tab_id == tab_id:
+                    return tree_item
+        return None
+
+    @staticmethod
+    def __is_measurement_item(tree_item) -> bool:
+        """Returns whether the tree item is a measurement, loaded or not.
+        """
+        obj = tree_item.obj
+        if isinstance(obj, RequestItem):
+            return obj.item_type == lazy_loading.MEASUREMENT
+        return isinstance(obj, Measurement)
+
+    def __is_nonslave(self, obj, nonslaves) -> bool:
+        """Returns whether a measurement, loaded or not, is excluded from
+        slaves.
+        """
+        if isinstance(obj, RequestItem):
+            return str(obj.file) in self.request.get_nonslave_paths()
+        return obj in nonslaves
+
     @gutils.block_treewidget_signals
     def __change_tab_icon(self, tree_item, icon="folder_open.svg"):
         """Change tab icon in QTreeWidgetItem.
@@ -1168,9 +1373,15 @@ class Potku(QtWidgets.QMainWindow):
             self.treeWidget.clear()
             self.tabs.clear()
             self.request.close_log_files()
+            self.request.index.save()
             self.request = None
             self.tab_widgets = {}
             self.tab_id = 0
+            self.lazy_items = {}
+            self.request_items = []
+            if self.prefetcher is not None:
+                self.prefetcher.shutdown()
+                self.prefetcher = None
 
     @gutils.block_treewidget_signals
     def __set_slave_status(self, is_slave):
@@ -1183,6 +1394,7 @@ class Potku(QtWidgets.QMainWindow):
         if not items:
             return
         clicked_item = self.treeWidget.currentItem()
+        self.__load_tree_item(clicked_item)
 
         if is_slave:
             self.request.include_slave(clicked_item.obj)
@@ -1200,7 +1412,7 @@ class Potku(QtWidgets.QMainWindow):
         if not items:
             return
         master_tree = items[0]
-        master_tab = self.tab_widgets[master_tree.tab_id]
+        master_tab = self.__get_tab(master_tree.tab_id)
         self.request.set_master(master_tab.obj)
         # old_master = self.request.get_master()
         nonslaves = self.request.get_nonslaves()
@@ -1210,16 +1422,19 @@ class Potku(QtWidgets.QMainWindow):
             sample_item = tree_root.child(i)
             for j in range(sample_item.childCount()):
                 tree_item = sample_item.child(j)
-                if isinstance(tree_item.obj, Measurement):
-                    tab_widget = self.tab_widgets[tree_item.tab_id]
-                    tab_name = tab_widget.obj.name
+                if self.__is_measurement_item(tree_item):
+                    tab_name = tree_item.obj.name
                     if tree_item.tab_id == master_tab.tab_id:
                         tree_item.setText(0, "{0} (master)".format(tab_name))
-                    elif tab_widget.obj in nonslaves:
+                    elif self.__is_nonslave(tree_item.obj, nonslaves):
                         tree_item.setText(0, tab_name)
                     else:
                         tree_item.setText(0, "{0} (slave)".format(tab_name))
-                    tab_widget.toggle_master_button()
+                    # Tabs that have not been loaded get the state of the
+                    # button when they are created
+                    tab_widget = self.tab_widgets.get(tree_item.tab_id)
+                    if tab_widget is not None:
+                        tab_widget.toggle_master_button()
 
                 for k in range(self.tabs.count()):
                     tab = self.tabs.widget(k)
@@ -1252,7 +1467,8 @@ class Potku(QtWidgets.QMainWindow):
         # TODO add request.get_slaves method?
         nonslaves = self.request.get_nonslaves()
         master = self.request.get_master()
-        master_tab = self.tab_widgets[master.tab_id]
+        master_tab = self.__get_tab(master.tab_id)
+        nonslave_paths = self.request.get_nonslave_paths()
         master_name = master.name
         directory_d = master.get_depth_profile_dir()
         directory_e = master.get_energy_spectra_dir()
@@ -1288,8 +1504,13 @@ class Potku(QtWidgets.QMainWindow):
                     lambda x: (100 * j + x) / sample_child_count
                 )
 
-                if isinstance(tree_item.obj, Measurement):
-                    tab = self.tab_widgets[tree_item.tab_id]
+                if isinstance(tree_item.obj, RequestItem) and \
+                        str(tree_item.obj.file) in nonslave_paths:
+                    # Non-slaves are not needed so they are not loaded
+                    continue
+
+                if self.__is_measurement_item(tree_item):
+                    tab = self.__get_tab(tree_item.tab_id)
                     tab_obj = tab.obj
                     tab_name = tab_obj.name
                     if tab_name == master_name or tab_obj in nonslaves:
@@ -1395,11 +1616,11 @@ class Potku(QtWidgets.QMainWindow):
             sample_item = tree_root.child(i)
             for j in range(sample_item.childCount()):
                 tree_item = sample_item.child(j)
-                if isinstance(tree_item.obj, Measurement):
-                    tab_widget = self.tab_widgets[tree_item.tab_id]
-                    tab_name = tab_widget.obj.name
-                    tree_item.setText(0, tab_name)
-                    tab_widget.toggle_master_button()
+                if self.__is_measurement_item(tree_item):
+                    tree_item.setText(0, tree_item.obj.name)
+                    tab_widget = self.tab_widgets.get(tree_item.tab_id)
+                    if tab_widget is not None:
+                        tab_widget.toggle_master_button()
 
         if old_master:
             measurement_name = old_master.name
@@ -115,6 +115,7 @@ class TestRecoilParameters(unittest.TestCase):
             "cross_p": 0.9,
             "mut_p": 1.0,
             "check_time": 20,
+            "steady_state": False,
         }
         fluence_expected = {
             "stop_percent": 0.7,
@@ -0,0 +1,160 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import os
+import tempfile
+import unittest
+
+import tests.utils as utils
+
+from pathlib import Path
+from unittest.mock import patch
+
+import modules.batch as batch
+
+from modules.cut_file import CutFile
+from modules.global_settings import GlobalSettings
+from modules.request import Request
+from modules.selection import Selector
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        sample_dir = utils.get_sample_data_dir() / "Ecaart-11-mini"
+        self.asc_file = sample_dir / "Tof-E_65-mini.asc"
+        self.selection_file = sample_dir / "Tof-E_65-mini" / \
+            "Tof-E_65-mini.sel"
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_dir = Path(self.tmp_dir.name, "config")
+        settings = GlobalSettings(
+            config_dir=self.config_dir, save_on_creation=False)
+        request = Request(
+            Path(self.tmp_dir.name, "req"), "req", settings,
+            enable_logging=False)
+        self.request_file = request.request_file
+        sample = request.samples.add_sample(name="sample")
+        self.master, self.slave, self.nonslave = (
+            request.samples.measurements.add_measurement_file(
+                sample, self.asc_file, i, name, False,
+                selector_cls=Selector)
+            for i, name in enumerate(("master", "slave", "nonslave"))
+        )
+
+        self.master.load_data()
+        self.master.load_selection(self.selection_file)
+        self.master.save_cuts()
+        cuts, _ = self.master.get_cut_files()
+        with Path(self.master.get_composition_changes_dir(),
+                  batch.ELEMENT_LOSSES_SAVE_FILE).open("w") as fh:
+            fh.write(f"{os.path.relpath(cuts[0], self.master.directory)}\n")
+            fh.write("\t".join(
+                os.path.relpath(cut, self.master.directory) for cut in cuts))
+            fh.write("\n3\n0")
+
+        request.set_master(self.master)
+        request.exclude_slave(self.nonslave)
+        request.close_log_files()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_master_and_slaves_are_found(self):
+        request = batch.load_request(
+            self.request_file,
+            GlobalSettings(config_dir=self.config_dir, save_on_creation=False),
+            enable_logging=False)
+        self.assertEqual(self.master.path, request.has_master().path)
+        self.assertEqual(
+            [self.slave.path], [m.path for m in batch.get_slaves(request)])
+        request.close_log_files()
+
+    def test_slaves_are_cut_with_master_selections(self):
+        results = batch.run(
+            self.request_file, use_processes=False,
+            config_dir=self.config_dir)
+
+        self.assertEqual(1, len(results))
+        self.assertEqual("slave", results[0].name)
+        self.assertTrue(results[0].ok)
+        self.assertEqual(["cuts", "elemental losses"], results[0].outputs)
+
+        master_cuts, _ = self.master.get_cut_files()
+        slave_cuts, _ = self.slave.get_cut_files()
+        self.assertEqual(
+            [cut.name.replace("master", "slave") for cut in master_cuts],
+            [cut.name for cut in slave_cuts])
+        self.assertEqual(
+            [CutFile(cut_file_path=cut).data for cut in master_cuts],
+            [CutFile(cut_file_path=cut).data for cut in slave_cuts])
+        self.assertEqual([], self.nonslave.get_cut_files()[0])
+
+        with Path(self.slave.get_composition_changes_dir(),
+                  batch.ELEMENT_LOSSES_SAVE_FILE).open() as fh:
+            lines = fh.read().splitlines()
+        self.assertEqual(
+            os.path.relpath(slave_cuts[0], self.slave.directory), lines[0])
+        self.assertEqual(
+            [os.path.relpath(cut, self.slave.directory) for cut in slave_cuts],
+            lines[1].split("\t"))
+        self.assertEqual(["3", "0"], lines[2:])
+
+    def test_request_without_master_is_rejected(self):
+        request = batch.load_request(
+            self.request_file,
+            GlobalSettings(config_dir=self.config_dir, save_on_creation=False),
+            enable_logging=False)
+        request.set_master(None)
+        request.close_log_files()
+
+        self.assertRaises(
+            ValueError, batch.run, self.request_file, use_processes=False,
+            config_dir=self.config_dir)
+
+    def test_only_master_and_slave_are_loaded(self):
+        with patch("modules.batch.apply_master") as mock_apply, \
+                patch("modules.request_index.RequestIndex.save") as mock_save:
+            batch.process_slave(
+                self.request_file, self.slave.path,
+                config_dir=self.config_dir)
+            mock_save.assert_not_called()
+
+        master, slave = mock_apply.call_args[0]
+        self.assertEqual(self.master.path, master.path)
+        self.assertEqual(self.slave.path, slave.path)
+        self.assertEqual(
+            2, len(slave.request.samples.measurements.measurements))
+
+    def test_unknown_slave_is_rejected(self):
+        unknown = Path(
+            self.slave.path.parent.parent, "Measurement_09-foo", "foo.info")
+        paths = (
+            unknown, Path(self.tmp_dir.name, "foo.info"), self.master.path,
+            self.nonslave.path)
+        for path in paths:
+            self.assertRaises(
+                ValueError, batch.process_slave, self.request_file, path,
+                config_dir=self.config_dir)
+        self.assertFalse(unknown.parent.exists())
@@ -0,0 +1,188 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import random
+import tempfile
+import unittest
+
+import numpy as np
+import tests.utils as utils
+
+from pathlib import Path
+
+import modules.coincidence as coincidence
+
+# Expected outputs have been produced with the coinc program and awk
+_EVENTS = """ADC N:o\tChannel\tTimestamp
+1\t5\t100
+2\t50\t110
+0\t7\t90
+2\t60\t300
+1\t8\t305
+0\t9\t290
+1\t1\t1000
+2\t70\t1001
+1 2"""
+
+
+class TestFindCoincidences(unittest.TestCase):
+    def setUp(self):
+        self.params = {
+            "input_file": utils.get_resource_dir() / "events.evnt",
+            "adc_count": 3,
+            "columns": "$3,$5,$4",
+            "nevents": 0,
+            "skip_lines": 1,
+            "tablesize": 10,
+            "timediff": True,
+            "timing": {
+                "1": (-1000, 1000)
+            },
+            "trigger": 2,
+            "verbose": False,
+        }
+        self.expected = [
+            "10 100 -100\n",
+            "20 200 100\n",
+        ]
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.events_file = Path(self.tmp_dir.name, "events.evnt")
+        self.events_file.write_text(_EVENTS)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_output_matches_coinc(self):
+        self.assertEqual(
+            self.expected, coincidence.find_coincidences(**self.params))
+
+    def test_output_is_written_to_file(self):
+        output_file = Path(self.tmp_dir.name, "import_file.tmp")
+        self.assertIsNone(coincidence.find_coincidences(
+            output_file=output_file, **self.params))
+        self.assertEqual(
+            "".join(self.expected).encode(), output_file.read_bytes())
+
+    def test_empty_list_is_returned_if_parameters_are_not_ok(self):
+        output_file = Path(self.tmp_dir.name, "import_file.tmp")
+        for key in "columns", "timing":
+            params = dict(self.params)
+            params[key] = type(params[key])()
+            self.assertEqual([], coincidence.find_coincidences(**params))
+            self.assertIsNone(coincidence.find_coincidences(
+                output_file=output_file, **params))
+        self.assertFalse(output_file.exists())
+
+    def test_invalid_input_produces_no_coincidences(self):
+        for key, value in (("trigger", 3), ("adc_count", 1),
+                           ("tablesize", 1), ("skip_lines", 10),
+                           ("input_file", Path(self.tmp_dir.name, "foo"))):
+            params = dict(self.params)
+            params[key] = value
+            self.assertEqual([], coincidence.find_coincidences(**params))
+
+    def test_table_size_affects_selected_events(self):
+        timing = {"0": (-20, 20), "1": (-10, 10)}
+        expected = {
+            3: ["0 0 1 -1\n"],
+            4: ["7 -20 5 -10\n", "0 0 8 5\n", "0 0 1 -1\n"],
+            5: ["0 0 5 -10\n", "0 0 8 5\n", "0 0 1 -1\n"],
+        }
+        for tablesize, lines in expected.items():
+            self.assertEqual(lines, coincidence.find_coincidences(
+                self.events_file, 0, tablesize, 2, 3, timing,
+                columns="$1,$2,$3,$4"))
+
+    def test_whole_records_without_timediff(self):
+        self.assertEqual(
+            ["7\t5\t50\t\n", "9\t8\t60\t\n"],
+            coincidence.find_coincidences(
+                self.events_file, 0, 10, 2, 3,
+                {"0": (-20, 20), "1": (-10, 10)}, columns="$0", nevents=2,
+                timediff=False))
+
+    def test_unsupported_columns_raise_error(self):
+        params = dict(self.params)
+        params["columns"] = "$1,$2+1"
+        self.assertRaises(
+            ValueError, coincidence.find_coincidences, **params)
+
+
+class TestReadEvents(unittest.TestCase):
+    def test_chunk_size_does_not_affect_events(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir, "events.evnt")
+            file.write_text(_EVENTS)
+            expected = coincidence.read_events(file, 0)
+            for chunk_size in range(1, 20):
+                events = coincidence.read_events(
+                    file, 0, chunk_size=chunk_size)
+                for expected_values, values in zip(expected, events):
+                    np.testing.assert_array_equal(expected_values, values)
+
+        self.assertEqual([1, 2, 0, 2, 1, 0, 1, 2], expected.adc.tolist())
+        self.assertEqual(1001, expected.timestamp[-1])
+        self.assertEqual((1, 2), expected.partial)
+
+    def test_reading_stops_at_invalid_data(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir, "events.evnt")
+            file.write_text("header\n0 1 2\n1 2 3x\n2 foo 4\n0 5 6\n")
+            events = coincidence.read_events(file, 0)
+
+        self.assertEqual([0, 1], events.adc.tolist())
+        self.assertEqual([2, 3], events.timestamp.tolist())
+        self.assertEqual((), events.partial)
+
+
+class TestCoincidenceTable(unittest.TestCase):
+    def test_sliding_window_matches_stepping_through_table(self):
+        rng = random.Random(7)
+        timing = {"0": (-40, 60), "1": (-80, 20)}
+        for _ in range(50):
+            n = rng.randrange(0, 100)
+            events = coincidence.Events(
+                np.array([rng.randrange(3) for _ in range(n)], np.int64),
+                np.array([rng.randrange(100) for _ in range(n)], np.uint32),
+                np.cumsum([rng.randrange(-10, 40) for _ in range(n)]).astype(
+                    np.uint64))
+            tablesize = rng.randrange(2, 12)
+            if n < tablesize - tablesize // 2:
+                continue
+
+            source = coincidence._get_source(events)
+            low, high = coincidence._get_window_limits(timing)
+            table = list(coincidence._iter_table_coincidences(
+                source, tablesize, 2, 3, low, high))
+            window = list(coincidence._iter_window_coincidences(
+                source, n, tablesize, 2, 3, low, high, block_size=7))
+
+            for attr in "trigger", "events":
+                expected = [getattr(block, attr) for block in table]
+                actual = [getattr(block, attr) for block in window]
+                np.testing.assert_array_equal(
+                    np.concatenate(expected) if expected else [],
+                    np.concatenate(actual) if actual else [])
@@ -25,6 +25,7 @@ __author__ = "Juhani Sundell"
 __version__ = "2.0"
 
 import unittest
+import concurrent.futures
 import time
 
 import threading
@@ -32,6 +33,7 @@ import threading
 from timeit import default_timer as timer
 
 from modules.concurrency import CancellationToken
+from modules.concurrency import EvaluationExecutor
 
 
 def sleeper(sleep_time, ct):
@@ -76,5 +78,67 @@ class TestCancellationToken(unittest.TestCase):
         self.assertLess(stop - start, 1.5 * self.sleep_time)
 
 
+
+class TestEvaluationExecutor(unittest.TestCase):
+    def test_results_are_in_submission_order(self):
+        executor = EvaluationExecutor(max_workers=4)
+
+        def delayed(i):
+            time.sleep(0.001 * (10 - i))
+            return i * 2
+
+        self.assertEqual([i * 2 for i in range(10)],
+                         executor.map(delayed, range(10)))
+        executor.shutdown()
+
+    def test_worker_count_is_bounded(self):
+        executor = EvaluationExecutor(max_workers=3)
+        lock = threading.Lock()
+        running = []
+        max_running = []
+
+        def work(_):
+            with lock:
+                running.append(1)
+                max_running.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        executor.map(work, range(20))
+        executor.shutdown()
+        self.assertEqual(3, max(max_running))
+
+    def test_temp_dir_is_removed_on_shutdown(self):
+        executor = EvaluationExecutor()
+        temp_dir = executor.get_temp_dir()
+        self.assertTrue(temp_dir.is_dir())
+        self.assertEqual(temp_dir, executor.get_temp_dir())
+        executor.shutdown()
+        self.assertFalse(temp_dir.exists())
+
+    def test_exceptions_are_raised(self):
+        executor = EvaluationExecutor(max_workers=2)
+        self.assertRaises(ZeroDivisionError,
+                          lambda: executor.map(lambda x: 1 / x, [1, 0, 2]))
+        executor.shutdown()
+
+    def test_submitted_results_are_returned_as_completed(self):
+        executor = EvaluationExecutor(max_workers=2)
+        event = threading.Event()
+        slow = executor.submit(event.wait, 5)
+        fast = executor.submit(pow, 2, 3)
+        self.assertEqual(
+            fast, next(concurrent.futures.as_completed((slow, fast))))
+        self.assertEqual(8, fast.result())
+        event.set()
+        self.assertTrue(slow.result())
+        executor.shutdown()
+
+    def test_process_pool(self):
+        executor = EvaluationExecutor(max_workers=2, use_processes=True)
+        self.assertEqual([1, 2, 3], executor.map(abs, [-1, 2, -3]))
+        executor.shutdown()
+
 if __name__ == '__main__':
     unittest.main()
@@ -25,10 +25,16 @@ along with this program (file named 'LICENCE').
 __author__ = "Juhani Sundell"
 __version__ = "2.0"
 
+import tempfile
 import unittest
 
 import modules.depth_files as depth_files
+import tests.mock_objects as mo
 
+from pathlib import Path
+from unittest.mock import patch
+
+from modules.depth_files import DepthFileGenerator
 from modules.depth_files import DepthProfile
 from modules.element import Element
 
@@ -320,5 +326,52 @@ class TestDepthFiles(unittest.TestCase):
                          expected)
 
 
+class TestGenerateDepthFiles(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = Path(self.tmp_dir.name)
+        self.mesu = mo.get_measurement(
+            path=tmp_dir / "mesu.info", save_on_creation=True)
+        self.mesu.get_detector_or_default().update_directories(
+            tmp_dir / "Detector")
+        self.cut_file = tmp_dir / "cuts.1H.ERD.0.cut"
+        self.cut_file.write_text("1 2 3\n")
+        self.output_dir = tmp_dir / "Depth_profiles"
+        self.runs = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_generator(self, generator: DepthFileGenerator):
+        self.runs += 1
+        for name in "depth.1H", "depth.total":
+            Path(generator._output_path.parent, name).write_text(
+                f"{name} {self.runs}")
+        return 0
+
+    def generate(self):
+        with patch.object(DepthFileGenerator, "run", autospec=True,
+                          side_effect=self.run_generator):
+            depth_files.generate_depth_files(
+                [self.cut_file], self.output_dir, self.mesu)
+
+    def test_depth_files_are_copied_from_result_cache(self):
+        self.generate()
+        (self.output_dir / "depth.1H").unlink()
+        self.generate()
+        self.assertEqual(1, self.runs)
+        self.assertEqual(
+            "depth.1H 1", (self.output_dir / "depth.1H").read_text())
+
+        self.cut_file.write_text("1 2 4\n")
+        self.generate()
+        self.assertEqual(2, self.runs)
+        self.assertEqual(
+            "depth.total 2", (self.output_dir / "depth.total").read_text())
+        self.assertEqual(
+            ["depth", "depth"],
+            [e.kind for e in self.mesu.get_result_cache().get_entries()])
+
+
 if __name__ == "__main__":
     unittest.main()
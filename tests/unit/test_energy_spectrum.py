@@ -24,17 +24,22 @@ along with this program (file named 'LICENCE').
 __author__ = "Juhani Sundell"
 __version__ = "2.0"
 
+import sys
+import threading
 import unittest
 import tests.mock_objects as mo
 import tests.utils as utils
 import tempfile
 import os
+import shutil
 import numpy as np
 
 from pathlib import Path
+from unittest.mock import patch
 
 from modules.energy_spectrum import EnergySpectrum, SumEnergySpectrum
 from modules.enums import SumSpectrumType
+from modules.observing import ProgressReporter
 from modules.parsing import ToFListParser
 
 parser = ToFListParser()
@@ -221,6 +226,173 @@ class TestGetTofListFileName(unittest.TestCase):
         )
 
 
+class TestTofListCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = Path(self.tmp_dir.name)
+        self.cut_file = tmp_dir / "cuts.1H.ERD.0.cut"
+        self.cut_file.write_text("1 2 3\n")
+        self.tof_in = tmp_dir / "tof.in"
+        self.tof_in.write_text("Beam: 4He\n")
+        self.espe_dir = tmp_dir / "Energy_spectra"
+        self.cache_dir = tmp_dir / "Tof_list"
+        self.output = [
+            "0.000000e+00 0.000000e+00    0.53703   1   1.0078 ERD  1.000   764",
+            "0.000000e+00 0.000000e+00    0.54982   1   1.0078 ERD  0.500  3688",
+        ]
+        self.command_calls = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_command(self, tof_in, cut_file):
+        self.command_calls += 1
+        return sys.executable, "-c", f"print({chr(10).join(self.output)!r})"
+
+    def run_tof_list(self):
+        with patch.object(EnergySpectrum, "get_command", self.get_command):
+            return EnergySpectrum.tof_list(
+                self.cut_file, self.espe_dir, tof_in=self.tof_in,
+                verbose=False, cache_dir=self.cache_dir)
+
+    def test_results_are_reloaded_from_cache(self):
+        data = self.run_tof_list()
+        self.assertEqual(1, self.command_calls)
+        np.testing.assert_array_equal([0.53703, 0.54982], data["energy"])
+        np.testing.assert_array_equal([1.0, 0.5], data["weight"])
+        self.assertEqual([764, 3688], data["event"].tolist())
+        self.assertEqual(
+            ["0.0 0.0 0.53703 1 1.0078 ERD 1.0 764\n",
+             "0.0 0.0 0.54982 1 1.0078 ERD 0.5 3688\n"],
+            (self.espe_dir / "cuts.1H.ERD.0.tof_list").read_text().splitlines(
+                keepends=True))
+
+        reloaded = self.run_tof_list()
+        self.assertEqual(1, self.command_calls)
+        self.assertIsInstance(reloaded, np.memmap)
+        np.testing.assert_array_equal(data, reloaded)
+
+    def test_changed_inputs_invalidate_cache(self):
+        self.run_tof_list()
+        self.cut_file.write_text("1 2 4\n")
+        self.run_tof_list()
+        self.assertEqual(2, self.command_calls)
+
+        self.tof_in.write_text("Beam: 1H\n")
+        self.run_tof_list()
+        self.assertEqual(3, self.command_calls)
+
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+    def test_hist_of_cached_results(self):
+        self.run_tof_list()
+        es = EnergySpectrum._calculate_spectrum(
+            {"1H.ERD.0": self.run_tof_list()}, 0.5, mo.get_measurement(),
+            self.espe_dir, use_efficiency=True)
+        self.assertEqual(
+            [(-0.25, 0), (0.25, 0.0), (0.75, 1.5), (1.25, 0)],
+            es["1H.ERD.0"])
+
+
+class TestLoadCuts(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir = Path(self.tmp_dir.name)
+        self.mesu = mo.get_measurement(
+            path=tmp_dir / "mesu.info", save_on_creation=True)
+        self.mesu.get_detector_or_default().update_directories(
+            tmp_dir / "Detector")
+        self.cut_files = []
+        for name in "1H.ERD.0", "7Li.ERD.0", "1H.RBS_Mn.0", "12C.ERD.1":
+            cut_file = tmp_dir / f"cuts.{name}.cut"
+            cut_file.write_text(f"{name}\n")
+            self.cut_files.append(cut_file)
+        self.threads = set()
+        self.command_calls = 0
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_command(self, tof_in, cut_file):
+        self.threads.add(threading.get_ident())
+        self.command_calls += 1
+        if "7Li" in cut_file.name:
+            raise OSError("tof_list failed")
+        line = f"0 0 {len(cut_file.name)} 1 1.0078 ERD 1.0 1"
+        return sys.executable, "-c", f"print({line!r})"
+
+    def load_cuts(self, cut_files, **kwargs):
+        with patch.object(EnergySpectrum, "get_command", self.get_command), \
+                patch.object(type(self.mesu), "log_error") as log_error:
+            es = EnergySpectrum(
+                self.mesu, cut_files, 0.5, verbose=False, **kwargs)
+        return es._tof_listed_files, log_error
+
+    def test_failing_cut_does_not_stop_others(self):
+        progress = []
+        tof_listed_files, log_error = self.load_cuts(
+            self.cut_files, max_workers=4,
+            progress=ProgressReporter(progress.append))
+
+        self.assertEqual(
+            ["1H.ERD.0", "7Li.ERD.0", "1H.RBS_Mn.0", "12C.ERD.1"],
+            list(tof_listed_files))
+        self.assertEqual(
+            [17, 0, 20, 18],
+            [sum(data["energy"]) for data in tof_listed_files.values()])
+        log_error.assert_called_once_with("Error in tof_list: tof_list failed")
+        self.assertEqual([22.5, 45, 67.5, 90, 100], progress)
+        self.assertNotIn(threading.get_ident(), self.threads)
+
+    def test_results_are_in_the_order_of_cut_files(self):
+        for max_workers in 1, 2:
+            tof_listed_files, _ = self.load_cuts(
+                self.cut_files[::-1], max_workers=max_workers)
+            self.assertEqual(
+                ["12C.ERD.1", "1H.RBS_Mn.0", "7Li.ERD.0", "1H.ERD.0"],
+                list(tof_listed_files))
+
+    def test_invalid_cut_file_name_is_skipped(self):
+        invalid_file = Path(self.tmp_dir.name, "1H.cut")
+        tof_listed_files, log_error = self.load_cuts(
+            [invalid_file, self.cut_files[0]])
+        self.assertEqual(["1H.ERD.0"], list(tof_listed_files))
+        log_error.assert_called_once_with(
+            f"Could not calculate Energy Spectrum: Could not parse cut file "
+            f"name: {invalid_file}.")
+
+    def test_spectra_are_loaded_from_result_cache(self):
+        cut_files = [self.cut_files[0], self.cut_files[3]]
+        with patch.object(EnergySpectrum, "get_command", self.get_command):
+            espes = EnergySpectrum.calculate_measured_spectra(
+                self.mesu, cut_files, 0.5, verbose=False)
+            hist_file = self.mesu.get_energy_spectra_dir() / \
+                "Default.12C.ERD.1.hist"
+            hist = hist_file.read_text()
+            hist_file.unlink()
+            shutil.rmtree(self.mesu.get_tof_list_dir())
+
+            self.assertEqual(espes, EnergySpectrum.calculate_measured_spectra(
+                self.mesu, cut_files, 0.5, verbose=False))
+            self.assertEqual(2, self.command_calls)
+            self.assertEqual(hist, hist_file.read_text())
+
+            EnergySpectrum.calculate_measured_spectra(
+                self.mesu, cut_files, 0.2, verbose=False)
+            self.assertEqual(4, self.command_calls)
+
+    def test_failed_spectra_are_not_cached(self):
+        with patch.object(EnergySpectrum, "get_command", self.get_command), \
+                patch.object(type(self.mesu), "log_error"):
+            for i in range(1, 3):
+                EnergySpectrum.calculate_measured_spectra(
+                    self.mesu, self.cut_files[:2], 0.5, verbose=False)
+                # The successful result is reused from the tof_list cache
+                self.assertEqual(i + 1, self.command_calls)
+        self.assertEqual(
+            [], self.mesu.get_result_cache().get_entries())
+
+
 class TestSumSpectra(unittest.TestCase):
 
     def create_measurement_and_energy_spectrum(self, tmp_dir):
@@ -0,0 +1,161 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import io
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+import tests.utils as utils
+from modules.event_data import EventData
+from modules.event_data import MISSING_ADC
+
+
+def read_events_line_by_line(file: Path):
+    """Reference implementation that reads events the way Measurement did
+    before EventData.
+    """
+    data = []
+    with file.open("r") as fp:
+        for n, line in enumerate(fp, start=1):
+            split = line.split()
+            if len(split) == 2:
+                data.append([int(split[0]), int(split[1]), n])
+            if len(split) == 3:
+                data.append([int(split[0]), int(split[1]), int(split[2]), n])
+    return data
+
+
+def to_rows(events: EventData):
+    """Returns the events as they are written to .cut files.
+    """
+    fp = io.StringIO()
+    events.write(fp)
+    return [
+        [int(x) for x in line.split()]
+        for line in fp.getvalue().splitlines()
+    ]
+
+
+class TestReading(unittest.TestCase):
+    def assert_read_equal(self, contents: str, chunk_size=2 ** 20):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file = Path(tmp_dir, "mesu.asc")
+            file.write_text(contents)
+            events = EventData.from_file(file, chunk_size=chunk_size)
+            self.assertEqual(read_events_line_by_line(file), to_rows(events))
+        return events
+
+    def test_empty_file(self):
+        events = self.assert_read_equal("")
+        self.assertEqual(0, len(events))
+        self.assertIsNone(events.adc)
+
+    def test_two_columns(self):
+        events = self.assert_read_equal("1 2\n3 4\n5 6")
+        self.assertIsNone(events.adc)
+        self.assertEqual(np.int32, events.tof.dtype)
+        self.assertEqual(np.int32, events.energy.dtype)
+        self.assertEqual(np.int64, events.event_number.dtype)
+
+    def test_three_columns(self):
+        events = self.assert_read_equal("1 2 3\n4 5 6\n")
+        np.testing.assert_array_equal([3, 6], events.adc)
+
+    def test_skipped_lines_increase_event_number(self):
+        events = self.assert_read_equal(
+            "\n1 2\n  \n7\n4 5\n1 2 3 4\nfoo bar baz qux\n\t8\t9 \r\n")
+        np.testing.assert_array_equal([2, 5, 8], events.event_number)
+
+    def test_signs_and_whitespace(self):
+        self.assert_read_equal("  -1\t+2\n003 \t -0\r\n")
+
+    def test_invalid_values_raise_error(self):
+        for contents in ("1 2\n3 x\n", "1 2.0\n", "- 1\n", "1-2 3\n"):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                file = Path(tmp_dir, "mesu.asc")
+                file.write_text(contents)
+                self.assertRaises(
+                    ValueError, lambda: EventData.from_file(file))
+
+    def test_mixed_column_counts(self):
+        events = self.assert_read_equal("1 2\n3 4 5\n\n6 7\n8 9 10\n")
+        np.testing.assert_array_equal(
+            [MISSING_ADC, 5, MISSING_ADC, 10], events.adc)
+        np.testing.assert_array_equal([1, 2, 4, 5], events.event_number)
+        np.testing.assert_array_equal([5], events[1:2].adc)
+
+    def test_chunk_boundaries(self):
+        lines = [
+            " ".join(str(random.randint(0, 8000)) for _ in range(2))
+            for _ in range(100)
+        ]
+        lines[random.randrange(100)] = ""
+        contents = "\n".join(lines)
+        for chunk_size in (1, 3, 7, 64, 2 ** 20):
+            self.assert_read_equal(contents, chunk_size=chunk_size)
+
+    def test_sample_data(self):
+        file = utils.get_sample_data_dir() / "Ecaart-11-mini" / \
+            "Tof-E_65-mini.asc"
+        events = EventData.from_file(file, chunk_size=2 ** 14)
+        self.assertEqual(read_events_line_by_line(file), to_rows(events))
+
+
+class TestEventData(unittest.TestCase):
+    def setUp(self):
+        self.events = EventData([1, 2, 3], [4, 5, 6], [7, 8, 9])
+
+    def test_unequal_lengths(self):
+        self.assertRaises(
+            ValueError, lambda: EventData([1, 2], [3], [4, 5]))
+        self.assertRaises(
+            ValueError, lambda: EventData([1, 2], [3, 4], [5, 6], adc=[1]))
+
+    def test_indexing(self):
+        selected = self.events[np.array([True, False, True])]
+        self.assertEqual([[1, 4, 7], [3, 6, 9]], to_rows(selected))
+        self.assertEqual([[2, 5, 8]], to_rows(self.events[1:2]))
+
+    def test_write(self):
+        fp = io.StringIO()
+        self.events.write(fp)
+        self.assertEqual("1 4 7\n2 5 8\n3 6 9\n", fp.getvalue())
+
+        fp = io.StringIO()
+        EventData([1, 2], [3, 4], [5, 6], adc=[MISSING_ADC, 7]).write(fp)
+        self.assertEqual("1 3 5\n2 4 7 6\n", fp.getvalue())
+
+        fp = io.StringIO()
+        EventData.empty().write(fp)
+        self.assertEqual("", fp.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
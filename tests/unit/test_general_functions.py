@@ -34,6 +34,8 @@ import tests.utils as utils
 
 from pathlib import Path
 
+import numpy as np
+
 from modules import general_functions as gf
 from modules.element import Element
 
@@ -194,6 +196,79 @@ class TestGeneralFunctions(unittest.TestCase):
                          msg="Temporary directory {0} was not removed "
                              "after the test".format(tmp_dir))
 
+    def test_incremental_line_counting(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_file = Path(tmp_dir, "testfile")
+            tmp_file.write_text("foo\nbar")
+
+            count, state = gf.count_new_lines_in_file(tmp_file, chunk_size=3)
+            self.assertEqual(2, count)
+
+            # Only appended bytes are read, unterminated line is counted once
+            with tmp_file.open("a") as file:
+                file.write("\nbaz\n")
+            count, state = gf.count_new_lines_in_file(tmp_file, state)
+            self.assertEqual(3, count)
+            self.assertEqual(tmp_file.stat().st_size, state.offset)
+
+            count, state = gf.count_new_lines_in_file(tmp_file, state)
+            self.assertEqual(3, count)
+
+            # Truncated file is counted from the start
+            tmp_file.write_text("foo\n")
+            count, state = gf.count_new_lines_in_file(tmp_file, state)
+            self.assertEqual(1, count)
+
+            # So is a file that was rewritten with more content
+            tmp_file.write_text("a\nb\nc")
+            count, state = gf.count_new_lines_in_file(tmp_file, state)
+            self.assertEqual(3, count)
+
+            # And a file that was replaced by another file
+            other_file = Path(tmp_dir, "other")
+            other_file.write_text("x\n" * 5)
+            os.replace(other_file, tmp_file)
+            count, state = gf.count_new_lines_in_file(tmp_file, state)
+            self.assertEqual(5, count)
+
+            self.assertEqual(
+                gf.count_lines_in_file(tmp_file),
+                gf.count_new_lines_in_file(tmp_file)[0])
+
+        self.assertRaises(
+            FileNotFoundError,
+            lambda: gf.count_new_lines_in_file(tmp_file, state))
+        self.assertEqual(
+            (0, None),
+            gf.count_new_lines_in_file(tmp_file, state,
+                                       check_file_exists=True))
+
+    def test_read_new_lines_in_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            tmp_file = Path(tmp_dir, "testfile")
+            tmp_file.write_text("foo\nbar")
+
+            lines, state, restarted = gf.read_new_lines_in_file(tmp_file)
+            self.assertEqual(["foo\n"], lines)
+            self.assertFalse(restarted)
+
+            with tmp_file.open("a") as file:
+                file.write("\nbaz\n")
+            lines, state, restarted = gf.read_new_lines_in_file(
+                tmp_file, state)
+            self.assertEqual(["bar\n", "baz\n"], lines)
+            self.assertFalse(restarted)
+            self.assertEqual(3, state.line_count)
+
+            self.assertEqual(
+                ([], state, False), gf.read_new_lines_in_file(tmp_file, state))
+
+            tmp_file.write_text("a\nb\nc\nd\n")
+            lines, state, restarted = gf.read_new_lines_in_file(
+                tmp_file, state)
+            self.assertEqual(["a\n", "b\n", "c\n", "d\n"], lines)
+            self.assertTrue(restarted)
+
     def test_rounding(self):
         self.assertEqual(1000, gf.round_value_by_four_biggest(1000))
         self.assertEqual(12340, gf.round_value_by_four_biggest(12345))
@@ -264,6 +339,56 @@ class TestHistogramming(unittest.TestCase):
                 x2 - x1 == bin_width for (_, x1), (_, x2) in pairwise_iter
             )
 
+    def test_hist_matches_reference_implementation(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            width = rng.choice([0.025, 0.1, 0.3, 1, 2.5, rng.uniform(0.01, 3)])
+            low = rng.uniform(-50, 50)
+            data = [
+                (rng.choice([rng.uniform(low, low + 40),
+                             round(rng.uniform(low, low + 40) / width) * width]),
+                 rng.uniform(0, 3))
+                for _ in range(rng.randint(1, 500))
+            ]
+            for weight_col in (None, 1):
+                self.assertEqual(
+                    _reference_hist(data, weight_col=weight_col, width=width),
+                    gf.hist(data, col=0, weight_col=weight_col, width=width))
+
+    def test_hist_accepts_arrays(self):
+        data = [(0, 2), (1, 2), (1.5, 2), (2, 2), (3, 2), (5, 2)]
+        self.assertEqual(
+            gf.hist(data, col=0, weight_col=1, width=2),
+            gf.hist(np.array(data), col=0, weight_col=1, width=2))
+
+        xs, ys = gf.hist_columns(
+            np.array([0, 1, 1.5, 2, 3, 5]), np.full(6, 2), width=2)
+        np.testing.assert_array_equal([-1, 1, 3, 5], xs)
+        np.testing.assert_array_equal([0, 6, 4, 2], ys)
+
+        self.assertEqual([], gf.hist(np.empty((0, 2))))
+        self.assertRaises(ValueError, gf.hist_columns, [1], width=0)
+
+
+def _reference_hist(data, col=0, weight_col=None, width=1.0):
+    """Pure Python histogram that gf.hist must produce identical results to.
+    """
+    data_sliced = sorted(
+        ((float(row[col]), float(row[weight_col])
+          if weight_col is not None else 1) for row in data),
+        key=lambda x: x[0])
+    a = int(data_sliced[0][0] / width) * width
+    i = 0
+    hist_list = []
+    while i < len(data_sliced):
+        b = 0.0
+        while i < len(data_sliced) and data_sliced[i][0] < a:
+            b += data_sliced[i][1]
+            i += 1
+        hist_list.append((a - (width / 2.0), b))
+        a += width
+    return hist_list
+
 
 class TestBinDir(unittest.TestCase):
     def test_get_bin_dir(self):
@@ -24,7 +24,11 @@ along with this program (file named 'LICENCE').
 __author__ = "Juhani Sundell"
 __version__ = "2.0"
 
+import pickle
+import subprocess
 import unittest
+
+import numpy as np
 import tests.mock_objects as mo
 import tempfile
 import tests.utils as utils
@@ -32,9 +36,16 @@ import time
 
 import modules.general_functions as gf
 
+from modules.get_espe import ErdData
+from modules.get_espe import EspeCache
 from modules.get_espe import GetEspe
+from modules.get_espe import SpectrumAccumulator
+from modules.get_espe import _bin_events
+from modules.get_espe import _get_calibration
+from modules.get_espe import _read_erd_data
 from pathlib import Path
 from tests.utils import PlatformSwitcher
+from unittest.mock import patch
 
 resource_dir = utils.get_resource_dir()
 _RECOIL_FILE = resource_dir / "C-Default.recoil"
@@ -56,6 +67,10 @@ class TestGetCommand(unittest.TestCase):
             mo.get_target().target_theta, det.calculate_tof_length(),
             det.calculate_solid(), self.rec_file, self.erd_file)
 
+    def test_get_espe_can_be_pickled(self):
+        unpickled = pickle.loads(pickle.dumps(self.espe))
+        self.assertEqual(self.espe.get_command(), unpickled.get_command())
+
     def test_get_command(self):
         with PlatformSwitcher("Windows"):
             cmd = self.espe.get_command()
@@ -166,5 +181,317 @@ class TestGetEspeRun(unittest.TestCase):
         self.assertEqual([], erd_data)
 
 
+class TestGetEspeRunInProcess(unittest.TestCase):
+    def setUp(self):
+        beam = mo.get_beam()
+        detector = mo.get_detector()
+        self.default_kwargs = {
+            "beam_ion": beam.ion.get_prefix(),
+            "energy": beam.energy,
+            "theta": detector.detector_theta,
+            "toflen": detector.calculate_tof_length(),
+            "tangle": mo.get_target().target_theta,
+            "solid": detector.calculate_solid(),
+            "recoil_file": _RECOIL_FILE,
+            "erd_file": _ERD_FILE,
+            "reference_density": 4.98e22,
+            "ch": 0.025,
+            "fluence": 5.00e+11,
+            "timeres": detector.timeres,
+        }
+        self.expected = GetEspe.read_espe_file(_EXPECTED_SPECTRUM_FILE)
+        # Calibrations of previous tests must not be reused
+        _get_calibration.cache_clear()
+
+    @staticmethod
+    def get_sum_and_centroid(espe):
+        total = sum(y for _, y in espe)
+        return total, sum(x * y for x, y in espe) / total
+
+    def run_in_process(self, get_espe_output, **kwargs):
+        """Calculates a spectrum in process when get_espe gives the given
+        output for the calibration run.
+        """
+        with patch("modules.get_espe.GetEspe.run",
+                   return_value=get_espe_output) as mock_run:
+            espe = GetEspe(**dict(self.default_kwargs, **kwargs)) \
+                .run_in_process()
+            mock_run.assert_called_once_with(verbose=False)
+        return espe
+
+    def test_spectrum_matches_get_espe_output(self):
+        # The expected spectrum was calculated for a recoil distribution
+        # that covers all events, so it is also the output of the
+        # calibration run. The spectrum is calculated for a different
+        # fluence and a distribution that leaves out the deepest events.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            recoil_file = Path(tmp_dir, "C-Default.recoil")
+            recoil_file.write_text(
+                "0.0 1.0\n150.00 1.0\n150.01 0.0\n1090.03 0.0\n")
+            for timeres in 250.0, 0.0:
+                espe = self.run_in_process(
+                    self.expected, timeres=timeres, fluence=1.0e+12,
+                    recoil_file=recoil_file)
+
+                # Events deeper than 150 nm land in channels below 2.5 MeV
+                expected = [
+                    (x, 2 * y if x > 2.5 else 0.0)
+                    for x, y in self.expected]
+                total, centroid = self.get_sum_and_centroid(espe)
+                exp_total, exp_centroid = self.get_sum_and_centroid(expected)
+                self.assertAlmostEqual(
+                    exp_total, total, delta=exp_total * 1e-3)
+                self.assertAlmostEqual(exp_centroid, centroid, delta=0.025)
+
+    def test_channels_match_get_espe_output(self):
+        espe = self.run_in_process(self.expected, timeres=0.0)
+        self.assertEqual(self.expected[0][0], espe[0][0])
+
+        # Without time resolution, only one event lands in a different
+        # channel than in the noisy get_espe output
+        same_channels = sum(
+            abs(y1 - y2) < 0.01
+            for (_, y1), (_, y2) in zip(espe, self.expected))
+        self.assertEqual(len(self.expected) - 2, same_channels)
+
+    def test_fluence_scales_spectrum(self):
+        espe1 = self.run_in_process(self.expected)
+        _get_calibration.cache_clear()
+        espe2 = self.run_in_process(self.expected, fluence=1.0e+12)
+        for (x1, y1), (x2, y2) in zip(espe1, espe2):
+            self.assertEqual(x1, x2)
+            self.assertAlmostEqual(2 * y1, y2)
+
+    def test_calibration_uses_get_espe_output(self):
+        doubled = [(x, 2 * y) for x, y in self.expected]
+        kwargs = dict(self.default_kwargs, theta=40.5)
+        with patch("modules.get_espe.GetEspe.run",
+                   return_value=doubled) as mock_run:
+            espe1 = GetEspe(**kwargs).run_in_process()
+            # Calibration is cached, also for different fluences
+            GetEspe(**dict(kwargs, fluence=1.0e+12)).run_in_process()
+            mock_run.assert_called_once()
+
+        total, _ = self.get_sum_and_centroid(espe1)
+        exp_total, _ = self.get_sum_and_centroid(doubled)
+        self.assertAlmostEqual(exp_total, total, delta=exp_total * 1e-3)
+
+    def test_get_espe_is_required(self):
+        get_espe = GetEspe(**self.default_kwargs)
+        with patch("modules.get_espe.GetEspe.run", side_effect=OSError):
+            self.assertRaises(
+                subprocess.SubprocessError, get_espe.run_in_process)
+        with patch("modules.get_espe.GetEspe.run", return_value=[]):
+            self.assertRaises(
+                subprocess.SubprocessError, get_espe.run_in_process)
+
+    def test_no_erd_files(self):
+        kwargs = dict(
+            self.default_kwargs, erd_file=Path(tempfile.gettempdir(), "*.foo"))
+        with patch("modules.get_espe.GetEspe.run") as mock_run:
+            self.assertEqual([], GetEspe(**kwargs).run_in_process())
+            mock_run.assert_not_called()
+
+    def test_output_is_written_to_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_file = Path(tmp_dir, "C-Default.simu")
+            with patch("modules.get_espe.GetEspe.run",
+                       return_value=self.expected):
+                espe = GetEspe(**self.default_kwargs).run_in_process(
+                    output_file=output_file)
+            self.assertEqual(espe, GetEspe.read_espe_file(output_file))
+
+    def test_erd_data_is_cached_until_files_change(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            erd_file = Path(tmp_dir, "C-Default.9997.erd")
+            lines = Path(_ERD_FILE.parent, erd_file.name).read_text()
+            erd_file.write_text(lines)
+            pattern = Path(tmp_dir, "C-Default.*.erd")
+
+            data = ErdData.from_files(pattern)
+            self.assertEqual(12, data.depth.size)
+            self.assertIs(data, ErdData.from_files(pattern))
+
+            # Lines that have not been fully written are ignored
+            with erd_file.open("a") as f:
+                f.write(lines.splitlines(keepends=True)[0])
+                f.write("R V R   1.8665   6  12.00")
+            new_data = ErdData.from_files(pattern)
+            self.assertIsNot(data, new_data)
+            self.assertEqual(13, new_data.depth.size)
+
+        self.assertEqual(0, ErdData.from_files(pattern).depth.size)
+
+    def test_erd_data_is_read_up_to_fingerprinted_size(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            erd_file = Path(tmp_dir, "C-Default.9997.erd")
+            lines = Path(_ERD_FILE.parent, erd_file.name).read_text()
+            erd_file.write_text(lines)
+            fingerprint = ErdData.get_fingerprint(erd_file)
+
+            with erd_file.open("a") as f:
+                f.write(lines)
+            self.assertEqual(12, _read_erd_data(fingerprint).depth.size)
+
+    def test_get_espe_is_calibrated_with_fingerprinted_events(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            erd_file = Path(tmp_dir, "C-Default.9997.erd")
+            lines = Path(_ERD_FILE.parent, erd_file.name).read_text()
+            erd_file.write_text(lines)
+            read_lines = []
+
+            def run(get_espe, verbose=True):
+                # MCERD keeps writing while get_espe runs
+                with erd_file.open("a") as f:
+                    f.write(lines)
+                read_lines.extend(get_espe.read_erd_files())
+                return self.expected
+
+            kwargs = dict(self.default_kwargs, erd_file=erd_file)
+            with patch.object(GetEspe, "run", autospec=True,
+                              side_effect=run):
+                espe = GetEspe(**kwargs).run_in_process()
+
+        self.assertEqual(lines, "".join(read_lines))
+        total, _ = self.get_sum_and_centroid(espe)
+        exp_total, _ = self.get_sum_and_centroid(self.expected)
+        self.assertAlmostEqual(exp_total, total, delta=exp_total * 1e-3)
+
+
+class TestSpectrumAccumulator(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.erd_file = Path(self.tmp_dir.name, "C-Default.9997.erd")
+        self.lines = Path(_ERD_FILE.parent, self.erd_file.name).read_text() \
+            .splitlines(keepends=True)
+        beam = mo.get_beam()
+        detector = mo.get_detector()
+        self.get_espe = GetEspe(
+            beam_ion=beam.ion.get_prefix(), energy=beam.energy,
+            theta=detector.detector_theta,
+            toflen=detector.calculate_tof_length(),
+            tangle=mo.get_target().target_theta,
+            solid=detector.calculate_solid(), recoil_file=_RECOIL_FILE,
+            erd_file=Path(self.tmp_dir.name, "C-Default.*.erd"),
+            reference_density=4.98e22, timeres=detector.timeres)
+        self.accumulator = SpectrumAccumulator(self.get_espe)
+
+        # Calibration is tested in TestGetEspeRunInProcess
+        calibration_patcher = patch(
+            "modules.get_espe._get_calibration", return_value=1.0e-9)
+        calibration_patcher.start()
+        self.addCleanup(calibration_patcher.stop)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def assert_matches_full_spectrum(self, espe):
+        expected = self.get_espe.run_in_process()
+        self.assertEqual([x for x, _ in expected], [x for x, _ in espe])
+        for (_, y1), (_, y2) in zip(expected, espe):
+            self.assertAlmostEqual(y1, y2)
+
+    def test_no_files(self):
+        self.assertEqual([], self.accumulator.update())
+
+    def test_only_new_events_are_read(self):
+        self.erd_file.write_text("".join(self.lines[:10]))
+        self.assert_matches_full_spectrum(self.accumulator.update())
+
+        # Unfinished line is read once it has been written completely
+        with self.erd_file.open("a") as f:
+            f.writelines(self.lines[10:15])
+            f.write(self.lines[15][:10])
+        with patch("modules.get_espe.np.loadtxt",
+                   wraps=np.loadtxt) as loadtxt:
+            espe = self.accumulator.update()
+            self.assertEqual(
+                [line for line in self.lines[10:15] if line.startswith("R")],
+                loadtxt.call_args[0][0])
+        self.assert_matches_full_spectrum(espe)
+
+        with self.erd_file.open("a") as f:
+            f.write(self.lines[15][10:])
+            f.writelines(self.lines[16:])
+        self.assert_matches_full_spectrum(self.accumulator.update())
+
+        # New files are read as well
+        Path(self.tmp_dir.name, "C-Default.9998.erd").write_text(
+            "".join(self.lines))
+        self.assert_matches_full_spectrum(self.accumulator.update())
+
+    def test_only_new_events_are_binned(self):
+        self.erd_file.write_text("".join(self.lines[:10]))
+        self.accumulator.update()
+
+        with self.erd_file.open("a") as f:
+            f.writelines(self.lines[10:])
+        with patch("modules.get_espe._bin_events",
+                   wraps=_bin_events) as bin_events:
+            self.accumulator.update()
+            bin_events.assert_called_once()
+        new_events = [line for line in self.lines[10:] if line.startswith("R")]
+        self.assertEqual(len(new_events), bin_events.call_args[0][0].size)
+
+    def test_spectrum_is_recalculated_if_files_are_rewritten(self):
+        other_file = Path(self.tmp_dir.name, "C-Default.9998.erd")
+        self.erd_file.write_text("".join(self.lines))
+        other_file.write_text("".join(self.lines))
+        self.accumulator.update()
+
+        self.erd_file.write_text("".join(self.lines[:8]))
+        self.assert_matches_full_spectrum(self.accumulator.update())
+
+        other_file.unlink()
+        self.assert_matches_full_spectrum(self.accumulator.update())
+
+
+class TestEspeCache(unittest.TestCase):
+    def test_lru_eviction_and_statistics(self):
+        cache = EspeCache(maxsize=2)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", [(1.0, 1.0)])
+        cache.put("b", [(1.0, 2.0)])
+        self.assertEqual([(1.0, 1.0)], cache.get("a"))
+
+        # "b" is the least recently used spectrum
+        cache.put("c", [(1.0, 3.0)])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual([(1.0, 1.0)], cache.get("a"))
+        self.assertEqual([(1.0, 3.0)], cache.get("c"))
+
+        # Empty spectra are not cached
+        cache.put("d", [])
+        self.assertIsNone(cache.get("d"))
+
+        self.assertEqual(
+            {"hits": 3, "misses": 3, "size": 2}, cache.get_statistics())
+        cache.clear()
+        self.assertEqual(
+            {"hits": 0, "misses": 0, "size": 0}, cache.get_statistics())
+
+    def test_key(self):
+        beam = mo.get_beam()
+        detector = mo.get_detector()
+        target = mo.get_target()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            recoil_file = Path(tmp_dir, "foo.recoil")
+            recoil_file.write_text("0.0 1.0\n10.0 1.0\n")
+
+            def get_key(in_process=False, **kwargs):
+                get_espe = GetEspe.from_settings(
+                    beam, detector, target, recoil_file=recoil_file,
+                    erd_file=_ERD_FILE, **kwargs)
+                return EspeCache.get_key(get_espe, in_process)
+
+            key = get_key()
+            self.assertEqual(key, get_key())
+            self.assertNotEqual(key, get_key(in_process=True))
+            self.assertNotEqual(key, get_key(fluence=1e12))
+            self.assertNotEqual(key, get_key(ch=0.05))
+
+            recoil_file.write_text("0.0 1.0\n10.0 0.5\n")
+            self.assertNotEqual(key, get_key())
+
 if __name__ == '__main__':
     unittest.main()
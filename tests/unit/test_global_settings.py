@@ -73,6 +73,14 @@ class TestGlobalSettings(unittest.TestCase):
         self.gs.set_tofe_invert_y(True)
         self.assertTrue(self.gs.get_tofe_invert_y())
 
+        self.assertFalse(self.gs.get_import_in_process_coinc())
+        self.gs.set_import_in_process_coinc(True)
+        self.assertTrue(self.gs.get_import_in_process_coinc())
+
+        self.assertFalse(self.gs.get_lazy_loading())
+        self.gs.set_lazy_loading(True)
+        self.assertTrue(self.gs.get_lazy_loading())
+
     def test_int_getters(self):
         self.gs.set_import_coinc_count(555)
         self.assertEqual(555, self.gs.get_import_coinc_count())
@@ -133,6 +141,13 @@ class TestGlobalSettings(unittest.TestCase):
         # The absolute minimum
         self.assertEqual(0.000001, self.gs.get_minimum_concentration())
 
+    def test_undo_history_depth(self):
+        self.assertEqual(100, self.gs.get_undo_history_depth())
+        self.gs.set_undo_history_depth(5)
+        self.assertEqual(5, self.gs.get_undo_history_depth())
+        self.gs.set_undo_history_depth(0)
+        self.assertEqual(1, self.gs.get_undo_history_depth())
+
     def test_serialiazation(self):
         """Deserialized GlobalSettings object should have the same
         values as the serialized object.
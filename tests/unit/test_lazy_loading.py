@@ -0,0 +1,156 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import tempfile
+import threading
+import unittest
+
+import tests.utils as utils
+
+from pathlib import Path
+
+import modules.lazy_loading as lazy_loading
+
+from modules.global_settings import GlobalSettings
+from modules.measurement import MeasurementSettings
+from modules.request import Request
+from modules.selection import Selector
+
+
+class TestGetRequestItems(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        settings = GlobalSettings(
+            config_dir=Path(self.tmp_dir.name, "config"),
+            save_on_creation=False)
+        self.request = Request(
+            Path(self.tmp_dir.name, "req"), "req", settings,
+            enable_logging=False)
+        asc_file = utils.get_sample_data_dir() / "Ecaart-11-mini" / \
+            "Tof-E_65-mini.asc"
+        self.samples = [
+            self.request.samples.add_sample(name=name)
+            for name in ("first", "second")
+        ]
+        for i, (sample, name) in enumerate(((self.samples[1], "c"),
+                                            (self.samples[0], "b"),
+                                            (self.samples[0], "a"))):
+            self.request.samples.measurements.add_measurement_file(
+                sample, asc_file, i, name, False, selector_cls=Selector)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_items_are_listed_without_loading(self):
+        items = lazy_loading.get_request_items(self.samples, first_tab_id=4)
+
+        self.assertEqual(
+            [("b", self.samples[0], 4), ("a", self.samples[0], 5),
+             ("c", self.samples[1], 6)],
+            [(item.name, item.sample, item.tab_id) for item in items])
+        self.assertTrue(all(
+            item.item_type == lazy_loading.MEASUREMENT for item in items))
+        self.assertEqual(
+            [self.request.samples.measurements.measurements[i].path
+             for i in (1, 2, 0)],
+            [item.file for item in items])
+
+    def test_item_is_loaded_with_read_settings(self):
+        item = lazy_loading.get_request_items(self.samples)[1]
+        settings = lazy_loading.read_item_settings(item)
+        self.assertIsInstance(settings, MeasurementSettings)
+
+        measurement = self.request.samples.measurements.add_measurement_file(
+            item.sample, item.file, 10, "", False, settings=settings)
+        self.assertEqual("a", measurement.name)
+        self.assertEqual(10, measurement.tab_id)
+        self.assertIs(
+            measurement, item.sample.measurements.measurements[10])
+
+
+class TestGetNeighbours(unittest.TestCase):
+    def test_closest_items_are_returned_first(self):
+        items = list(range(6))
+        self.assertEqual([3, 1, 4, 0], lazy_loading.get_neighbours(
+            items, 2, 4))
+        self.assertEqual([1, 2], lazy_loading.get_neighbours(items, 0, 2))
+        self.assertEqual([4, 3, 2, 1, 0], lazy_loading.get_neighbours(
+            items, 5, 10))
+        self.assertEqual([], lazy_loading.get_neighbours(items, 7, 2))
+        self.assertEqual([], lazy_loading.get_neighbours([1], 1, 2))
+
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.loaded = []
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+
+        def load(item):
+            self.started.release()
+            self.release.wait(timeout=5)
+            if item == "fail":
+                raise OSError("fail")
+            self.loaded.append(item)
+            return item.upper()
+
+        self.prefetcher = lazy_loading.Prefetcher(load, max_workers=2)
+
+    def tearDown(self):
+        self.release.set()
+        self.prefetcher.shutdown()
+
+    def wait_for_start(self, count):
+        for _ in range(count):
+            self.assertTrue(self.started.acquire(timeout=5))
+
+    def test_prefetched_item_is_returned_once(self):
+        self.release.set()
+        self.prefetcher.prefetch(["foo", "bar", "foo"])
+        self.wait_for_start(2)
+        self.assertTrue(self.prefetcher.is_prefetched("foo"))
+        self.assertEqual("FOO", self.prefetcher.get("foo"))
+        self.assertFalse(self.prefetcher.is_prefetched("foo"))
+        self.assertIsNone(self.prefetcher.get("foo"))
+        self.assertEqual("BAR", self.prefetcher.get("bar"))
+        self.assertEqual(["foo", "bar"], self.loaded)
+
+    def test_failed_or_unknown_item_returns_none(self):
+        self.release.set()
+        self.prefetcher.prefetch(["fail"])
+        self.assertIsNone(self.prefetcher.get("fail"))
+        self.assertIsNone(self.prefetcher.get("baz"))
+
+    def test_item_that_has_not_started_loading_is_cancelled(self):
+        self.prefetcher.prefetch(["foo", "bar", "baz"])
+        self.wait_for_start(2)
+        # Both workers are busy so baz is still waiting
+        self.assertIsNone(self.prefetcher.get("baz"))
+        self.prefetcher.discard("foo")
+        self.release.set()
+        self.assertEqual("BAR", self.prefetcher.get("bar"))
+        self.prefetcher.shutdown()
+        self.assertEqual(["bar", "foo"], sorted(self.loaded))
@@ -0,0 +1,115 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import random
+import struct
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import modules.list_mode as list_mode
+
+
+def _convert_with_struct(data: bytes) -> bytes:
+    # Converts the data one event at a time like the import dialog used to
+    lines = []
+    for i in range(0, len(data) - len(data) % 4, 4):
+        first, second = struct.unpack("<hh", data[i:i + 4])
+        lines.append(f"{first} {second - 8192}\n")
+    return "".join(lines).encode()
+
+
+class TestConvertBinaryFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+        rng = random.Random(3)
+        # Include the extreme values of both columns
+        self.data = struct.pack("<hhhh", -32768, -32768, 32767, 32767) + \
+            bytes(rng.randrange(256) for _ in range(4 * 1000))
+        self.input_file = self.dir / "events.lst"
+        self.input_file.write_bytes(self.data)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_output_does_not_depend_on_block_size(self):
+        expected = _convert_with_struct(self.data)
+        for block_size in 1, 7, 1002, 5000:
+            output_file = self.dir / f"{block_size}.asc"
+            count = list_mode.convert_binary_file(
+                self.input_file, output_file, block_size=block_size)
+            self.assertEqual(1002, count)
+            self.assertEqual(expected, output_file.read_bytes())
+
+    def test_incomplete_event_at_the_end_is_ignored(self):
+        self.input_file.write_bytes(self.data[:10])
+        output_file = self.dir / "events.asc"
+        self.assertEqual(
+            2, list_mode.convert_binary_file(self.input_file, output_file))
+        self.assertEqual(
+            b"-32768 -40960\n32767 24575\n", output_file.read_bytes())
+
+    def test_empty_file(self):
+        self.input_file.write_bytes(b"")
+        output_file = self.dir / "events.asc"
+        self.assertEqual(
+            0, list_mode.convert_binary_file(self.input_file, output_file))
+        self.assertEqual(b"", output_file.read_bytes())
+
+    def test_progress_is_reported_in_bytes(self):
+        progress = []
+        list_mode.convert_binary_file(
+            self.input_file, self.dir / "events.asc", block_size=500,
+            progress=progress.append)
+        self.assertEqual([2000, 4000, 4008], progress)
+
+
+class TestConvertBinaryFiles(unittest.TestCase):
+    def test_files_are_converted_concurrently(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conversions = []
+            expected = []
+            for i in range(4):
+                data = bytes(range(4 * (i + 10)))
+                input_file = Path(tmp_dir, f"{i}.lst")
+                input_file.write_bytes(data)
+                conversions.append((input_file, Path(tmp_dir, f"{i}.asc")))
+                expected.append(_convert_with_struct(data))
+
+            for max_workers in 1, 3:
+                progress = []
+                counts = list_mode.convert_binary_files(
+                    conversions, max_workers=max_workers,
+                    use_processes=False,
+                    progress=lambda *args: progress.append(args))
+
+                self.assertEqual([10, 11, 12, 13], counts)
+                self.assertEqual(
+                    expected, [f.read_bytes() for _, f in conversions])
+                self.assertEqual(sorted(progress), progress)
+                self.assertEqual((184, 184), progress[-1])
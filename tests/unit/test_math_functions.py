@@ -479,6 +479,55 @@ class TestPointInside(unittest.TestCase):
         self.assertFalse(mf.point_inside_polygon(Point(0.5, -0.1), rectangle))
         self.assertFalse(mf.point_inside_polygon(Point(1.5, 0.25), rectangle))
 
+    def test_vectorized_matches_scalar(self):
+        for _ in range(50):
+            poly = [
+                (random.randint(0, 20), random.randint(0, 20))
+                for _ in range(random.randint(1, 8))
+            ]
+            xs = np.array([random.randint(-2, 22) for _ in range(100)])
+            ys = np.array([random.randint(-2, 22) for _ in range(100)])
+            expected = [
+                mf.point_inside_polygon((x, y), poly) for x, y in zip(xs, ys)
+            ]
+            self.assertEqual(
+                expected, list(mf.points_inside_polygon(xs, ys, poly)))
+
+    def test_multiple_polygons(self):
+        polygons = [
+            [(random.randint(0, 20), random.randint(0, 20))
+             for _ in range(random.randint(3, 8))]
+            for _ in range(5)
+        ]
+        xs = np.array([random.randint(-2, 22) for _ in range(500)])
+        ys = np.array([random.randint(-2, 22) for _ in range(500)])
+        expected = [
+            [mf.point_inside_polygon((x, y), poly) for x, y in zip(xs, ys)]
+            for poly in polygons
+        ]
+        for chunk_size in (1, 7, 500, 1000):
+            inside = mf.points_inside_polygons(
+                xs, ys, polygons, chunk_size=chunk_size)
+            self.assertEqual((5, 500), inside.shape)
+            self.assertEqual(expected, inside.tolist())
+
+    def test_bounds_of_multiple_polygons(self):
+        square = [(0, 0), (0, 10), (10, 10), (10, 0)]
+        xs = np.array([1, 5, 9])
+        ys = np.array([5, 5, 5])
+        inside = mf.points_inside_polygons(
+            xs, ys, [square, square, square], [None, (4, 10, 0, 10), None])
+        self.assertEqual(
+            [[False, False, False], [False, True, True],
+             [False, False, False]],
+            inside.tolist())
+
+        progress = []
+        mf.points_inside_polygons(
+            xs, ys, [square], chunk_size=2, progress_callback=progress.append)
+        self.assertEqual(100, progress[-1])
+        self.assertEqual(2, len(progress))
+
 
 class TestBinCounts(unittest.TestCase):
     def setUp(self):
@@ -28,13 +28,18 @@ import unittest
 import tempfile
 import copy
 import os
+import shutil
 
 import tests.utils as utils
 import tests.mock_objects as mo
 
 from pathlib import Path
 
+import modules.math_functions as mf
+from matplotlib.figure import Figure
+from modules.cut_file import CutFile
 from modules.measurement import Measurement
+from modules.selection import Selector
 
 
 class TestFolderStructure(unittest.TestCase):
@@ -203,3 +208,107 @@ class TestMeasurement(unittest.TestCase):
     def test_measurement_has_slots(self):
         m = mo.get_measurement()
         utils.assert_has_slots(m)
+
+
+class TestSaveCuts(unittest.TestCase):
+    def setUp(self):
+        sample_dir = utils.get_sample_data_dir() / "Ecaart-11-mini"
+        self.asc_file = sample_dir / "Tof-E_65-mini.asc"
+        self.selection_file = sample_dir / "Tof-E_65-mini" / \
+            "Tof-E_65-mini.sel"
+
+    def load_measurement(self, tmp_dir, asc_contents=None) -> Measurement:
+        path = Path(tmp_dir, f"{Measurement.DIRECTORY_PREFIX}01-mesu")
+        path.mkdir()
+        mesu = Measurement(
+            mo.get_request(), path / "mesu.info", name="mesu",
+            save_on_creation=False, enable_logging=False)
+        mesu.create_folder_structure(
+            path, path / "Data" / self.asc_file.name,
+            selector_cls=Selector)
+        if asc_contents is None:
+            shutil.copy(self.asc_file, mesu.get_data_dir())
+        else:
+            Path(mesu.get_data_dir(), self.asc_file.name).write_text(
+                asc_contents)
+        mesu.load_data()
+        mesu.selector.axes = Figure().add_subplot(111)
+        mesu.load_selection(self.selection_file)
+        return mesu
+
+    def test_cuts_match_point_by_point_classification(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mesu = self.load_measurement(tmp_dir)
+
+            expected_counts = []
+            expected_points = []
+            data = [
+                [int(x) for x in row] for row in zip(*mesu.data.get_columns())
+            ]
+            for selection in mesu.selector.selections:
+                points = [
+                    p for p in data
+                    if selection.axes_limits.is_inside(p) and
+                    mf.point_inside_polygon(p[:2], selection.get_points())
+                ]
+                expected_counts.append(len(points))
+                expected_points.append(points)
+
+            self.assertEqual(
+                expected_counts,
+                [s.event_count for s in mesu.selector.selections])
+
+            mesu.save_cuts()
+            cut_files, _ = mesu.get_cut_files()
+            cut_points = sorted(
+                CutFile(cut_file_path=cut).data for cut in cut_files)
+            self.assertEqual(
+                sorted(points for points in expected_points if points),
+                cut_points)
+
+    def test_open_selections_have_no_events(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mesu = self.load_measurement(tmp_dir)
+            selections = mesu.selector.selections
+            counts = [s.event_count for s in selections]
+            self.assertTrue(all(counts))
+
+            selections[0].is_closed = False
+            mesu.selector.update_selection_points()
+            self.assertEqual(
+                [0, *counts[1:]], [s.event_count for s in selections])
+
+            inside = mesu.selector.events_inside(
+                mesu.data.tof, mesu.data.energy)
+            self.assertFalse(inside[0].any())
+            self.assertEqual(counts[1:], inside[1:].sum(axis=1).tolist())
+
+    def test_files_with_two_and_three_column_events(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mesu = self.load_measurement(tmp_dir)
+            mesu.save_cuts()
+            expected = [
+                CutFile(cut_file_path=cut).data
+                for cut in mesu.get_cut_files()[0]
+            ]
+
+        # Every other event has a value for the third ADC
+        lines = self.asc_file.read_text().splitlines()
+        contents = "".join(
+            f"{line} {n}\n" if n % 2 else f"{line}\n"
+            for n, line in enumerate(lines, start=1))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mesu = self.load_measurement(tmp_dir, contents)
+            self.assertEqual(len(lines), len(mesu.data))
+            mesu.save_cuts()
+            cuts = [
+                CutFile(cut_file_path=cut).data
+                for cut in mesu.get_cut_files()[0]
+            ]
+
+        self.assertEqual(len(expected), len(cuts))
+        for expected_points, points in zip(expected, cuts):
+            self.assertEqual(
+                [p[:2] + [p[-1], p[-1]] if p[-1] % 2 else p
+                 for p in expected_points],
+                points)
@@ -26,14 +26,32 @@ __version__ = "2.0"
 
 import unittest
 import random
+
+import concurrent.futures
+import subprocess
+import numpy as np
+import rx
 import tests.mock_objects as mo
 import tempfile
 
 from pathlib import Path
+from rx import operators as ops
 from unittest.mock import patch
 
+import modules.file_paths as fp
+
+from modules.concurrency import CancellationToken
+from modules.element_simulation import ElementSimulation
+from modules.enums import IonDivision
+from modules.enums import OptimizationState
+from modules.enums import OptimizationType
+from modules.get_espe import GetEspe
+from modules.mcerd import MCERD
+from modules.nsgaii import Archive
 from modules.nsgaii import Nsgaii
 from modules.nsgaii import pick_final_solutions
+from modules.optimization import dominates
+from modules.point import Point
 
 
 class TestPickFinalSolutions(unittest.TestCase):
@@ -103,5 +121,401 @@ class TestPickFinalSolutions(unittest.TestCase):
                           lambda: pick_final_solutions([], [], count=4))
 
 
+def _nd_sort_pairwise(pop_obj, n, r_n=np.inf):
+    # Non-dominated sort that compares solutions pair by pair like nd_sort
+    # used to
+    r_n = n if r_n == np.inf else r_n
+    front_no = np.inf * np.ones(n)
+    dominated = [[] for _ in range(n)]
+    counts = np.zeros(n)
+    for i, p in enumerate(pop_obj):
+        for h, q in enumerate(pop_obj):
+            if dominates(p, q):
+                dominated[i].append(h)
+            elif dominates(q, p):
+                counts[i] += 1
+    current = [i for i in range(n) if counts[i] == 0]
+    front_no[current] = 1
+    added, fronts = len(current), 1
+    while current and added < r_n:
+        new = []
+        for i in current:
+            for h in dominated[i]:
+                counts[h] -= 1
+                if counts[h] == 0:
+                    front_no[h] = fronts + 1
+                    new.append(h)
+        added += len(new)
+        fronts += 1
+        current = new
+    return front_no, fronts
+
+
+def _crowding_distance_per_member(front_no, objective_values):
+    # Crowding distance calculated one member at a time
+    pop_obj = np.array(objective_values)
+    n, m = pop_obj.shape
+    crowd_dis = np.zeros(n)
+    for f in np.unique(front_no[front_no != np.inf]):
+        front = np.array([k for k in range(n) if front_no[k] == f])
+        f_max = pop_obj[front, :].max(0)
+        f_min = pop_obj[front, :].min(0)
+        for i in range(m):
+            rank = np.argsort(pop_obj[front, i])
+            crowd_dis[front[rank[0]]] = np.inf
+            crowd_dis[front[rank[-1]]] = np.inf
+            for j in range(1, len(front) - 1):
+                dist = pop_obj[front[rank[j + 1]], i] - \
+                    pop_obj[front[rank[j - 1]], i]
+                if dist != 0:
+                    crowd_dis[front[rank[j]]] += dist / (f_max[i] - f_min[i])
+    return crowd_dis
+
+
+class TestSelection(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(11)
+        # Integer values produce plenty of ties and equal solutions
+        self.populations = [
+            rng.randint(0, k, size=(n, 2)).astype(float)
+            for n, k in ((1, 3), (2, 3), (10, 4), (40, 10), (100, 1000))
+        ]
+
+    def test_nd_sort(self):
+        for pop_obj in self.populations:
+            n = len(pop_obj)
+            for r_n in np.inf, n // 2, 1:
+                front_no, fronts = Nsgaii.nd_sort(pop_obj, n, r_n)
+                expected_no, expected_fronts = _nd_sort_pairwise(
+                    pop_obj, n, r_n)
+                np.testing.assert_array_equal(expected_no, front_no)
+                self.assertEqual(expected_fronts, fronts)
+
+    def test_crowding_distance(self):
+        for pop_obj in self.populations:
+            front_no, _ = Nsgaii.nd_sort(pop_obj, len(pop_obj))
+            np.testing.assert_array_equal(
+                _crowding_distance_per_member(front_no, pop_obj),
+                Nsgaii.crowding_distance(front_no, pop_obj))
+
+    def test_new_population_selection(self):
+        pop_obj = self.populations[3]
+        sols = np.arange(len(pop_obj))[:, None] * np.ones((1, 3))
+        (next_sols, next_objs), front_no, crowd_dis = \
+            Nsgaii.new_population_selection([sols, pop_obj], 20)
+
+        index = next_sols[:, 0].astype(int)
+        all_fronts, last_front = Nsgaii.nd_sort(pop_obj, len(pop_obj), 20)
+        all_dis = Nsgaii.crowding_distance(all_fronts, pop_obj)
+        self.assertEqual(20, len(index))
+        np.testing.assert_array_equal(pop_obj[index], next_objs)
+        np.testing.assert_array_equal(all_fronts[index], front_no)
+        np.testing.assert_array_equal(all_dis[index], crowd_dis)
+        # Better fronts are included fully and the rest of the last front
+        # is less crowded than the included part
+        self.assertTrue(set(np.flatnonzero(all_fronts < last_front)) <=
+                        set(index))
+        excluded = [i for i in np.flatnonzero(all_fronts == last_front)
+                    if i not in index]
+        if excluded:
+            self.assertLessEqual(
+                all_dis[excluded].max(),
+                crowd_dis[front_no == last_front].min())
+
+
+class TestArchive(unittest.TestCase):
+    def test_insert_selects_same_population_as_generational_selection(self):
+        rng = np.random.RandomState(5)
+        pop_obj = rng.randint(0, 10, size=(20, 2)).astype(float)
+        sols = np.arange(len(pop_obj))[:, None] * np.ones((1, 3))
+        archive = Archive(sols, pop_obj, len(pop_obj))
+
+        for i, obj in enumerate(rng.randint(0, 10, size=(30, 2))):
+            sol = np.full(3, len(pop_obj) + i)
+            joined = [np.vstack((archive.solutions, sol)),
+                      np.vstack((archive.objective_values, obj))]
+            (exp_sols, exp_objs), exp_front_no, exp_dis = \
+                Nsgaii.new_population_selection(joined, len(pop_obj))
+
+            kept = archive.insert(sol, obj)
+            self.assertEqual(kept, sol[0] in exp_sols[:, 0])
+            np.testing.assert_array_equal(exp_sols, archive.solutions)
+            np.testing.assert_array_equal(exp_objs, archive.objective_values)
+            np.testing.assert_array_equal(exp_front_no, archive.front_no)
+            np.testing.assert_array_equal(exp_dis, archive.crowd_dis)
+            np.testing.assert_array_equal(
+                exp_objs[exp_front_no == 1], archive.get_pareto_front())
+
+
+class TestSteadyState(unittest.TestCase):
+    def setUp(self):
+        self.nsgaii = Nsgaii(
+            gen=3, pop_size=8, sol_size=1, upper_limits=[1e13],
+            lower_limits=[1e11], element_simulation=mo.get_element_simulation(),
+            optimization_type=OptimizationType.FLUENCE, steady_state=True,
+            max_workers=2, cut_file=Path(tempfile.gettempdir(), "foo.cut"))
+        np.random.seed(3)
+        sols = np.arange(1, 9)[:, None] * 1e12
+        self.nsgaii.population = [sols, self.get_objective_values(sols)]
+
+    @staticmethod
+    def get_objective_values(sols):
+        return np.hstack((sols, 1e24 / sols))
+
+    @staticmethod
+    def submit_evaluation(solution, slot):
+        future = concurrent.futures.Future()
+        future.set_result(solution)
+        return future
+
+    def test_progress_is_reported_after_each_population(self):
+        with patch.object(self.nsgaii, "_submit_evaluation",
+                          side_effect=self.submit_evaluation) as mock_submit, \
+                patch.object(self.nsgaii, "get_objective_values",
+                             side_effect=lambda sol: tuple(
+                                 self.get_objective_values(sol[None])[0])), \
+                patch.object(self.nsgaii, "on_next") as mock_next:
+            evaluations = self.nsgaii._run_steady_state(None, 0)
+            self.assertEqual(24, mock_submit.call_count)
+
+        self.assertEqual(0, evaluations)
+        msgs = [args[0] for args, _ in mock_next.call_args_list]
+        self.assertEqual([16, 8, 0], [m["evaluations_left"] for m in msgs])
+        for msg in msgs:
+            self.assertEqual(OptimizationState.RUNNING, msg["state"])
+            self.assertIn("elapsed", msg)
+        # All solutions are on the first front
+        sols, objs = self.nsgaii.population
+        self.assertEqual(8, len(sols))
+        np.testing.assert_array_equal(objs, msgs[-1]["pareto_front"])
+        np.testing.assert_array_equal(self.get_objective_values(sols), objs)
+
+    def test_cancellation_stops_evaluation(self):
+        ct = CancellationToken()
+        ct.request_cancellation()
+        with patch.object(self.nsgaii, "_submit_evaluation",
+                          side_effect=self.submit_evaluation) as mock_submit:
+            self.assertEqual(24, self.nsgaii._run_steady_state(ct, 0))
+            mock_submit.assert_not_called()
+
+
+class TestInitialSimulation(unittest.TestCase):
+    def setUp(self):
+        self.elem_sim = mo.get_element_simulation()
+        self.nsgaii = Nsgaii(
+            gen=1, pop_size=4, sol_size=1, upper_limits=[1e13],
+            lower_limits=[1e11], element_simulation=self.elem_sim,
+            measurement=mo.get_measurement(),
+            optimization_type=OptimizationType.FLUENCE,
+            cut_file=Path(tempfile.gettempdir(), "foo.cut"),
+            check_time=0.01)
+
+    def test_failed_convergence_check_stops_simulation(self):
+        cts = []
+
+        def start(*_, ct, **__):
+            cts.append(ct)
+            return rx.interval(0.01).pipe(ops.map(lambda _: {
+                MCERD.IS_RUNNING: not ct.is_cancellation_requested()
+            }))
+
+        with patch.object(ElementSimulation, "start", side_effect=start), \
+                patch.object(ElementSimulation, "_clean_up") as \
+                mock_clean_up, \
+                patch("modules.optimization.get_optim_spectrum_accumulator"
+                      ) as mock_accumulator:
+            mock_accumulator.return_value.update.side_effect = \
+                subprocess.SubprocessError("get_espe not found")
+            self.assertRaises(
+                subprocess.SubprocessError,
+                self.nsgaii.run_initial_simulation, CancellationToken(),
+                IonDivision.NONE)
+
+        ct, = cts
+        self.assertTrue(ct.is_cancellation_requested())
+        mock_clean_up.assert_called_once_with(ct)
+
+
+class TestCheckpoints(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.elem_sim = mo.get_element_simulation()
+        self.elem_sim.directory = Path(self.tmp_dir.name)
+        self.sols = np.arange(1, 9)[:, None] * 1e12
+        self.objs = np.hstack((self.sols, 1e24 / self.sols))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_nsgaii(self, gen=2):
+        nsgaii = Nsgaii(
+            gen=gen, pop_size=8, sol_size=1, upper_limits=[1e13],
+            lower_limits=[1e11], element_simulation=self.elem_sim,
+            measurement=mo.get_measurement(),
+            optimization_type=OptimizationType.FLUENCE,
+            cut_file=Path(self.tmp_dir.name, "foo.cut"))
+        nsgaii.measured_espe = [(1.0, 1.0)]
+        return nsgaii
+
+    def save_checkpoint(self, evaluations_left):
+        nsgaii = self.get_nsgaii()
+        nsgaii.population = [self.sols, self.objs]
+        nsgaii._erd_fingerprint = nsgaii._get_erd_fingerprint()
+        np.random.seed(7)
+        nsgaii._save_checkpoint(evaluations_left)
+        return np.random.get_state()
+
+    def prepare(self, nsgaii, **kwargs):
+        with patch.object(nsgaii, "prepare_measured_spectra"), \
+                patch.object(nsgaii, "modify_measurement"), \
+                patch.object(nsgaii, "combine_previous_erd_files") as \
+                mock_combine, \
+                patch.object(nsgaii, "run_initial_simulation") as mock_sim:
+            nsgaii._prepare_optimization(**kwargs)
+            mock_combine.assert_not_called()
+            mock_sim.assert_not_called()
+
+    def test_resume_restores_state(self):
+        rng_state = self.save_checkpoint(8)
+        np.random.seed(1)
+        nsgaii = self.get_nsgaii()
+        self.assertTrue(nsgaii.has_checkpoint())
+        self.prepare(nsgaii, resume=True)
+
+        np.testing.assert_array_equal(self.sols, nsgaii.population[0])
+        np.testing.assert_array_equal(self.objs, nsgaii.population[1])
+        self.assertEqual(8, nsgaii._evaluations_left)
+        np.testing.assert_array_equal(
+            rng_state[1], np.random.get_state()[1])
+
+    def test_resume_fails_if_checkpoint_does_not_match(self):
+        nsgaii = self.get_nsgaii()
+        self.assertFalse(nsgaii.has_checkpoint())
+        self.assertRaises(OSError, lambda: self.prepare(nsgaii, resume=True))
+
+        self.save_checkpoint(8)
+        nsgaii = self.get_nsgaii()
+        nsgaii.pop_size = 10
+        self.assertRaises(ValueError,
+                          lambda: self.prepare(nsgaii, resume=True))
+
+        erd_file = self.elem_sim.directory / fp.get_erd_file_name(
+            self.elem_sim.get_main_recoil(), 201,
+            optim_mode=OptimizationType.FLUENCE)
+        erd_file.write_text("foo")
+        self.assertRaises(ValueError,
+                          lambda: self.prepare(self.get_nsgaii(), resume=True))
+
+    def test_resumed_optimization_continues_evaluation_count(self):
+        self.save_checkpoint(8)
+        nsgaii = self.get_nsgaii()
+        with patch.object(nsgaii, "prepare_measured_spectra"), \
+                patch.object(nsgaii, "modify_measurement"), \
+                patch.object(nsgaii, "_get_fluence_espe",
+                             side_effect=lambda fluence: fluence), \
+                patch.object(nsgaii, "get_objective_values",
+                             side_effect=lambda f: (f, 1e24 / f)), \
+                patch.object(nsgaii, "on_next") as mock_next, \
+                patch.object(nsgaii, "on_completed") as mock_completed:
+            nsgaii.start_optimization(resume=True)
+
+        msgs = [args[0] for args, _ in mock_next.call_args_list]
+        self.assertEqual(
+            [(OptimizationState.PREPARING, 16),
+             (OptimizationState.RUNNING, 8),
+             (OptimizationState.RUNNING, 0)],
+            [(m["state"], m["evaluations_left"]) for m in msgs])
+        self.assertEqual(
+            16, mock_completed.call_args[0][0]["evaluations_done"])
+        self.assertFalse(nsgaii.has_checkpoint())
+
+
+class TestFluenceEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.elem_sim = mo.get_element_simulation()
+        self.base_espe = [(1.0, 0.0), (1.025, 3.0), (1.05, 5.0), (1.075, 0.0)]
+        measured_espe = [(1.0, 1.0), (1.025, 4.0), (1.05, 6.0), (1.075, 2.0)]
+
+        self.nsgaii = Nsgaii(
+            gen=1, element_simulation=self.elem_sim,
+            optimization_type=OptimizationType.FLUENCE,
+            cut_file=Path(tempfile.gettempdir(), "foo.cut"))
+        self.nsgaii.measured_espe = measured_espe
+
+    def get_espe(self, recoil, fluence, **kwargs):
+        return [(x, y * fluence / 1e12) for x, y in self.base_espe], None
+
+    def test_fluence_spectra_are_scaled(self):
+        sols = [[1e12], [2e12], [5e11], [1e12]]
+        with patch("modules.element_simulation.ElementSimulation."
+                   "calculate_espe", side_effect=self.get_espe) as mock_espe:
+            pop = self.nsgaii.evaluate_solutions(sols)
+            mock_espe.assert_called_once()
+        self.assertEqual(3, self.nsgaii.saved_espe_runs)
+
+        # Objective values are the same as when get_espe is run for each
+        # solution
+        expected = [
+            self.nsgaii.get_objective_values(self.get_espe(None, sol[0])[0])
+            for sol in sols
+        ]
+        self.assertEqual(expected, pop.objective_values)
+
+    def test_failed_base_spectrum_is_recalculated(self):
+        with patch("modules.element_simulation.ElementSimulation."
+                   "calculate_espe", return_value=([], None)) as mock_espe:
+            pop = self.nsgaii.evaluate_solutions([[1e12], [2e12]])
+            self.assertEqual(2, mock_espe.call_count)
+        self.assertEqual(0, self.nsgaii.saved_espe_runs)
+        self.assertTrue(all(
+            obj == (float("inf"), float("inf"))
+            for obj in pop.objective_values))
+
+class TestRecoilEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.elem_sim = mo.get_element_simulation()
+        self.nsgaii = Nsgaii(
+            gen=1, element_simulation=self.elem_sim, max_workers=2,
+            cut_file=Path(tempfile.gettempdir(), "foo.cut"))
+
+    @staticmethod
+    def get_espe_calculator(recoil, recoil_file, **kwargs):
+        recoil_file.write_text("\n".join(recoil.get_mcerd_params()))
+        get_espe = GetEspe.from_settings(
+            mo.get_beam(), mo.get_detector(), mo.get_target(),
+            recoil_file=recoil_file, erd_file=Path("foo.*.erd"))
+        return get_espe, None
+
+    @staticmethod
+    def get_espe(get_espe, **kwargs):
+        return [(1.0, float(get_espe.recoil_file.read_text().count("\n")))]
+
+    def test_duplicate_recoils_are_evaluated_once(self):
+        recoils = [
+            mo.get_recoil_element(),
+            mo.get_recoil_element(),
+            mo.get_recoil_element()
+        ]
+        recoils[1].add_point(Point((5.0, 1.0)))
+        self.elem_sim.optimization_recoils = recoils
+
+        with patch("modules.get_espe.GetEspe.run",
+                   side_effect=self.get_espe) as mock_run, \
+                patch("modules.element_simulation.ElementSimulation."
+                      "get_espe_calculator",
+                      side_effect=self.get_espe_calculator):
+            espes = self.nsgaii.calculate_espes(recoils)
+            self.assertEqual(2, mock_run.call_count)
+            self.assertEqual(espes[0], espes[2])
+            self.assertNotEqual(espes[0], espes[1])
+
+            self.assertEqual(espes, self.nsgaii.calculate_espes(recoils))
+            self.assertEqual(2, mock_run.call_count)
+
+        self.assertEqual(
+            {"hits": 4, "misses": 2, "size": 2},
+            self.nsgaii._get_message(None)["espe_cache"])
+        self.nsgaii._executor.shutdown()
+
 if __name__ == '__main__':
     unittest.main()
@@ -28,6 +28,8 @@ __version__ = "2.0"
 import unittest
 import itertools
 
+import numpy as np
+
 import modules.optimization as optim
 
 
@@ -105,6 +107,15 @@ class TestOptimization(unittest.TestCase):
         self.assertFalse(optim.dominates([1], [0, 1]))
         self.assertRaises(TypeError, lambda: optim.dominates("s", [0]))
 
+    def test_domination_matrix(self):
+        sols = [self.ideal, *self.front1, *self.front2, self.nadir,
+                [np.nan, 0, 0], [1, np.nan, 1], self.ideal]
+        expected = [
+            [optim.dominates(a, b) for b in sols] for a in sols
+        ]
+        self.assertEqual(expected, optim.domination_matrix(sols).tolist())
+        self.assertEqual((0, 0), optim.domination_matrix([]).shape)
+
     def assert_dominates(self, nondominated, dominated):
         """Helper function that checks if the solutions in the nondominated
         set dominate all solutions in the dominated set."""
@@ -117,3 +128,53 @@ class TestOptimization(unittest.TestCase):
         for sol1, sol2 in itertools.product(set1, set2):
             self.assertFalse(optim.dominates(sol1, sol2))
 
+
+def _tournament_one_at_a_time(t, p, fit):
+    # Candidates are drawn and compared one by one like the tournament
+    # used to be implemented
+    n = len(fit)
+    pool = []
+    for _ in range(p):
+        candidates = []
+        while len(candidates) < t:
+            candidate = np.random.randint(n)
+            if candidate not in candidates:
+                candidates.append(candidate)
+        min_front = min([fit[i, 0] for i in candidates])
+        min_candidates = [i for i in candidates if fit[i, 0] == min_front]
+        if len(min_candidates) > 1:
+            max_dist = max([fit[i, 1] for i in min_candidates])
+            max_cands = [i for i in min_candidates if fit[i, 1] == max_dist]
+            pool.append(max_cands[0])
+        else:
+            pool.append(min_candidates[0])
+    return np.array(pool)
+
+
+class TestTournament(unittest.TestCase):
+    def test_same_pool_with_same_random_state(self):
+        rng = np.random.RandomState(7)
+        for n, t, p in (3, 2, 20), (10, 2, 5), (50, 3, 25), (4, 4, 3):
+            fit = np.vstack((
+                rng.randint(1, 4, size=n),
+                rng.choice([0.0, 0.5, 1.0, np.inf], size=n))).T
+            for seed in range(20):
+                np.random.seed(seed)
+                expected = _tournament_one_at_a_time(t, p, fit)
+                state = np.random.randint(1000)
+
+                np.random.seed(seed)
+                pool = optim.tournament_allow_doubles(t, p, fit)
+                self.assertEqual(expected.tolist(), pool.tolist())
+                # Same amount of random numbers was used
+                self.assertEqual(state, np.random.randint(1000))
+
+    def test_undecided_tournament_raises_index_error(self):
+        fit = np.array([[1, np.nan], [1, np.nan]])
+        self.assertRaises(
+            IndexError, lambda: optim.tournament_allow_doubles(2, 1, fit))
+
+    def test_empty_pool(self):
+        self.assertEqual(
+            0, len(optim.tournament_allow_doubles(2, 0, np.ones((3, 2)))))
+
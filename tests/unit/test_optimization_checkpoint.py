@@ -0,0 +1,116 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import tempfile
+import unittest
+
+import numpy as np
+
+from pathlib import Path
+
+import modules.optimization_checkpoint as ckpt
+
+from modules.enums import OptimizationType
+
+
+def _get_checkpoint(seed=1):
+    rng = np.random.RandomState(seed)
+    return ckpt.Checkpoint(
+        solutions=rng.random_sample((6, 5)),
+        objective_values=rng.random_sample((6, 2)),
+        evaluations_left=42,
+        rng_state=rng.get_state(),
+        erd_fingerprint=(("foo.201.erd", 123, 456), ("foo.202.erd", 7, 8)),
+        const_var_i=[0, 4])
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = Path(self.tmp_dir.name, "He-opt.checkpoint")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_checkpoint_file(self):
+        self.assertEqual(
+            Path("foo", "He-opt.checkpoint"),
+            ckpt.get_checkpoint_file(Path("foo"), "He",
+                                     OptimizationType.RECOIL))
+        self.assertEqual(
+            Path("foo", "He-optfl.checkpoint"),
+            ckpt.get_checkpoint_file(Path("foo"), "He",
+                                     OptimizationType.FLUENCE))
+        self.assertRaises(
+            ValueError,
+            lambda: ckpt.get_checkpoint_file(Path("foo"), "He", None))
+
+    def test_save_and_load(self):
+        checkpoint = _get_checkpoint()
+        ckpt.save_checkpoint(self.file, checkpoint)
+        loaded = ckpt.load_checkpoint(self.file)
+
+        np.testing.assert_array_equal(checkpoint.solutions, loaded.solutions)
+        np.testing.assert_array_equal(
+            checkpoint.objective_values, loaded.objective_values)
+        self.assertEqual(42, loaded.evaluations_left)
+        self.assertEqual(checkpoint.erd_fingerprint, loaded.erd_fingerprint)
+        self.assertEqual([0, 4], loaded.const_var_i)
+
+        # Restored generator continues from the same state
+        rng = np.random.RandomState()
+        rng.set_state(loaded.rng_state)
+        expected = np.random.RandomState(1)
+        expected.random_sample((6, 5))
+        expected.random_sample((6, 2))
+        self.assertEqual(expected.random_sample(3).tolist(),
+                         rng.random_sample(3).tolist())
+
+    def test_save_replaces_previous_checkpoint(self):
+        ckpt.save_checkpoint(self.file, _get_checkpoint(1))
+        ckpt.save_checkpoint(self.file, _get_checkpoint(2))
+
+        np.testing.assert_array_equal(
+            _get_checkpoint(2).solutions,
+            ckpt.load_checkpoint(self.file).solutions)
+        self.assertEqual([self.file], list(self.file.parent.iterdir()))
+
+    def test_invalid_files(self):
+        self.assertRaises(
+            OSError, lambda: ckpt.load_checkpoint(self.file))
+
+        self.file.write_text("foo")
+        self.assertRaises(
+            ValueError, lambda: ckpt.load_checkpoint(self.file))
+
+        with self.file.open("wb") as f:
+            np.savez_compressed(f, version=ckpt.CHECKPOINT_VERSION)
+        self.assertRaises(
+            ValueError, lambda: ckpt.load_checkpoint(self.file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import json
+import tempfile
+import threading
+import time
+import unittest
+
+from pathlib import Path
+
+import modules.persistence as persistence
+
+from modules.persistence import DebouncedWriter
+from modules.target import Target
+
+
+class TestWriteJsonIfChanged(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file = Path(self.tmp_dir.name, "foo.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_new_file_is_written(self):
+        self.assertTrue(persistence.write_json_if_changed(
+            self.file, {"a": (1, 2)}))
+        with self.file.open() as file:
+            self.assertEqual({"a": [1, 2]}, json.load(file))
+
+    def test_unchanged_content_is_not_written(self):
+        persistence.write_json_if_changed(
+            self.file, {"a": 1, "modification_time_unix": 1})
+        mtime = self.file.stat().st_mtime_ns
+
+        self.assertFalse(persistence.write_json_if_changed(
+            self.file, {"a": 1, "modification_time_unix": 2}))
+        self.assertEqual(mtime, self.file.stat().st_mtime_ns)
+        with self.file.open() as file:
+            self.assertEqual(1, json.load(file)["modification_time_unix"])
+
+    def test_changed_content_is_written(self):
+        persistence.write_json_if_changed(self.file, {"a": 1})
+        self.assertTrue(persistence.write_json_if_changed(
+            self.file, {"a": 2}))
+        with self.file.open() as file:
+            self.assertEqual({"a": 2}, json.load(file))
+
+    def test_invalid_file_is_overwritten(self):
+        self.file.write_text("{")
+        self.assertTrue(persistence.write_json_if_changed(
+            self.file, {"a": 1}))
+
+    def test_target_is_written_only_when_changed(self):
+        target = Target(name="foo")
+        file = Path(self.tmp_dir.name, "foo.target")
+        target.to_file(file)
+        content = file.read_text()
+
+        target.to_file(file)
+        self.assertEqual(content, file.read_text())
+
+        target.description = "bar"
+        target.to_file(file)
+        self.assertEqual("bar", Target.from_file(file, None).description)
+
+
+class TestDebouncedWriter(unittest.TestCase):
+    def setUp(self):
+        self.saved = threading.Event()
+        self.save_count = 0
+
+    def save(self):
+        self.save_count += 1
+        self.saved.set()
+
+    def test_edits_are_coalesced(self):
+        writer = DebouncedWriter(self.save, delay=0.2)
+        for _ in range(10):
+            writer.mark_dirty()
+            time.sleep(0.01)
+        self.assertTrue(writer.dirty)
+        self.assertEqual(0, self.save_count)
+
+        self.assertTrue(self.saved.wait(timeout=5))
+        writer.close()
+        self.assertEqual(1, self.save_count)
+        self.assertFalse(writer.dirty)
+
+    def test_flush_saves_immediately(self):
+        writer = DebouncedWriter(self.save, delay=60)
+        self.assertFalse(writer.flush())
+        writer.mark_dirty()
+        self.assertTrue(writer.flush())
+        self.assertFalse(writer.flush())
+        writer.close()
+        self.assertEqual(1, self.save_count)
+
+    def test_close_saves_pending_changes(self):
+        writer = DebouncedWriter(self.save, delay=60)
+        writer.mark_dirty()
+        writer.close()
+        self.assertEqual(1, self.save_count)
+
+        writer.mark_dirty()
+        self.assertFalse(writer.dirty)
+        self.assertFalse(writer.flush())
+        self.assertEqual(1, self.save_count)
+
+    def test_close_can_discard_changes(self):
+        writer = DebouncedWriter(self.save, delay=60)
+        writer.mark_dirty()
+        writer.close(flush=False)
+        self.assertFalse(writer.dirty)
+        self.assertEqual(0, self.save_count)
+
+    def test_failed_save_remains_dirty(self):
+        def fail():
+            raise OSError
+
+        writer = DebouncedWriter(fail, delay=60)
+        writer.mark_dirty()
+        self.assertRaises(OSError, writer.flush)
+        self.assertTrue(writer.dirty)
+        writer.close(flush=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -24,11 +24,14 @@ along with this program (file named 'LICENCE').
 __author__ = "Juhani Sundell"
 __version__ = "2.0"
 
+import copy
+import pickle
 import unittest
 import random
 import modules.math_functions as mf
 
 from modules.point import Point
+from modules.point import PointStore
 
 
 class TestPoint(unittest.TestCase):
@@ -100,5 +103,119 @@ class TestPoint(unittest.TestCase):
                              str(p2.calculate_new_point(p1, x)))
 
 
+class TestPointStore(unittest.TestCase):
+    def setUp(self):
+        self.p1 = Point(0, 1)
+        self.p2 = Point(1, 2)
+        self.p3 = Point(2, 3)
+        self.store = PointStore([self.p3, self.p1, self.p2])
+
+    def assert_coordinates_match(self, store):
+        self.assertEqual([p.get_x() for p in store], store.get_xs())
+        self.assertEqual([p.get_y() for p in store], store.get_ys())
+
+    def test_points_are_sorted(self):
+        self.assertEqual([self.p1, self.p2, self.p3], self.store.get_points())
+        self.assertEqual([0, 1, 2], self.store.get_xs())
+        self.assertEqual([1, 2, 3], self.store.get_ys())
+
+        random.seed(5)
+        points = [Point(random.uniform(0, 10), i) for i in range(50)]
+        store = PointStore()
+        for p in points:
+            store.add(p)
+        self.assertEqual(sorted(points), store.get_points())
+        self.assert_coordinates_match(store)
+
+    def test_added_point_goes_after_equal_xs(self):
+        p = Point(1, 5)
+        self.assertEqual(2, self.store.add(p))
+        self.assertIs(p, self.store[2])
+        self.assertEqual(0, self.store.add(Point(-1, 0)))
+        self.assertEqual(5, self.store.add(Point(3, 0)))
+
+    def test_index(self):
+        self.assertEqual(1, self.store.index(self.p2))
+        self.assertEqual(1, self.store.index(Point(1, 2)))
+        self.assertRaises(ValueError, lambda: self.store.index(Point(1, 3)))
+        self.assertRaises(ValueError, lambda: self.store.index(Point(5, 2)))
+
+        p = Point(1, 2)
+        self.store.add(p)
+        # First equal point is found like with lists
+        self.assertEqual(1, self.store.index(p))
+
+    def test_remove(self):
+        self.store.remove(Point(1, 2))
+        self.assertEqual([self.p1, self.p3], self.store.get_points())
+        self.assertEqual([0, 2], self.store.get_xs())
+        self.assertRaises(ValueError, lambda: self.store.remove(self.p2))
+        self.assertIs(self.p3, self.store.pop(-1))
+        self.assertRaises(IndexError, lambda: self.store.pop(1))
+
+    def test_neighbors(self):
+        self.assertEqual((None, self.p2), self.store.get_neighbors(self.p1))
+        self.assertEqual((self.p1, self.p3), self.store.get_neighbors(self.p2))
+        self.assertEqual((self.p2, None), self.store.get_neighbors(self.p3))
+
+    def test_changed_points_are_updated(self):
+        self.p2.set_y(7)
+        self.p3.set_x(2.5)
+        self.p1.set_coordinates((-1, 0))
+        self.assertEqual([-1, 1, 2.5], self.store.get_xs())
+        self.assertEqual([0, 7, 3], self.store.get_ys())
+        self.assertTrue(self.store.is_sorted())
+
+        self.store.remove(self.p2)
+        self.p2.set_x(10)
+        self.assertEqual([-1, 2.5], self.store.get_xs())
+
+    def test_point_moved_past_neighbor(self):
+        self.p1.set_x(1.5)
+        self.assertFalse(self.store.is_sorted())
+        self.assertEqual((self.p1, self.p3), self.store.get_neighbors(self.p2))
+        self.assertEqual(0, self.store.index(self.p1))
+
+        self.p1.set_x(0.5)
+        self.assertTrue(self.store.is_sorted())
+
+        self.p1.set_x(1.5)
+        self.store.add(Point(3, 0))
+        self.assertTrue(self.store.is_sorted())
+        self.assertEqual([1, 1.5, 2, 3], self.store.get_xs())
+        self.assert_coordinates_match(self.store)
+
+    def test_replace(self):
+        self.store.replace(1, 2, [0.5, 0.7], [1, 1])
+        self.assertEqual([0, 0.5, 0.7, 2], self.store.get_xs())
+        self.assertIs(self.p1, self.store[0])
+        self.assertIs(self.p3, self.store[-1])
+
+        # Replaced point no longer updates the store
+        self.p2.set_x(5)
+        self.assertEqual([0, 0.5, 0.7, 2], self.store.get_xs())
+        self.store[1].set_y(4)
+        self.assertEqual([1, 4, 1, 3], self.store.get_ys())
+
+    def test_point_in_multiple_stores(self):
+        other = PointStore([self.p2])
+        self.p2.set_x(1.5)
+        self.assertEqual([1.5], other.get_xs())
+        self.assertEqual([0, 1.5, 2], self.store.get_xs())
+
+    def test_copies_are_detached(self):
+        for p in copy.copy(self.p1), copy.deepcopy(self.p1), \
+                pickle.loads(pickle.dumps(self.p1)):
+            self.assertEqual(self.p1, p)
+            p.set_x(5)
+            self.assertEqual([0, 1, 2], self.store.get_xs())
+
+        store = copy.deepcopy(self.store)
+        self.assertEqual(self.store, store)
+        store[0].set_y(10)
+        self.assertEqual([10, 2, 3], store.get_ys())
+        self.assertEqual([1, 2, 3], self.store.get_ys())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,194 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import random
+import unittest
+
+import numpy as np
+
+import modules.point_history as ph
+
+from modules.point import Point
+from modules.point import PointStore
+
+
+def _snapshot(xs, ys=None, full_edit=False):
+    if ys is None:
+        ys = [0] * len(xs)
+    return ph.Snapshot(
+        np.array(xs, dtype=float), np.array(ys, dtype=float), full_edit)
+
+
+class TestPatches(unittest.TestCase):
+    def test_changed_range(self):
+        def get_range(xs1, xs2):
+            s1, s2 = _snapshot(xs1), _snapshot(xs2)
+            return ph.get_changed_range(s1.xs, s1.ys, s2.xs, s2.ys)
+
+        self.assertEqual((3, 3, 3), get_range([0, 1, 2], [0, 1, 2]))
+        self.assertEqual((1, 2, 2), get_range([0, 1, 2], [0, 5, 2]))
+        self.assertEqual((1, 1, 2), get_range([0, 2], [0, 1, 2]))
+        self.assertEqual((1, 2, 1), get_range([0, 1, 2], [0, 2]))
+        self.assertEqual((2, 2, 3), get_range([0, 1], [0, 1, 2]))
+        self.assertEqual((2, 2, 3), get_range([1, 1], [1, 1, 1]))
+        self.assertEqual((0, 2, 1), get_range([0, 1], [2]))
+        self.assertEqual((0, 0, 2), get_range([], [0, 1]))
+
+        s1, s2 = _snapshot([0, 1, 2], [0, 0, 0]), _snapshot([0, 1, 2], [0, 1, 0])
+        self.assertEqual(
+            (1, 2, 2), ph.get_changed_range(s1.xs, s1.ys, s2.xs, s2.ys))
+
+    def test_patch_turns_newer_state_into_older(self):
+        rand = random.Random(3)
+        for _ in range(200):
+            older = _snapshot(
+                [rand.randint(0, 3) for _ in range(rand.randint(0, 6))],
+                full_edit=rand.random() < 0.5)
+            older = older._replace(ys=older.xs * 2)
+            newer = _snapshot(
+                [rand.randint(0, 3) for _ in range(rand.randint(0, 6))])
+            patch = ph.get_patch(newer, older)
+            restored = ph.apply_patch(newer, patch)
+            self.assertTrue(ph.is_same_state(older, restored))
+            self.assertEqual(older.full_edit, restored.full_edit)
+
+    def test_patch_only_contains_changed_points(self):
+        older = _snapshot(range(1000))
+        newer = _snapshot([*range(500), 500.5, *range(501, 1000)])
+        patch = ph.get_patch(newer, older)
+        self.assertEqual((500, 501), (patch.start, patch.stop))
+        self.assertEqual([500], patch.xs.tolist())
+
+
+class TestPointHistory(unittest.TestCase):
+    def setUp(self):
+        self.store = PointStore([Point(0, 1), Point(1, 2), Point(2, 3)])
+        self.history = ph.PointHistory()
+
+    def test_undo_and_redo(self):
+        self.assertFalse(self.history.undo(self.store))
+        self.assertFalse(self.history.redo(self.store))
+
+        self.history.save(self.store, False)
+        self.store[1].set_y(5)
+        self.history.save(self.store, True)
+        self.store.add(Point(3, 4))
+
+        self.assertEqual(2, self.history.get_undo_count())
+        self.assertTrue(self.history.is_previous_full_edit())
+
+        self.assertTrue(self.history.undo(self.store))
+        self.assertEqual([0, 1, 2], self.store.get_xs())
+        self.assertEqual([1, 5, 3], self.store.get_ys())
+        self.assertFalse(self.history.is_previous_full_edit())
+
+        self.assertTrue(self.history.undo(self.store))
+        self.assertEqual([1, 2, 3], self.store.get_ys())
+        self.assertIsNone(self.history.is_previous_full_edit())
+        self.assertFalse(self.history.undo(self.store))
+        self.assertEqual(2, self.history.get_redo_count())
+
+        self.assertTrue(self.history.redo(self.store))
+        self.assertEqual([1, 5, 3], self.store.get_ys())
+        self.assertFalse(self.history.is_previous_full_edit())
+        self.assertTrue(self.history.redo(self.store))
+        self.assertEqual([0, 1, 2, 3], self.store.get_xs())
+        self.assertEqual([1, 5, 3, 4], self.store.get_ys())
+        self.assertTrue(self.history.is_previous_full_edit())
+        self.assertFalse(self.history.redo(self.store))
+
+    def test_unchanged_points_are_kept(self):
+        first, last = self.store[0], self.store[-1]
+        self.history.save(self.store, False)
+        self.store[1].set_x(1.5)
+        self.history.undo(self.store)
+        self.assertIs(first, self.store[0])
+        self.assertIs(last, self.store[-1])
+        self.assertEqual([0, 1, 2], self.store.get_xs())
+
+        # Restored points are part of the store
+        self.store[1].set_x(0.5)
+        self.assertEqual([0, 0.5, 2], self.store.get_xs())
+
+    def test_saving_clears_redo(self):
+        self.history.save(self.store, False)
+        self.store[0].set_y(0)
+        self.history.undo(self.store)
+        self.assertEqual(1, self.history.get_redo_count())
+
+        self.store[0].set_y(10)
+        self.history.save(self.store, False)
+        self.assertEqual(0, self.history.get_redo_count())
+        self.assertEqual(1, self.history.get_undo_count())
+
+    def test_same_state_is_saved_once(self):
+        self.history.save(self.store, False)
+        self.history.save(self.store, True)
+        self.assertEqual(1, self.history.get_undo_count())
+        self.assertFalse(self.history.is_previous_full_edit())
+
+    def test_excluded_point_is_not_saved(self):
+        p = Point(1.5, 0)
+        self.store.add(p)
+        self.history.save(self.store, False, exclude=p)
+        self.history.undo(self.store)
+        self.assertEqual([0, 1, 2], self.store.get_xs())
+        self.history.redo(self.store)
+        self.assertEqual([0, 1, 1.5, 2], self.store.get_xs())
+
+    def test_depth_limits_history(self):
+        self.history.depth = 3
+        for i in range(10):
+            self.store[0].set_y(i)
+            self.history.save(self.store, False)
+        self.store[0].set_y(10)
+        self.assertEqual(3, self.history.get_undo_count())
+
+        ys = []
+        while self.history.undo(self.store):
+            ys.append(self.store[0].get_y())
+        self.assertEqual([9, 8, 7], ys)
+        self.assertEqual(3, self.history.get_redo_count())
+
+        self.history.depth = 2
+        self.assertEqual(2, self.history.get_redo_count())
+        while self.history.redo(self.store):
+            ys.append(self.store[0].get_y())
+        self.assertEqual([9, 8, 7, 8, 9], ys)
+
+        self.history.depth = 1
+        self.assertEqual(1, self.history.get_undo_count())
+        self.assertRaises(ValueError, ph.PointHistory, 0)
+
+    def test_clear(self):
+        self.history.save(self.store, False)
+        self.history.clear()
+        self.assertEqual(0, self.history.get_undo_count())
+        self.assertFalse(self.history.undo(self.store))
+
+
+if __name__ == '__main__':
+    unittest.main()
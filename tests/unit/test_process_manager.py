@@ -0,0 +1,193 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import sys
+import threading
+import time
+import unittest
+
+from rx import operators as ops
+
+import modules.process_manager as pm
+
+from modules.concurrency import CancellationToken
+from tests.mock_objects import MockObserver
+
+_TIMEOUT = 10
+
+
+def _python(code: str):
+    return sys.executable, "-c", code
+
+
+def _observe(observable):
+    """Subscribes to the observable and returns the observer and an event
+    that is set when the stream ends.
+    """
+    obs = MockObserver()
+    done = threading.Event()
+    observable.pipe(ops.do_action(
+        on_error=lambda _: done.set(), on_completed=done.set)).subscribe(obs)
+    return obs, done
+
+
+def _kinds(obs):
+    return [event.kind for event in obs.nexts]
+
+
+class TestProcessManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = pm.ProcessManager(max_processes=1)
+
+    def test_output_and_exit_status(self):
+        obs, done = _observe(self.manager.observe(_python(
+            "import sys\n"
+            "print('foo')\n"
+            "print('bar', file=sys.stderr)\n"
+            "sys.stdout.write('baz')"
+        )))
+        self.assertTrue(done.wait(_TIMEOUT))
+
+        lines = [e.value for e in obs.nexts if e.kind == pm.LINE]
+        self.assertEqual(["bar", "baz", "foo"], sorted(lines))
+        self.assertEqual(pm.STATUS, obs.nexts[-1].kind)
+        self.assertEqual(0, obs.nexts[-1].value.poll())
+        self.assertEqual([], obs.errs)
+        self.assertEqual(["done"], obs.compl)
+
+    def test_processes_over_the_limit_are_queued(self):
+        started = []
+        sleep = _python("import time; time.sleep(0.3)")
+        streams = [
+            _observe(self.manager.observe(
+                sleep, prepare=lambda i=i: started.append((i, time.time()))))
+            for i in range(2)
+        ]
+        for _, done in streams:
+            self.assertTrue(done.wait(_TIMEOUT))
+
+        self.assertEqual([0, 1], [i for i, _ in started])
+        self.assertGreaterEqual(started[1][1] - started[0][1], 0.3)
+        self.assertEqual(0, self.manager.get_running_count())
+        self.assertEqual(0, self.manager.get_queued_count())
+
+    def test_processes_are_prepared_without_holding_the_lock(self):
+        # Queue cannot be inspected while the manager holds its lock
+        queued = []
+        obs, done = _observe(self.manager.observe(
+            _python("pass"),
+            prepare=lambda: queued.append(self.manager.get_queued_count())))
+        self.assertTrue(done.wait(_TIMEOUT))
+
+        self.assertEqual([0], queued)
+        self.assertEqual([], obs.errs)
+
+    def test_cancelled_process_is_killed_and_queued_one_not_started(self):
+        ct = CancellationToken()
+        started = []
+        sleep = _python("import time; time.sleep(10)")
+        first_obs, first_done = _observe(self.manager.observe(
+            sleep, ct=ct, prepare=lambda: started.append(0)))
+        second_obs, second_done = _observe(self.manager.observe(
+            sleep, ct=ct, prepare=lambda: started.append(1)))
+        time.sleep(0.3)
+        ct.request_cancellation()
+        self.assertTrue(first_done.wait(_TIMEOUT))
+        self.assertTrue(second_done.wait(_TIMEOUT))
+
+        self.assertEqual([0], started)
+        stopped = first_obs.nexts[-1]
+        self.assertEqual(pm.STOPPED, stopped.kind)
+        self.assertIsNotNone(stopped.value.poll())
+        self.assertEqual([pm.ProcessEvent(pm.STOPPED, None)], second_obs.nexts)
+
+    def test_timeout_requests_cancellation(self):
+        ct = CancellationToken()
+        obs, done = _observe(self.manager.observe(
+            _python("import time; time.sleep(10)"), ct=ct, max_time=0.2))
+        self.assertTrue(done.wait(_TIMEOUT))
+
+        self.assertEqual(pm.TIMEOUT, obs.nexts[-1].kind)
+        self.assertTrue(ct.is_cancellation_requested())
+
+    def test_running_status_is_polled(self):
+        obs, done = _observe(self.manager.observe(
+            _python("import time; time.sleep(0.5)"), first_check=0,
+            poll_interval=0.1))
+        self.assertTrue(done.wait(_TIMEOUT))
+
+        statuses = [e.value for e in obs.nexts if e.kind == pm.STATUS]
+        self.assertLess(2, len(statuses))
+        self.assertEqual(0, statuses[-1].poll())
+
+    def test_processes_with_same_startup_key_are_started_in_turn(self):
+        self.manager.max_processes = 2
+        started = []
+        code = _python(
+            "import time\n"
+            "time.sleep(0.3)\n"
+            "print('started', flush=True)\n"
+            "time.sleep(0.3)")
+        streams = [
+            _observe(self.manager.observe(
+                code, prepare=lambda i=i: started.append((i, time.time())),
+                startup_key="foo", startup_done=lambda x: x == "started"))
+            for i in range(2)
+        ]
+        for _, done in streams:
+            self.assertTrue(done.wait(_TIMEOUT))
+
+        self.assertGreaterEqual(started[1][1] - started[0][1], 0.3)
+        # Second process started before the first one ended
+        self.assertLess(started[1][1] - started[0][1], 0.6)
+
+    def test_disposing_removes_queued_process(self):
+        started = []
+        sleep = _python("import time; time.sleep(0.3)")
+        _, first_done = _observe(self.manager.observe(sleep))
+        disposable = self.manager.observe(
+            sleep, prepare=lambda: started.append(1)).subscribe(MockObserver())
+        disposable.dispose()
+        self.assertTrue(first_done.wait(_TIMEOUT))
+        time.sleep(0.3)
+
+        self.assertEqual([], started)
+        self.assertEqual(0, self.manager.get_queued_count())
+
+    def test_start_errors_are_reported(self):
+        def fail():
+            raise OSError("foo")
+
+        obs, done = _observe(self.manager.observe(
+            _python("pass"), prepare=fail))
+        self.assertTrue(done.wait(_TIMEOUT))
+
+        self.assertEqual([], obs.nexts)
+        self.assertIsInstance(obs.errs[0], OSError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -92,6 +92,7 @@ class TestRecoilElement(unittest.TestCase):
         snd = dict(vars(rec_elem2))
 
         self.assertEqual(fst.pop("_points"), snd.pop("_points"))
+        self.assertEqual(fst.pop("_history").depth, snd.pop("_history").depth)
         self.assertEqual(fst.pop("element"), snd.pop("element"))
 
         times = fst.pop("modification_time"), snd.pop("modification_time")
@@ -239,6 +240,29 @@ class TestPoints(unittest.TestCase):
 
         self.assertRaises(IndexError, self.rec_elem.distribution_length)
 
+    def test_undo_and_redo_points(self):
+        self.assertFalse(self.rec_elem.can_undo_points())
+        self.rec_elem.save_current_points(False)
+        self.p2.set_coordinates((0.5, 0.5))
+        self.assertEqual([0, 0.5, 2], self.rec_elem.get_xs())
+
+        self.assertTrue(self.rec_elem.can_undo_points())
+        self.assertFalse(self.rec_elem.previous_points_in_full_edit())
+        self.assertTrue(self.rec_elem.undo_points())
+        self.assertEqual([0, 1, 2], self.rec_elem.get_xs())
+        self.assertEqual([0, 1, 0], self.rec_elem.get_ys())
+        self.assertIs(self.p1, self.rec_elem.get_first_point())
+        self.assertFalse(self.rec_elem.can_undo_points())
+
+        self.assertTrue(self.rec_elem.can_redo_points())
+        self.assertTrue(self.rec_elem.redo_points())
+        self.assertEqual([0, 0.5, 2], self.rec_elem.get_xs())
+
+        self.rec_elem.set_history_depth(1)
+        self.rec_elem.delete_backlog()
+        self.assertFalse(self.rec_elem.can_undo_points())
+        self.assertFalse(self.rec_elem.can_redo_points())
+
 
 if __name__ == '__main__':
     unittest.main()
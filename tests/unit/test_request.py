@@ -33,6 +33,7 @@ import tests.mock_objects as mo
 from pathlib import Path
 
 from modules.request import Request
+from modules.selection import Selector
 
 
 class TestFolderStructure(unittest.TestCase):
@@ -172,3 +173,43 @@ class TestSerialization(unittest.TestCase):
             request.default_measurement.target,
             request.default_simulation.target
         )
+
+
+class TestSlaves(unittest.TestCase):
+    def test_paths_of_unloaded_nonslaves_are_kept(self):
+        asc_file = utils.get_sample_data_dir() / "Ecaart-11-mini" / \
+            "Tof-E_65-mini.asc"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            request = Request(
+                Path(tmp_dir, "req"), "req", mo.get_global_settings(),
+                enable_logging=False)
+            sample = request.samples.add_sample(name="sample")
+            first, second = (
+                request.samples.measurements.add_measurement_file(
+                    sample, asc_file, i, name, False, selector_cls=Selector)
+                for i, name in enumerate(("first", "second"))
+            )
+            request.set_master(first)
+            request.exclude_slave(second)
+
+            # Only the master is loaded
+            request = Request.from_file(
+                request.request_file, mo.get_global_settings(),
+                enable_logging=False)
+            sample = request.samples.add_sample(
+                sample_path=request.directory / sample.directory)
+            master = request.samples.measurements.add_measurement_file(
+                sample, first.path, 0, "", False, selector_cls=Selector)
+
+            self.assertEqual(str(first.path), request.get_master_path())
+            self.assertEqual(
+                [str(second.path)], request.get_nonslave_paths())
+            self.assertEqual([], request.get_nonslaves())
+
+            request.exclude_slave(master)
+            self.assertEqual(
+                [str(second.path), str(first.path)],
+                request.get_nonslave_paths())
+            request.include_slave(master)
+            self.assertEqual(
+                [str(second.path)], request.get_nonslave_paths())
@@ -0,0 +1,175 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from pathlib import Path
+from unittest.mock import patch
+
+import modules.request_index as request_index
+
+from modules.request_index import RequestIndex
+
+
+def _set_old_mtime(*paths):
+    # Directories modified just now are not trusted so make them older
+    old = time.time() - 60
+    for path in paths:
+        os.utime(path, (old, old))
+
+
+class TestRequestIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name, "req")
+        self.sample = self.root / "Sample_01-foo"
+        self.mesu = self.sample / "Measurement_01-bar"
+        (self.mesu / "Detector").mkdir(parents=True)
+        for file in "bar.info", "bar.profile", "bar.target":
+            (self.mesu / file).write_text("")
+        (self.root / "req.request").write_text("")
+        self.index_file = self.root / "Index" / "index.json"
+        # Index directory is created beforehand so that saving the index
+        # does not modify the root directory
+        self.index_file.parent.mkdir()
+        _set_old_mtime(self.root, self.sample, self.mesu)
+
+        self.list_directory = request_index.list_directory
+        self.listed = []
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_index(self):
+        return RequestIndex(self.root, self.index_file)
+
+    def count_listings(self):
+        def list_directory(directory):
+            self.listed.append(Path(directory).name)
+            return self.list_directory(directory)
+
+        return patch.object(
+            request_index, "list_directory", side_effect=list_directory)
+
+    def test_listings_are_read_from_saved_index(self):
+        index = self.get_index()
+        with self.count_listings():
+            expected = [index.list_dir(d) for d in
+                        (self.root, self.sample, self.mesu)]
+            index.save()
+
+            self.assertEqual(
+                (["req.request"], ["Index", "Sample_01-foo"]), expected[0])
+            self.assertEqual(
+                (["bar.info", "bar.profile", "bar.target"], ["Detector"]),
+                expected[2])
+
+            index = self.get_index()
+            self.assertEqual(expected, [index.list_dir(d) for d in
+                                        (self.root, self.sample, self.mesu)])
+        self.assertEqual(
+            ["req", "Sample_01-foo", "Measurement_01-bar"], self.listed)
+
+    def test_modified_directory_is_listed_again(self):
+        index = self.get_index()
+        index.list_dir(self.mesu)
+        index.save()
+        (self.mesu / "bar.measurement").write_text("")
+
+        index = self.get_index()
+        self.assertEqual(
+            {".measurement": [self.mesu / "bar.measurement"],
+             ".profile": [self.mesu / "bar.profile"]},
+            index.find_files_by_extension(
+                self.mesu, ".measurement", ".profile"))
+
+    def test_recently_modified_directory_is_not_trusted(self):
+        (self.mesu / "bar.measurement").write_text("")
+        index = self.get_index()
+        with self.count_listings():
+            index.list_dir(self.mesu)
+            index.list_dir(self.mesu)
+        self.assertEqual(["Measurement_01-bar"] * 2, self.listed)
+
+    def test_unusable_index_file_is_rebuilt(self):
+        for contents in ("{", json.dumps({"version": -1}),
+                         json.dumps({"version": request_index.INDEX_VERSION,
+                                     "directories": {"x": {"files": 1}}})):
+            self.index_file.write_text(contents)
+            self.listed.clear()
+            index = self.get_index()
+            with self.count_listings():
+                self.assertEqual(
+                    (["req.request"], ["Index", "Sample_01-foo"]),
+                    index.list_dir(self.root))
+            self.assertEqual(["req"], self.listed)
+
+    def test_invalidate_and_remove(self):
+        index = self.get_index()
+        for directory in self.root, self.sample, self.mesu:
+            index.list_dir(directory)
+
+        index.invalidate(self.sample)
+        with self.count_listings():
+            for directory in self.root, self.sample, self.mesu:
+                index.list_dir(directory)
+        self.assertEqual(["Sample_01-foo"], self.listed)
+
+        index.remove(self.sample)
+        self.assertTrue(self.index_file.exists())
+        self.listed.clear()
+        with self.count_listings():
+            for directory in self.root, self.sample, self.mesu:
+                index.list_dir(directory)
+        self.assertEqual(["Sample_01-foo", "Measurement_01-bar"], self.listed)
+
+    def test_deleted_directories_are_pruned_on_save(self):
+        index = self.get_index()
+        for directory in self.root, self.sample, self.mesu:
+            index.list_dir(directory)
+        index.save()
+
+        new_sample = self.root / "Sample_02-foo"
+        self.sample.rename(new_sample)
+        _set_old_mtime(self.root)
+        index = self.get_index()
+        index.list_dir(self.root)
+        index.save()
+
+        with self.index_file.open() as f:
+            self.assertEqual(["."], list(json.load(f)["directories"]))
+
+    def test_directories_outside_request_are_not_indexed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            Path(tmp_dir, "foo").write_text("")
+            index = self.get_index()
+            self.assertEqual((["foo"], []), index.list_dir(Path(tmp_dir)))
+            index.save()
+            self.assertFalse(self.index_file.exists())
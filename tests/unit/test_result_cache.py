@@ -0,0 +1,173 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import modules.result_cache as rc
+
+from modules.result_cache import ResultCache
+
+
+class TestGetFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+        self.file = self.dir / "cuts.1H.ERD.0.cut"
+        self.file.write_text("1 2 3\n")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_files_are_hashed_by_name_and_contents(self):
+        fingerprint = rc.get_fingerprint(self.file, 0.1)
+        moved_file = self.dir / "moved" / self.file.name
+        moved_file.parent.mkdir()
+        moved_file.write_text("1 2 3\n")
+        self.assertEqual(fingerprint, rc.get_fingerprint(moved_file, 0.1))
+
+        self.file.write_text("1 2 4\n")
+        self.assertNotEqual(fingerprint, rc.get_fingerprint(self.file, 0.1))
+        self.assertNotEqual(fingerprint, rc.get_fingerprint(
+            self.file.rename(self.dir / "cuts.1H.ERD.1.cut"), 0.1))
+
+    def test_directories_are_hashed_by_their_files(self):
+        fingerprint = rc.get_fingerprint(self.dir)
+        (self.dir / "H.eff").write_text("1 0.5\n")
+        self.assertNotEqual(fingerprint, rc.get_fingerprint(self.dir))
+        self.assertNotEqual(
+            rc.get_fingerprint(self.dir / "foo"), rc.get_fingerprint(self.dir))
+
+    def test_values_are_not_ambiguous(self):
+        self.assertNotEqual(
+            rc.get_fingerprint("ab", "c"), rc.get_fingerprint("a", "bc"))
+        self.assertNotEqual(
+            rc.get_fingerprint([1, 2], 3), rc.get_fingerprint([1], 2, 3))
+        self.assertNotEqual(rc.get_fingerprint(1), rc.get_fingerprint(1.0))
+        self.assertEqual(
+            rc.get_fingerprint({"a": 1, "b": 2}),
+            rc.get_fingerprint({"b": 2, "a": 1}))
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp_dir.name)
+        self.cache = ResultCache(self.dir / "Result_cache")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def set_last_used(self, entry_name: str, timestamp: float):
+        os.utime(self.cache.directory / entry_name, (timestamp, timestamp))
+
+    def test_json_results(self):
+        self.assertIsNone(self.cache.load_json("espe", "abc"))
+        value = {"1H.ERD.0": [[0.1, 0], [0.3, 2.0]]}
+        self.cache.save_json("espe", "abc", value)
+        self.assertEqual(value, self.cache.load_json("espe", "abc"))
+        self.assertIsNone(self.cache.load_json("losses", "abc"))
+
+    def test_file_results(self):
+        output_dir = self.dir / "Depth_profiles"
+        self.assertIsNone(self.cache.load_files("depth", "abc", output_dir))
+        files = []
+        for name in "depth.1H", "depth.total":
+            file = self.dir / name
+            file.write_text(name)
+            files.append(file)
+        self.cache.save_files("depth", "abc", files)
+
+        loaded = self.cache.load_files("depth", "abc", output_dir)
+        self.assertEqual(
+            [output_dir / "depth.1H", output_dir / "depth.total"], loaded)
+        self.assertEqual(["depth.1H", "depth.total"],
+                         [file.read_text() for file in loaded])
+
+    def test_invalid_keys_are_rejected(self):
+        self.assertRaises(ValueError, self.cache.save_json, "a.b", "c", 1)
+        self.assertRaises(ValueError, self.cache.load_json, "a", "../c")
+
+    def test_entries_are_listed_least_recently_used_first(self):
+        self.assertEqual([], self.cache.get_entries())
+        self.cache.save_json("espe", "a1", [1, 2])
+        self.cache.save_json("losses", "b2", {"H": [1]})
+        file = self.dir / "depth.total"
+        file.write_text("12345")
+        self.cache.save_files("depth", "c3", [file])
+        self.set_last_used("espe.a1.json", 3)
+        self.set_last_used("losses.b2.json", 1)
+        self.set_last_used("depth.c3", 2)
+
+        entries = self.cache.get_entries()
+        self.assertEqual(
+            [("losses", "b2", 10, 1), ("depth", "c3", 5, 2),
+             ("espe", "a1", 6, 3)],
+            [(e.kind, e.key, e.size, e.last_used) for e in entries])
+        self.assertEqual(
+            ["espe"], [e.kind for e in self.cache.get_entries("espe")])
+        self.assertEqual(21, self.cache.get_size())
+        self.assertEqual(5, self.cache.get_size("depth"))
+
+        self.cache.load_json("losses", "b2")
+        self.assertEqual(
+            ["depth", "espe", "losses"],
+            [e.kind for e in self.cache.get_entries()])
+
+    def test_evict(self):
+        for i in range(4):
+            self.cache.save_json("espe", f"k{i}", i)
+            self.set_last_used(f"espe.k{i}.json", i)
+        self.cache.save_json("losses", "k", 10)
+
+        removed = self.cache.evict(max_size=4)
+        self.assertEqual(["k0", "k1"], [e.key for e in removed])
+        self.assertEqual(["k2", "k3", "k"],
+                         [e.key for e in self.cache.get_entries()])
+
+        self.assertEqual(
+            ["k2", "k3"], [e.key for e in self.cache.evict("espe")])
+        self.cache.clear()
+        self.assertEqual([], os.listdir(self.cache.directory))
+
+    def test_cache_is_trimmed_to_max_size(self):
+        self.cache.max_size = 12
+        for i in range(5):
+            self.cache.save_json("espe", f"k{i}", "1234")
+            self.set_last_used(f"espe.k{i}.json", i)
+        self.assertEqual(
+            ["k3", "k4"], [e.key for e in self.cache.get_entries()])
+
+        # The saved result is kept even if it is larger than max size
+        self.cache.save_json("espe", "big", "x" * 20)
+        self.assertEqual(["big"], [e.key for e in self.cache.get_entries()])
+
+
+if __name__ == '__main__':
+    unittest.main()
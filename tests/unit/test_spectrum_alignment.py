@@ -0,0 +1,140 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+import math
+import unittest
+
+import numpy as np
+
+import modules.math_functions as mf
+import modules.spectrum_alignment as sa
+
+from modules.optimization import calculate_change
+
+_CH = 0.025
+
+
+def _uniform_espe_lists(espe1, espe2, channel_width):
+    # Pads spectra with zeros one channel at a time like
+    # general_functions.uniform_espe_lists used to
+    first, second = list(espe1), list(espe2)
+    if second[0][0] < first[0][0]:
+        x = first[0][0] - channel_width
+        while round(x, 4) >= second[0][0]:
+            first.insert(0, (round(x, 4), 0))
+            x -= channel_width
+    elif first[0][0] < second[0][0]:
+        x = second[0][0] - channel_width
+        while round(x, 4) >= first[0][0]:
+            second.insert(0, (round(x, 4), 0))
+            x -= channel_width
+    if second[-1][0] < first[-1][0]:
+        x = second[-1][0] + channel_width
+        while round(x, 4) <= first[-1][0]:
+            second.append((round(x, 4), 0))
+            x += channel_width
+    elif first[-1][0] < second[-1][0]:
+        x = first[-1][0] + channel_width
+        while round(x, 4) <= second[-1][0]:
+            first.append((round(x, 4), 0))
+            x += channel_width
+    return first, second
+
+
+def _get_espe(rng, first, last):
+    return [
+        (round(k * _CH, 4), float(rng.randint(0, 50)))
+        for k in range(first, last + 1)
+    ]
+
+
+class TestSpectrumAlignment(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(3)
+        self.measured = _get_espe(rng, 40, 80)
+        self.simulated = [
+            _get_espe(rng, first, last) for first, last in (
+                (40, 80), (20, 60), (60, 100), (10, 120), (50, 55), (70, 70),
+                (90, 100), (0, 30)
+            )
+        ]
+
+    def test_differences_match_padded_lists(self):
+        reference = sa.ReferenceSpectrum(self.measured, _CH)
+        for espe in self.simulated:
+            sim, mes = _uniform_espe_lists(espe, self.measured, _CH)
+            expected_area = mf.calculate_area(sim, mes)
+            expected_mse = sum(
+                (s[1] - m[1]) ** 2 for s, m in zip(sim, mes)) / len(sim)
+
+            area, mse = reference.get_differences(espe)
+            self.assertAlmostEqual(expected_area, area, places=6)
+            self.assertAlmostEqual(expected_mse, mse, places=9)
+
+    def test_align_spectra(self):
+        espe1 = [(0.05, 1.0), (0.075, 2.0)]
+        espe2 = [(0.1, 3.0), (0.125, 4.0)]
+        x, y1, y2 = sa.align_spectra(espe1, espe2, _CH)
+        np.testing.assert_allclose([0.05, 0.075, 0.1, 0.125], x)
+        np.testing.assert_array_equal([1, 2, 0, 0], y1)
+        np.testing.assert_array_equal([0, 0, 3, 4], y2)
+
+        # Inputs are not modified
+        self.assertEqual([(0.05, 1.0), (0.075, 2.0)], espe1)
+        self.assertEqual([(0.1, 3.0), (0.125, 4.0)], espe2)
+
+    def test_area_of_single_channel_is_zero(self):
+        reference = sa.ReferenceSpectrum([(1.0, 5.0)], _CH)
+        self.assertEqual((0.0, 25.0), reference.get_differences([(1.0, 0.0)]))
+
+    def test_average_adjacent_channels(self):
+        espe = [(1.0, 1.0), (1.025, 3.0), (1.05, 6.0), (1.075, 2.0)]
+        self.assertEqual(
+            [(0.9875, 0.5), (1.0125, 2.0), (1.0375, 4.5), (1.0625, 4.0),
+             (1.0875, 1.0)],
+            sa.average_adjacent_channels(espe, _CH))
+
+    def test_calculate_change(self):
+        def change_one_at_a_time(espe1, espe2):
+            uni1, uni2 = _uniform_espe_lists(espe1, espe2, _CH)
+            diffs = [
+                abs(p1[1] - p2[1]) for p1, p2 in zip(uni1, uni2)
+                if p1[1] != 0 or p2[1] != 0
+            ]
+            return sum(diffs) / len(diffs) if diffs else math.inf
+
+        for espe in self.simulated:
+            self.assertAlmostEqual(
+                change_one_at_a_time(espe, self.measured),
+                calculate_change(espe, self.measured, _CH))
+        self.assertEqual(math.inf, calculate_change([], self.measured, _CH))
+        self.assertEqual(
+            math.inf,
+            calculate_change([(1.0, 0.0)], [(1.05, 0.0)], _CH))
+
+
+if __name__ == '__main__':
+    unittest.main()
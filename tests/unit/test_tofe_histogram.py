@@ -0,0 +1,80 @@
+# coding=utf-8
+"""
+Created on 16.10.2026
+
+Potku is a graphical user interface for analyzation and
+visualization of measurement data collected from a ToF-ERD
+telescope. For physics calculations Potku uses external
+analyzation components.
+Copyright (C) 2026 Tuomas Pitkänen
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program (file named 'LICENCE').
+"""
+__author__ = "Tuomas Pitkänen"
+__version__ = "2.0"
+
+
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from modules.tofe_histogram import HistogramGrid
+from modules.tofe_histogram import ToFEHistogram
+
+
+class TestToFEHistogram(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.tof = rng.integers(0, 1000, 5000)
+        self.energy = rng.integers(0, 500, 5000)
+        self.histogram = ToFEHistogram(self.tof, self.energy)
+
+    def test_grid_matches_histogram2d(self):
+        counts, x_edges, y_edges = np.histogram2d(
+            self.tof, self.energy, bins=(20, 10), range=((0, 500), (0, 250)))
+        grid = self.histogram.get_grid((20, 10), [[0, 500], [0, 250]])
+
+        np.testing.assert_array_equal(counts, grid.counts)
+        np.testing.assert_array_equal(x_edges, grid.x_edges)
+        np.testing.assert_array_equal(y_edges, grid.y_edges)
+        self.assertEqual((0, 500, 0, 250), grid.extent)
+
+    def test_transposed_grid(self):
+        counts, x_edges, y_edges = np.histogram2d(
+            self.energy, self.tof, bins=(10, 20))
+        grid = self.histogram.get_grid((10, 20), transposed=True)
+
+        np.testing.assert_array_equal(counts, grid.counts)
+        np.testing.assert_array_equal(x_edges, grid.x_edges)
+        np.testing.assert_array_equal(y_edges, grid.y_edges)
+
+    def test_events_are_binned_only_when_binning_changes(self):
+        with mock.patch("numpy.histogram2d",
+                        wraps=np.histogram2d) as histogram2d:
+            grid = self.histogram.get_grid((20, 10))
+            self.assertIs(grid, self.histogram.get_grid((20, 10)))
+            # Swapping the axes reuses the same bins
+            self.assertIsInstance(
+                self.histogram.get_grid((10, 20), transposed=True),
+                HistogramGrid)
+            self.assertEqual(1, histogram2d.call_count)
+
+            self.histogram.get_grid((20, 11))
+            self.histogram.get_grid((20, 11), [[0, 10], [0, 10]])
+            self.assertEqual(3, histogram2d.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
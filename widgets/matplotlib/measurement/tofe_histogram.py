@@ -31,6 +31,8 @@ __version__ = "2.0"
 
 import os
 from pathlib import Path
+
+import numpy as np
 import modules.math_functions as mf
 import modules.general_functions as gf
 
@@ -38,6 +40,7 @@ import widgets.gui_utils as gutils
 
 from modules.enums import ToFEColorScheme
 from modules.measurement import Measurement
+from modules.tofe_histogram import ToFEHistogram
 from dialogs.energy_spectrum import EnergySpectrumWidget
 from dialogs.graph_settings import TofeGraphSettingsWidget
 from dialogs.measurement.depth_profile import DepthProfileWidget
@@ -95,11 +98,17 @@ class MatplotlibHistogramWidget(MatplotlibWidget):
         # Connections and setup
         self.canvas.mpl_connect('button_press_event', self.on_click)
         self.canvas.mpl_connect('motion_notify_event', self.__on_motion)
+        self.canvas.mpl_connect('draw_event', self.__on_canvas_draw)
         self.__fork_toolbar_buttons()
 
         self.measurement = measurement
-        self.__x_data = [x[0] for x in self.measurement.data]
-        self.__y_data = [x[1] for x in self.measurement.data]
+        self.__x_data = self.measurement.data.tof
+        self.__y_data = self.measurement.data.energy
+        # Binned counts are cached so that only changes in binning cause
+        # the events to be binned again.
+        self.__histogram = ToFEHistogram(self.__x_data, self.__y_data)
+        # Figure without selections, used for blitting selections
+        self.__background = None
 
         # Variables
         self.__inverted_Y = False
@@ -194,11 +203,16 @@ class MatplotlibHistogramWidget(MatplotlibWidget):
         self.axes.set_ylim([y_min, y_max])
         self.axes.set_xlim([x_min, x_max]) 
 
-        self.axes.hist2d(x_data,
-                         y_data,
-                         bins=bin_counts,
+        grid = self.__histogram.get_grid(
+            bin_counts, axes_range, transposed=self.transpose_axes)
+        # Empty bins are masked so that they are left transparent like in
+        # hist2d.
+        self.axes.imshow(np.ma.masked_less_equal(grid.counts.T, 0),
+                         origin="lower",
+                         extent=grid.extent,
+                         aspect="auto",
+                         interpolation="nearest",
                          norm=LogNorm(),
-                         range=axes_range,
                          cmap=colormap)
 
         self.__on_draw_legend()
@@ -244,8 +258,44 @@ class MatplotlibHistogramWidget(MatplotlibWidget):
 
         # Remove axis ticks and draw
         self.remove_axes_ticks()
+        # Selections are drawn on top of the histogram after each draw
+        self.__get_selection_lines()
         self.canvas.draw()
 
+    def __get_selection_lines(self):
+        """Returns the lines of the selections. The lines are set animated
+        so that they are left out of the background used for blitting.
+        """
+        lines = []
+        for sel in self.measurement.selector.selections:
+            if sel.points is not None:
+                sel.points.set_animated(True)
+                lines.append(sel.points)
+        return lines
+
+    def __on_canvas_draw(self, event):
+        """Stores the drawn figure as the background for blitting and draws
+        the selections on top of it.
+
+        Args:
+            event: A MPL DrawEvent
+        """
+        self.__background = self.canvas.copy_from_bbox(self.axes.bbox)
+        for line in self.__get_selection_lines():
+            self.axes.draw_artist(line)
+
+    def __draw_selections(self):
+        """Redraws the selections on top of the stored background instead
+        of drawing the whole figure.
+        """
+        if self.__background is None or not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.__background)
+        for line in self.__get_selection_lines():
+            self.axes.draw_artist(line)
+        self.canvas.blit(self.axes.bbox)
+
     def __set_y_axis_on_right(self, yes):
         if yes:
             # self.axes.spines['left'].set_color('none')
@@ -467,7 +517,9 @@ class MatplotlibHistogramWidget(MatplotlibWidget):
                         == 1:
                     self.__on_draw_legend()
                     self.__emit_selections_changed()
-                self.canvas.draw_idle()  # Draw selection points
+                    self.canvas.draw_idle()
+                else:
+                    self.__draw_selections()  # Draw selection points
         if event.button == 3:  # Right click
             # Return if matplotlib tools are in use.
             if self.__button_drag.isChecked():
@@ -601,7 +653,7 @@ class MatplotlibHistogramWidget(MatplotlibWidget):
         """
         if self.elementSelectionSelectButton.isChecked():
             self.measurement.purge_selection()
-            self.canvas.draw_idle()
+            self.__draw_selections()
             # One cannot make new selection while choosing selection
             self.elementSelectionButton.setChecked(False)
             self.elementSelectUndoButton.setEnabled(False)
@@ -757,7 +809,7 @@ class MatplotlibHistogramWidget(MatplotlibWidget):
         """Undo last point in open selection.
         """
         self.measurement.undo_point()
-        self.canvas.draw_idle()
+        self.__draw_selections()
 
     def show_yourself(self, dialog):
         """Show current ToF-E histogram settings in dialog.
@@ -931,6 +931,8 @@ class RecoilAtomDistributionWidget(MatplotlibWidget):
         self.current_recoil_element = \
             self.element_manager.get_recoil_element_with_radio_button(
                 button, self.current_element_simulation)
+        self.current_recoil_element.set_history_depth(
+            self._settings.get_undo_history_depth())
         # pt 2
         try:
             self.other_recoils.remove(self.current_recoil_element)
@@ -1852,7 +1854,7 @@ class RecoilAtomDistributionWidget(MatplotlibWidget):
         """Updates marker and line data and redraws the plot.
         """
         if hasattr(self.parent, 'recoil_distribution_widget'):
-            self.parent._save_target_and_recoils(True)
+            self.parent.schedule_save()
         if self.current_element_simulation is None:
             self.markers.set_visible(False)
             self.lines.set_visible(False)
@@ -2234,9 +2236,7 @@ class RecoilAtomDistributionWidget(MatplotlibWidget):
     def undo_recoil_changes(self):
         """Undo recoil changes.
         """
-        self.current_recoil_element.save_current_points(
-            self.full_edit_on, save_before_undo=True)
-        self.current_recoil_element.change_points_to_previous()
+        self.current_recoil_element.undo_points()
         self.reset_movables()
 
     def reset_movables(self):
@@ -2255,7 +2255,7 @@ class RecoilAtomDistributionWidget(MatplotlibWidget):
     def redo_recoil_changes(self):
         """Redo recoil changes.
         """
-        self.current_recoil_element.change_points_to_next()
+        self.current_recoil_element.redo_points()
         self.reset_movables()
 
     def __context_menu(self, event):
@@ -2274,7 +2274,7 @@ class RecoilAtomDistributionWidget(MatplotlibWidget):
         action.triggered.connect(self.undo_recoil_changes)
         menu.addAction(action)
 
-        if self.current_recoil_element.get_previous_backlog_index() < 0:
+        if not self.current_recoil_element.can_undo_points():
             action.setEnabled(False)
         if not self.full_edit_on:
             if self.current_recoil_element.previous_points_in_full_edit():
@@ -2284,7 +2284,7 @@ class RecoilAtomDistributionWidget(MatplotlibWidget):
         action_3.triggered.connect(self.redo_recoil_changes)
         menu.addAction(action_3)
 
-        if not self.current_recoil_element.next_backlog_entry_done():
+        if not self.current_recoil_element.can_redo_points():
             action_3.setEnabled(False)
 
         if not self.main_recoil_selected() and self.area_limits_for_all_on:
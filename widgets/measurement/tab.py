@@ -51,6 +51,7 @@ from dialogs.measurement.settings import MeasurementSettingsDialog
 from modules.element import Element
 from modules.enums import DepthProfileUnit
 from modules.general_functions import check_if_sum_in_directory_name
+from modules.general_functions import rreplace
 from modules.measurement import Measurement
 
 from widgets.base_tab import BaseTab
@@ -553,42 +554,3 @@ class MeasurementTabWidget(BaseTab):
         else:
             self.warning_text.setText("")
             self.warning_text.setStyleSheet("")
-
-
-def rreplace(s, old, new, old_folder_prefix, new_folder_prefix,
-             old_sample_name, new_sample_name):
-    """Replace from last occurrence.
-
-    http://stackoverflow.com/questions/2556108/how-to-replace-the-last-
-    occurence-of-an-expression-in-a-string
-
-    Args:
-        s: String to modify.
-        old: Old name.
-        new: New name.
-        old_folder_prefix: Folder prefix of the old name.
-        new_folder_prefix: Folder prefix of the new name.
-        old_sample_name: Name of the old sample folder.
-        new_sample_name: Name of the new sample folder.
-    """
-    li = s.rsplit(old, 2)
-    if old_folder_prefix in li[0]:
-        new_f = li[0].replace(old_folder_prefix, new_folder_prefix)
-        li[0] = new_f
-    if old_sample_name in li[0]:
-        new_f = li[0].replace(old_sample_name, new_sample_name)
-        li[0] = new_f
-    # first = s.split(old_folder_prefix, 1)[0]
-    # f_done = first + new_folder_name
-    # second = s.rsplit(old, 1)[1]
-    # s_done = new + second
-    #
-    # result = f_done + s_done
-    result = new.join(li)
-    if "\\" in result and "/" not in result:
-        # This is a patch to make it possible to open .cut files made
-        # on another os.
-        # TODO it would be better to use Path when writing these paths
-        #      to file in the first place
-        result = result.replace("\\", "/")
-    return Path(result)
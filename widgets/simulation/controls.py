@@ -220,6 +220,9 @@ class SimulationControlsWidget(QtWidgets.QWidget, GUIObserver):
             self.recoil_dist_widget.full_edit_on = False
             self.recoil_dist_widget.update_plot()
 
+        # Simulation must start from the latest target and recoils
+        self.recoil_dist_widget.parent.flush_saves()
+
         self.finished_processes = 0, self.process_count
         self.remove_progress_bars()
 
@@ -98,6 +98,7 @@ class OptimizationParameterWidget(QtWidgets.QWidget,
     check_max = bnd.bind("maxTimeEdit")
     check_min = bnd.bind("minTimeEdit")
     skip_simulation = bnd.bind("skip_sim_chk_box")
+    steady_state = bnd.bind("steady_state_chk_box")
 
     @abc.abstractmethod
     def optimization_type(self) -> OptimizationType:
@@ -123,6 +124,25 @@ class OptimizationParameterWidget(QtWidgets.QWidget,
         self.skip_sim_chk_box.stateChanged.connect(self.enable_sim_params)
         self.set_properties(**kwargs)
         self.enable_sim_params()
+        self.set_resume_enabled(False)
+
+    def is_resume_checked(self) -> bool:
+        """Returns whether the optimization is continued from the checkpoint
+        of a previous optimization.
+        """
+        return self.resume_chk_box.isEnabled() and \
+            self.resume_chk_box.isChecked()
+
+    def set_resume_enabled(self, enabled: bool) -> None:
+        """Enables or disables the resume checkbox depending on whether
+        there is a checkpoint to resume from.
+
+        Args:
+            enabled: whether resuming is possible
+        """
+        self.resume_chk_box.setEnabled(enabled)
+        if not enabled:
+            self.resume_chk_box.setChecked(False)
 
     def enable_sim_params(self, *_):
         """Either enables or disables simulation parameters depending on the
@@ -28,8 +28,6 @@ __author__ = "Severi Jääskeläinen \n Samuel Kaiponen \n Heta Rekilä " \
 __version__ = "2.0"
 
 import platform
-import threading
-import time
 
 import widgets.gui_utils as gutils
 
@@ -41,6 +39,7 @@ from modules.simulation import Simulation
 from modules.global_settings import GlobalSettings
 from modules.target import Target
 from modules.observing import ProgressReporter
+from modules.persistence import DebouncedWriter
 
 from PyQt5 import QtCore
 from PyQt5 import QtWidgets
@@ -61,6 +60,9 @@ class TargetWidget(QtWidgets.QWidget):
     """
     results_accepted = pyqtSignal(ElementSimulation)
 
+    # Seconds without edits before changes are written to disk
+    SAVE_DELAY = 2.0
+
     def __init__(self, tab: BaseTab, simulation: Simulation, target: Target,
                  icon_manager: IconManager, settings: GlobalSettings,
                  progress: Optional[ProgressReporter] = None,
@@ -76,7 +78,7 @@ class TargetWidget(QtWidgets.QWidget):
             target: A Target object.
             icon_manager: An icon manager class object.
             progress: ProgressReporter object
-            auto_save: whether automatic saving is enabled.
+            auto_save: whether edits are saved automatically.
         """
         super().__init__()
         uic.loadUi(gutils.get_ui_dir() / "ui_target_widget.ui", self)
@@ -89,6 +91,13 @@ class TargetWidget(QtWidgets.QWidget):
         self.target = target
         self.statusbar = statusbar
 
+        if auto_save:
+            self._writer = DebouncedWriter(
+                lambda: self._save_target_and_recoils(True),
+                delay=self.SAVE_DELAY)
+        else:
+            self._writer = None
+
         self.target_widget = TargetCompositionWidget(
             self, self.target, icon_manager, self.simulation)
 
@@ -140,19 +149,29 @@ class TargetWidget(QtWidgets.QWidget):
         if progress is not None:
             progress.report(100)
 
-        self.stop_saving = False
-        self.thread = None
+    def schedule_save(self):
+        """Marks the target and recoils as changed. Changes are saved in a
+        background thread once no new edits have been made for SAVE_DELAY
+        seconds.
+        """
+        if self._writer is not None:
+            self._writer.mark_dirty()
 
-        if auto_save:
-            self.add_automatic_saving()
+    def flush_saves(self):
+        """Saves pending changes to target and recoils immediately.
+        """
+        if self._writer is not None:
+            self._writer.flush()
 
-    def add_automatic_saving(self):
-        """Add this target widget to be saved (target and recoils) every 1
-        minute in a thread.
+    def stop_automatic_saving(self, save_changes=True):
+        """Stops saving edits automatically.
+
+        Args:
+            save_changes: whether pending changes are saved or discarded.
         """
-        self.thread = threading.Thread(target=self.timed_save)
-        self.thread.daemon = True
-        self.thread.start()
+        if self._writer is not None:
+            self._writer.close(flush=save_changes)
+            self._writer = None
 
     def switch_to_target(self):
         """
@@ -188,21 +207,6 @@ class TargetWidget(QtWidgets.QWidget):
             text += "Ctrl+click."
         self.instructionLabel.setText(text)
 
-    def timed_save(self):
-        """
-        Save target and recoils every 1 minute.
-        """
-        while True:
-            # TODO it might be better to just save when something changes
-            #  instead of automatically doing it every 60 seconds. This might
-            #  cause a situation where files are being written or read at the
-            #  same time by different threads.
-            if self.stop_saving:
-                break
-            if self.target:
-                self._save_target_and_recoils(True)
-            time.sleep(60)
-
     def _save_target_and_recoils(self, thread=False):
         """
         Save target and element simulations.
@@ -237,6 +241,12 @@ class TargetWidget(QtWidgets.QWidget):
         if reporter is not None:
             reporter.report(100)
 
+    def closeEvent(self, event):
+        """Saves pending changes before the widget is closed.
+        """
+        self.stop_automatic_saving()
+        super().closeEvent(event)
+
     def set_shortcuts(self):
         """
         Set shortcuts for deleting points.